@@ -0,0 +1,463 @@
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+from datetime import date, datetime, timezone
+from functools import lru_cache
+
+import pymysql
+from pymysql.cursors import Cursor, DictCursor, SSCursor, SSDictCursor
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lms_db.sql")
+
+# DatabaseManager dono backends ke errors ek saath pakadta h
+IntegrityError = (pymysql.err.IntegrityError, sqlite3.IntegrityError)
+
+
+def is_disconnect(exc):
+    """True if `exc` means the server couldn't be reached or the link dropped,
+    i.e. the statement may never have run (not that it failed)."""
+    if isinstance(exc, (pymysql.err.InterfaceError, ConnectionError, TimeoutError)):
+        return True
+    # 2000-2999: client errors (2003 can't connect, 2006 gone away, 2013 lost connection)
+    return (isinstance(exc, pymysql.err.OperationalError) and bool(exc.args)
+            and isinstance(exc.args[0], int) and 2000 <= exc.args[0] < 3000)
+
+
+def is_missing_table(exc):
+    """True if `exc` says the table doesn't exist (a migration hasn't run yet)."""
+    if isinstance(exc, (pymysql.err.ProgrammingError, pymysql.err.OperationalError)):
+        return bool(exc.args) and exc.args[0] == 1146   # ER_NO_SUCH_TABLE
+    return isinstance(exc, sqlite3.OperationalError) and "no such table" in str(exc)
+
+
+class MySQLBackend:
+    """MariaDB/MySQL server through pymysql (the default)."""
+
+    name = "mysql"
+    fulltext = True            # FULLTEXT index + MATCH ... AGAINST available
+    cursor_base = DictCursor
+    stream_cursor = SSDictCursor
+    column_cursor = SSCursor   # unbuffered, rows as tuples (numpy me seedha jaate h)
+    tuple_cursor = Cursor      # buffered tuples, rows.Rows ke liye
+
+    def __init__(self, conn_args):
+        self.conn_args = dict(conn_args)
+
+    def connect(self, cursorclass=None):
+        args = dict(self.conn_args)
+        if cursorclass is not None:
+            args["cursorclass"] = cursorclass
+        return pymysql.connect(**args)
+
+    def close(self):
+        pass
+
+
+# ---- SQLite
+
+def _adapt_date(value):
+    return value.isoformat()
+
+
+def _adapt_datetime(value):
+    return value.isoformat(" ")
+
+
+def _convert_date(raw):
+    return date.fromisoformat(raw.decode()[:10])
+
+
+def _convert_datetime(raw):
+    return datetime.fromisoformat(raw.decode())
+
+
+sqlite3.register_adapter(date, _adapt_date)
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_converter("date", _convert_date)
+sqlite3.register_converter("datetime", _convert_datetime)
+
+
+def _as_date(value):
+    if isinstance(value, (date, datetime)):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _local(value):
+    # SQLite ka CURRENT_TIMESTAMP UTC me likhta h, MySQL ka session (local) time me;
+    # HOUR()/WEEKDAY() desk ke ghante dikhayein isliye yaha local me badlo
+    d = _as_date(value)
+    if isinstance(value, str) and len(value) > 10 and d is not None:
+        d = d.replace(tzinfo=timezone.utc).astimezone()
+    return d
+
+
+def _hour(value):
+    d = _local(value)
+    return d.hour if isinstance(d, datetime) else (0 if d is not None else None)
+
+
+def _weekday(value):
+    # MySQL WEEKDAY: Monday = 0
+    d = _local(value)
+    return d.weekday() if d is not None else None
+
+
+def _date_format(value, fmt):
+    d = _as_date(value)
+    return d.strftime(fmt) if d is not None and fmt else None
+
+
+def _lpad(value, length, pad):
+    value = "" if value is None else str(value)
+    if len(value) >= length or not pad:
+        return value[:length]
+    return (pad * length)[:length - len(value)] + value
+
+
+def _concat(*parts):
+    # MySQL jaisa: koi bhi NULL to poora NULL
+    if any(p is None for p in parts):
+        return None
+    return "".join(str(p) for p in parts)
+
+
+def _greatest(*values):
+    return None if any(v is None for v in values) else max(values)
+
+
+def _least(*values):
+    return None if any(v is None for v in values) else min(values)
+
+
+def _to_days(value):
+    # MySQL TO_DAYS: saal 0 se din. date.toordinal() saal 1 se ginta h
+    d = _as_date(value)
+    return d.toordinal() + 365 if d is not None else None
+
+
+_MYSQL_FUNCTIONS = {
+    "GREATEST": (-1, _greatest),
+    "LEAST": (-1, _least),
+    "CONCAT": (-1, _concat),
+    "LPAD": (3, _lpad),
+    "DATE_FORMAT": (2, _date_format),
+    "CURDATE": (0, lambda: date.today().isoformat()),
+    "VERSION": (0, lambda: f"SQLite {sqlite3.sqlite_version}"),
+    "TO_DAYS": (1, _to_days),
+    "HOUR": (1, _hour),
+    "WEEKDAY": (1, _weekday),
+}
+
+_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE(\s+SKIP\s+LOCKED|\s+NOWAIT)?", re.IGNORECASE)
+_ON_DUPLICATE = re.compile(r"ON\s+DUPLICATE\s+KEY\s+UPDATE", re.IGNORECASE)
+_VALUES_FN = re.compile(r"\bVALUES\((\w+)\)", re.IGNORECASE)
+_INSERT_IGNORE = re.compile(r"^\s*INSERT\s+IGNORE\b", re.IGNORECASE)
+_EXPLAIN = re.compile(r"^\s*EXPLAIN\s+(?!QUERY\s+PLAN)", re.IGNORECASE)
+_ONLINE_DDL = re.compile(r"\s+(ALGORITHM|LOCK)\s*=?\s*\w+", re.IGNORECASE)
+_DROP_INDEX_ON = re.compile(r"^(\s*DROP\s+INDEX\s+(?:IF\s+EXISTS\s+)?`?\w+`?)\s+ON\s+`?\w+`?", re.IGNORECASE)
+_PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s|%%")
+
+
+@lru_cache(maxsize=512)
+def translate(query, has_args=True):
+    """MySQL flavoured SQL as written in db.py -> SQLite.
+
+    Row locks aren't needed (every write transaction starts with BEGIN
+    IMMEDIATE, which already takes SQLite's single writer lock), upserts
+    become ON CONFLICT ... DO UPDATE, and pyformat placeholders become
+    qmark/named ones. The few MySQL functions used are registered on the
+    connection instead of rewritten. Cached, so the same text always maps
+    to the same statement and sqlite3's statement cache keeps it prepared.
+    """
+    sql = _FOR_UPDATE.sub("", query)
+    if _ON_DUPLICATE.search(sql):
+        sql = _ON_DUPLICATE.sub("ON CONFLICT DO UPDATE SET", sql)
+        sql = _VALUES_FN.sub(r"excluded.\1", sql)
+    sql = _INSERT_IGNORE.sub("INSERT OR IGNORE", sql)
+    sql = _EXPLAIN.sub("EXPLAIN QUERY PLAN ", sql)
+    if sql.lstrip()[:6].upper() in ("CREATE", "DROP I"):
+        # migrations: online-DDL options MySQL ke h, aur SQLite me index naam poore db me unique
+        sql = _ONLINE_DDL.sub("", _DROP_INDEX_ON.sub(r"\1", sql))
+    if has_args:
+        sql = _PLACEHOLDER.sub(lambda m: f":{m.group(1)}" if m.group(1) else ("?" if m.group(0) == "%s" else "%"), sql)
+    return sql
+
+
+class SQLiteCursor:
+    """DictCursor-alike over sqlite3: rows come back as dicts, SQL is translated."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection._conn.cursor()
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @staticmethod
+    def _params(args):
+        if args is None:
+            return ()
+        if isinstance(args, dict):
+            return args
+        return tuple(args) if isinstance(args, (list, tuple)) else (args,)
+
+    def execute(self, query, args=None):
+        self._cursor.execute(translate(query, args is not None), self._params(args))
+        self.rowcount = self._cursor.rowcount
+        self.lastrowid = self._cursor.lastrowid
+        return self.rowcount
+
+    def executemany(self, query, args):
+        args = [self._params(a) for a in args]
+        if not args:
+            return 0
+        self._cursor.executemany(translate(query, True), args)
+        self.rowcount = self._cursor.rowcount
+        return self.rowcount
+
+    def _row(self, row):
+        if row is None:
+            return None
+        return dict(zip([d[0] for d in self._cursor.description], row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size or self._cursor.arraysize)
+        if not rows:
+            return []
+        names = [d[0] for d in self._cursor.description]
+        return [dict(zip(names, r)) for r in rows]
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        if not rows:
+            return []
+        names = [d[0] for d in self._cursor.description]
+        return [dict(zip(names, r)) for r in rows]
+
+    def mogrify(self, query, args=None):
+        # sirf slow-query log ke liye, asli execute hamesha parameters ke saath hota h
+        if args is None:
+            return query
+        if isinstance(args, dict):
+            return query % {k: _literal(v) for k, v in args.items()}
+        return query % tuple(_literal(v) for v in self._params(args))
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteTupleCursor(SQLiteCursor):
+    """Rows as plain tuples, like pymysql's SSCursor."""
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size or self._cursor.arraysize)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+
+def _literal(value):
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+class SQLiteConnection:
+    """The slice of the pymysql connection API that DatabaseManager and
+    ConnectionPool use, over a sqlite3 connection in autocommit mode."""
+
+    def __init__(self, conn, cursorclass=SQLiteCursor):
+        self._conn = conn
+        self.cursorclass = cursorclass
+        self.open = True
+
+    def cursor(self, cursorclass=None):
+        # pymysql cursor classes (DictCursor, SSDictCursor) ki jagah plain SQLiteCursor:
+        # sqlite cursor waise bhi rows ek ek karke deta h
+        if cursorclass is None:
+            cursorclass = self.cursorclass
+        elif not issubclass(cursorclass, SQLiteCursor):
+            cursorclass = SQLiteCursor
+        return cursorclass(self)
+
+    def begin(self):
+        # IMMEDIATE: transaction shuru hote hi write lock, taaki read-then-write
+        # (FOR UPDATE wale) blocks beech me kisi aur writer se na takraye
+        self._conn.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, reconnect=False):
+        self._conn.execute("SELECT 1")
+
+    def close(self):
+        if self.open:
+            self.open = False
+            self._conn.close()
+
+
+class SQLiteBackend:
+    """In-process SQLite database file (WAL mode), created from lms_db.sql.
+
+    path=":memory:" gives a private throwaway database that lives until
+    close(). It is a WAL file in a temp directory rather than a shared-cache
+    memory database, because shared cache uses table locks that fail
+    immediately ("database table is locked") instead of waiting.
+    """
+
+    name = "sqlite"
+    fulltext = False
+    cursor_base = SQLiteCursor
+    stream_cursor = SQLiteCursor
+    column_cursor = SQLiteTupleCursor
+    tuple_cursor = SQLiteTupleCursor
+
+    def __init__(self, path, schema_path=SCHEMA_PATH, busy_timeout=5.0):
+        self.path = path
+        self.schema_path = schema_path
+        self.busy_timeout = busy_timeout
+        self._init_lock = threading.Lock()
+        self._tmpdir = None
+        if path == ":memory:":
+            self._tmpdir = tempfile.mkdtemp(prefix="lms-sqlite-")
+            self._target = os.path.join(self._tmpdir, "lms.sqlite3")
+        else:
+            self._target = path
+        self._ensure_schema()
+
+    def _open(self):
+        conn = sqlite3.connect(self._target, timeout=self.busy_timeout,
+                               isolation_level=None, check_same_thread=False,
+                               detect_types=sqlite3.PARSE_DECLTYPES, cached_statements=256)
+        for name, (nargs, fn) in _MYSQL_FUNCTIONS.items():
+            conn.create_function(name, nargs, fn, deterministic=name != "CURDATE")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def connect(self, cursorclass=None):
+        return SQLiteConnection(self._open(), cursorclass or SQLiteCursor)
+
+    def _ensure_schema(self):
+        with self._init_lock:
+            conn = self._open()
+            try:
+                exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type='table' AND name='books'").fetchone()
+                if not exists:
+                    with open(self.schema_path, encoding="utf-8") as fp:
+                        script = mysqldump_to_sqlite(fp.read())
+                    conn.execute("PRAGMA foreign_keys=OFF")
+                    conn.executescript("BEGIN;\n" + script + "\nCOMMIT;")
+                    conn.execute("PRAGMA foreign_keys=ON")
+            finally:
+                conn.close()
+
+    def close(self):
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+
+
+# ---- lms_db.sql (mysqldump) -> SQLite DDL + data. Schema ka ek hi source rehta h
+
+_SKIP = re.compile(r"^(SET|USE|LOCK|UNLOCK|DROP|ALTER TABLE .* (DIS|EN)ABLE KEYS|/\*|--)", re.IGNORECASE)
+_ENUM = re.compile(r"enum\(([^)]*)\)", re.IGNORECASE)
+
+
+def _column(line):
+    name = line.split("`")[1]
+    line = re.sub(r"\bint\(\d+\)", "INTEGER", line, flags=re.IGNORECASE)
+    line = re.sub(r"current_timestamp\(\)", "CURRENT_TIMESTAMP", line, flags=re.IGNORECASE)
+    line = re.sub(r"\s+COLLATE\s+\w+", "", line)
+    line = _ENUM.sub(lambda m: f"TEXT CHECK (`{name}` IN ({m.group(1)}))", line)
+    return name, line
+
+
+def mysqldump_to_sqlite(text):
+    out, table, body, indexes, pk_inline = [], None, [], [], False
+    stmt = []
+    for raw in text.splitlines():
+        line = raw.strip()
+        if table is None:
+            if stmt:
+                stmt.append(raw)
+                if line.endswith(";"):
+                    out.append(_unescape_insert("\n".join(stmt)))
+                    stmt = []
+                continue
+            if not line or _SKIP.match(line):
+                continue
+            m = re.match(r"CREATE TABLE `(\w+)` \(", line)
+            if m:
+                table, body, indexes, pk_inline = m.group(1), [], [], False
+                continue
+            if line.upper().startswith("INSERT"):
+                stmt = [raw]
+                if line.endswith(";"):
+                    out.append(_unescape_insert(raw))
+                    stmt = []
+            continue
+
+        if line.startswith(")"):
+            out.append(f"CREATE TABLE `{table}` (\n  " + ",\n  ".join(body) + "\n);")
+            out.extend(indexes)
+            table = None
+            continue
+        line = line.rstrip(",")
+        if line.startswith("`"):
+            name, col = _column(line)
+            if "AUTO_INCREMENT" in col.upper():
+                # rowid alias, warna SQLite auto increment nahi karta
+                col = f"`{name}` INTEGER PRIMARY KEY AUTOINCREMENT"
+                pk_inline = True
+            body.append(col)
+        elif line.startswith("PRIMARY KEY"):
+            if not pk_inline:
+                body.append(line)
+        elif line.startswith("UNIQUE KEY"):
+            body.append("UNIQUE " + line.split(None, 3)[3])
+        elif line.startswith("FULLTEXT"):
+            continue
+        elif line.startswith("KEY"):
+            _, name, cols = line.split(None, 2)
+            indexes.append(f"CREATE INDEX `{table}_{name.strip('`')}` ON `{table}` {cols};")
+        elif line.startswith("CONSTRAINT"):
+            body.append(line)
+    return "\n".join(out)
+
+
+def _unescape_insert(stmt):
+    # mysqldump strings me \' aur \\ escape hote h, SQLite '' chahta h
+    return re.sub(r"\\(.)", lambda m: "''" if m.group(1) == "'" else m.group(1), stmt)
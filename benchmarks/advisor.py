@@ -0,0 +1,228 @@
+"""Index advisor: EXPLAIN every statement the benchmark workloads issue.
+
+    python -m benchmarks.advisor --password root --database lms_bench
+    python -m benchmarks.advisor --sqlite bench.sqlite3 --only get_member_fines issue_book
+    python -m benchmarks.advisor --password root --json advice.json
+
+Runs each benchmarks.suite workload once with statement tracing on, then
+EXPLAINs every distinct statement it saw and reports the ones that read a
+whole table or index, or sort/group through a temporary table, with an
+index that would probably help. Batch methods (iter_*, rebuild, sync, the
+fines run) are expected to scan and are listed separately. Write
+workloads change the data, so use the same scratch database as the suite.
+A suggestion becomes a new file under migrations/ (python migrate.py new).
+"""
+import argparse
+import json
+import random
+import re
+
+from benchmarks.common import add_db_args, make_db
+from benchmarks.suite import WORKLOADS, Context, _Rnd
+
+# inme poori table padhna hi kaam h
+BATCH_PREFIXES = ("iter_", "rebuild_", "sync_", "archive_", "upsert_fines", "clear_fines")
+
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|UPDATE|DELETE|INSERT\s+INTO\s+\w+\s*(\([^)]*\))?\s*SELECT|WITH)\b",
+                          re.IGNORECASE)
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN|UPDATE)\s+(\w+)(?:\s+(?:AS\s+)?(?!WHERE|JOIN|LEFT|INNER|ON|SET|ORDER|GROUP|LIMIT|USING)(\w+))?",
+                        re.IGNORECASE)
+_EQUALITY = re.compile(r"(?:(\w+)\.)?(\w+)\s*(?:=\s*(?:%s|%\(\w+\)s|'[^']*'|\d+)|IN\s*\(|IS\s+(?:NOT\s+)?NULL)",
+                       re.IGNORECASE)
+_RANGE = re.compile(r"(?:(\w+)\.)?(\w+)\s*(?:<=?|>=?|BETWEEN)\s*", re.IGNORECASE)
+_ORDER_BY = re.compile(r"ORDER\s+BY\s+(.+?)(?:\s+LIMIT\b|\s+FOR\b|;|$)", re.IGNORECASE | re.DOTALL)
+_SQLITE_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(\w+)( USING (?:COVERING )?INDEX \w+)?")
+_LIMIT = re.compile(r"\bLIMIT\s+(%s|\d+)\s*;?\s*$", re.IGNORECASE)
+_LIKE = re.compile(r"\bLIKE\b", re.IGNORECASE)
+
+
+def is_batch(method):
+    return method.startswith(BATCH_PREFIXES)
+
+
+def trace_workloads(db, only=None, seed=1):
+    """workload name -> [(query, args)] it executed (one call each)."""
+    ctx = Context(db, seed)
+    traces = {}
+    for name, wl in WORKLOADS.items():
+        if only and name not in only:
+            continue
+        rnd = _Rnd(seed, 0, 1)
+        args = wl.prepare(ctx, rnd) if wl.prepare else ()
+        db.metrics.trace = []
+        try:
+            result = wl.run(ctx, *args)
+        finally:
+            traces[name], db.metrics.trace = db.metrics.trace, None
+        if wl.cleanup:
+            wl.cleanup(ctx, result, *args)
+    return traces
+
+
+def _normalize(query):
+    return " ".join(query.split())
+
+
+def explain(db, query, args):
+    if db.backend.name == "sqlite":
+        rows = db._fetch_all("EXPLAIN " + query, args)
+        return [{"table": _SQLITE_SCAN.match(r["detail"]).group(1) if _SQLITE_SCAN.match(r["detail"]) else None,
+                 "detail": r["detail"]} for r in rows]
+    return db._fetch_all("EXPLAIN " + query, args)
+
+
+def problems(db, plan, limited=False):
+    """EXPLAIN rows -> [(table, what)] for the steps that don't use an index well.
+
+    limited: the statement has a LIMIT, so walking an index in ORDER BY
+    order stops early and isn't reported.
+    """
+    found = []
+    for row in plan:
+        if db.backend.name == "sqlite":
+            detail = row["detail"]
+            m = _SQLITE_SCAN.match(detail)
+            if m and not m.group(2):
+                found.append((m.group(1), "full table scan"))
+            elif m and not limited:
+                found.append((m.group(1), "full index scan"))
+            if "TEMP B-TREE" in detail:
+                found.append((None, detail.replace("USE ", "").lower()))
+            continue
+        table, kind, extra = row.get("table"), row.get("type"), row.get("Extra") or ""
+        if table and table.startswith("<"):
+            continue  # derived table / union result: apni query alag se explain hoti h
+        if kind == "ALL":
+            found.append((table, f"full table scan (~{row.get('rows')} rows)"))
+        elif kind == "index" and not limited:
+            found.append((table, f"full index scan of {row.get('key')} (~{row.get('rows')} rows)"))
+        for word in ("filesort", "temporary"):
+            if word in extra:
+                found.append((table, f"using {word}"))
+    return found
+
+
+def suggest(query, table, columns=None):
+    """Heuristic: equality columns, then one range column, then ORDER BY columns of `table`.
+
+    None when the WHERE has nothing indexable for `table`; `columns` (the
+    table's column names, if known) keeps select-list aliases out.
+    """
+    if not table:
+        return None
+    aliases = {table}
+    for name, alias in _TABLE_REF.findall(query):
+        if name == table and alias:
+            aliases.add(alias)
+    single = len({name for name, _ in _TABLE_REF.findall(query)}) == 1
+
+    def mine(matches):
+        return [col for alias, col in matches
+                if (alias in aliases or (not alias and single)) and (columns is None or col in columns)]
+
+    where = re.split(r"\bWHERE\b", query, 1, flags=re.IGNORECASE)[1:]
+    where = re.split(r"\bORDER\s+BY\b|\bGROUP\s+BY\b|\bLIMIT\b", where[0], flags=re.IGNORECASE)[0] if where else ""
+    cols = []
+    for col in mine(_EQUALITY.findall(where)) + mine(_RANGE.findall(where))[:1]:
+        if col not in cols:
+            cols.append(col)
+    if not cols:
+        # sirf ORDER BY wala index full scan hi rahega
+        return None
+    order = _ORDER_BY.search(query)
+    if order:
+        for part in order.group(1).split(","):
+            m = re.match(r"\s*(?:(\w+)\.)?(\w+)", part)
+            if m and not m.group(2).isdigit() and m.group(2) not in cols and mine([m.groups()]):
+                cols.append(m.group(2))
+    return f"{table} ({', '.join(cols)})" if cols else None
+
+
+def table_columns(db, table):
+    # alias ho sakta h (i, b, h): table na mile to None, filter nahi lagta
+    try:
+        rows = db._fetch_all(f"SELECT * FROM {table} LIMIT 1;")
+    except Exception:
+        return None
+    return set(rows[0]) if rows else None
+
+
+def advise(db, traces):
+    """-> list of findings, one per distinct problematic statement."""
+    seen = {}
+    for method, statements in traces.items():
+        for query, args in statements:
+            key = _normalize(query)
+            if not _EXPLAINABLE.match(key):
+                continue
+            if key in seen:
+                seen[key]["methods"].add(method)
+                continue
+            try:
+                plan = explain(db, query, args)
+            except Exception as e:
+                seen[key] = {"methods": {method}, "sql": key, "error": str(e), "issues": []}
+                continue
+            issues = problems(db, plan, limited=bool(_LIMIT.search(key)))
+            seen[key] = {"methods": {method}, "sql": key, "issues": issues, "plan": plan}
+    findings = []
+    for entry in seen.values():
+        if not entry["issues"] and "error" not in entry:
+            continue
+        tables = [t for t, _ in entry["issues"] if t]
+        entry["methods"] = sorted(entry["methods"])
+        entry["batch"] = all(is_batch(m) for m in entry["methods"])
+        entry["suggest"] = None
+        if tables and _LIKE.search(entry["sql"]):
+            entry["issues"].append((None, "LIKE pattern search: a B-tree index can't help a leading %"))
+        elif tables:
+            entry["suggest"] = suggest(entry["sql"], tables[0], table_columns(db, tables[0]))
+        findings.append(entry)
+    findings.sort(key=lambda e: (e["batch"], e["methods"]))
+    return findings
+
+
+def print_findings(findings, statements):
+    print(f"{statements} distinct statements explained, {len(findings)} flagged\n")
+    for batch in (False, True):
+        group = [f for f in findings if f["batch"] == batch]
+        if not group:
+            continue
+        print("batch methods (scans expected):" if batch else "needs attention:")
+        for f in group:
+            print(f"  {', '.join(f['methods'])}")
+            print(f"    {f['sql'][:160]}{'...' if len(f['sql']) > 160 else ''}")
+            for table, what in f["issues"]:
+                print(f"    - {table + ': ' if table else ''}{what}")
+            if f.get("error"):
+                print(f"    - EXPLAIN failed: {f['error']}")
+            if f["suggest"] and not batch:
+                print(f"    suggest: CREATE INDEX ... ON {f['suggest']} ALGORITHM=INPLACE LOCK=NONE;")
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_db_args(parser)
+    parser.add_argument("--only", nargs="*", choices=sorted(WORKLOADS), default=None)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", default=None, metavar="PATH", help="also write the findings as JSON")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    # slow_query_ms sirf isliye ki har connection TimedCursor le (trace wahi bharta h)
+    db = make_db(args, cache_size=0, metrics=True, slow_query_ms=60_000)
+    try:
+        traces = trace_workloads(db, args.only, args.seed)
+        findings = advise(db, traces)
+    finally:
+        db.close()
+    distinct = {_normalize(q) for statements in traces.values() for q, _ in statements}
+    print_findings(findings, len([q for q in distinct if _EXPLAINABLE.match(q)]))
+    if args.json:
+        with open(args.json, "w") as fp:
+            json.dump(findings, fp, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Concurrent checkout of one title: per-copy SKIP LOCKED vs the old row counter.
+
+    python -m benchmarks.bench_checkout --password root --threads 16 --ops 4000
+
+Every worker issues and returns the same book over and over, like a class
+all borrowing the one set text. "copies" goes through DatabaseManager.
+issue_book/return_book, which claim a free book_copies row with
+FOR UPDATE SKIP LOCKED. "row-counter" replays the old transaction, which
+decremented books.available_copies inside the checkout and so serialized
+every desk on that one books row.
+
+Writes loans and circulation stats, so run it against a scratch database.
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import add_db_args, make_db, summarize
+
+
+def legacy_issue(db, book_id, member_id):
+    today = date.today()
+    with db.pool.connection() as conn, conn.cursor() as cursor:
+        try:
+            conn.begin()
+            cursor.execute("SELECT available_copies FROM books WHERE book_id=%s FOR UPDATE;", (book_id,))
+            row = cursor.fetchone()
+            if not row or row["available_copies"] <= 0:
+                conn.rollback()
+                return None
+            cursor.execute("UPDATE books SET available_copies = available_copies - 1 WHERE book_id=%s;",
+                           (book_id,))
+            cursor.execute("""
+                INSERT INTO issued_books (book_id, member_id, issue_date, due_date)
+                VALUES (%s, %s, %s, %s);
+            """, (book_id, member_id, today, today + timedelta(days=14)))
+            issue_id = cursor.lastrowid
+            db._record_circulation(cursor, book_id, member_id, today, issued=1)
+            conn.commit()
+            return issue_id
+        except Exception:
+            conn.rollback()
+            return None
+
+
+def legacy_return(db, issue_id, book_id, member_id):
+    today = date.today()
+    with db.pool.connection() as conn, conn.cursor() as cursor:
+        conn.begin()
+        cursor.execute("UPDATE issued_books SET return_date=%s WHERE issue_id=%s;", (today, issue_id))
+        cursor.execute("UPDATE books SET available_copies = available_copies + 1 WHERE book_id=%s;",
+                       (book_id,))
+        db._record_circulation(cursor, book_id, member_id, today, returned=1)
+        conn.commit()
+
+
+def copies_issue(db, book_id, member_id):
+    if not db.issue_book(book_id, member_id):
+        return None
+    # issue_book sirf True/False deta h; har thread ka apna member h to uska open loan yahi h
+    rows = db._fetch_all("""
+        SELECT issue_id FROM issued_books
+        WHERE book_id=%s AND member_id=%s AND return_date IS NULL
+        ORDER BY issue_id DESC LIMIT 1;
+    """, (book_id, member_id))
+    return rows[0]["issue_id"] if rows else None
+
+
+def copies_return(db, issue_id, book_id, member_id):
+    db.return_book(issue_id)
+
+
+MODES = {
+    "copies": (copies_issue, copies_return),
+    "row-counter": (legacy_issue, legacy_return),
+}
+
+
+def run(db, mode, book_id, members, ops):
+    issue, give_back = MODES[mode]
+    latencies, lock = [], threading.Lock()
+    refused = 0
+    per_thread = ops // len(members)
+
+    def worker(member_id):
+        nonlocal refused
+        local, misses = [], 0
+        for _ in range(per_thread):
+            t0 = time.perf_counter()
+            issue_id = issue(db, book_id, member_id)
+            local.append(time.perf_counter() - t0)
+            if issue_id is None:
+                misses += 1
+                continue
+            give_back(db, issue_id, book_id, member_id)
+        with lock:
+            latencies.extend(local)
+            refused += misses
+
+    workers = [threading.Thread(target=worker, args=(m,)) for m in members]
+    t0 = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    result = summarize(latencies, time.perf_counter() - t0)
+    result["no_copy_free"] = refused
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_db_args(parser)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=4000, help="checkouts per mode")
+    parser.add_argument("--copies", type=int, default=None, help="copies of the title (default: --threads)")
+    parser.add_argument("--mode", choices=sorted(MODES), action="append", default=None)
+    args = parser.parse_args()
+
+    db = make_db(args, pool_min_size=args.threads, pool_max_size=args.threads,
+                 pool_timeout=60, cache_size=0)
+    try:
+        members = [r["member_id"] for r in db._fetch_all(
+            "SELECT member_id FROM members ORDER BY member_id LIMIT %s;", (args.threads,))]
+        if len(members) < args.threads:
+            parser.error(f"need {args.threads} members in the database, found {len(members)}")
+        title = f"bench_checkout {time.time():.0f}"
+        db.add_book(title, "bench", "bench", None, None, args.copies or args.threads)
+        book_id = db._fetch_all("SELECT MAX(book_id) AS book_id FROM books WHERE title=%s;", (title,))[0]["book_id"]
+
+        results = {"book_id": book_id, "threads": args.threads}
+        for mode in args.mode or ["row-counter", "copies"]:
+            results[mode] = run(db, mode, book_id, members, args.ops)
+        if "copies" in results and "row-counter" in results:
+            results["speedup"] = round(results["copies"]["ops_per_s"]
+                                       / max(results["row-counter"]["ops_per_s"], 1e-9), 2)
+        db.sync_book_copies()
+    finally:
+        db.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Overdue/fines engine throughput.
+
+    python -m benchmarks.bench_fines --loans 10000000
+    python -m benchmarks.bench_fines --db --sqlite bench.sqlite3
+    python -m benchmarks.bench_fines --db --password root
+
+Without --db it times FinesEngine.compute over synthetic loan batches
+(no database): the numpy part of a nightly run over --loans late loans.
+With --db it runs the engine against a database filled by
+benchmarks.datagen, once in full and once incrementally, and prints both
+reports (read / compute / write split).
+"""
+import argparse
+import json
+import time
+from datetime import date
+
+import numpy as np
+
+from benchmarks.common import add_db_args, make_db
+from fines import FinesEngine, to_days
+
+
+def synthetic_batches(loans, batch_size, today, seed=1):
+    rnd = np.random.default_rng(seed)
+    for start in range(0, loans, batch_size):
+        n = min(batch_size, loans - start)
+        due = today - rnd.integers(1, 3 * 365, n)
+        late = rnd.integers(1, 90, n)
+        ret = np.where(rnd.random(n) < 0.05, 0, np.minimum(due + late, today))
+        yield np.column_stack([np.arange(start, start + n), rnd.integers(1, 100_000, n), due, ret])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_db_args(parser)
+    parser.add_argument("--db", action="store_true", help="run against the database instead of synthetic data")
+    parser.add_argument("--loans", type=int, default=10_000_000)
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    if args.db:
+        db = make_db(args)
+        try:
+            engine = FinesEngine(db, batch_size=args.batch_size)
+            results = {"full": engine.run(full=True).as_dict(), "incremental": engine.run().as_dict()}
+        finally:
+            db.close()
+        print(json.dumps(results, indent=2))
+        return
+
+    engine = FinesEngine(None, batch_size=args.batch_size)
+    today = to_days(date.today())
+    batches = list(synthetic_batches(args.loans, args.batch_size, today))
+    t0 = time.perf_counter()
+    total = 0
+    for batch in batches:
+        _, _, _, cents, _ = engine.compute(batch, today)
+        total += int(cents.sum())
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({"loans": args.loans, "batch_size": args.batch_size, "compute_s": round(elapsed, 3),
+                      "loans_per_s": round(args.loans / elapsed), "total_fines": total / 100}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
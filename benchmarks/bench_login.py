@@ -0,0 +1,96 @@
+"""Login throughput with the scrypt password hash: logins per second per core.
+
+    python -m benchmarks.bench_login --target-ms 250
+    python -m benchmarks.bench_login --ln 14 --threads 1 2 4 8
+    python -m benchmarks.bench_login --db --sqlite bench.sqlite3 --logins 200
+
+Without --db it times PasswordHasher.verify alone (what a login costs
+besides one indexed SELECT) with 1..N threads, at the cost given by --ln
+or calibrated for --target-ms. With --db it logs in datagen users through
+DatabaseManager.validate_login at the deployment's stored cost: the first
+pass upgrades their legacy SHA-256 hashes, the second is the steady state.
+The upgrade pass rewrites password hashes, so use a scratch database.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+from benchmarks.common import add_db_args, make_db, summarize
+from benchmarks.datagen import password_for
+from passwords import PasswordHasher
+
+
+def run(login, n, threads):
+    """login(i) for i in range(n), spread over `threads` threads."""
+    latencies, lock = [], threading.Lock()
+
+    def worker(t):
+        local = []
+        for i in range(t, n, threads):
+            t0 = time.perf_counter()
+            if not login(i):
+                raise RuntimeError(f"login {i} failed")
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    t0 = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    result = summarize(latencies, time.perf_counter() - t0)
+    # kdf pool me cpu_count workers: usse zyada threads bas line me lagte h
+    result["logins_per_s_per_core"] = round(result["ops_per_s"] / min(threads, os.cpu_count() or 1), 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_db_args(parser)
+    parser.add_argument("--db", action="store_true", help="log in datagen users through validate_login")
+    parser.add_argument("--ln", type=int, default=None, help="scrypt cost 2**ln (default: calibrate)")
+    parser.add_argument("--target-ms", type=float, default=250, help="calibration target per hash")
+    parser.add_argument("--threads", type=int, nargs="*", default=None,
+                        help="thread counts to try (default 1 and the number of cores)")
+    parser.add_argument("--logins", type=int, default=None, help="logins per run (default 20 per thread)")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    thread_counts = args.threads or sorted({1, cores})
+    results = {"cores": cores}
+
+    if args.db:
+        db = make_db(args, cache_size=0, pool_max_size=max(thread_counts) + 1)
+        try:
+            results["params"] = db.hasher.params
+            n = args.logins or 20 * max(thread_counts)
+            # har thread count ko naye users (abhi bhi SHA-256 wale), taaki upgrade pass har baar naapa jaye
+            needed = n * len(thread_counts)
+            if db._fetch_all("SELECT COUNT(*) AS n FROM users;")[0]["n"] < needed:
+                parser.error(f"need {needed} datagen users")
+            for k, threads in enumerate(thread_counts):
+                first = k * n + 1
+                user = lambda i: db.validate_login(f"user{first + i}", password_for(first + i))
+                results[f"upgrade_{threads}t"] = run(user, n, threads)
+                results[f"steady_{threads}t"] = run(user, n, threads)
+        finally:
+            db.close()
+        print(json.dumps(results, indent=2))
+        return
+
+    hasher = PasswordHasher(args.ln) if args.ln is not None else PasswordHasher.calibrate(args.target_ms)
+    results["params"] = hasher.params
+    results["ms_per_hash"] = round(hasher.time_hash() * 1000, 2)
+    stored = hasher.hash("bench-password")
+    for threads in thread_counts:
+        n = args.logins or 20 * threads
+        results[f"{threads}t"] = run(lambda i: hasher.verify("bench-password", stored)[0], n, threads)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Offline desk: issue/return latency with the server down, replay after it comes back.
+
+    python -m benchmarks.bench_offline --sqlite bench.sqlite3 --ops 2000
+
+Starts server.py over --sqlite (a copy is used, the file isn't touched) in
+a subprocess and puts an offline.OfflineDesk in front of an ApiClient. It
+times the snapshot download and online issue + return, kills the server,
+times --ops offline issues and returns (each one fsynced to the journal),
+has a second desk lend out the last copy of some of the books meanwhile,
+restarts the server and times the replay. At the end the desk's open loans
+for the bench members are compared with the server's.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import summarize
+from client import ApiClient
+from db import DatabaseManager
+from offline import OfflineDesk
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(sqlite_path, port):
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py"), "--sqlite", sqlite_path,
+                             "--port", str(port), "--no-index", "--no-recommendations"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(300):
+        try:
+            ApiClient(f"http://127.0.0.1:{port}", timeout=1)
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise SystemExit("server.py did not start")
+
+
+def open_loans(sqlite_path, members):
+    db = DatabaseManager(sqlite_path=sqlite_path, cache_size=0)
+    try:
+        return {m: sorted(l["issue_id"] for l in db.get_issued_books_by_member(m)) for m in members}
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sqlite", required=True, metavar="PATH", help="database filled by benchmarks.datagen")
+    parser.add_argument("--port", type=int, default=18180)
+    parser.add_argument("--ops", type=int, default=2000, help="offline issues (and as many returns)")
+    parser.add_argument("--members", type=int, default=50)
+    parser.add_argument("--taken", type=int, default=20, help="books another desk empties while offline")
+    args = parser.parse_args()
+    rnd = random.Random(1)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "server.sqlite3")
+        shutil.copy(args.sqlite, db_path)
+        db = DatabaseManager(sqlite_path=db_path, cache_size=0)
+        db.create_member_and_user("Offline Bench", "offline@bench", None, "offline-bench", "bench")
+        with db.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("UPDATE users SET role='librarian' WHERE username=%s", ("offline-bench",))
+        # datagen ke members 1..N
+        members = list(range(1, args.members + 1))
+        db.close()
+
+        server = start_server(db_path, args.port)
+        try:
+            desk = OfflineDesk(ApiClient(f"http://127.0.0.1:{args.port}", check=False, timeout=2),
+                               os.path.join(tmp, "desk.sqlite3"), start=False)
+            desk.validate_login("offline-bench", "bench")
+            t0 = time.perf_counter()
+            desk.sync()
+            results["snapshot_s"] = round(time.perf_counter() - t0, 3)
+            results["snapshot_books"] = len(desk.store.get_all_books())
+
+            free = [b["book_id"] for b in desk.store.get_available_books() if b["available_copies"] >= 1]
+            rnd.shuffle(free)
+            lat = []
+            for book_id in free[:50]:
+                t0 = time.perf_counter()
+                issued = desk.issue_books(members[0], [book_id])
+                desk.return_books([issued[0]["issue_id"]])
+                lat.append(time.perf_counter() - t0)
+            results["online_issue_return"] = summarize(lat, sum(lat))
+
+            server.kill()
+            server.wait()
+            desk.get_all_books(limit=1)   # connection refused: desk offline, jawab snapshot se
+            results["offline_after_kill"] = not desk.is_online
+
+            # sirf jinki kai copies free h, taaki conflicts sirf --taken wali books se aaye
+            plenty = [b["book_id"] for b in desk.store.get_available_books() if b["available_copies"] >= 3]
+            taken = plenty[:args.taken]
+            lat, issued = [], []
+            start = time.perf_counter()
+            i = 0
+            while i < args.ops:
+                # ek member counter par 1-4 books leke aata h, har book alag scan (alag call)
+                member = rnd.choice(members)
+                for _ in range(rnd.randint(1, 4)):
+                    t0 = time.perf_counter()
+                    r = desk.issue_books(member, [plenty[i % len(plenty)]])
+                    lat.append(time.perf_counter() - t0)
+                    if r[0]["ok"]:
+                        issued.append(r[0]["issue_id"])
+                    i += 1
+            results["offline_issue"] = summarize(lat, time.perf_counter() - start)
+            returned = issued[::2]
+            lat = []
+            start = time.perf_counter()
+            for issue_id in returned:
+                t0 = time.perf_counter()
+                desk.return_books([issue_id])
+                lat.append(time.perf_counter() - t0)
+            results["offline_return"] = summarize(lat, time.perf_counter() - start)
+            results["journal_entries"] = desk.store.unsynced
+
+            # doosri desk (seedha DB par) in books ki saari copies de deti h
+            other = DatabaseManager(sqlite_path=db_path, cache_size=0)
+            for book_id in taken:
+                while other.issue_book(book_id, members[-1]):
+                    pass
+            other.close()
+
+            server = start_server(db_path, args.port)
+            t0 = time.perf_counter()
+            desk.sync()
+            elapsed = time.perf_counter() - t0
+            results["replay"] = {"entries": results["journal_entries"], "s": round(elapsed, 3),
+                                 "entries_per_s": round(results["journal_entries"] / elapsed, 1)}
+            results["conflicts"] = desk.status()["conflicts"]
+            local = {m: sorted(l["issue_id"] for l in desk.get_issued_books_by_member(m)) for m in members}
+            results["loans_match_server"] = local == open_loans(db_path, members)
+            desk.close()
+        finally:
+            server.kill()
+            server.wait()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
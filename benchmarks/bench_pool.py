@@ -0,0 +1,70 @@
+"""Pool vs single shared connection throughput.
+
+    python -m benchmarks.bench_pool --password root --threads 8 --ops 2000
+
+The "single" run pins the pool to one connection, which is what the old
+DatabaseManager did (every caller queued on one socket). The "pool" run lets
+every worker thread hold its own connection.
+"""
+import argparse
+import json
+import threading
+import time
+
+from benchmarks.common import add_db_args, make_db, summarize
+
+
+def run(db, threads, ops, query):
+    latencies = []
+    lock = threading.Lock()
+    per_thread = ops // threads
+
+    def worker():
+        local = []
+        for _ in range(per_thread):
+            t0 = time.perf_counter()
+            query(db)
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return summarize(latencies, time.perf_counter() - t0)
+
+
+QUERIES = {
+    "search": lambda db: db.search_books("the"),
+    "loans": lambda db: db.get_issued_books_by_member(1),
+    "top": lambda db: db.get_top_issued_books(10),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_db_args(parser)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--query", choices=sorted(QUERIES), default="search")
+    args = parser.parse_args()
+
+    query = QUERIES[args.query]
+    results = {}
+    for label, size in (("single", 1), ("pool", args.threads)):
+        db = make_db(args, pool_min_size=size, pool_max_size=size, pool_timeout=60)
+        try:
+            query(db)  # warm up
+            results[label] = run(db, args.threads, args.ops, query)
+        finally:
+            db.close()
+
+    results["speedup"] = round(results["pool"]["ops_per_s"] / max(results["single"]["ops_per_s"], 1e-9), 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Borrowers-also-borrowed index: full build, incremental loans, lookups.
+
+    python -m benchmarks.bench_recommend --loans 10000000
+    python -m benchmarks.bench_recommend --db --sqlite bench.sqlite3
+
+Without --db it builds recommend.CoBorrowIndex from --loans synthetic loans
+(Zipf-skewed books and members, like datagen) without a database, then
+applies --new loans one at a time the way catch_up does, times top-k
+lookups, and saves/loads the index file. With --db it times
+Recommender.rebuild / build (load + catch up) / also_borrowed against a
+database filled by benchmarks.datagen.
+"""
+import argparse
+import json
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import add_db_args, make_db, summarize
+from recommend import CoBorrowIndex, Recommender
+
+
+def zipf_ids(rnd, n, size, s):
+    # rank -> id shuffled, taaki popular ids chhote number hi na ho (datagen jaisa)
+    p = 1 / np.arange(1, n + 1) ** s
+    ids = rnd.permutation(n) + 1
+    return ids[rnd.choice(n, size=size, p=p / p.sum())]
+
+
+def synthetic_batches(loans, books, members, batch_size, seed=1):
+    rnd = np.random.default_rng(seed)
+    for start in range(0, loans, batch_size):
+        n = min(batch_size, loans - start)
+        yield np.column_stack([np.arange(start + 1, start + n + 1), zipf_ids(rnd, members, n, 0.7),
+                               zipf_ids(rnd, books, n, 0.9)])
+
+
+def peak_rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_db_args(parser)
+    parser.add_argument("--db", action="store_true", help="run against the database instead of synthetic loans")
+    parser.add_argument("--loans", type=int, default=10_000_000)
+    parser.add_argument("--books", type=int, default=1_000_000)
+    parser.add_argument("--members", type=int, default=100_000)
+    parser.add_argument("--new", type=int, default=1000, help="loans applied one at a time after the build")
+    parser.add_argument("--lookups", type=int, default=100_000)
+    args = parser.parse_args()
+    results = {}
+
+    if args.db:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = make_db(args, cache_size=0)
+            try:
+                rec = Recommender(db, path=os.path.join(tmp, "coborrow.npz"))
+                t0 = time.perf_counter()
+                rec.rebuild()
+                results["rebuild_s"] = round(time.perf_counter() - t0, 3)
+                results["loans_through"] = rec.index.last_issue_id
+                results["file_mb"] = round(os.path.getsize(rec.path) / 2**20, 1)
+                rec = Recommender(db, path=rec.path)
+                t0 = time.perf_counter()
+                rec.build()
+                results["load_and_catch_up_s"] = round(time.perf_counter() - t0, 3)
+                rnd = np.random.default_rng(3)
+                books = rnd.integers(1, len(rec.index.offsets) - 1, 200).tolist()
+                lat = []
+                for b in books:
+                    t0 = time.perf_counter()
+                    rec.also_borrowed(b)
+                    lat.append(time.perf_counter() - t0)
+                results["also_borrowed"] = summarize(lat, sum(lat))
+            finally:
+                db.close()
+        print(json.dumps(results, indent=2))
+        return
+
+    batches = list(synthetic_batches(args.loans, args.books, args.members, 100_000))
+    index = CoBorrowIndex()
+    rss0 = peak_rss_mb()
+    t0 = time.perf_counter()
+    index.build(batches)
+    results["build_s"] = round(time.perf_counter() - t0, 2)
+    results["peak_rss_mb"] = {"before": rss0, "after_build": peak_rss_mb()}
+    results["loans"] = args.loans
+    results["books_with_neighbours"] = int(np.count_nonzero(np.diff(index.offsets)))
+    results["top_k_entries"] = len(index.ids)
+
+    rnd = np.random.default_rng(2)
+    new = next(synthetic_batches(args.new, args.books, args.members, args.new, seed=5))
+    new[:, 0] += args.loans
+    lat = []
+    for loan in new.tolist():
+        t0 = time.perf_counter()
+        index.add_loans([loan])
+        lat.append(time.perf_counter() - t0)
+    results["add_loan"] = summarize(lat, sum(lat))
+    results["rows_recomputed"] = len(index.updated)
+
+    books = rnd.integers(1, args.books + 1, args.lookups).tolist()
+    t0 = time.perf_counter()
+    for b in books:
+        index.neighbours(b)
+    results["lookup_us"] = round((time.perf_counter() - t0) / len(books) * 1e6, 2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "coborrow.npz")
+        t0 = time.perf_counter()
+        index.save(path)
+        results["save_s"] = round(time.perf_counter() - t0, 3)
+        results["file_mb"] = round(os.path.getsize(path) / 2**20, 1)
+        t0 = time.perf_counter()
+        CoBorrowIndex.load(path)
+        results["load_s"] = round(time.perf_counter() - t0, 3)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Reports tab redraw cost: the old subplots()-per-visit plot vs reports.BarChart.
+
+    python -m benchmarks.bench_reports --visits 20
+    python -m benchmarks.bench_reports --db --sqlite bench.sqlite3
+
+Replays --visits tab visits on an Agg figure of the tab's size. "old" is
+the previous _draw_top_issued: a new Axes on every visit, all of them
+redrawn. "new" keeps one BarChart: a visit with the same data draws
+nothing, a visit with changed counts updates bar heights and draws once.
+"render" is how long the loans-over-time and busiest-hours images take to
+draw, time the GUI thread no longer spends (the worker does, once per
+data and size). With --db it also times get_report per period with the
+query cache off, next to the single query the old tab ran.
+"""
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from benchmarks.common import add_db_args, make_db, summarize
+import reports
+
+WIDTH, HEIGHT, DPI = 900, 420, 100
+
+
+def sample_report(rnd):
+    today = date.today().replace(day=1)
+    return {
+        "top": [{"title": f"Bench Title Number {i}", "issue_count": rnd.randint(100, 3000)} for i in range(10)],
+        "timeline": {"unit": "month", "points": [
+            {"day": (today - timedelta(days=31 * i)).replace(day=1), "issued": rnd.randint(1500, 2500),
+             "returned": rnd.randint(1500, 2500)} for i in range(24, -1, -1)]},
+        "hours": [[rnd.randint(0, 40) for _ in range(24)] for _ in range(7)],
+    }
+
+
+def _canvas():
+    fig = Figure(figsize=(WIDTH / DPI, HEIGHT / DPI), dpi=DPI)
+    return fig, FigureCanvasAgg(fig)
+
+
+def old_visits(top, visits):
+    # pehle wala _draw_top_issued, jaisa tha
+    fig, canvas = _canvas()
+    times = []
+    titles = [r["title"] for r in top]
+    counts = [r["issue_count"] for r in top]
+    for _ in range(visits):
+        t0 = time.perf_counter()
+        ax = fig.subplots()
+        ax.clear()
+        ax.bar(titles, counts)
+        ax.set_xlabel("Book Title")
+        ax.set_ylabel("Issue Count")
+        ax.set_title("Top Issued Books (All time)")
+        ax.tick_params(axis='x', rotation=45)
+        canvas.draw()
+        times.append(time.perf_counter() - t0)
+    return times, len(fig.axes)
+
+
+def new_visits(top, visits, changed):
+    fig, canvas = _canvas()
+    chart = reports.BarChart(fig.subplots(), "Book Title", "Issue Count", rotation=45)
+    titles = [r["title"] for r in top]
+    counts = [r["issue_count"] for r in top]
+    times = []
+    for i in range(visits):
+        if changed:
+            counts = [c + (j == i % len(counts)) for j, c in enumerate(counts)]
+        t0 = time.perf_counter()
+        if chart.update(titles, counts, "Top Issued Books (All time)"):
+            canvas.draw()
+        times.append(time.perf_counter() - t0)
+    return times, len(fig.axes)
+
+
+def render_times(data, draw, runs):
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        reports.render(draw, data, WIDTH // 2, HEIGHT, DPI)
+        times.append(time.perf_counter() - t0)
+    return summarize(times, sum(times))
+
+
+def _visit_summary(times, axes):
+    result = summarize(times, sum(times))
+    result["first_ms"] = round(times[0] * 1000, 3)
+    result["last_ms"] = round(times[-1] * 1000, 3)
+    result["axes_after"] = axes
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_db_args(parser)
+    parser.add_argument("--db", action="store_true", help="also time get_report on the database")
+    parser.add_argument("--visits", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=10, help="renders / queries per measurement")
+    args = parser.parse_args()
+
+    rnd = random.Random(7)
+    data = sample_report(rnd)
+    results = {
+        "old": _visit_summary(*old_visits(data["top"], args.visits)),
+        "new_unchanged": _visit_summary(*new_visits(data["top"], args.visits, changed=False)),
+        "new_changed": _visit_summary(*new_visits(data["top"], args.visits, changed=True)),
+        "render_timeline": render_times(data["timeline"], reports.draw_timeline, args.runs),
+        "render_hours": render_times(data["hours"], reports.draw_hours, args.runs),
+    }
+
+    if args.db:
+        db = make_db(args, cache_size=0)
+        try:
+            for period in db.TOP_PERIODS:
+                old = [0.0] * args.runs
+                new = [0.0] * args.runs
+                for i in range(args.runs):
+                    t0 = time.perf_counter()
+                    db.get_top_issued_books(10, period=period)
+                    old[i] = time.perf_counter() - t0
+                    t0 = time.perf_counter()
+                    db.get_report(period)
+                    new[i] = time.perf_counter() - t0
+                results[f"query_{period}"] = {"get_top_issued_books": summarize(old, sum(old)),
+                                              "get_report": summarize(new, sum(new))}
+        finally:
+            db.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
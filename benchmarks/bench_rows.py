@@ -0,0 +1,114 @@
+"""Memory and GC cost of catalog listings: DictCursor dicts vs rows.Rows.
+
+    python -m benchmarks.datagen --sqlite rows.sqlite3 --scale tiny --books 1000000 --reset
+    python -m benchmarks.bench_rows --sqlite rows.sqlite3
+    python -m benchmarks.bench_rows --password root --database lms_bench --limit 1000000
+
+Loads the whole catalog (the get_all_books query, up to --limit books)
+once as DictCursor dicts and once as the Rows batch get_all_books now
+returns, and reports what the result keeps alive (tracemalloc, so values
+are counted too and are the same for both), the per-row container size,
+fetch time, how long full gc.collect() passes take while the rows are
+held (the first pass also untracks the tuples, later ones skip them), and
+the time to turn one screen of rows into table text.
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from benchmarks.common import add_db_args, make_db
+from rows import Rows, display
+
+SCREEN_ROWS = 40
+COLUMNS = ("book_id", "title", "author", "publisher", "isbn", "year_published",
+           "total_copies", "available_copies")
+
+
+def fetch_dicts(db, limit):
+    return db._fetch_all(*db._books_query(limit=limit))
+
+
+def fetch_rows(db, limit):
+    return db.get_all_books(limit=limit)
+
+
+MODES = {"dicts": fetch_dicts, "rows": fetch_rows}
+
+
+def screen(rows):
+    if isinstance(rows, Rows):
+        for i in range(min(SCREEN_ROWS, len(rows))):
+            [rows.display(i, c) for c in COLUMNS]
+    else:
+        for row in rows[:SCREEN_ROWS]:
+            [display(row.get(c)) for c in COLUMNS]
+
+
+def measure(args, mode):
+    fetch = MODES[mode]
+    db = make_db(args, cache_size=0)
+    try:
+        fetch(db, 10)   # connection pehle se khula ho, taaki naap me na aaye
+        gc.collect()
+        t0 = time.perf_counter()
+        rows = fetch(db, args.limit)
+        fetch_s = time.perf_counter() - t0
+        n = len(rows)
+        gc_s = []
+        for _ in range(2):
+            t0 = time.perf_counter()
+            gc.collect()
+            gc_s.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        screen(rows)
+        screen_ms = (time.perf_counter() - t0) * 1000
+        container = sys.getsizeof(rows.data[0] if isinstance(rows, Rows) else rows[0]) if rows else 0
+        del rows
+        gc.collect()
+
+        # memory alag run me: tracemalloc fetch ko kaafi dheema karta h
+        tracemalloc.start()
+        rows = fetch(db, args.limit)
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del rows
+        gc.collect()
+    finally:
+        db.close()
+    mb = lambda b: round(b / 2**20, 1)
+    return {
+        "rows": n,
+        "retained_mb": mb(retained),
+        "peak_mb": mb(peak),
+        "bytes_per_row": round(retained / n) if n else 0,
+        "container_bytes": container,
+        "fetch_s": round(fetch_s, 3),
+        "first_gc_ms": round(gc_s[0] * 1000, 1),
+        "gc_ms": round(gc_s[1] * 1000, 1),
+        "screen_ms": round(screen_ms, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_db_args(parser)
+    parser.add_argument("--limit", type=int, default=1_000_000, help="books to load")
+    parser.add_argument("--mode", choices=sorted(MODES), action="append", default=None)
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.mode or ["dicts", "rows"]:
+        results[mode] = measure(args, mode)
+    if "dicts" in results and "rows" in results:
+        d, r = results["dicts"], results["rows"]
+        results["memory_saved"] = f"{1 - r['retained_mb'] / max(d['retained_mb'], 1e-9):.0%}"
+        results["fetch_speedup"] = round(d["fetch_s"] / max(r["fetch_s"], 1e-9), 2)
+        results["gc_speedup"] = round(d["gc_ms"] / max(r["gc_ms"], 1e-9), 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
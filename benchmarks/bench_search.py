@@ -0,0 +1,52 @@
+"""In-process catalog search latency on a synthetic catalog.
+
+    python -m benchmarks.bench_search --books 1000000
+
+Builds a TrigramIndex over generated titles (no database needed) and times
+exact, prefix, typo and ISBN queries.
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks.common import summarize
+from benchmarks.datagen import make_books
+from search import TrigramIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    index = TrigramIndex()
+    t0 = time.perf_counter()
+    index.build(make_books(args.books))
+    build_s = time.perf_counter() - t0
+
+    rnd = random.Random(1)
+    sample = list(make_books(min(args.books, 5000)))
+    queries = {
+        "exact": lambda b: f"{b['title']} {b['author']}",
+        "prefix": lambda b: f"{b['title']} {b['author'][:4]}",
+        "typo": lambda b: f"{b['title'][:3]}{b['title'][4:]} {b['author']}",
+        "short_prefix": lambda b: b["title"][:4],
+        "isbn": lambda b: b["isbn"],
+    }
+    results = {"books": args.books, "build_s": round(build_s, 2)}
+    for name, make_q in queries.items():
+        lat, hits = [], 0
+        for _ in range(args.queries):
+            book = rnd.choice(sample)
+            t0 = time.perf_counter()
+            found = index.search(make_q(book), limit=20)
+            lat.append(time.perf_counter() - t0)
+            hits += any(bid == book["book_id"] for bid, _ in found)
+        results[name] = dict(summarize(lat, sum(lat)), recall_at_20=round(hits / args.queries, 3))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
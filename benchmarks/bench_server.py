@@ -0,0 +1,146 @@
+"""Load test for the circulation API server (server.py).
+
+    python -m benchmarks.bench_server --url http://127.0.0.1:8080 --threads 32 --seconds 20
+    python -m benchmarks.bench_server --sqlite bench.sqlite3 --threads 32
+
+With --url it drives a running server; otherwise it starts one in-process
+on a free port over --sqlite (default: a throwaway in-memory database).
+Every worker is a desk: it registers and logs in its own member, then
+loops over a mix of catalog searches, listing pages, top books, its loans
+and an issue + return, on one keep-alive connection. Prints requests per
+second and latency percentiles per operation and overall, plus the
+server's own counters (GET /api/stats needs a librarian: --login against
+a running server, the in-process one gets its own).
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+
+from benchmarks.common import summarize
+from client import ApiClient, ApiError
+
+LOCAL_LIBRARIAN = ("bench-librarian", "bench")
+
+# (name, weight)
+MIX = [("search", 30), ("books_page", 20), ("available_page", 10), ("top", 15),
+       ("loans", 15), ("issue_return", 10)]
+
+
+def start_local_server(sqlite_path, pool_size, cache_ttl):
+    from db import DatabaseManager
+    from search import CatalogSearch
+    from server import CirculationServer
+
+    db = DatabaseManager(sqlite_path=sqlite_path, pool_min_size=1, pool_max_size=pool_size, metrics=True)
+    username, password = LOCAL_LIBRARIAN
+    db.create_member_and_user("Bench Librarian", "librarian@bench", None, username, password)
+    with db.pool.connection() as conn, conn.cursor() as cursor:
+        cursor.execute("UPDATE users SET role='librarian' WHERE username=%s", (username,))
+    catalog_search = CatalogSearch(db)
+    catalog_search.build()
+    server = CirculationServer(db, catalog_search, cache_ttl=cache_ttl)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    address = []
+
+    def run():
+        asyncio.set_event_loop(loop)
+        address.extend(loop.run_until_complete(server.start("127.0.0.1", 0)))
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    started.wait()
+    return f"http://{address[0]}:{address[1]}"
+
+
+def worker(url, n, run_tag, deadline, seed, results, lock):
+    rnd = random.Random(seed + n)
+    client = ApiClient(url)
+    username = f"load-{run_tag}-{n}"
+    client.create_member_and_user(f"Load {n}", f"{username}@bench", None, username, "load")
+    user = client.validate_login(username, "load")
+    books = client.get_all_books(limit=500)
+    titles = [w for b in books for w in b["title"].split() if len(w) > 3] or ["the"]
+    ops = [name for name, _ in MIX]
+    weights = [w for _, w in MIX]
+    local = {name: [] for name in ops}
+    failed = 0
+
+    while time.perf_counter() < deadline:
+        op = rnd.choices(ops, weights)[0]
+        t0 = time.perf_counter()
+        try:
+            if op == "search":
+                client.search_books_ranked(rnd.choice(titles)[:rnd.randint(3, 8)], limit=20)
+            elif op == "books_page":
+                client.get_all_books(after_id=rnd.choice(books)["book_id"], limit=50)
+            elif op == "available_page":
+                client.get_available_books(limit=50, sort_key="title")
+            elif op == "top":
+                client.get_top_issued_books(10, rnd.choice(("all", "month", "week")))
+            elif op == "loans":
+                client.get_issued_books_by_member(user["member_id"])
+            else:
+                if client.issue_book(rnd.choice(books)["book_id"], user["member_id"]):
+                    for loan in client.get_issued_books_by_member(user["member_id"]):
+                        client.return_book(loan["issue_id"])
+        except ApiError:
+            failed += 1
+            continue
+        local[op].append(time.perf_counter() - t0)
+    client.close()
+    with lock:
+        for name, lat in local.items():
+            results.setdefault(name, []).extend(lat)
+        results.setdefault("_failed", []).append(failed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=None, help="running server (default: start one in-process)")
+    parser.add_argument("--sqlite", default=":memory:", metavar="PATH")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--pool-size", type=int, default=16)
+    parser.add_argument("--cache-ttl", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--login", metavar="USER:PASSWORD", help="librarian on --url, for the server counters")
+    args = parser.parse_args()
+
+    if args.url:
+        url = args.url
+        login = args.login.split(":", 1) if args.login else None
+    else:
+        url = start_local_server(args.sqlite, args.pool_size, args.cache_ttl)
+        login = LOCAL_LIBRARIAN
+    run_tag = f"{int(time.time())}"
+    results, lock = {}, threading.Lock()
+    t0 = time.perf_counter()
+    deadline = t0 + args.seconds
+    workers = [threading.Thread(target=worker, args=(url, n, run_tag, deadline, args.seed, results, lock))
+               for n in range(args.threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - t0
+
+    failed = sum(results.pop("_failed", []))
+    report = {"url": url, "threads": args.threads, "failed": failed,
+              "all": summarize([x for lat in results.values() for x in lat], elapsed)}
+    for name, lat in sorted(results.items()):
+        report[name] = summarize(lat, elapsed)
+    if login:
+        client = ApiClient(url)
+        client.validate_login(*login)
+        server_stats = client.stats()
+        report["server"] = dict(server_stats.get("server", {}), responses=server_stats.get("responses"))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Desk throughput for a patron's stack: one call per book vs issue_books/return_books.
+
+    python -m benchmarks.bench_stack --password root --database lms_bench --threads 8 --stack 8
+    python -m benchmarks.bench_stack --sqlite bench.sqlite3 --threads 1
+
+Each worker is a desk with its own member: it checks out a stack of
+--stack random available books and returns them again, over and over.
+"single" calls issue_book/return_book once per book (what the Issue tab
+did before), "batch" sends the whole stack to issue_books/return_books,
+one transaction each. Also counts the SQL statements one stack costs.
+
+Writes loans and circulation stats, so run it against a scratch database.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+
+from benchmarks.common import add_db_args, make_db, summarize
+
+
+def single_stack(db, member_id, book_ids):
+    issued = []
+    for book_id in book_ids:
+        if db.issue_book(book_id, member_id):
+            issued.append(book_id)
+    # issue_book issue_id nahi deta: member ke open loans se nikalo (batch me bhi yahi query, barabari ke liye)
+    loans = db.get_issued_books_by_member(member_id)
+    for loan in loans:
+        db.return_book(loan["issue_id"])
+    return len(issued)
+
+
+def batch_stack(db, member_id, book_ids):
+    results = db.issue_books(member_id, book_ids)
+    issued = [r["issue_id"] for r in results if r["ok"]]
+    db.get_issued_books_by_member(member_id)
+    db.return_books(issued)
+    return len(issued)
+
+
+MODES = {"single": single_stack, "batch": batch_stack}
+
+
+def run(db, mode, members, book_pool, stack, stacks, seed):
+    fn = MODES[mode]
+    latencies, lock = [], threading.Lock()
+    total = 0
+
+    def worker(t, member_id):
+        nonlocal total
+        rnd = random.Random(seed * 100 + t)
+        local, books = [], 0
+        for _ in range(stacks):
+            picked = rnd.sample(book_pool, stack)
+            t0 = time.perf_counter()
+            books += fn(db, member_id, picked)
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+            total += books
+
+    workers = [threading.Thread(target=worker, args=(t, m)) for t, m in enumerate(members)]
+    t0 = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - t0
+    result = summarize(latencies, elapsed)
+    result["books_per_s"] = round(total / elapsed, 1) if elapsed else 0.0
+    return result
+
+
+def statements_per_stack(db, mode, member_id, book_ids):
+    db.metrics.trace = []
+    try:
+        MODES[mode](db, member_id, book_ids)
+        return len(db.metrics.trace)
+    finally:
+        db.metrics.trace = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_db_args(parser)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--stack", type=int, default=8, help="books per patron")
+    parser.add_argument("--stacks", type=int, default=50, help="stacks per desk and mode")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mode", choices=sorted(MODES), action="append", default=None)
+    args = parser.parse_args()
+
+    # trace sirf statements ginne ke liye; slow_query_ms se connections TimedCursor lete h
+    db = make_db(args, pool_min_size=args.threads, pool_max_size=args.threads, pool_timeout=60,
+                 cache_size=0, slow_query_ms=60_000)
+    try:
+        members = [r["member_id"] for r in db._fetch_all("""
+            SELECT m.member_id FROM members m
+            WHERE NOT EXISTS (SELECT 1 FROM issued_books i WHERE i.member_id = m.member_id
+                              AND i.return_date IS NULL)
+            ORDER BY m.member_id LIMIT %s;
+        """, (args.threads,))]
+        if len(members) < args.threads:
+            parser.error(f"need {args.threads} members without open loans, found {len(members)}")
+        # har desk alag books le, warna "no free copy" dono modes ko alag tarah bigaadta
+        book_pool = [r["book_id"] for r in db._fetch_all(
+            "SELECT book_id FROM books WHERE available_copies >= %s ORDER BY book_id LIMIT 5000;",
+            (args.threads,))]
+        if len(book_pool) < args.stack:
+            parser.error("not enough books with free copies")
+
+        results = {"threads": args.threads, "stack": args.stack}
+        for mode in args.mode or ["single", "batch"]:
+            results[mode] = run(db, mode, members, book_pool, args.stack, args.stacks, args.seed)
+            results[mode]["statements_per_stack"] = statements_per_stack(
+                db, mode, members[0], book_pool[:args.stack])
+        if "single" in results and "batch" in results:
+            results["speedup"] = round(results["batch"]["books_per_s"]
+                                       / max(results["single"]["books_per_s"], 1e-9), 2)
+    finally:
+        db.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
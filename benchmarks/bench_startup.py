@@ -0,0 +1,48 @@
+"""Time-to-first-window of the GUI, over several cold starts.
+
+    python -m benchmarks.bench_startup --runs 10
+    python -m benchmarks.bench_startup --runs 10 --sqlite lms.sqlite3
+
+Starts main.py in a fresh process per run with LMS_STARTUP_EXIT=1, so it
+quits as soon as the login window is up and the database is ready, and
+reads the milestones it appends to LMS_STARTUP_LOG (see startup.py).
+Without --sqlite it uses a throwaway in-memory SQLite database, so no
+server is needed. Set QT_QPA_PLATFORM=offscreen on machines without a display.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--sqlite", default=":memory:", metavar="PATH")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, "startup.jsonl")
+        env = dict(os.environ, LMS_SQLITE=args.sqlite, LMS_STARTUP_EXIT="1", LMS_STARTUP_LOG=log_path)
+        for _ in range(args.runs):
+            subprocess.run([sys.executable, os.path.join(ROOT, "main.py")], env=env, cwd=ROOT,
+                           check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with open(log_path, encoding="utf-8") as fp:
+            runs = [json.loads(line)["marks"] for line in fp]
+
+    results = {"runs": len(runs)}
+    for name in ("imports", "qapp", "first_window", "db_ready"):
+        values = sorted(r[name] for r in runs if name in r)
+        if values:
+            results[name] = {"median_ms": round(statistics.median(values), 1),
+                             "min_ms": values[0], "max_ms": values[-1]}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import argparse
+import statistics
+import time
+
+from db import DatabaseManager
+
+
+def add_db_args(parser: argparse.ArgumentParser):
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", default="lms_db")
+    parser.add_argument("--unix-socket", default=None)
+    parser.add_argument("--sqlite", default=None, metavar="PATH",
+                        help="benchmark the embedded SQLite backend (file or :memory:) instead of MySQL")
+
+
+def make_db(args, **kwargs) -> DatabaseManager:
+    return DatabaseManager(
+        user=args.user,
+        password=args.password,
+        database=args.database,
+        unix_socket=args.unix_socket,
+        host=args.host,
+        port=args.port,
+        sqlite_path=args.sqlite,
+        **kwargs,
+    )
+
+
+def summarize(latencies, elapsed):
+    """latencies in seconds -> dict of throughput and percentiles in ms"""
+    if not latencies:
+        return {"ops": 0, "elapsed_s": elapsed, "ops_per_s": 0.0}
+    lat = sorted(latencies)
+    pick = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] * 1000
+    return {
+        "ops": len(lat),
+        "elapsed_s": round(elapsed, 4),
+        "ops_per_s": round(len(lat) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(lat) * 1000, 3),
+        "p50_ms": round(pick(0.50), 3),
+        "p95_ms": round(pick(0.95), 3),
+        "p99_ms": round(pick(0.99), 3),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - t0
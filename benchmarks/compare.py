@@ -0,0 +1,62 @@
+"""Compare two benchmarks.suite result files.
+
+    python -m benchmarks.compare benchmarks/results/A.json benchmarks/results/B.json --threshold 0.15
+
+Prints p50/p95 and throughput change per benchmark and exits with status 1
+if any p95 got slower (or throughput dropped) by more than --threshold.
+"""
+import argparse
+import json
+import sys
+
+
+def _rows(report):
+    for scale, entry in report["scales"].items():
+        for name, runs in entry["results"].items():
+            for mode, r in runs.items():
+                yield (scale, name, mode), r
+
+
+def compare(old, new, threshold=0.15):
+    before = dict(_rows(old))
+    lines, regressions = [], []
+    for key, r in _rows(new):
+        o = before.get(key)
+        if not o or not o.get("ops") or not r.get("ops"):
+            continue
+        p50 = r["p50_ms"] / o["p50_ms"] - 1 if o["p50_ms"] else 0.0
+        p95 = r["p95_ms"] / o["p95_ms"] - 1 if o["p95_ms"] else 0.0
+        tput = r["ops_per_s"] / o["ops_per_s"] - 1 if o["ops_per_s"] else 0.0
+        bad = p95 > threshold or tput < -threshold
+        if bad:
+            regressions.append(key)
+        scale, name, mode = key
+        lines.append(f"{'!' if bad else ' '} {scale:<10}{name:<28}{mode:<12}"
+                     f"p50 {o['p50_ms']:>8.2f} -> {r['p50_ms']:>8.2f} ({p50:+.0%})  "
+                     f"p95 {o['p95_ms']:>8.2f} -> {r['p95_ms']:>8.2f} ({p95:+.0%})  "
+                     f"ops/s {tput:+.0%}")
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.15)
+    args = parser.parse_args()
+
+    with open(args.old) as fp:
+        old = json.load(fp)
+    with open(args.new) as fp:
+        new = json.load(fp)
+    print(f"{old['commit']} -> {new['commit']}")
+    lines, regressions = compare(old, new, args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
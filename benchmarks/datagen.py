@@ -0,0 +1,278 @@
+"""Deterministic synthetic library data for benchmarks.
+
+    python -m benchmarks.datagen --password root --database lms_bench --scale medium --reset
+
+Fills books, book_copies, members, users and issued_books with skewed,
+realistic-looking data: a Zipf-like title vocabulary, a few very popular
+books and very active members, and two years of loans of which a few
+percent are still out.
+The same --seed and scale always produce the same rows. Member N can log
+in as user<N> with password bench-<N>; the hashes are written in the old
+SHA-256 format (scrypt would take hours) and upgrade on first login.
+
+--reset empties those tables first, so point it at a scratch database.
+"""
+import argparse
+import itertools
+import json
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import add_db_args, make_db
+from passwords import legacy_hash
+
+SCALES = {
+    "tiny": {"books": 1_000, "members": 200, "loans": 5_000},
+    "small": {"books": 10_000, "members": 2_000, "loans": 50_000},
+    "medium": {"books": 100_000, "members": 20_000, "loans": 500_000},
+    "large": {"books": 1_000_000, "members": 100_000, "loans": 5_000_000},
+}
+
+SYLLABLES = ("ka ra ti on de la mo ri su an el or ve na lo mi ther ing sto ry his ma gic "
+             "qua tum pro gra data struc ture world sea fire gar den ni ght mo dern").split()
+PUBLISHERS = ["McGraw Hill", "Oxford University Press", "PHI Learning", "Penguin", "BPB Publications"]
+FIRST_NAMES = ("aarav vivaan aditya vihaan arjun sai reyansh ayaan krishna ishaan ananya diya "
+               "saanvi aadhya kiara pari myra anika riya sneha priya rahul amit neha pooja").split()
+LAST_NAMES = ("kumar sharma singh verma gupta yadav mishra jha patel reddy nair iyer das "
+              "chatterjee banerjee mehta shah joshi pandey tiwari").split()
+
+# --reset me isi order me khali hote h (child tables pehle)
+TABLES = ("book_issue_daily", "book_issue_monthly", "book_issue_totals", "member_issue_monthly",
+          "change_log", "fines", "issued_books_archive", "issued_books", "users", "members", "book_copies", "books")
+
+LOAN_DAYS = 14
+OPEN_RATIO = 0.05
+
+
+def password_for(member_id):
+    return f"bench-{member_id}"
+
+
+def make_vocab(rnd, size):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))))
+    return sorted(words)
+
+
+def zipf_cum_weights(n, s=1.0):
+    return list(itertools.accumulate(1 / (r + 1) ** s for r in range(n)))
+
+
+def make_books(n, seed=7, vocab_size=50_000):
+    # Zipf jaisa skew: kuch words bahut common, baaki rare (asli catalog jaisa)
+    rnd = random.Random(seed)
+    vocab = make_vocab(rnd, vocab_size)
+    names = make_vocab(rnd, 5_000)
+    cum = zipf_cum_weights(len(vocab))
+    for i in range(1, n + 1):
+        title_words = rnd.choices(vocab, cum_weights=cum, k=rnd.randint(2, 6))
+        yield {
+            "book_id": i,
+            "title": " ".join(title_words).title(),
+            "author": f"{rnd.choice(names).title()} {rnd.choice(names).title()}",
+            "publisher": rnd.choice(PUBLISHERS),
+            "isbn": f"978{rnd.randrange(10**9, 10**10)}",
+        }
+
+
+def make_members(n, seed=7):
+    rnd = random.Random(seed + 2)
+    today = date.today()
+    for i in range(1, n + 1):
+        yield {
+            "member_id": i,
+            "full_name": f"{rnd.choice(FIRST_NAMES).title()} {rnd.choice(LAST_NAMES).title()}",
+            "email": f"member{i}@bench.example",
+            "phone": f"9{rnd.randrange(10**8, 10**9)}",
+            "join_date": today - timedelta(days=rnd.randrange(3 * 365)),
+            "status": rnd.choices(("active", "suspended", "alumni"), (90, 2, 8))[0],
+        }
+
+
+def _chunks(rows, size):
+    it = iter(rows)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Generator:
+    def __init__(self, db, books, members, loans, seed=7, days=730, chunk_size=5000, progress=None):
+        self.db = db
+        self.n_books = books
+        self.n_members = members
+        self.n_loans = loans
+        self.seed = seed
+        self.days = days
+        self.chunk_size = chunk_size
+        self.progress = progress or (lambda msg: None)
+        # book b ki copies: copy_start[b] .. copy_start[b] + copies[b] - 1
+        self.copies = [0] * (books + 1)
+        self.copy_start = [0] * (books + 1)
+
+    def run(self, reset=False):
+        t0 = time.perf_counter()
+        sqlite = self.db.backend.name == "sqlite"
+        with self.db.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("PRAGMA foreign_keys=OFF;" if sqlite else "SET FOREIGN_KEY_CHECKS=0, UNIQUE_CHECKS=0;")
+            try:
+                if reset:
+                    for table in TABLES:
+                        cursor.execute(f"{'DELETE FROM' if sqlite else 'TRUNCATE TABLE'} {table};")
+                else:
+                    cursor.execute("SELECT COUNT(*) AS n FROM books;")
+                    if cursor.fetchone()["n"]:
+                        raise ValueError("books is not empty; generate into a scratch database with reset=True")
+                self._load_books(conn, cursor)
+                self._load_members(conn, cursor)
+                self._load_loans(conn, cursor)
+            finally:
+                cursor.execute("PRAGMA foreign_keys=ON;" if sqlite else "SET FOREIGN_KEY_CHECKS=1, UNIQUE_CHECKS=1;")
+        # available_copies aur summary tables wahi code banata h jo production me use hota h
+        self.progress("recounting copies")
+        self.db.sync_book_copies()
+        self.progress("rebuilding circulation stats")
+        self.db.rebuild_circulation_stats()
+        return {"books": self.n_books, "members": self.n_members, "loans": self.n_loans,
+                "seed": self.seed, "elapsed_s": round(time.perf_counter() - t0, 1)}
+
+    def _insert(self, conn, cursor, sql, rows, label):
+        done = 0
+        for chunk in _chunks(rows, self.chunk_size):
+            conn.begin()
+            cursor.executemany(sql, chunk)
+            conn.commit()
+            done += len(chunk)
+            self.progress(f"{label} {done}")
+
+    def _load_books(self, conn, cursor):
+        rnd = random.Random(self.seed + 1)
+        seen_isbn = set()
+        copy_id = 1
+
+        def books():
+            nonlocal copy_id
+            for b in make_books(self.n_books, self.seed):
+                isbn = b["isbn"] if b["isbn"] not in seen_isbn else None
+                seen_isbn.add(isbn)
+                n = rnd.choices((1, 2, 3, 5, 10), (40, 25, 20, 10, 5))[0]
+                self.copies[b["book_id"]] = n
+                self.copy_start[b["book_id"]] = copy_id
+                copy_id += n
+                yield (b["book_id"], b["title"], b["author"], b["publisher"], isbn,
+                       rnd.randint(1950, 2025), n, n)
+
+        self._insert(conn, cursor, """
+            INSERT INTO books (book_id, title, author, publisher, isbn, year_published,
+                               total_copies, available_copies)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s);
+        """, books(), "books")
+
+        def copies():
+            for book_id in range(1, self.n_books + 1):
+                start = self.copy_start[book_id]
+                for c in range(start, start + self.copies[book_id]):
+                    yield (c, book_id, f"LMS{c:09d}")
+
+        self._insert(conn, cursor, """
+            INSERT INTO book_copies (copy_id, book_id, barcode) VALUES (%s, %s, %s);
+        """, copies(), "copies")
+
+    def _load_members(self, conn, cursor):
+        self._insert(conn, cursor, """
+            INSERT INTO members (member_id, full_name, email, phone, join_date, status)
+            VALUES (%(member_id)s, %(full_name)s, %(email)s, %(phone)s, %(join_date)s, %(status)s);
+        """, make_members(self.n_members, self.seed), "members")
+        # scrypt se laakhon users me ghante lagte; purana SHA-256 format, jo pehle login par
+        # validate_login khud upgrade kar deta h (asli purane deployment jaisa hi)
+        users = ((m, f"user{m}", legacy_hash(password_for(m))) for m in range(1, self.n_members + 1))
+        self._insert(conn, cursor, """
+            INSERT INTO users (member_id, username, password_hash, role) VALUES (%s, %s, %s, 'member');
+        """, users, "users")
+
+    def _load_loans(self, conn, cursor):
+        rnd = random.Random(self.seed + 3)
+        # popular books/members random jagah par, sirf chhote id wale nahi
+        book_rank = list(range(1, self.n_books + 1))
+        member_rank = list(range(1, self.n_members + 1))
+        rnd.shuffle(book_rank)
+        rnd.shuffle(member_rank)
+        book_cum = zipf_cum_weights(self.n_books, 0.9)
+        member_cum = zipf_cum_weights(self.n_members, 0.7)
+        out = [0] * (self.n_books + 1)   # book ki kitni copies abhi issued h
+        today = date.today()
+        first = today - timedelta(days=self.days)
+
+        def loans():
+            per_day = self.n_loans / self.days
+            made = 0
+            for d in range(self.days):
+                day = first + timedelta(days=d)
+                # weekend par kam, aakhri din bache hue sab
+                weight = 0.4 if day.weekday() >= 5 else 1.15
+                count = self.n_loans - made if d == self.days - 1 else int(rnd.gauss(per_day * weight, per_day * 0.1))
+                count = max(0, min(count, self.n_loans - made))
+                made += count
+                for _ in range(count):
+                    book_id = rnd.choices(book_rank, cum_weights=book_cum)[0]
+                    member_id = rnd.choices(member_rank, cum_weights=member_cum)[0]
+                    kept = int(rnd.expovariate(1 / 10)) + 1
+                    returned = day + timedelta(days=kept)
+                    still_out = returned > today or rnd.random() < OPEN_RATIO * (d / self.days) ** 4
+                    n = self.copies[book_id]
+                    if still_out and out[book_id] < n:
+                        copy_id = self.copy_start[book_id] + out[book_id]
+                        out[book_id] += 1
+                        returned = None
+                    else:
+                        copy_id = self.copy_start[book_id] + rnd.randrange(n)
+                        returned = min(returned, today)
+                    yield (book_id, member_id, day, day + timedelta(days=LOAN_DAYS), returned, copy_id)
+
+        self._insert(conn, cursor, """
+            INSERT INTO issued_books (book_id, member_id, issue_date, due_date, return_date, copy_id)
+            VALUES (%s, %s, %s, %s, %s, %s);
+        """, loans(), "loans")
+        conn.begin()
+        cursor.execute("""
+            UPDATE book_copies SET status = 'issued'
+            WHERE copy_id IN (SELECT copy_id FROM issued_books WHERE return_date IS NULL);
+        """)
+        conn.commit()
+
+
+def generate(db, scale="small", seed=7, reset=False, progress=None, **overrides):
+    sizes = dict(SCALES[scale], **overrides)
+    return Generator(db, seed=seed, progress=progress, **sizes).run(reset=reset)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_db_args(parser)
+    parser.add_argument("--scale", choices=list(SCALES), default="small")
+    parser.add_argument("--books", type=int, default=None, help="override the scale's book count")
+    parser.add_argument("--members", type=int, default=None)
+    parser.add_argument("--loans", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--reset", action="store_true", help="empty the library tables first")
+    args = parser.parse_args()
+
+    overrides = {k: getattr(args, k) for k in ("books", "members", "loans") if getattr(args, k)}
+    db = make_db(args, cache_size=0)
+    try:
+        summary = generate(db, args.scale, seed=args.seed, reset=args.reset,
+                           progress=lambda msg: print(f"\r{msg:<40}", end="", file=sys.stderr),
+                           **overrides)
+    finally:
+        db.close()
+    print(file=sys.stderr)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
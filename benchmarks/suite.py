@@ -0,0 +1,320 @@
+"""Benchmark every public DatabaseManager method, single-threaded and concurrent.
+
+    python -m benchmarks.suite --password root --database lms_bench --scale tiny small medium
+    python -m benchmarks.suite --password root --database lms_bench --only search_books issue_book
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+
+With --scale the database is regenerated (benchmarks.datagen, --reset) for
+each scale before its run; without it the suite measures whatever is loaded.
+Random choices are seeded, so two runs on the same data issue the same
+calls. Results go to benchmarks/results/<time>-<commit>.json.
+
+Write benchmarks (issue/return, add_book, ...) change the data, so use a
+scratch database.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+
+from benchmarks.common import add_db_args, make_db, summarize
+from benchmarks.datagen import SCALES, generate, password_for
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# prepare(ctx, rnd) -> args (untimed), run(ctx, *args) (timed), cleanup(ctx, result, *args) (untimed)
+Workload = namedtuple("Workload", "run prepare cleanup ops_factor concurrent")
+
+
+def workload(run, prepare=None, cleanup=None, ops_factor=1.0, concurrent=True):
+    return Workload(run, prepare, cleanup, ops_factor, concurrent)
+
+
+class Context:
+    """What the workloads know about the loaded data (sampled once per run)."""
+
+    def __init__(self, db, seed):
+        self.db = db
+        rnd = random.Random(seed)
+        row = db._fetch_all("""
+            SELECT (SELECT MAX(book_id) FROM books) AS books,
+                   (SELECT MAX(member_id) FROM members) AS members,
+                   (SELECT MAX(version) FROM change_log) AS version;
+        """)[0]
+        self.max_book = row["books"] or 1
+        self.max_member = row["members"] or 1
+        # get_changes: ek poll jitna peeche, jaise koi window thodi der baad puchti h
+        self.change_version = max(0, (row["version"] or 0) - 200)
+        ids = [rnd.randint(1, self.max_book) for _ in range(200)]
+        sample = db.get_books_by_ids(ids)
+        self.words = sorted({w for b in sample for w in b["title"].split() if len(w) > 3}) or ["the"]
+        self.titles = [b["title"] for b in sample] or ["the"]
+        self.isbns = [b["isbn"] for b in sample if b.get("isbn")] or ["0"]
+        self.run_tag = f"{int(time.time())}{os.getpid()}"
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def unique(self):
+        with self._lock:
+            self._counter += 1
+            return f"{self.run_tag}-{self._counter}"
+
+    def book(self, rnd):
+        return rnd.randint(1, self.max_book)
+
+    def member(self, rnd):
+        # har thread apne members use karta h (rnd.thread, rnd.threads), taaki issue/return
+        # ek dusre ke loan na utha le
+        m = rnd.randint(1, max(1, self.max_member // rnd.threads))
+        return min(self.max_member, (m - 1) * rnd.threads + rnd.thread + 1)
+
+    def open_loan(self, book_id, member_id):
+        rows = self.db._fetch_all("""
+            SELECT issue_id FROM issued_books
+            WHERE book_id=%s AND member_id=%s AND return_date IS NULL
+            ORDER BY issue_id DESC LIMIT 1;
+        """, (book_id, member_id))
+        return rows[0]["issue_id"] if rows else None
+
+
+def _return_loan(ctx, issued, book_id, member_id):
+    if issued:
+        issue_id = ctx.open_loan(book_id, member_id)
+        if issue_id:
+            ctx.db.return_book(issue_id)
+
+
+def _issue_for_return(ctx, rnd):
+    for _ in range(20):
+        book_id, member_id = ctx.book(rnd), ctx.member(rnd)
+        if ctx.db.issue_book(book_id, member_id):
+            return (ctx.open_loan(book_id, member_id),)
+    return (None,)
+
+
+def _consume(it, n=5000):
+    for i, _ in enumerate(it):
+        if i + 1 >= n:
+            break
+    it.close()
+
+
+def _new_book(ctx):
+    tag = ctx.unique()
+    return {"title": f"Bench Volume {tag}", "author": "Bench Author", "publisher": "Bench Press",
+            "isbn": None, "year_published": 2024, "total_copies": 2}
+
+
+WORKLOADS = {
+    "validate_login": workload(
+        lambda ctx, m: ctx.db.validate_login(f"user{m}", password_for(m)),
+        prepare=lambda ctx, rnd: (ctx.member(rnd),)),
+    "create_member_and_user": workload(
+        lambda ctx, tag: ctx.db.create_member_and_user(f"Bench {tag}", f"{tag}@bench.example",
+                                                       "9000000000", f"b{tag}", "bench"),
+        prepare=lambda ctx, rnd: (ctx.unique(),), ops_factor=0.2),
+    "get_all_books": workload(
+        lambda ctx, after: ctx.db.get_all_books(after_id=after, limit=50),
+        prepare=lambda ctx, rnd: (ctx.book(rnd),)),
+    "get_all_books_by_title": workload(
+        lambda ctx, after: ctx.db.get_all_books(after_id=after, limit=50, sort_key="title"),
+        prepare=lambda ctx, rnd: (ctx.book(rnd),)),
+    "search_books": workload(
+        lambda ctx, kw: ctx.db.search_books(kw, limit=50),
+        prepare=lambda ctx, rnd: (rnd.choice(ctx.words),)),
+    "search_books_ranked": workload(
+        lambda ctx, q: ctx.db.search_books_ranked(q, limit=50),
+        prepare=lambda ctx, rnd: (" ".join(rnd.choice(ctx.titles).split()[:2]),)),
+    "search_books_ranked_isbn": workload(
+        lambda ctx, q: ctx.db.search_books_ranked(q, limit=50),
+        prepare=lambda ctx, rnd: (rnd.choice(ctx.isbns),)),
+    "get_books_by_ids": workload(
+        lambda ctx, ids: ctx.db.get_books_by_ids(ids),
+        prepare=lambda ctx, rnd: ([ctx.book(rnd) for _ in range(50)],)),
+    "get_available_books": workload(
+        lambda ctx, after: ctx.db.get_available_books(after_id=after, limit=50),
+        prepare=lambda ctx, rnd: (ctx.book(rnd),)),
+    "suggest_available_books": workload(
+        lambda ctx, prefix: ctx.db.suggest_available_books(prefix),
+        prepare=lambda ctx, rnd: (rnd.choice(ctx.titles)[:rnd.randint(1, 6)],)),
+    "iter_all_books": workload(
+        lambda ctx: _consume(ctx.db.iter_all_books()), ops_factor=0.05),
+    "iter_search_books": workload(
+        lambda ctx, kw: _consume(ctx.db.iter_search_books(kw)),
+        prepare=lambda ctx, rnd: (rnd.choice(ctx.words),), ops_factor=0.05),
+    "iter_available_books": workload(
+        lambda ctx: _consume(ctx.db.iter_available_books()), ops_factor=0.05),
+    "get_issued_books_by_member": workload(
+        lambda ctx, m: ctx.db.get_issued_books_by_member(m),
+        prepare=lambda ctx, rnd: (ctx.member(rnd),)),
+    "get_top_issued_books": workload(
+        lambda ctx, period: ctx.db.get_top_issued_books(10, period=period),
+        prepare=lambda ctx, rnd: (rnd.choice(ctx.db.TOP_PERIODS),)),
+    "get_report": workload(
+        lambda ctx, period: ctx.db.get_report(period),
+        prepare=lambda ctx, rnd: (rnd.choice(ctx.db.TOP_PERIODS),)),
+    "get_member_activity": workload(
+        lambda ctx, m: ctx.db.get_member_activity(m),
+        prepare=lambda ctx, rnd: (ctx.member(rnd),)),
+    "get_loan_history": workload(
+        lambda ctx, m: ctx.db.get_loan_history(m, limit=50),
+        prepare=lambda ctx, rnd: (ctx.member(rnd),)),
+    "get_member_fines": workload(
+        lambda ctx, m: ctx.db.get_member_fines(m),
+        prepare=lambda ctx, rnd: (ctx.member(rnd),)),
+    "get_changes": workload(
+        lambda ctx, since: ctx.db.get_changes(since),
+        prepare=lambda ctx, rnd: (ctx.change_version,)),
+    "iter_overdue_loans": workload(
+        lambda ctx: _consume(ctx.db.iter_overdue_loans(date.today())), ops_factor=0.05),
+    "iter_late_loans": workload(
+        lambda ctx: _consume(ctx.db.iter_late_loans(date.today(), date.today())), ops_factor=0.05),
+    "issue_book": workload(
+        lambda ctx, book_id, member_id: ctx.db.issue_book(book_id, member_id),
+        prepare=lambda ctx, rnd: (ctx.book(rnd), ctx.member(rnd)),
+        cleanup=_return_loan),
+    "return_book": workload(
+        lambda ctx, issue_id: ctx.db.return_book(issue_id) if issue_id else None,
+        prepare=_issue_for_return),
+    "add_book": workload(
+        lambda ctx, b: ctx.db.add_book(b["title"], b["author"], b["publisher"], b["isbn"],
+                                       b["year_published"], b["total_copies"]),
+        prepare=lambda ctx, rnd: (_new_book(ctx),), ops_factor=0.2),
+    "upsert_books": workload(
+        lambda ctx, books: ctx.db.upsert_books(books),
+        prepare=lambda ctx, rnd: ([_new_book(ctx) for _ in range(100)],), ops_factor=0.05),
+    "sync_book_copies": workload(
+        lambda ctx: ctx.db.sync_book_copies(), ops_factor=0, concurrent=False),
+    "rebuild_circulation_stats": workload(
+        lambda ctx: ctx.db.rebuild_circulation_stats(), ops_factor=0, concurrent=False),
+}
+
+
+class _Rnd(random.Random):
+    def __init__(self, seed, thread, threads):
+        super().__init__(seed)
+        self.thread = thread
+        self.threads = threads
+
+
+def run_workload(ctx, wl, ops, threads, seed):
+    latencies, lock = [], threading.Lock()
+    per_thread = max(1, ops // threads)
+    errors = 0
+
+    def worker(t):
+        nonlocal errors
+        rnd = _Rnd(seed * 1000 + t, t, threads)
+        local, failed = [], 0
+        for _ in range(per_thread):
+            args = wl.prepare(ctx, rnd) if wl.prepare else ()
+            t0 = time.perf_counter()
+            try:
+                result = wl.run(ctx, *args)
+            except Exception:
+                failed += 1
+                continue
+            local.append(time.perf_counter() - t0)
+            if wl.cleanup:
+                wl.cleanup(ctx, result, *args)
+        with lock:
+            latencies.extend(local)
+            errors += failed
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    t0 = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    result = summarize(latencies, time.perf_counter() - t0)
+    result["errors"] = errors
+    return result
+
+
+def run_suite(db, ops=500, threads=8, seed=1, only=None, progress=None):
+    ctx = Context(db, seed)
+    results = {}
+    for name, wl in WORKLOADS.items():
+        if only and name not in only:
+            continue
+        n = max(3, int(ops * wl.ops_factor))
+        runs = {"single": run_workload(ctx, wl, n, 1, seed)}
+        if wl.concurrent and threads > 1:
+            runs[f"threads_{threads}"] = run_workload(ctx, wl, max(n, threads), threads, seed)
+        results[name] = runs
+        if progress:
+            progress(name, runs)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(__file__), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_db_args(parser)
+    parser.add_argument("--scale", nargs="*", choices=list(SCALES), default=None,
+                        help="regenerate the database at each scale and benchmark it")
+    parser.add_argument("--ops", type=int, default=500, help="calls per read benchmark")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", nargs="*", choices=sorted(WORKLOADS), default=None)
+    parser.add_argument("--cache", action="store_true", help="keep the query cache on (default: off)")
+    parser.add_argument("--out", default=None, help="result file (default: benchmarks/results/...)")
+    args = parser.parse_args()
+
+    commit = _git_commit()
+    report = {
+        "commit": commit,
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "ops": args.ops,
+        "threads": args.threads,
+        "cache": args.cache,
+        "scales": {},
+    }
+
+    def progress(name, runs):
+        line = "  ".join(f"{k}: p50 {r.get('p50_ms', 0):.2f}ms {r['ops_per_s']}/s" for k, r in runs.items())
+        print(f"  {name:<28}{line}", flush=True)
+
+    db = make_db(args, pool_min_size=args.threads, pool_max_size=args.threads, pool_timeout=60,
+                 cache_size=256 if args.cache else 0)
+    try:
+        report["server"] = db._fetch_all("SELECT VERSION() AS v;")[0]["v"]
+        for scale in args.scale or [None]:
+            label = scale or "as-loaded"
+            entry = {}
+            if scale:
+                print(f"generating {scale} data ...", flush=True)
+                entry["data"] = generate(db, scale, reset=True)
+            print(f"benchmarking {label}", flush=True)
+            entry["results"] = run_suite(db, args.ops, args.threads, args.seed, args.only, progress)
+            report["scales"][label] = entry
+    finally:
+        db.close()
+
+    path = args.out
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    with open(path, "w") as fp:
+        json.dump(report, fp, indent=2, default=str)
+    print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from rows import Row, Rows
+
+
+class _Entry:
+    __slots__ = ("value", "expires", "tags", "book_ids")
+
+    def __init__(self, value, expires, tags, book_ids):
+        self.value = value
+        self.expires = expires
+        self.tags = tags
+        self.book_ids = book_ids
+
+
+def _copy_result(value):
+    # cache me rakhi rows caller ko seedhe nahi dete, warna caller ka edit cache bigaad dega
+    if isinstance(value, Rows):
+        return value.copy()   # tuples badalte nahi, list ki copy kaafi
+    if isinstance(value, list):
+        return [dict(r) if isinstance(r, dict) else r for r in value]
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+def _book_ids(value):
+    if isinstance(value, Rows):
+        return set(value.column("book_id")) if "book_id" in value.index else set()
+    if isinstance(value, list):
+        return {r["book_id"] for r in value if isinstance(r, dict) and "book_id" in r}
+    return set()
+
+
+class QueryCache:
+    """Thread-safe LRU cache with a per-entry TTL for DatabaseManager reads.
+
+    Entries carry tags ("books", "loans", ...) and the set of book_ids in the
+    cached rows, so writes can either drop what they affect (invalidate) or
+    update cached rows in place (patch_books).
+    """
+
+    def __init__(self, max_entries=256, ttl=30.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._by_book = {}
+        # har write par badhta h; jo read write se pehle shuru hua uska result cache nahi hota
+        self.generation = 0
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= self._clock():
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, _copy_result(entry.value)
+
+    def put(self, key, value, tags=(), generation=None):
+        value = _copy_result(value)
+        book_ids = _book_ids(value)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = _Entry(value, self._clock() + self.ttl, frozenset(tags), book_ids)
+            for book_id in book_ids:
+                self._by_book.setdefault(book_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, tag=None, where=None):
+        """Drop entries with `tag` (all entries if tag is None) for which
+        where(key) is true. Returns how many were dropped."""
+        with self._lock:
+            self.generation += 1
+            doomed = [k for k, e in self._entries.items()
+                      if (tag is None or tag in e.tags) and (where is None or where(k))]
+            for key in doomed:
+                self._drop(key)
+            self.invalidations += len(doomed)
+            return len(doomed)
+
+    def patch_books(self, book_id, fn, drop_tag=None, drop_if=None):
+        """Apply fn(row) to every cached row of book_id. Entries tagged
+        drop_tag are dropped instead when drop_if(row) is true after the patch
+        (e.g. a book leaving the 'available' listing)."""
+        with self._lock:
+            self.generation += 1
+            for key in list(self._by_book.get(book_id, ())):
+                entry = self._entries[key]
+                for row in entry.value:
+                    if isinstance(row, (dict, Row)) and row.get("book_id") == book_id:
+                        fn(row)
+                        if drop_tag in entry.tags and drop_if and drop_if(row):
+                            self._drop(key)
+                            self.invalidations += 1
+                            break
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._by_book.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        for book_id in entry.book_ids:
+            keys = self._by_book.get(book_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_book[book_id]
+
+
+def cached(*tags):
+    """Cache a DatabaseManager read method in self.cache (if enabled).
+
+    The key is (method name, args, sorted kwargs), so only use it on methods
+    whose arguments are hashable.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            cache = self.cache
+            if cache is None:
+                return fn(self, *args, **kwargs)
+            key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+            hit, value = cache.get(key)
+            if hit:
+                return value
+            generation = cache.generation
+            value = fn(self, *args, **kwargs)
+            cache.put(key, value, tags, generation)
+            return value
+        return wrapper
+    return decorator
@@ -0,0 +1,236 @@
+"""Thin client for server.py with the DatabaseManager methods the GUI uses.
+
+main.py uses ApiClient instead of DatabaseManager when LMS_SERVER is set,
+so a desk needs no database credentials. Every TaskRunner thread keeps
+its own keep-alive connection to the server.
+"""
+import http.client
+import json
+import threading
+from datetime import date
+from urllib.parse import urlencode, urlsplit
+
+from db import DatabaseManager
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+def _dates(rows, *names):
+    # JSON me date string ban jaati h; GUI/cache wapas date object expect karte h
+    for row in rows:
+        for name in names:
+            if isinstance(row.get(name), str):
+                row[name] = date.fromisoformat(row[name][:10])
+    return rows
+
+
+class RemoteCatalogSearch:
+    """CatalogSearch stand-in: the server keeps the index, search() asks it."""
+
+    ready = True
+
+    def __init__(self, client):
+        self.client = client
+
+    def build(self):
+        pass
+
+    def catch_up(self):
+        pass
+
+    def search(self, query, limit=50):
+        return self.client.search_books_ranked(query, limit=limit)
+
+
+class RemoteRecommender:
+    """Recommender stand-in: the server keeps the index up to date."""
+
+    ready = True
+    dirty = False
+
+    def __init__(self, client):
+        self.client = client
+
+    def build(self):
+        pass
+
+    def catch_up(self):
+        return 0
+
+    def save(self):
+        pass
+
+    def also_borrowed(self, book_id, limit=10):
+        return self.client.also_borrowed(book_id, limit=limit)
+
+
+class ApiClient:
+
+    TOP_PERIODS = DatabaseManager.TOP_PERIODS
+    OVERDUE_BUCKETS = DatabaseManager.OVERDUE_BUCKETS
+
+    def __init__(self, base_url, timeout=10.0, check=True):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.prefix = url.path.rstrip("/")
+        self.timeout = timeout
+        self.token = None
+        self.metrics = None
+        self.cache = None
+        self.catalog_search = RemoteCatalogSearch(self)
+        self.recommender = RemoteRecommender(self)
+        self._local = threading.local()
+        # check=False: server band ho tab bhi object ban jaye (offline.OfflineDesk baad me jodta h)
+        if check:
+            self._request("GET", "/api/health")
+
+    # ---- HTTP
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def _request(self, method, path, params=None, body=None):
+        if params:
+            path += "?" + urlencode({k: v for k, v in params.items() if v is not None})
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        payload = json.dumps(body).encode() if body is not None else None
+        for attempt in (0, 1):
+            conn = self._connection()
+            try:
+                conn.request(method, self.prefix + path, payload, headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError) as e:
+                conn.close()
+                self._local.conn = None
+                # server ne idle keep-alive connection band kar diya: request pahuchi hi nahi,
+                # ek baar naye connection par. baaki errors me POST dobara nahi bhejte
+                stale = isinstance(e, (http.client.RemoteDisconnected, BrokenPipeError))
+                if attempt or not (stale or method == "GET"):
+                    raise
+        result = json.loads(data) if data else None
+        if response.status != 200:
+            raise ApiError(response.status, (result or {}).get("error", response.reason))
+        return result
+
+    @staticmethod
+    def _listing(after_id, limit, sort_key, descending):
+        return {"after_id": after_id, "limit": limit, "sort": sort_key, "desc": int(descending)}
+
+    # ---- DatabaseManager API
+
+    def validate_login(self, username, plain_password):
+        try:
+            result = self._request("POST", "/api/login", body={"username": username, "password": plain_password})
+        except ApiError as e:
+            if e.status == 401:
+                return None
+            raise
+        self.token = result["token"]
+        return result["user"]
+
+    def create_member_and_user(self, full_name, email, phone, username, plain_password) -> bool:
+        return self._request("POST", "/api/register", body={
+            "full_name": full_name, "email": email, "phone": phone,
+            "username": username, "password": plain_password})["ok"]
+
+    def get_all_books(self, after_id=None, limit=None, sort_key="book_id", descending=False):
+        return self._request("GET", "/api/books", self._listing(after_id, limit, sort_key, descending))
+
+    def search_books(self, keyword, after_id=None, limit=None, sort_key="book_id", descending=False):
+        params = self._listing(after_id, limit, sort_key, descending)
+        params["q"] = keyword
+        return self._request("GET", "/api/books", params)
+
+    def get_available_books(self, after_id=None, limit=None, sort_key="book_id", descending=False):
+        return self._request("GET", "/api/books/available", self._listing(after_id, limit, sort_key, descending))
+
+    def suggest_available_books(self, prefix, limit=20):
+        return self._request("GET", "/api/books/suggest", {"q": prefix, "limit": limit})
+
+    def search_books_ranked(self, query, limit=50):
+        return self._request("GET", "/api/search", {"q": query, "limit": limit})
+
+    def add_book(self, title, author, publisher, isbn, year_published, total_copies):
+        return self._request("POST", "/api/books", body={
+            "title": title, "author": author, "publisher": publisher, "isbn": isbn,
+            "year_published": year_published, "total_copies": total_copies})["ok"]
+
+    def upsert_books(self, books):
+        result = self._request("POST", "/api/books/bulk", body={"books": list(books)})
+        return result["inserted"], result["updated"]
+
+    def get_issued_books_by_member(self, member_id, after_id=None, limit=None, descending=False):
+        rows = self._request("GET", "/api/loans", {"member_id": member_id, "after_id": after_id,
+                                                   "limit": limit, "desc": int(descending)})
+        return _dates(rows, "issue_date", "due_date")
+
+    def issue_book(self, book_id, member_id, days=14) -> bool:
+        return self._request("POST", "/api/issue", body={"book_id": book_id, "member_id": member_id,
+                                                         "days": days})["ok"]
+
+    def return_book(self, issue_id) -> bool:
+        return self._request("POST", "/api/return", body={"issue_id": issue_id})["ok"]
+
+    def issue_books(self, member_id, book_ids, days=14, on=None):
+        return self._request("POST", "/api/issue-books", body={
+            "book_ids": list(book_ids), "member_id": member_id, "days": days,
+            "on": on.isoformat() if on else None})["results"]
+
+    def return_books(self, issue_ids, on=None):
+        return self._request("POST", "/api/return-books", body={
+            "issue_ids": list(issue_ids), "on": on.isoformat() if on else None})["results"]
+
+    def get_open_loans(self, after_id=None, limit=None):
+        return _dates(self._request("GET", "/api/loans/open", {"after_id": after_id, "limit": limit}),
+                      "issue_date", "due_date")
+
+    def get_top_issued_books(self, limit=10, period="all"):
+        return self._request("GET", "/api/top", {"limit": limit, "period": period})
+
+    def get_report(self, period="all", limit=10):
+        report = self._request("GET", "/api/report", {"period": period, "limit": limit})
+        _dates(report["timeline"]["points"], "day")
+        return report
+
+    def get_changes(self, since=None, limit=1000):
+        return self._request("GET", "/api/changes", {"since": since, "limit": limit})
+
+    def get_books_by_ids(self, book_ids):
+        if not book_ids:
+            return []
+        return self._request("GET", "/api/books/by-id", {"ids": ",".join(str(i) for i in book_ids)})
+
+    def also_borrowed(self, book_id, limit=10):
+        return self._request("GET", "/api/books/also-borrowed", {"book_id": book_id, "limit": limit})
+
+    def batch(self, requests):
+        """[(method, path, params, body)] in one round trip -> [(status, body)]."""
+        reqs = []
+        for method, path, params, body in requests:
+            if params:
+                path += "?" + urlencode({k: v for k, v in params.items() if v is not None})
+            req = {"method": method, "path": path}
+            if body is not None:
+                req["body"] = body
+            reqs.append(req)
+        return [(r["status"], r["body"]) for r in self._request("POST", "/api/batch", body={"requests": reqs})]
+
+    def stats(self):
+        return self._request("GET", "/api/stats")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
@@ -1,42 +1,125 @@
-import pymysql
-from pymysql.cursors import DictCursor
 from datetime import date, timedelta
-import hashlib
+import re
+
+import passwords
+from pool import ConnectionPool
+from backends import IntegrityError, MySQLBackend, SQLiteBackend, is_disconnect, is_missing_table
+from cache import QueryCache, cached
+from metrics import QueryMetrics, instrumented
+from rows import Rows
+
+# books table ke sortable columns. nullable wale COALESCE ke saath, taaki keyset
+# comparison NULL par na toote
+BOOK_SORT_COLUMNS = {
+    "book_id": "book_id",
+    "title": "title",
+    "author": "COALESCE(author, '')",
+    "publisher": "COALESCE(publisher, '')",
+    "isbn": "COALESCE(isbn, '')",
+    "year_published": "COALESCE(year_published, 0)",
+    "total_copies": "total_copies",
+    "available_copies": "available_copies",
+}
+
+# typeahead me sirf itna chahiye, poori row nahi
+SUGGEST_COLUMNS = "book_id, title, author, isbn, available_copies"
+
+# hot/cold: issued_books me sirf bahar gaye aur haal me lautaye loans rehte h, purane
+# lautaye hue archive_loans() issued_books_archive me daal deta h. poori history sirf
+# reports/rebuild ko chahiye, woh loan_history() subquery se padhte h
+LOAN_COLUMNS = "issue_id, book_id, member_id, issue_date, due_date, return_date, copy_id"
+
+
+def loan_history(where=None):
+    # filter dono hisso me alag se, taaki har table apna index use kare
+    cond = f" WHERE {where}" if where else ""
+    return (f"(SELECT {LOAN_COLUMNS} FROM issued_books{cond}"
+            f" UNION ALL SELECT {LOAN_COLUMNS} FROM issued_books_archive{cond})")
+
 
 class DatabaseManager:
 
-    def __init__(self, user, password, database, unix_socket=None, host=None, port=None):
-        conn_args = {
-            "user": user,
-            "password": password,
-            "database": database,
-            "cursorclass": DictCursor,
-            "autocommit": True,
-            "connect_timeout": 5,
-        }
-        if unix_socket:
-            conn_args["unix_socket"] = unix_socket
+    def __init__(self, user=None, password=None, database=None, unix_socket=None, host=None, port=None,
+                 pool_min_size=1, pool_max_size=5, pool_timeout=10.0,
+                 cache_size=256, cache_ttl=30.0, metrics=False, slow_query_ms=None,
+                 sqlite_path=None, migrate=True):
+        # sqlite_path diya to MariaDB server ki jagah in-process SQLite file (ya ":memory:")
+        if sqlite_path is not None:
+            self.backend = SQLiteBackend(sqlite_path)
         else:
-            conn_args["host"] = host or "127.0.0.1"
-            conn_args["port"] = port or 3306
+            conn_args = {
+                "user": user,
+                "password": password,
+                "database": database,
+                "autocommit": True,
+                "connect_timeout": 5,
+            }
+            if unix_socket:
+                conn_args["unix_socket"] = unix_socket
+            else:
+                conn_args["host"] = host or "127.0.0.1"
+                conn_args["port"] = port or 3306
+            self.backend = MySQLBackend(conn_args)
+
+        # har method ka latency/rows/errors hisaab; metrics=False par decorator sirf ek
+        # attribute check karta h. slow_query_ms diya to har statement time hota h
+        self.metrics = QueryMetrics(slow_query_ms) if metrics or slow_query_ms is not None else None
+        cursorclass = self.backend.cursor_base
+        self._tuple_cursor = self.backend.tuple_cursor
+        if self.metrics and slow_query_ms is not None:
+            cursorclass = self.metrics.cursor_class(cursorclass)
+            self._tuple_cursor = self.metrics.cursor_class(self._tuple_cursor)
 
-        self.conn = pymysql.connect(**conn_args)
+        # har method apna connection pool se leta h, taaki threads parallel chal sake
+        try:
+            self.pool = ConnectionPool({"cursorclass": cursorclass}, min_size=pool_min_size,
+                                       max_size=pool_max_size, timeout=pool_timeout,
+                                       connect=self.backend.connect)
+        except Exception:
+            self.backend.close()
+            raise
+        # read queries ka result kuch der memory me; cache_size=0 se band
+        self.cache = QueryCache(cache_size, cache_ttl) if cache_size else None
+        self._hasher = None
+        # SQLite file ka koi DBA nahi hota: pending migrations khud chala do.
+        # MariaDB par `python migrate.py up` se, jab admin chahe
+        if migrate and self.backend.name == "sqlite":
+            from migrate import Migrator
+            try:
+                Migrator(self).up()
+            except Exception:
+                self.close()
+                raise
 
     # iss functon me password hassing and user authorization ho rha h 
 
+    @property
+    def hasher(self):
+        # scrypt cost har deployment ka apna (settings.password_kdf), pehli baar padh ke yaad
+        if self._hasher is None:
+            params = self.get_setting(passwords.SETTING)
+            self._hasher = passwords.PasswordHasher.from_params(params) if params else passwords.PasswordHasher()
+        return self._hasher
+
+    def set_password_kdf(self, hasher):
+        """Store calibrated KDF parameters; new and upgraded hashes use them from now on."""
+        self.set_setting(passwords.SETTING, hasher.params)
+        self._hasher = hasher
+
     def hash_password(self, plain_text_password: str) -> str:
-        return hashlib.sha256(plain_text_password.encode('utf-8')).hexdigest()
+        return self.hasher.hash(plain_text_password)
 
+    @instrumented
     def create_member_and_user(self, full_name, email, phone, username, plain_password) -> bool:
         pwd_hash = self.hash_password(plain_password)
-        with self.conn.cursor() as cursor:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
             try:
                 cursor.execute("""
                     INSERT INTO members (full_name, email, phone)
                     VALUES (%s, %s, %s);
                 """, (full_name, email, phone))
                 member_id = cursor.lastrowid
-            except pymysql.err.IntegrityError:
+            except IntegrityError:
                 return False
 
             try:
@@ -44,108 +127,707 @@ class DatabaseManager:
                     INSERT INTO users (member_id, username, password_hash, role)
                     VALUES (%s, %s, %s, 'member');
                 """, (member_id, username, pwd_hash))
+                self._log_change(cursor, "member", member_id, "insert", member_id)
                 return True
-            except pymysql.err.IntegrityError:
+            except IntegrityError:
                 cursor.execute("DELETE FROM members WHERE member_id=%s;", (member_id,))
                 return False
 
+    @instrumented
     def validate_login(self, username, plain_password):
-        pwd_hash = self.hash_password(plain_password)
-        with self.conn.cursor() as cursor:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
             cursor.execute("""
                 SELECT user_id, member_id, password_hash, role
                 FROM users
                 WHERE username=%s;
             """, (username,))
             row = cursor.fetchone()
-            if row and row.get('password_hash') == pwd_hash:
-                return {
-                    'user_id': row['user_id'],
-                    'member_id': row['member_id'],
-                    'username': username,
-                    'role': row['role']
-                }
+        # hashing jaan-bujh ke dheemi h: connection pehle hi pool me wapas, verify kdf pool par
+        if row is None:
+            self.hasher.dummy_verify(plain_password)
             return None
+        ok, needs_rehash = self.hasher.verify(plain_password, row['password_hash'])
+        if not ok:
+            return None
+        if needs_rehash:
+            # purana SHA-256 ya kam cost wala hash: sahi password abhi haath me h, naya bana do.
+            # doosre login ne beech me badal diya ho to uska rehne do
+            new_hash = self.hasher.hash(plain_password)
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE users SET password_hash=%s
+                    WHERE user_id=%s AND password_hash=%s;
+                """, (new_hash, row['user_id'], row['password_hash']))
+        return {
+            'user_id': row['user_id'],
+            'member_id': row['member_id'],
+            'username': username,
+            'role': row['role']
+        }
 
     # book ka sara operation sql query ke through
 
-    def get_all_books(self):
-        with self.conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM books;")
-            return cursor.fetchall()
+    @instrumented
+    @cached("books")
+    def get_all_books(self, after_id=None, limit=None, sort_key="book_id", descending=False):
+        sql, params = self._books_query(after_id=after_id, limit=limit,
+                                        sort_key=sort_key, descending=descending)
+        return self._fetch_rows(sql, params)
+
+    @instrumented
+    @cached("books")
+    def search_books(self, keyword, after_id=None, limit=None, sort_key="book_id", descending=False):
+        sql, params = self._books_query(keyword=keyword, after_id=after_id, limit=limit,
+                                        sort_key=sort_key, descending=descending)
+        return self._fetch_rows(sql, params)
+
+    @instrumented
+    @cached("books")
+    def search_books_ranked(self, query, limit=50):
+        # FULLTEXT(title, author, publisher) se relevance ranking; har word prefix match
+        # hota h ("harr" -> "harry"). ISBN exact match sabse upar
+        words = re.findall(r"\w+", query)
+        boolean_q = " ".join(f"+{w}*" for w in words)
+        isbn = re.sub(r"[\s-]", "", query)
+        if not boolean_q:
+            return []
+        if not self.backend.fulltext:
+            return self._search_books_like(words, isbn, limit)
+        return self._fetch_all("""
+            SELECT *, MATCH(title, author, publisher) AGAINST (%s IN BOOLEAN MODE) AS relevance
+            FROM books
+            WHERE MATCH(title, author, publisher) AGAINST (%s IN BOOLEAN MODE) OR isbn = %s
+            ORDER BY isbn = %s DESC, relevance DESC, book_id
+            LIMIT %s;
+        """, (boolean_q, boolean_q, isbn, isbn, limit))
+
+    def _search_books_like(self, words, isbn, limit):
+        # FULLTEXT index nahi (SQLite): har word title/author/publisher me kahi ho,
+        # title usi word se shuru ho to upar. CatalogSearch ka index banne tak hi chalta h
+        where, params = [], []
+        for w in words:
+            where.append("(title LIKE %s OR author LIKE %s OR publisher LIKE %s)")
+            params += [f"%{w}%"] * 3
+        return self._fetch_all(f"""
+            SELECT *, (title LIKE %s) + 0.5 * (title LIKE %s) AS relevance
+            FROM books
+            WHERE ({" AND ".join(where)}) OR isbn = %s
+            ORDER BY isbn = %s DESC, relevance DESC, book_id
+            LIMIT %s;
+        """, [f"%{words[0]}%", f"{words[0]}%"] + params + [isbn, isbn, limit])
 
-    def search_books(self, keyword):
-        like_kw = f"%{keyword}%"
-        with self.conn.cursor() as cursor:
+    @instrumented
+    def get_books_by_ids(self, book_ids):
+        if not book_ids:
+            return []
+        placeholders = ", ".join(["%s"] * len(book_ids))
+        return self._fetch_all(f"SELECT * FROM books WHERE book_id IN ({placeholders});", list(book_ids))
+
+    @staticmethod
+    def _books_query(keyword=None, available_only=False, after_id=None, limit=None,
+                     sort_key="book_id", descending=False):
+        # keyset pagination: after_id pichle page ki last book h, OFFSET scan nahi hota.
+        # sort column ki value us book se subquery me nikalti h
+        sort_expr = BOOK_SORT_COLUMNS[sort_key]
+        op, direction = ("<", "DESC") if descending else (">", "ASC")
+        where, params = [], []
+        if keyword:
+            like_kw = f"%{keyword}%"
+            where.append("(title LIKE %s OR author LIKE %s)")
+            params += [like_kw, like_kw]
+        if available_only:
+            where.append("available_copies > 0")
+        if after_id is not None:
+            if sort_key == "book_id":
+                where.append(f"book_id {op} %s")
+                params.append(after_id)
+            else:
+                last_val = f"(SELECT {sort_expr} FROM books WHERE book_id=%s)"
+                where.append(f"({sort_expr} {op} {last_val} OR ({sort_expr} = {last_val} AND book_id {op} %s))")
+                params += [after_id, after_id, after_id]
+        sql = "SELECT * FROM books"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if sort_key == "book_id":
+            sql += f" ORDER BY book_id {direction}"
+        else:
+            sql += f" ORDER BY {sort_expr} {direction}, book_id {direction}"
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(limit)
+        return sql + ";", params
+
+    def get_setting(self, name, default=None):
+        try:
+            rows = self._fetch_all("SELECT value FROM settings WHERE name=%s;", (name,))
+        except Exception as e:
+            # MariaDB par `migrate.py up` abhi nahi chala: settings table hi nahi, defaults chalao.
+            # connection/auth/lock ki galti upar jaaye, warna login galat cost se hash karta
+            if not is_missing_table(e):
+                raise
+            return default
+        return rows[0]["value"] if rows else default
+
+    def set_setting(self, name, value):
+        with self.pool.connection() as conn, conn.cursor() as cursor:
             cursor.execute("""
-                SELECT * FROM books
-                WHERE title LIKE %s OR author LIKE %s;
-            """, (like_kw, like_kw))
+                INSERT INTO settings (name, value) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE value = VALUES(value), updated_at = CURRENT_TIMESTAMP;
+            """, (name, value))
+
+    def _fetch_all(self, sql, params=()):
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(sql, params)
             return cursor.fetchall()
 
+    def _fetch_rows(self, sql, params=()):
+        # catalog jitni listings: har row ka dict nahi, driver ka tuple aur column naam ek baar (rows.py)
+        with self.pool.connection() as conn, conn.cursor(self._tuple_cursor) as cursor:
+            cursor.execute(sql, params)
+            return Rows([d[0] for d in cursor.description], cursor.fetchall())
+
+    # bade export/report ke liye: rows server se thodi thodi aati h (SSDictCursor / sqlite cursor),
+    # poora result memory me nahi aata. generator chalne tak ek pooled connection busy rehta h
+
+    def _stream(self, sql, params=(), batch_size=1000):
+        for rows in self._stream_batches(sql, params, batch_size):
+            yield from rows
+
+    def _stream_batches(self, sql, params=(), batch_size=1000, cursorclass=None):
+        if self.metrics and self.metrics.trace is not None:
+            # stream cursor TimedCursor nahi h, to trace yahin se
+            self.metrics.trace.append((sql, params))
+        conn = self.pool.acquire()
+        finished = False
+        try:
+            cursor = conn.cursor(cursorclass or self.backend.stream_cursor)
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+            cursor.close()
+            finished = True
+        finally:
+            # adha padha unbuffered result drain karne se achha connection hi band kar do
+            self.pool.release(conn, discard=not finished)
+
+    @instrumented
+    def iter_all_books(self, sort_key="book_id", descending=False, batch_size=1000):
+        sql, params = self._books_query(sort_key=sort_key, descending=descending)
+        return self._stream(sql, params, batch_size)
+
+    @instrumented
+    def iter_search_books(self, keyword, sort_key="book_id", descending=False, batch_size=1000):
+        sql, params = self._books_query(keyword=keyword, sort_key=sort_key, descending=descending)
+        return self._stream(sql, params, batch_size)
+
+    @instrumented
+    def iter_available_books(self, sort_key="book_id", descending=False, batch_size=1000):
+        sql, params = self._books_query(available_only=True, sort_key=sort_key, descending=descending)
+        return self._stream(sql, params, batch_size)
+
+    @instrumented
     def add_book(self, title, author, publisher, isbn, year_published, total_copies):
-        with self.conn.cursor() as cursor:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
             try:
+                conn.begin()
                 cursor.execute("""
                     INSERT INTO books
                       (title, author, publisher, isbn, year_published, total_copies, available_copies)
                     VALUES (%s, %s, %s, %s, %s, %s, %s);
                 """, (title, author, publisher, isbn, year_published, total_copies, total_copies))
-                return True
-            except pymysql.err.IntegrityError:
+                book_id = cursor.lastrowid
+                self._add_copies(cursor, {book_id: total_copies})
+                self._log_change(cursor, "book", book_id, "insert")
+                conn.commit()
+            except IntegrityError:
+                conn.rollback()
                 return False
+        if self.cache:
+            self.cache.invalidate("books")
+        return True
 
-    def get_available_books(self):
-        with self.conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM books WHERE available_copies > 0;")
-            return cursor.fetchall()
+    @instrumented
+    def upsert_books(self, books):
+        # bulk import: ek transaction, ek multi-row INSERT. ISBN pehle se h to copies jud jaati h
+        with_isbn = [b for b in books if b.get("isbn")]
+        without_isbn = [b for b in books if not b.get("isbn")]
+        if not books:
+            return 0, 0
+
+        def values(b):
+            return (b["title"], b.get("author"), b.get("publisher"), b.get("isbn"),
+                    b.get("year_published"), b["total_copies"], b["total_copies"])
+
+        insert_sql = """
+            INSERT INTO books
+              (title, author, publisher, isbn, year_published, total_copies, available_copies)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+              total_copies = total_copies + VALUES(total_copies),
+              available_copies = available_copies + VALUES(available_copies);
+        """
+        new_copies = {}
+        updated = 0
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            conn.begin()
+            if with_isbn:
+                placeholders = ", ".join(["%s"] * len(with_isbn))
+                isbns = [b["isbn"] for b in with_isbn]
+                # affected-rows ka matlab har backend me alag h, isliye pehle se maujood
+                # ISBN khud gin lete h (same batch me dobara aaya ISBN bhi update h)
+                cursor.execute(f"SELECT isbn FROM books WHERE isbn IN ({placeholders});", isbns)
+                seen = {r["isbn"] for r in cursor.fetchall()}
+                for isbn in isbns:
+                    updated += isbn in seen
+                    seen.add(isbn)
+                cursor.executemany(insert_sql, [values(b) for b in with_isbn])
+                cursor.execute(f"SELECT book_id, isbn FROM books WHERE isbn IN ({placeholders});", isbns)
+                ids = {r["isbn"]: r["book_id"] for r in cursor.fetchall()}
+                for b in with_isbn:
+                    new_copies[ids[b["isbn"]]] = new_copies.get(ids[b["isbn"]], 0) + b["total_copies"]
+            for b in without_isbn:
+                # ISBN ke bina book_id wapas pane ka yahi tareeka h
+                cursor.execute(insert_sql, values(b))
+                new_copies[cursor.lastrowid] = b["total_copies"]
+            self._add_copies(cursor, new_copies)
+            cursor.executemany("""
+                INSERT INTO change_log (entity, entity_id, op) VALUES ('book', %s, 'update');
+            """, [(book_id,) for book_id in new_copies])
+            conn.commit()
+        return len(books) - updated, updated
+
+    def _add_copies(self, cursor, copies_by_book):
+        # har physical copy ki ek row; barcode copy_id se banta h
+        rows = [(book_id,) for book_id, n in copies_by_book.items() for _ in range(n)]
+        if not rows:
+            return
+        cursor.executemany("INSERT INTO book_copies (book_id) VALUES (%s);", rows)
+        placeholders = ", ".join(["%s"] * len(copies_by_book))
+        cursor.execute(f"""
+            UPDATE book_copies SET barcode = CONCAT('LMS', LPAD(copy_id, 9, '0'))
+            WHERE barcode IS NULL AND book_id IN ({placeholders});
+        """, list(copies_by_book))
+
+    @instrumented
+    def sync_book_copies(self):
+        # purane data ke liye: jitni copies total_copies me h utni book_copies rows bana do,
+        # phir books.available_copies ko book_copies se dobara gino
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            conn.begin()
+            cursor.execute("""
+                SELECT b.book_id, b.total_copies - COUNT(c.copy_id) AS missing
+                FROM books b LEFT JOIN book_copies c ON c.book_id=b.book_id
+                GROUP BY b.book_id
+                HAVING missing > 0;
+            """)
+            missing = {r["book_id"]: int(r["missing"]) for r in cursor.fetchall()}
+            self._add_copies(cursor, missing)
+            # jo loans copy_id se pehle ke h unko ek copy de do
+            cursor.execute("""
+                SELECT issue_id, book_id FROM issued_books
+                WHERE return_date IS NULL AND copy_id IS NULL
+                FOR UPDATE;
+            """)
+            for loan in cursor.fetchall():
+                cursor.execute("""
+                    SELECT copy_id FROM book_copies
+                    WHERE book_id=%s AND status='available' LIMIT 1 FOR UPDATE;
+                """, (loan["book_id"],))
+                copy = cursor.fetchone()
+                if copy:
+                    cursor.execute("UPDATE book_copies SET status='issued' WHERE copy_id=%s;", (copy["copy_id"],))
+                    cursor.execute("UPDATE issued_books SET copy_id=%s WHERE issue_id=%s;",
+                                   (copy["copy_id"], loan["issue_id"]))
+            cursor.execute("""
+                UPDATE books SET
+                  total_copies = (SELECT COUNT(*) FROM book_copies c
+                                  WHERE c.book_id=books.book_id AND c.status IN ('available', 'issued')),
+                  available_copies = (SELECT COUNT(*) FROM book_copies c
+                                      WHERE c.book_id=books.book_id AND c.status='available');
+            """)
+            # har book ka counter badla ho sakta h: clients poori listing dobara le
+            self._log_change(cursor, "book", None, "reset")
+            conn.commit()
+        if self.cache:
+            self.cache.clear()
+        return sum(missing.values())
+
+    @instrumented
+    @cached("books", "available")
+    def get_available_books(self, after_id=None, limit=None, sort_key="book_id", descending=False):
+        sql, params = self._books_query(available_only=True, after_id=after_id, limit=limit,
+                                        sort_key=sort_key, descending=descending)
+        return self._fetch_rows(sql, params)
+
+    @instrumented
+    @cached("books", "available")
+    def suggest_available_books(self, prefix, limit=20):
+        """Typeahead for the Issue picker: available books whose title starts
+        with `prefix`, plus ISBN prefix / book_id matches when it looks like a
+        number. At most `limit` small rows, exact book_id first, then by title."""
+        prefix = prefix.strip()
+        # LIKE ke wildcard user ke text me ho to unhe literal maano
+        pattern = re.sub(r"([!%_])", r"!\1", prefix) + "%"
+        # title index par range scan; OR lagate to poori table padhni padti, isliye alag queries
+        rows = self._fetch_all(f"""
+            SELECT {SUGGEST_COLUMNS} FROM books
+            WHERE title LIKE %s ESCAPE '!' AND available_copies > 0
+            ORDER BY title, book_id LIMIT %s;
+        """, (pattern, limit))
+        digits = re.sub(r"[\s-]", "", prefix)
+        if digits and re.fullmatch(r"\d+[Xx]?", digits):
+            by_number = self._fetch_all(f"""
+                SELECT {SUGGEST_COLUMNS} FROM books
+                WHERE (book_id = %s OR isbn LIKE %s) AND available_copies > 0
+                ORDER BY book_id = %s DESC, isbn LIMIT %s;
+            """, (int(digits.rstrip("Xx") or 0), digits + "%", int(digits.rstrip("Xx") or 0), limit))
+            seen = {r["book_id"] for r in by_number}
+            rows = by_number + [r for r in rows if r["book_id"] not in seen]
+        return rows[:limit]
 
     # book issue aur return operation 
 
+    @instrumented
     def issue_book(self, book_id, member_id, days=14) -> bool:
         today = date.today()
         due = today + timedelta(days=days)
-        with self.conn.cursor() as cursor:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
             try:
+                # ek transaction: koi bhi free copy claim karo (jo copy dusri desk ne lock ki h
+                # use SKIP LOCKED chhod deta h, to ek hi title par checkouts line me nahi lagte),
+                # loan likho, stats badhao
+                conn.begin()
                 cursor.execute("""
-                    INSERT INTO issued_books (book_id, member_id, issue_date, due_date)
-                    VALUES (%s, %s, %s, %s);
-                """, (book_id, member_id, today, due))
-
-                cursor.execute("""
-                    UPDATE books
-                    SET available_copies = available_copies - 1
-                    WHERE book_id=%s AND available_copies > 0;
+                    SELECT copy_id FROM book_copies
+                    WHERE book_id=%s AND status='available'
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED;
                 """, (book_id,))
-
-                if cursor.rowcount == 0:
-                    self.conn.rollback()
+                copy = cursor.fetchone()
+                if not copy:
+                    conn.rollback()
                     return False
-                return True
-            except Exception:
-                self.conn.rollback()
+                cursor.execute("UPDATE book_copies SET status='issued' WHERE copy_id=%s;", (copy['copy_id'],))
+                cursor.execute("""
+                    INSERT INTO issued_books (book_id, member_id, issue_date, due_date, copy_id)
+                    VALUES (%s, %s, %s, %s, %s);
+                """, (book_id, member_id, today, due, copy['copy_id']))
+                self._log_change(cursor, "loan", cursor.lastrowid, "insert", member_id)
+                self._record_circulation(cursor, book_id, member_id, today, issued=1)
+                self._adjust_available(cursor, book_id, -1)
+                conn.commit()
+            except Exception as e:
+                # "copy nahi mili" aur "server hi nahi mila" alag: doosra caller ko dikhna chahiye
+                # (offline.OfflineDesk usi par local journal me daalta h)
+                if is_disconnect(e):
+                    raise
+                conn.rollback()
                 return False
+        self._patch_cached_copies(book_id, -1)
+        return True
 
-    def get_issued_books_by_member(self, member_id):
-        with self.conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT ib.issue_id, b.book_id, b.title, ib.issue_date, ib.due_date
-                FROM issued_books ib
-                JOIN books b ON ib.book_id=b.book_id
-                WHERE ib.member_id=%s AND ib.return_date IS NULL;
-            """, (member_id,))
-            return cursor.fetchall()
+    @instrumented
+    def issue_books(self, member_id, book_ids, days=14, on=None):
+        """Check out a stack of books to one member in one transaction.
+
+        Returns one {book_id, issue_id, ok} per requested book, in order; a
+        book with no free copy just fails (issue_id None), the rest are
+        still issued. A database error rolls back the whole stack; a lost
+        connection raises. `on`: the day the desk issued them (offline
+        replay), default today.
+        """
+        today = on or date.today()
+        due = today + timedelta(days=days)
+        wanted = {}
+        for book_id in book_ids:
+            wanted[book_id] = wanted.get(book_id, 0) + 1
+        results = [{"book_id": b, "issue_id": None, "ok": False} for b in book_ids]
+        if not wanted:
+            return results
+        claimed = {}
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            try:
+                conn.begin()
+                # har title ke liye jitni chahiye utni free copies, SKIP LOCKED ke saath (issue_book
+                # jaisa). sab copies ek saath lock karte to dusri desk ko woh title khaali dikhta
+                for book_id, n in sorted(wanted.items()):
+                    cursor.execute("""
+                        SELECT copy_id FROM book_copies
+                        WHERE book_id=%s AND status='available'
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED;
+                    """, (book_id, n))
+                    claimed[book_id] = [r['copy_id'] for r in cursor.fetchall()]
+                copies = [(b, c) for b, cs in claimed.items() for c in cs]
+                if not copies:
+                    conn.rollback()
+                    return results
+                placeholders = ", ".join(["%s"] * len(copies))
+                copy_ids = [c for _, c in copies]
+                cursor.execute(f"UPDATE book_copies SET status='issued' WHERE copy_id IN ({placeholders});",
+                               copy_ids)
+                cursor.executemany("""
+                    INSERT INTO issued_books (book_id, member_id, issue_date, due_date, copy_id)
+                    VALUES (%s, %s, %s, %s, %s);
+                """, [(b, member_id, today, due, c) for b, c in copies])
+                # multi-row INSERT ke ids: ek copy ka ek hi open loan hota h. member_id se
+                # sirf is member ke open loans padhne padte h (return_date IS NULL akela sab ke)
+                cursor.execute(f"""
+                    SELECT issue_id, copy_id FROM issued_books
+                    WHERE member_id=%s AND return_date IS NULL AND copy_id IN ({placeholders});
+                """, [member_id] + copy_ids)
+                issue_of = {r['copy_id']: r['issue_id'] for r in cursor.fetchall()}
+                self._log_changes(cursor, [("loan", issue_of[c], "insert", member_id) for c in copy_ids])
+                self._record_circulation_many(cursor, [(b, member_id, 1, 0) for b, _ in copies], today)
+                deltas = {b: -len(cs) for b, cs in claimed.items() if cs}
+                self._adjust_available_many(cursor, deltas)
+                conn.commit()
+            except Exception as e:
+                if is_disconnect(e):
+                    raise
+                conn.rollback()
+                return results
+        for result in results:
+            free = claimed.get(result["book_id"])
+            if free:
+                result["issue_id"] = issue_of[free.pop(0)]
+                result["ok"] = True
+        for book_id, delta in deltas.items():
+            self._patch_cached_copies(book_id, delta)
+        return results
+
+    @instrumented
+    def return_books(self, issue_ids, on=None):
+        """Return several loans in one transaction -> one {issue_id, ok} per id,
+        in order (ok False: no such loan, or already returned). `on` as in
+        issue_books."""
+        today = on or date.today()
+        ids = list(dict.fromkeys(issue_ids))
+        results = [{"issue_id": i, "ok": False} for i in issue_ids]
+        if not ids:
+            return results
+        placeholders = ", ".join(["%s"] * len(ids))
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            try:
+                conn.begin()
+                cursor.execute(f"""
+                    SELECT issue_id, book_id, member_id, copy_id FROM issued_books
+                    WHERE issue_id IN ({placeholders}) AND return_date IS NULL
+                    FOR UPDATE;
+                """, ids)
+                loans = cursor.fetchall()
+                if not loans:
+                    conn.rollback()
+                    return results
+                found = [r['issue_id'] for r in loans]
+                cursor.execute(f"""
+                    UPDATE issued_books SET return_date=%s
+                    WHERE issue_id IN ({", ".join(["%s"] * len(found))});
+                """, [today] + found)
+                copy_ids = [r['copy_id'] for r in loans if r['copy_id'] is not None]
+                if copy_ids:
+                    cursor.execute(f"""
+                        UPDATE book_copies SET status='available'
+                        WHERE copy_id IN ({", ".join(["%s"] * len(copy_ids))});
+                    """, copy_ids)
+                self._log_changes(cursor, [("loan", r['issue_id'], "update", r['member_id']) for r in loans])
+                self._record_circulation_many(cursor, [(r['book_id'], r['member_id'], 0, 1) for r in loans],
+                                              today)
+                deltas = {}
+                for r in loans:
+                    deltas[r['book_id']] = deltas.get(r['book_id'], 0) + 1
+                self._adjust_available_many(cursor, deltas)
+                conn.commit()
+            except Exception as e:
+                if is_disconnect(e):
+                    raise
+                conn.rollback()
+                return results
+        returned = set(found)
+        for result in results:
+            result["ok"] = result["issue_id"] in returned
+        for book_id, delta in deltas.items():
+            self._patch_cached_copies(book_id, delta)
+        return results
+
+    def _adjust_available(self, cursor, book_id, delta):
+        self._adjust_available_many(cursor, {book_id: delta})
+
+    def _adjust_available_many(self, cursor, deltas):
+        # books.available_copies listing ke liye counter h, asli hisaab book_copies me. copy
+        # wale transaction ke andar hi (caller commit karta h), taaki dono kabhi alag na ho;
+        # books ki row lock bas commit tak, sabse aakhri statement ke saath.
+        # deltas: book_id -> +/-n, sab books ek hi UPDATE me (sorted: lock order ek jaisa)
+        if not deltas:
+            return
+        ids = sorted(deltas)
+        cases = " ".join("WHEN %s THEN %s" for _ in ids)
+        placeholders = ", ".join(["%s"] * len(ids))
+        cursor.execute(f"""
+            UPDATE books
+            SET available_copies = GREATEST(0, LEAST(total_copies,
+                available_copies + CASE book_id {cases} ELSE 0 END))
+            WHERE book_id IN ({placeholders});
+        """, [v for b in ids for v in (b, deltas[b])] + ids)
+        # counter ke saath hi event, taaki event dekh ke row padhne wale ko naya count mile
+        self._log_changes(cursor, [("book", b, "update", None) for b in ids])
+
+    # circulation summary tables: issue/return ke transaction me hi update hote h,
+    # taaki reports ko poori issued_books history par GROUP BY na chalana pade
+
+    def _record_circulation(self, cursor, book_id, member_id, day, issued=0, returned=0):
+        self._record_circulation_many(cursor, [(book_id, member_id, issued, returned)], day)
+
+    def _record_circulation_many(self, cursor, events, day):
+        # events: (book_id, member_id, issued, returned). pehle book/member ke hisaab se jodo,
+        # phir har table me ek multi-row upsert (executemany ek hi INSERT bana deta h)
+        month = day.replace(day=1)
+        books, members = {}, {}
+        for book_id, member_id, issued, returned in events:
+            b = books.setdefault(book_id, [0, 0])
+            m = members.setdefault(member_id, [0, 0])
+            b[0] += issued; b[1] += returned
+            m[0] += issued; m[1] += returned
+        per_book = [(b, n[0]) for b, n in sorted(books.items()) if n[0]]
+        if per_book:
+            cursor.executemany("""
+                INSERT INTO book_issue_totals (book_id, issue_count, last_issued)
+                VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE issue_count = issue_count + VALUES(issue_count),
+                                        last_issued = VALUES(last_issued);
+            """, [(b, n, day) for b, n in per_book])
+            cursor.executemany("""
+                INSERT INTO book_issue_monthly (month, book_id, issue_count)
+                VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE issue_count = issue_count + VALUES(issue_count);
+            """, [(month, b, n) for b, n in per_book])
+        cursor.executemany("""
+            INSERT INTO book_issue_daily (day, book_id, issue_count, return_count)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE issue_count = issue_count + VALUES(issue_count),
+                                    return_count = return_count + VALUES(return_count);
+        """, [(day, b, n[0], n[1]) for b, n in sorted(books.items())])
+        cursor.executemany("""
+            INSERT INTO member_issue_monthly (month, member_id, issue_count, return_count)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE issue_count = issue_count + VALUES(issue_count),
+                                    return_count = return_count + VALUES(return_count);
+        """, [(month, m, n[0], n[1]) for m, n in sorted(members.items())])
+
+    @instrumented
+    def rebuild_circulation_stats(self):
+        # summary tables ko poori loan history se dobara banao (migration ya gadbad ke baad)
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            conn.begin()
+            for table in ("book_issue_totals", "book_issue_monthly", "book_issue_daily", "member_issue_monthly"):
+                cursor.execute(f"DELETE FROM {table};")
+            cursor.execute(f"""
+                INSERT INTO book_issue_totals (book_id, issue_count, last_issued)
+                SELECT book_id, COUNT(*), MAX(issue_date) FROM {loan_history()} h GROUP BY book_id;
+            """)
+            cursor.execute(f"""
+                INSERT INTO book_issue_monthly (month, book_id, issue_count)
+                SELECT DATE_FORMAT(issue_date, '%Y-%m-01'), book_id, COUNT(*)
+                FROM {loan_history()} h GROUP BY 1, 2;
+            """)
+            cursor.execute(f"""
+                INSERT INTO book_issue_daily (day, book_id, issue_count, return_count)
+                SELECT day, book_id, SUM(issued), SUM(returned) FROM (
+                    SELECT issue_date AS day, book_id, 1 AS issued, 0 AS returned FROM {loan_history()} h
+                    UNION ALL
+                    SELECT return_date, book_id, 0, 1 FROM {loan_history()} h WHERE return_date IS NOT NULL
+                ) ev GROUP BY day, book_id;
+            """)
+            cursor.execute(f"""
+                INSERT INTO member_issue_monthly (month, member_id, issue_count, return_count)
+                SELECT DATE_FORMAT(day, '%Y-%m-01'), member_id, SUM(issued), SUM(returned) FROM (
+                    SELECT issue_date AS day, member_id, 1 AS issued, 0 AS returned FROM {loan_history()} h
+                    UNION ALL
+                    SELECT return_date, member_id, 0, 1 FROM {loan_history()} h WHERE return_date IS NOT NULL
+                ) ev GROUP BY 1, 2;
+            """)
+            conn.commit()
+        if self.cache:
+            self.cache.invalidate("top")
+
+    def _patch_cached_copies(self, book_id, delta):
+        # issue/return ke baad cached rows me available_copies seedha badal do,
+        # poori listing dobara lane ki zarurat nahi
+        if self.cache is None:
+            return
+        seen = []
+
+        def bump(row):
+            if "available_copies" in row:
+                row["available_copies"] += delta
+                seen.append(row["available_copies"])
+
+        self.cache.patch_books(book_id, bump, drop_tag="available",
+                               drop_if=lambda row: row.get("available_copies", 1) <= 0)
+        if delta > 0 and (not seen or min(seen) <= delta):
+            # pehle 0 copies thi to book "available" listing me thi hi nahi
+            self.cache.invalidate("available")
+        self.cache.invalidate("loans")
+        self.cache.invalidate("top")
+
+    @instrumented
+    @cached("loans")
+    def get_issued_books_by_member(self, member_id, after_id=None, limit=None, descending=False):
+        # keyset yaha issue_id par
+        op, direction = ("<", "DESC") if descending else (">", "ASC")
+        sql = """
+            SELECT ib.issue_id, b.book_id, b.title, c.barcode, ib.issue_date, ib.due_date
+            FROM issued_books ib
+            JOIN books b ON ib.book_id=b.book_id
+            LEFT JOIN book_copies c ON ib.copy_id=c.copy_id
+            WHERE ib.member_id=%s AND ib.return_date IS NULL"""
+        params = [member_id]
+        if after_id is not None:
+            sql += f" AND ib.issue_id {op} %s"
+            params.append(after_id)
+        sql += f" ORDER BY ib.issue_id {direction}"
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(limit)
+        return self._fetch_all(sql + ";", params)
+
+    @instrumented
+    def get_open_loans(self, after_id=None, limit=None):
+        """Every loan still out, all members, by issue_id (keyset on after_id):
+        the offline snapshot of a desk (offline.py)."""
+        sql = """
+            SELECT ib.issue_id, ib.member_id, b.book_id, b.title, c.barcode, ib.issue_date, ib.due_date
+            FROM issued_books ib
+            JOIN books b ON ib.book_id=b.book_id
+            LEFT JOIN book_copies c ON ib.copy_id=c.copy_id
+            WHERE ib.return_date IS NULL"""
+        params = []
+        if after_id is not None:
+            sql += " AND ib.issue_id > %s"
+            params.append(after_id)
+        sql += " ORDER BY ib.issue_id"
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(limit)
+        return self._fetch_all(sql + ";", params)
 
+    @instrumented
     def return_book(self, issue_id) -> bool:
         today = date.today()
-        with self.conn.cursor() as cursor:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
             try:
+                conn.begin()
                 cursor.execute("""
-                    SELECT book_id FROM issued_books
-                    WHERE issue_id=%s AND return_date IS NULL;
+                    SELECT book_id, member_id, copy_id FROM issued_books
+                    WHERE issue_id=%s AND return_date IS NULL
+                    FOR UPDATE;
                 """, (issue_id,))
                 row = cursor.fetchone()
                 if not row:
+                    conn.rollback()
                     return False
                 book_id = row['book_id']
                 cursor.execute("""
@@ -153,32 +835,406 @@ class DatabaseManager:
                     SET return_date=%s
                     WHERE issue_id=%s;
                 """, (today, issue_id))
+                if row['copy_id'] is not None:
+                    cursor.execute("UPDATE book_copies SET status='available' WHERE copy_id=%s;",
+                                   (row['copy_id'],))
+                self._log_change(cursor, "loan", issue_id, "update", row['member_id'])
+                self._record_circulation(cursor, book_id, row['member_id'], today, returned=1)
+                self._adjust_available(cursor, book_id, +1)
+                conn.commit()
+            except Exception as e:
+                if is_disconnect(e):
+                    raise
+                conn.rollback()
+                return False
+        self._patch_cached_copies(book_id, +1)
+        return True
+
+    @instrumented
+    def get_loan_history(self, member_id, after_id=None, limit=None, descending=True):
+        """Every loan of a member, returned ones included (hot + archive)."""
+        op, direction = ("<", "DESC") if descending else (">", "ASC")
+        where, params = "member_id=%s", [member_id]
+        if after_id is not None:
+            where += f" AND issue_id {op} %s"
+            params.append(after_id)
+        sql = f"""
+            SELECT h.issue_id, b.book_id, b.title, h.issue_date, h.due_date, h.return_date
+            FROM {loan_history(where)} h
+            JOIN books b ON h.book_id=b.book_id
+            ORDER BY h.issue_id {direction}"""
+        params = params * 2
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(limit)
+        return self._fetch_all(sql + ";", params)
+
+    @instrumented
+    def archive_loans(self, returned_before, after_id=0, chunk_size=5000):
+        """Move up to chunk_size loans returned before `returned_before` (and
+        with issue_id > after_id) to issued_books_archive, in one short
+        transaction. Returns (moved, last issue_id looked at), or (0, None)
+        when nothing is left."""
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            conn.begin()
+            try:
+                # sabse naya loan kabhi nahi hilate: AUTO_INCREMENT restart par MAX(issue_id)+1
+                # se shuru ho sakta h, aur archive wale id dobara ban jaate
                 cursor.execute("""
-                    UPDATE books
-                    SET available_copies = available_copies + 1
-                    WHERE book_id=%s;
-                """, (book_id,))
-                return True
+                    SELECT issue_id, return_date FROM issued_books
+                    WHERE issue_id > %s AND issue_id < (SELECT MAX(issue_id) FROM issued_books)
+                    ORDER BY issue_id LIMIT %s;
+                """, (after_id, chunk_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    conn.rollback()
+                    return 0, None
+                ids = [r["issue_id"] for r in rows
+                       if r["return_date"] is not None and r["return_date"] < returned_before]
+                if ids:
+                    placeholders = ", ".join(["%s"] * len(ids))
+                    cursor.execute(f"""
+                        INSERT INTO issued_books_archive
+                          (issue_id, book_id, member_id, issue_date, due_date, return_date, copy_id)
+                        SELECT issue_id, book_id, member_id, issue_date, due_date, return_date, copy_id
+                        FROM issued_books WHERE issue_id IN ({placeholders});
+                    """, ids)
+                    cursor.execute(f"DELETE FROM issued_books WHERE issue_id IN ({placeholders});", ids)
+                conn.commit()
             except Exception:
-                self.conn.rollback()
-                return False
+                conn.rollback()
+                raise
+        return len(ids), rows[-1]["issue_id"]
+
+    @instrumented
+    def loan_table_sizes(self):
+        row = self._fetch_all("""
+            SELECT (SELECT COUNT(*) FROM issued_books) AS hot,
+                   (SELECT COUNT(*) FROM issued_books_archive) AS archived;
+        """)[0]
+        return row["hot"], row["archived"]
+
+    # "borrowers also borrowed" (recommend.py): loans sirf (issue_id, member_id, book_id)
+    # columns me, numpy me seedha jaane layak
+
+    @instrumented(batches=True)
+    def iter_loan_pairs(self, after_issue_id=0, batch_size=100_000):
+        """Batches of (issue_id, member_id, book_id) tuples for loans after
+        `after_issue_id`, archive included; in issue_id order when catching up."""
+        sql = f"SELECT issue_id, member_id, book_id FROM {loan_history('issue_id > %s')} h"
+        if after_issue_id:
+            sql += " ORDER BY issue_id"
+        return self._stream_batches(sql + ";", (after_issue_id, after_issue_id), batch_size,
+                                    self.backend.column_cursor)
+
+    @instrumented
+    def latest_issue_id(self):
+        row = self._fetch_all("""
+            SELECT (SELECT MAX(issue_id) FROM issued_books) AS hot,
+                   (SELECT MAX(issue_id) FROM issued_books_archive) AS archived;
+        """)[0]
+        return max(row["hot"] or 0, row["archived"] or 0)
+
+    # change feed: har write change_log me ek versioned event likhta h (book/loan/member,
+    # kaunsi row). clients "version N ke baad kya badla" puchte h aur sirf wahi rows dobara
+    # padhte h, poori listing nahi
+
+    def _log_change(self, cursor, entity, entity_id, op, member_id=None):
+        cursor.execute("""
+            INSERT INTO change_log (entity, entity_id, op, member_id) VALUES (%s, %s, %s, %s);
+        """, (entity, entity_id, op, member_id))
+
+    def _log_changes(self, cursor, events):
+        # (entity, entity_id, op, member_id) ki list, ek multi-row INSERT
+        if events:
+            cursor.executemany("""
+                INSERT INTO change_log (entity, entity_id, op, member_id) VALUES (%s, %s, %s, %s);
+            """, events)
 
-    # graph ke liye most issued books ka data yaha se 
+    @instrumented
+    def get_changes(self, since=None, limit=1000):
+        """Events after version `since`, oldest first, as a dict:
 
-    def get_top_issued_books(self, limit=10):
-        with self.conn.cursor() as cursor:
+        changes  - [{version, entity, entity_id, op, member_id}]
+        version  - where to continue from: the end of the gap-free run of
+                   versions. A concurrent transaction may still commit a lower
+                   version than one already visible, so a gap stops the run
+                   (ChangeFeed skips gaps that never fill, e.g. rollbacks)
+        latest   - highest version returned
+        reset    - the client should reload everything: first call
+                   (since=None), history pruned past `since`, or a bulk change
+        more     - limit was hit, ask again from `version`
+        """
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            # do alag subquery: dono ek index seek h, ek saath MIN/MAX par SQLite poora index padhta h
             cursor.execute("""
-                SELECT b.title AS title, COUNT(*) AS issue_count
-                FROM issued_books ib
-                JOIN books b ON ib.book_id=b.book_id
-                GROUP BY ib.book_id
+                SELECT (SELECT MIN(version) FROM change_log) AS lo, (SELECT MAX(version) FROM change_log) AS hi;
+            """)
+            bounds = cursor.fetchone()
+            lo, hi = bounds["lo"], bounds["hi"] or 0
+            # since > hi: table khaali karke dobara bhari gayi (datagen), purana version bekaar
+            if since is None or since > hi or (lo is not None and since < lo - 1):
+                return {"changes": [], "version": hi, "latest": hi, "reset": True, "more": False}
+            cursor.execute("""
+                SELECT version, entity, entity_id, op, member_id FROM change_log
+                WHERE version > %s ORDER BY version LIMIT %s;
+            """, (since, limit))
+            rows = cursor.fetchall()
+        version = since
+        for row in rows:
+            if row["version"] != version + 1:
+                break
+            version = row["version"]
+        return {
+            "changes": rows,
+            "version": version,
+            "latest": rows[-1]["version"] if rows else since,
+            "reset": any(r["op"] == "reset" for r in rows),
+            "more": len(rows) == limit,
+        }
+
+    @instrumented
+    def prune_changes(self, keep_days=7):
+        # purane events hatao; jo client itna peeche h use get_changes reset bolega
+        cutoff = date.today() - timedelta(days=keep_days)
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT MAX(version) AS hi FROM change_log WHERE changed_at < %s;", (cutoff,))
+            hi = cursor.fetchone()["hi"]
+            if hi is None:
+                return 0
+            # cutoff se pehle ka aakhri event rakho, taaki MIN(version) se pata chale kaha tak hata
+            return cursor.execute("""
+                DELETE FROM change_log WHERE version < %s;
+            """, (hi,))
+
+    # overdue/fines: fines.py ka engine loans yaha se columns (tuples) me padhta h,
+    # hisaab numpy me lagata h aur fines table me bulk upsert karta h
+
+    @instrumented(batches=True)
+    def iter_late_loans(self, as_of, since=None, batch_size=100_000):
+        """Batches of (issue_id, member_id, due_day, return_day) tuples for loans
+        due before `as_of` that are still out or came back late. Days are
+        TO_DAYS() numbers, return_day is 0 while the book is out. With `since`,
+        loans returned before that date are skipped: their fine can't change,
+        and only the hot table is read (archive_loans never moves loans
+        returned after the last fines run)."""
+        sql = f"""
+            SELECT issue_id, member_id, TO_DAYS(due_date), COALESCE(TO_DAYS(return_date), 0)
+            FROM {"issued_books" if since is not None else loan_history() + " h"}
+            WHERE due_date < %s AND (return_date IS NULL OR return_date > due_date)
+        """
+        params = [as_of]
+        if since is not None:
+            sql += " AND (return_date IS NULL OR return_date >= %s)"
+            params.append(since)
+        return self._stream_batches(sql + ";", params, batch_size, self.backend.column_cursor)
+
+    @instrumented
+    def upsert_fines(self, rows):
+        """rows: (issue_id, member_id, days_overdue, amount, returned, computed_on) tuples."""
+        if not rows:
+            return 0
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            conn.begin()
+            cursor.executemany("""
+                INSERT INTO fines (issue_id, member_id, days_overdue, amount, returned, computed_on)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE days_overdue = VALUES(days_overdue), amount = VALUES(amount),
+                                        returned = VALUES(returned), computed_on = VALUES(computed_on);
+            """, rows)
+            conn.commit()
+        return len(rows)
+
+    @instrumented
+    def fines_computed_on(self):
+        # pichli run ki tareekh; None = kabhi nahi chali, poora hisaab chahiye
+        day = self._fetch_all("SELECT MAX(computed_on) AS d FROM fines;")[0]["d"]
+        # sqlite aggregate ka type nahi jaanta, string deta h
+        return date.fromisoformat(day) if isinstance(day, str) else day
+
+    @instrumented
+    def clear_fines(self):
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("DELETE FROM fines;")
+
+    @instrumented
+    def iter_overdue_loans(self, as_of, batch_size=1000):
+        # notices ke liye: abhi bhi bahar padi late books, member ke hisaab se line me
+        return self._stream("""
+            SELECT i.issue_id, i.member_id, m.full_name, m.email, b.title, i.due_date,
+                   TO_DAYS(i.due_date) AS due_day
+            FROM issued_books i
+            JOIN members m ON m.member_id = i.member_id
+            JOIN books b ON b.book_id = i.book_id
+            WHERE i.return_date IS NULL AND i.due_date < %s
+            ORDER BY i.member_id, i.due_date, i.issue_id;
+        """, (as_of,), batch_size)
+
+    @instrumented
+    def get_member_fines(self, member_id):
+        return self._fetch_all("""
+            SELECT f.issue_id, b.title, COALESCE(i.due_date, a.due_date) AS due_date,
+                   COALESCE(i.return_date, a.return_date) AS return_date,
+                   f.days_overdue, f.amount, f.computed_on
+            FROM fines f
+            LEFT JOIN issued_books i ON i.issue_id = f.issue_id
+            LEFT JOIN issued_books_archive a ON a.issue_id = f.issue_id
+            JOIN books b ON b.book_id = COALESCE(i.book_id, a.book_id)
+            WHERE f.member_id=%s
+            ORDER BY f.returned, 3;
+        """, (member_id,))
+
+    # graph ke liye most issued books ka data yaha se. summary tables se aata h,
+    # isliye history kitni bhi badi ho, query ka kaam utna hi rehta h
+
+    TOP_PERIODS = ("all", "month", "week", "today")
+
+    @instrumented
+    @cached("top")
+    def get_top_issued_books(self, limit=10, period="all"):
+        return self._fetch_all(*self._top_issued_query(limit, period))
+
+    def _top_issued_query(self, limit, period):
+        today = date.today()
+        if period == "all":
+            sql = """
+                SELECT b.title AS title, t.issue_count AS issue_count
+                FROM book_issue_totals t
+                JOIN books b ON t.book_id=b.book_id
+                ORDER BY t.issue_count DESC
+                LIMIT %s
+            """
+            params = (limit,)
+        elif period == "month":
+            sql = """
+                SELECT b.title AS title, m.issue_count AS issue_count
+                FROM book_issue_monthly m
+                JOIN books b ON m.book_id=b.book_id
+                WHERE m.month=%s
+                ORDER BY m.issue_count DESC
+                LIMIT %s
+            """
+            params = (today.replace(day=1), limit)
+        elif period in ("week", "today"):
+            since = today - timedelta(days=6 if period == "week" else 0)
+            sql = """
+                SELECT b.title AS title, SUM(d.issue_count) AS issue_count
+                FROM book_issue_daily d
+                JOIN books b ON d.book_id=b.book_id
+                WHERE d.day >= %s
+                GROUP BY d.book_id
+                HAVING issue_count > 0
                 ORDER BY issue_count DESC
-                LIMIT %s;
-            """, (limit,))
-            return cursor.fetchall()
+                LIMIT %s
+            """
+            params = (since, limit)
+        else:
+            raise ValueError(f"unknown period {period!r}, expected one of {self.TOP_PERIODS}")
+        return sql, params
+
+    # reports tab: top books, loans over time, bahar padi books kitni late h aur desk ke
+    # busy ghante, sab ek UNION ALL query me (ek round trip, ek pool checkout). har hissa
+    # summary table ya index se aata h, poori loan history nahi padhni padti
+
+    OVERDUE_BUCKETS = ("on time", "1-7 days", "8-30 days", "30+ days")
+
+    @instrumented
+    @cached("top")
+    def get_report(self, period="all", limit=10):
+        """Data for every Reports chart as one dict:
+
+        top       - [{title, issue_count}], most issued first (get_top_issued_books)
+        timeline  - {unit: "month"|"day", points: [{day, issued, returned}]}, every
+                    month of the history for "all", else the days of this month or
+                    the last 7 days, with empty days filled in
+        overdue   - loans still out, per OVERDUE_BUCKETS entry (days past due)
+        hours     - 7 x 24 loan events (issues + returns) by weekday (Monday
+                    first) and hour, from the change log (only as far back as
+                    prune_changes keeps it)
+        """
+        today = date.today()
+        top_sql, top_params = self._top_issued_query(limit, period)
+        if period == "all":
+            unit, since = "month", None
+            timeline_sql = """
+                SELECT month AS label, SUM(issue_count) AS n, SUM(return_count) AS n2
+                FROM member_issue_monthly GROUP BY month
+            """
+            timeline_params = ()
+        else:
+            unit = "day"
+            since = today.replace(day=1) if period == "month" else today - timedelta(days=6)
+            timeline_sql = """
+                SELECT day AS label, SUM(issue_count) AS n, SUM(return_count) AS n2
+                FROM book_issue_daily WHERE day >= %s GROUP BY day
+            """
+            timeline_params = (since,)
+        hours_since = today - timedelta(days=6) if period in ("week", "today") else since
+        # label ek hi column h: title, din, bucket, weekday*24+hour. UNION me sab string ban
+        # sakte h (MySQL), isliye neeche python me wapas type dete h
+        rows = self._fetch_all(f"""
+            SELECT 'top' AS series, title AS label, issue_count AS n, NULL AS n2 FROM ({top_sql}) t
+            UNION ALL
+            SELECT 'timeline', label, n, n2 FROM ({timeline_sql}) l
+            UNION ALL
+            SELECT 'overdue', bucket, COUNT(*), NULL FROM (
+                SELECT CASE WHEN due_date >= %s THEN 0 WHEN due_date >= %s THEN 1
+                            WHEN due_date >= %s THEN 2 ELSE 3 END AS bucket
+                FROM issued_books WHERE return_date IS NULL
+            ) o GROUP BY bucket
+            UNION ALL
+            SELECT 'hours', slot, COUNT(*), NULL FROM (
+                SELECT WEEKDAY(changed_at) * 24 + HOUR(changed_at) AS slot
+                FROM change_log WHERE entity = 'loan' AND changed_at >= %s
+            ) h GROUP BY slot;
+        """, (*top_params, *timeline_params, today, today - timedelta(days=7), today - timedelta(days=30),
+              hours_since or date.min))
+
+        report = {"period": period, "top": [], "timeline": {"unit": unit, "points": []},
+                  "overdue": [0] * len(self.OVERDUE_BUCKETS), "hours": [[0] * 24 for _ in range(7)]}
+        counts = {}
+        for row in rows:
+            series, label = row["series"], row["label"]
+            if series == "top":
+                report["top"].append({"title": label, "issue_count": int(row["n"])})
+            elif series == "timeline":
+                day = label if isinstance(label, date) else date.fromisoformat(str(label)[:10])
+                counts[day] = (int(row["n"] or 0), int(row["n2"] or 0))
+            elif series == "overdue":
+                report["overdue"][int(label)] = int(row["n"])
+            elif label is not None:
+                slot = int(label)
+                report["hours"][slot // 24][slot % 24] = int(row["n"])
+        report["top"].sort(key=lambda r: -r["issue_count"])
+        if counts or since is not None:
+            day, end = since or min(counts), today.replace(day=1) if unit == "month" else today
+            while day <= end:
+                issued, returned = counts.get(day, (0, 0))
+                report["timeline"]["points"].append({"day": day, "issued": issued, "returned": returned})
+                day = (day + timedelta(days=31)).replace(day=1) if unit == "month" else day + timedelta(days=1)
+        return report
+
+    @instrumented
+    @cached("top")
+    def get_member_activity(self, member_id, months=12):
+        since = (date.today().replace(day=1) - timedelta(days=31 * (months - 1))).replace(day=1)
+        return self._fetch_all("""
+            SELECT month, issue_count, return_count
+            FROM member_issue_monthly
+            WHERE member_id=%s AND month >= %s
+            ORDER BY month;
+        """, (member_id, since))
 
     # yaha se connection close
 
-    def close(self):
-        self.conn.close()
+    def stats(self):
+        """Method metrics, slow queries, cache and pool counters in one dict."""
+        stats = self.metrics.snapshot() if self.metrics else {}
+        if self.cache:
+            stats["cache"] = self.cache.stats()
+        stats["pool"] = self.pool.stats()
+        return stats
 
+    def close(self):
+        self.pool.close()
+        self.backend.close()
@@ -0,0 +1,91 @@
+"""Change feed for the GUI: poll DatabaseManager.get_changes and patch views.
+
+Instead of reloading a whole listing after every issue/return (its own or
+another desk's), a window keeps the last change_log version it has seen,
+asks every few seconds what happened after it, and gets back only the
+books whose rows changed plus the members whose loans changed. Works the
+same against a DatabaseManager or a client.ApiClient.
+"""
+import time
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+
+class ChangeFeed(QObject):
+    booksChanged = pyqtSignal(list)   # fresh rows of books that were added or changed
+    booksReset = pyqtSignal()         # too much changed (or history was pruned): reload listings
+    loansChanged = pyqtSignal(object)  # set of member_ids whose loans changed, None = everyone
+
+    INTERVAL_MS = 3000
+    # itni der tak version ka gap na bhare to woh rollback tha, aage badho
+    GAP_GRACE = 10.0
+    KEY = "change-feed"
+
+    def __init__(self, db_manager, runner, interval_ms=None, parent=None):
+        super().__init__(parent)
+        self.db = db_manager
+        self.runner = runner
+        self.version = None
+        self._applied = set()  # gap ke aage wale versions jo already patch ho chuke
+        self._gap_since = None
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval_ms or self.INTERVAL_MS)
+        self.timer.timeout.connect(self.poll)
+
+    def start(self):
+        self.timer.start()
+        self.poll()
+
+    def stop(self):
+        self.timer.stop()
+        self.runner.cancel(self.KEY)
+
+    def poll(self):
+        """Fetch changes now (also called right after this window's own writes)."""
+        self.runner.submit(self._fetch, self.version, frozenset(self._applied), key=self.KEY, quiet=True,
+                           on_result=self._apply, on_error=self._failed)
+
+    def _fetch(self, since, applied):
+        # worker thread: changes aur badli hui books ek hi task me
+        feed = self.db.get_changes(since)
+        rows = []
+        if not feed["reset"]:
+            book_ids = sorted({c["entity_id"] for c in feed["changes"]
+                               if c["entity"] == "book" and c["version"] not in applied})
+            rows = self.db.get_books_by_ids(book_ids)
+        return feed, rows
+
+    def _apply(self, result):
+        feed, rows = result
+        first = self.version is None
+        if feed["reset"]:
+            self.version = max(feed["version"], feed["latest"] or 0)
+            self._applied.clear()
+            self._gap_since = None
+            if not first:
+                self.booksReset.emit()
+                self.loansChanged.emit(None)
+            return
+        new = [c for c in feed["changes"] if c["version"] not in self._applied]
+        if rows:
+            self.booksChanged.emit(rows)
+        members = {c["member_id"] for c in new if c["entity"] == "loan"}
+        if members:
+            self.loansChanged.emit(members)
+
+        previous, self.version = self.version, feed["version"]
+        if feed["latest"] > feed["version"]:
+            if self._gap_since is None:
+                self._gap_since = time.monotonic()
+            elif time.monotonic() - self._gap_since > self.GAP_GRACE:
+                self.version = feed["latest"]
+                self._gap_since = None
+        else:
+            self._gap_since = None
+        self._applied = {v for v in self._applied | {c["version"] for c in new} if v > self.version}
+        if feed["more"] and self.version > previous:
+            QTimer.singleShot(0, self.poll)
+
+    def _failed(self, err):
+        # server/DB thodi der ke liye gaya: agli poll me phir koshish, error dialog nahi
+        pass
@@ -0,0 +1,202 @@
+"""Nightly overdue and fines run.
+
+    python fines.py --password root
+    python fines.py --password root --full --notices notices.jsonl
+    python fines.py --sqlite lms.sqlite3 --as-of 2025-06-30
+
+Streams late loans from issued_books in column batches (issue_id,
+member_id, due day, return day as plain integers), computes days overdue
+and graduated fines with numpy over the whole batch, and bulk upserts the
+result into `fines`. After the first run only loans still out or returned
+since the previous run are read, because a returned loan's fine is final.
+--notices writes one JSON line per member with overdue books still out.
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import date
+
+import numpy as np
+
+
+def to_days(day):
+    # MySQL TO_DAYS() jaisa number, taaki SQL se aaye din seedha ghata sake
+    return day.toordinal() + 365
+
+
+class FinePolicy:
+    """Graduated fine per overdue day.
+
+    tiers: (first_day, per_day) pairs - from day `first_day` after the grace
+    period every day costs `per_day`, until the next tier starts.
+    cap: most a single loan can cost (None = no cap).
+    """
+
+    def __init__(self, tiers=((1, 1.0), (8, 2.0), (31, 5.0)), grace_days=0, cap=200.0):
+        self.tiers = sorted(tiers)
+        self.grace_days = grace_days
+        self.cap = cap
+
+    def fines(self, days_overdue):
+        """Array of days overdue -> array of fines in cents (int64)."""
+        days = np.maximum(np.asarray(days_overdue, dtype=np.int64) - self.grace_days, 0)
+        cents = np.zeros(days.shape, dtype=np.int64)
+        starts = [first for first, _ in self.tiers] + [None]
+        for (first, per_day), nxt in zip(self.tiers, starts[1:]):
+            # is tier me kitne din gire: [first, nxt)
+            n = np.maximum(days - (first - 1), 0)
+            if nxt is not None:
+                np.minimum(n, nxt - first, out=n)
+            cents += n * round(per_day * 100)
+        if self.cap is not None:
+            np.minimum(cents, round(self.cap * 100), out=cents)
+        return cents
+
+
+class FinesReport:
+    def __init__(self, as_of, full):
+        self.as_of = as_of
+        self.full = full
+        self.loans = 0          # late loans read
+        self.open = 0           # still out
+        self.members = 0        # members with a fine in this run
+        self.total_fines = 0.0
+        self.read_s = 0.0
+        self.compute_s = 0.0
+        self.write_s = 0.0
+        self.elapsed_s = 0.0
+
+    def as_dict(self):
+        d = dict(vars(self))
+        d["as_of"] = self.as_of.isoformat()
+        for k in ("read_s", "compute_s", "write_s", "elapsed_s", "total_fines"):
+            d[k] = round(d[k], 3 if k.endswith("_s") else 2)
+        return d
+
+
+class FinesEngine:
+    """Computes overdue days and fines for every late loan into `fines`."""
+
+    def __init__(self, db_manager, policy=None, batch_size=100_000, progress=None):
+        self.db = db_manager
+        self.policy = policy or FinePolicy()
+        self.batch_size = batch_size
+        self.progress = progress
+
+    def compute(self, batch, today):
+        """(issue_id, member_id, due_day, return_day) rows -> column arrays:
+        issue_id, member_id, days_overdue, fine_cents, returned."""
+        cols = np.array(batch, dtype=np.int64).reshape(-1, 4)
+        issue, member, due, ret = cols.T
+        returned = ret > 0
+        days = np.where(returned, ret, today) - due
+        return issue, member, days, self.policy.fines(days), returned
+
+    def run(self, as_of=None, full=False):
+        as_of = as_of or date.today()
+        since = None if full else self.db.fines_computed_on()
+        report = FinesReport(as_of, since is None)
+        if since is None:
+            # policy badli ho to purane amounts na bachein
+            self.db.clear_fines()
+        today = to_days(as_of)
+        members = set()
+        t0 = time.perf_counter()
+        mark = t0
+        for batch in self.db.iter_late_loans(as_of, since, batch_size=self.batch_size):
+            t1 = time.perf_counter()
+            issue, member, days, cents, returned = self.compute(batch, today)
+            rows = list(zip(issue.tolist(), member.tolist(), days.tolist(), (cents / 100).tolist(),
+                            returned.astype(np.int8).tolist(), [as_of] * len(batch)))
+            t2 = time.perf_counter()
+            self.db.upsert_fines(rows)
+            t3 = time.perf_counter()
+            report.read_s += t1 - mark
+            report.compute_s += t2 - t1
+            report.write_s += t3 - t2
+            mark = t3
+            report.loans += len(batch)
+            report.open += int(np.count_nonzero(~returned))
+            report.total_fines += int(cents.sum()) / 100
+            members.update(np.unique(member[cents > 0]).tolist())
+            if self.progress:
+                self.progress(report)
+        report.read_s += time.perf_counter() - mark
+        report.members = len(members)
+        report.elapsed_s = time.perf_counter() - t0
+        return report
+
+    def notices(self, as_of=None):
+        """One dict per member with books still out past their due date:
+        member_id, full_name, email, total_fine and loans (issue_id, title,
+        due_date, days_overdue, fine), in member_id order."""
+        as_of = as_of or date.today()
+        today = to_days(as_of)
+        current = None
+        batch = []
+
+        def flush():
+            # ek batch ke fines ek saath numpy me, phir member ke hisaab se jodo
+            nonlocal current
+            days = today - np.fromiter((r["due_day"] for r in batch), dtype=np.int64, count=len(batch))
+            cents = self.policy.fines(days)
+            for row, d, c in zip(batch, days.tolist(), cents.tolist()):
+                if current is None or current["member_id"] != row["member_id"]:
+                    if current is not None:
+                        yield current
+                    current = {"member_id": row["member_id"], "full_name": row["full_name"],
+                               "email": row["email"], "total_fine": 0.0, "loans": []}
+                current["loans"].append({"issue_id": row["issue_id"], "title": row["title"],
+                                         "due_date": row["due_date"], "days_overdue": d, "fine": c / 100})
+                current["total_fine"] = round(current["total_fine"] + c / 100, 2)
+            batch.clear()
+
+        for row in self.db.iter_overdue_loans(as_of, batch_size=5000):
+            batch.append(row)
+            if len(batch) >= 5000:
+                yield from flush()
+        if batch:
+            yield from flush()
+        if current is not None:
+            yield current
+
+    def write_notices(self, path, as_of=None):
+        n = 0
+        with open(path, "w", encoding="utf-8") as fp:
+            for notice in self.notices(as_of):
+                fp.write(json.dumps(notice, default=str, ensure_ascii=False) + "\n")
+                n += 1
+        return n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute overdue days and fines for late loans")
+    parser.add_argument("--as-of", type=date.fromisoformat, default=None, help="YYYY-MM-DD (default: today)")
+    parser.add_argument("--full", action="store_true", help="recompute every late loan, not just open/recent ones")
+    parser.add_argument("--notices", default=None, metavar="PATH", help="write per-member overdue notices (JSON lines)")
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", default="lms_db")
+    parser.add_argument("--sqlite", default=None, metavar="PATH", help="use an embedded SQLite database file")
+    args = parser.parse_args(argv)
+
+    from db import DatabaseManager
+    db = DatabaseManager(user=args.user, password=args.password, database=args.database,
+                         host=args.host, port=args.port, sqlite_path=args.sqlite)
+    try:
+        engine = FinesEngine(db, batch_size=args.batch_size)
+        result = engine.run(args.as_of, full=args.full).as_dict()
+        if args.notices:
+            result["notices"] = engine.write_notices(args.notices, args.as_of)
+    finally:
+        db.close()
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
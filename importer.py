@@ -0,0 +1,317 @@
+"""Bulk catalog import.
+
+    python importer.py acquisitions.csv --password root
+    python importer.py records.mrc --format marc --chunk-size 2000
+
+Reads CSV, JSON (array or one object per line) or MARC 21 (ISO 2709) files
+record by record, validates and normalises each book, and upserts them into
+`books` in chunked transactions. Books whose ISBN already exists get their
+copy counts added instead of failing on the unique key. Rows that can't be
+imported are written to a reject report (CSV) next to the input.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import date
+
+FIELD_ALIASES = {
+    "title": "title",
+    "author": "author",
+    "authors": "author",
+    "publisher": "publisher",
+    "isbn": "isbn",
+    "isbn13": "isbn",
+    "year": "year_published",
+    "year_published": "year_published",
+    "copies": "total_copies",
+    "total_copies": "total_copies",
+}
+
+
+class RejectedRow(Exception):
+    pass
+
+
+# ---- readers: har ek (record_no, dict) yield karta h, file poori memory me nahi aati.
+# jo record parse na ho uski jagah (record_no, RejectedRow) aata h
+
+def read_csv(fp):
+    reader = csv.DictReader(fp)
+    for n, row in enumerate(reader, start=2):
+        yield n, row
+
+
+def read_json(fp, chunk_size=1 << 16):
+    # JSON lines ya ek bada [ {...}, {...} ] array, dono incrementally
+    decoder = json.JSONDecoder()
+    buf = fp.read(chunk_size).lstrip()
+    if not buf.startswith("["):
+        for n, line in enumerate(_lines(buf, fp), start=1):
+            if line.strip():
+                try:
+                    yield n, json.loads(line)
+                except ValueError as e:
+                    yield n, RejectedRow(f"bad JSON: {e}")
+        return
+    buf, pos, n = buf[1:], 0, 0
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buf) and buf[pos] == "]":
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            more = fp.read(chunk_size)
+            if not more:
+                raise
+            buf, pos = buf[pos:] + more, 0
+            continue
+        n += 1
+        yield n, obj
+        buf, pos = buf[end:], 0
+
+
+def _lines(head, fp):
+    # pehle chunk ki last line adhuri ho sakti h, use file ki agli line se poora karo
+    parts = head.split("\n")
+    yield from parts[:-1]
+    yield parts[-1] + fp.readline()
+    yield from fp
+
+
+def read_marc(fp):
+    # ISO 2709: 24 byte leader, directory (12 byte entries), fields 0x1E, subfields 0x1F
+    n = 0
+    while True:
+        head = fp.read(5)
+        if not head:
+            return
+        n += 1
+        try:
+            length = int(head)
+        except ValueError:
+            # length ke bina agla record kaha se shuru h pata nahi chalega
+            raise ValueError(f"record {n}: bad MARC record length {head!r}")
+        record = head + fp.read(length - 5)
+        try:
+            yield n, _parse_marc(record)
+        except (ValueError, IndexError) as e:
+            yield n, RejectedRow(f"bad MARC record: {e}")
+
+
+def _parse_marc(record):
+    base = int(record[12:17])
+    directory = record[24:record.index(b"\x1e")]
+    fields = {}
+    for i in range(0, len(directory) - 11, 12):
+        tag = directory[i:i + 3].decode("ascii")
+        flen = int(directory[i + 3:i + 7])
+        start = int(directory[i + 7:i + 12])
+        data = record[base + start:base + start + flen].rstrip(b"\x1e").decode("utf-8", "replace")
+        subfields = {}
+        for part in data.split("\x1f")[1:]:
+            if part:
+                subfields.setdefault(part[0], part[1:].strip(" /:;,."))
+        fields.setdefault(tag, subfields)
+
+    def sub(tag, code):
+        return fields.get(tag, {}).get(code)
+
+    title = " ".join(filter(None, [sub("245", "a"), sub("245", "b")]))
+    return {
+        "title": title,
+        "author": sub("100", "a") or sub("110", "a"),
+        "publisher": sub("264", "b") or sub("260", "b"),
+        "isbn": (sub("020", "a") or "").split(" ")[0],
+        "year_published": sub("264", "c") or sub("260", "c"),
+    }
+
+
+READERS = {"csv": read_csv, "json": read_json, "marc": read_marc}
+EXTENSIONS = {".csv": "csv", ".json": "json", ".jsonl": "json", ".mrc": "marc", ".marc": "marc"}
+
+
+# ---- validation
+
+def clean_isbn(raw):
+    digits = "".join(ch for ch in str(raw or "") if ch.isdigit() or ch in "xX").upper()
+    if not digits:
+        return None
+    if len(digits) == 10:
+        total = sum((10 - i) * (10 if ch == "X" else int(ch)) for i, ch in enumerate(digits))
+        if "X" in digits[:9] or total % 11:
+            raise RejectedRow(f"bad ISBN-10 checksum: {raw}")
+    elif len(digits) == 13 and digits.isdigit():
+        total = sum(int(ch) * (1 if i % 2 == 0 else 3) for i, ch in enumerate(digits))
+        if total % 10:
+            raise RejectedRow(f"bad ISBN-13 checksum: {raw}")
+    else:
+        raise RejectedRow(f"ISBN must have 10 or 13 digits: {raw}")
+    return digits
+
+
+def normalize_book(raw):
+    if not isinstance(raw, dict):
+        raise RejectedRow("record is not an object")
+    book = {}
+    for key, val in raw.items():
+        field = FIELD_ALIASES.get(str(key).strip().lower())
+        if field:
+            book[field] = val.strip() if isinstance(val, str) else val
+    title = book.get("title")
+    if not title:
+        raise RejectedRow("missing title")
+    year = book.get("year_published")
+    digits = "".join(ch for ch in str(year or "") if ch.isdigit())[:4]
+    # YEAR column 1901-2155 tak hi rakh sakta h, baaki NULL
+    year = int(digits) if digits and 1901 <= int(digits) <= min(2155, date.today().year + 1) else None
+    copies = book.get("total_copies")
+    try:
+        copies = int(copies) if copies not in (None, "") else 1
+    except (TypeError, ValueError):
+        raise RejectedRow(f"copies is not a number: {copies}")
+    if copies < 1:
+        raise RejectedRow(f"copies must be positive: {copies}")
+    return {
+        "title": str(title)[:255],
+        "author": (str(book["author"])[:255] if book.get("author") else None),
+        "publisher": (str(book["publisher"])[:255] if book.get("publisher") else None),
+        "isbn": clean_isbn(book.get("isbn")),
+        "year_published": year,
+        "total_copies": copies,
+    }
+
+
+class ImportReport:
+    def __init__(self):
+        self.read = 0
+        self.inserted = 0
+        self.updated = 0
+        self.merged = 0      # same ISBN repeated inside one chunk
+        self.rejected = 0
+        self.reject_path = None
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+class BulkImporter:
+    """Streams parsed records into DatabaseManager.upsert_books in chunks."""
+
+    def __init__(self, db_manager, chunk_size=1000, reject_path=None, progress=None):
+        self.db = db_manager
+        self.chunk_size = chunk_size
+        self.reject_path = reject_path
+        self.progress = progress
+
+    def import_file(self, path, fmt=None):
+        fmt = fmt or EXTENSIONS.get(os.path.splitext(path)[1].lower(), "csv")
+        reject_path = self.reject_path or path + ".rejects.csv"
+        mode = "rb" if fmt == "marc" else "r"
+        kwargs = {} if fmt == "marc" else {"encoding": "utf-8-sig", "newline": ""}
+        with open(path, mode, **kwargs) as fp:
+            report = self.import_records(READERS[fmt](fp), reject_path)
+        return report
+
+    def import_records(self, records, reject_path):
+        report = ImportReport()
+        reject_fp = writer = None
+        chunk = {}   # isbn (ya row no.) -> book, taaki chunk ke andar duplicate ISBN merge ho jaye
+
+        def reject(n, reason, raw):
+            nonlocal reject_fp, writer
+            if reject_fp is None:
+                reject_fp = open(reject_path, "w", newline="", encoding="utf-8")
+                writer = csv.writer(reject_fp)
+                writer.writerow(["record", "reason", "data"])
+                report.reject_path = reject_path
+            writer.writerow([n, reason, json.dumps(raw, default=str, ensure_ascii=False)])
+            report.rejected += 1
+
+        try:
+            for n, raw in records:
+                report.read += 1
+                if isinstance(raw, RejectedRow):
+                    reject(n, str(raw), None)
+                    continue
+                try:
+                    book = normalize_book(raw)
+                except RejectedRow as e:
+                    reject(n, str(e), raw)
+                    continue
+                key = book["isbn"] or ("row", n)
+                if key in chunk:
+                    chunk[key][1]["total_copies"] += book["total_copies"]
+                    report.merged += 1
+                else:
+                    chunk[key] = (n, book)
+                if len(chunk) >= self.chunk_size:
+                    self._flush(chunk, report, reject)
+            if chunk:
+                self._flush(chunk, report, reject)
+        finally:
+            if reject_fp is not None:
+                reject_fp.close()
+        if self.db.cache:
+            self.db.cache.invalidate("books")
+        return report
+
+    def _flush(self, chunk, report, reject):
+        items = list(chunk.values())
+        chunk.clear()
+        try:
+            inserted, updated = self.db.upsert_books([book for _, book in items])
+        except Exception:
+            # poora chunk fail hua: ek ek karke daalo taaki kharab row pakad me aaye
+            inserted = updated = 0
+            for n, book in items:
+                try:
+                    i, u = self.db.upsert_books([book])
+                    inserted += i
+                    updated += u
+                except Exception as e:
+                    reject(n, f"database error: {e}", book)
+        report.inserted += inserted
+        report.updated += updated
+        if self.progress:
+            self.progress(report)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import books into lms_db")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=sorted(READERS), default=None,
+                        help="default: guessed from the file extension")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--rejects", default=None, help="reject report path (default: <path>.rejects.csv)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", default="lms_db")
+    parser.add_argument("--sqlite", default=None, metavar="PATH", help="use an embedded SQLite database file")
+    args = parser.parse_args(argv)
+
+    from db import DatabaseManager
+    db = DatabaseManager(user=args.user, password=args.password, database=args.database,
+                         host=args.host, port=args.port, sqlite_path=args.sqlite)
+
+    def progress(report):
+        print(f"\rread {report.read}  inserted {report.inserted}  updated {report.updated}  "
+              f"rejected {report.rejected}", end="", file=sys.stderr)
+
+    try:
+        importer = BulkImporter(db, chunk_size=args.chunk_size, reject_path=args.rejects, progress=progress)
+        report = importer.import_file(args.path, args.format)
+    finally:
+        db.close()
+    print(file=sys.stderr)
+    print(json.dumps(report.as_dict(), indent=2))
+    return 0 if not report.rejected else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -24,7 +24,9 @@ CREATE TABLE `books` (
   `available_copies` int(11) NOT NULL DEFAULT 1,
   `created_at` datetime DEFAULT current_timestamp(),
   PRIMARY KEY (`book_id`),
-  UNIQUE KEY `isbn` (`isbn`)
+  UNIQUE KEY `isbn` (`isbn`),
+  KEY `title` (`title`),
+  FULLTEXT KEY `ft_books` (`title`,`author`,`publisher`)
 ) ENGINE=InnoDB AUTO_INCREMENT=7 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 SET character_set_client = @saved_cs_client;
 
@@ -45,6 +47,73 @@ INSERT INTO `books` VALUES
 ALTER TABLE `books` ENABLE KEYS;
 UNLOCK TABLES;
 
+DROP TABLE IF EXISTS `book_copies`;
+SET @saved_cs_client     = @@character_set_client;
+SET character_set_client = utf8mb4;
+CREATE TABLE `book_copies` (
+  `copy_id` int(11) NOT NULL AUTO_INCREMENT,
+  `book_id` int(11) NOT NULL,
+  `barcode` varchar(32) DEFAULT NULL,
+  `status` enum('available','issued','lost','withdrawn') NOT NULL DEFAULT 'available',
+  `added_at` datetime DEFAULT current_timestamp(),
+  PRIMARY KEY (`copy_id`),
+  UNIQUE KEY `barcode` (`barcode`),
+  KEY `book_status` (`book_id`,`status`),
+  CONSTRAINT `book_copies_ibfk_1` FOREIGN KEY (`book_id`) REFERENCES `books` (`book_id`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB AUTO_INCREMENT=46 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+SET character_set_client = @saved_cs_client;
+
+LOCK TABLES `book_copies` WRITE;
+ALTER TABLE `book_copies` DISABLE KEYS;
+INSERT INTO `book_copies` (`copy_id`, `book_id`, `barcode`, `status`) VALUES
+(1,1,'LMS000000001','available'),
+(2,1,'LMS000000002','available'),
+(3,1,'LMS000000003','available'),
+(4,1,'LMS000000004','available'),
+(5,1,'LMS000000005','available'),
+(6,2,'LMS000000006','available'),
+(7,2,'LMS000000007','available'),
+(8,2,'LMS000000008','available'),
+(9,2,'LMS000000009','available'),
+(10,3,'LMS000000010','available'),
+(11,3,'LMS000000011','available'),
+(12,3,'LMS000000012','available'),
+(13,3,'LMS000000013','available'),
+(14,4,'LMS000000014','available'),
+(15,4,'LMS000000015','available'),
+(16,4,'LMS000000016','available'),
+(17,5,'LMS000000017','available'),
+(18,5,'LMS000000018','available'),
+(19,5,'LMS000000019','available'),
+(20,5,'LMS000000020','available'),
+(21,5,'LMS000000021','available'),
+(22,6,'LMS000000022','available'),
+(23,6,'LMS000000023','available'),
+(24,6,'LMS000000024','available'),
+(25,6,'LMS000000025','available'),
+(26,7,'LMS000000026','available'),
+(27,7,'LMS000000027','available'),
+(28,7,'LMS000000028','available'),
+(29,7,'LMS000000029','available'),
+(30,7,'LMS000000030','available'),
+(31,8,'LMS000000031','available'),
+(32,8,'LMS000000032','available'),
+(33,8,'LMS000000033','available'),
+(34,8,'LMS000000034','available'),
+(35,9,'LMS000000035','available'),
+(36,9,'LMS000000036','available'),
+(37,9,'LMS000000037','available'),
+(38,9,'LMS000000038','available'),
+(39,10,'LMS000000039','available'),
+(40,10,'LMS000000040','available'),
+(41,10,'LMS000000041','available'),
+(42,11,'LMS000000042','available'),
+(43,11,'LMS000000043','available'),
+(44,11,'LMS000000044','available'),
+(45,11,'LMS000000045','available');
+ALTER TABLE `book_copies` ENABLE KEYS;
+UNLOCK TABLES;
+
 DROP TABLE IF EXISTS `issued_books`;
 SET @saved_cs_client     = @@character_set_client;
 SET character_set_client = utf8mb4;
@@ -55,18 +124,21 @@ CREATE TABLE `issued_books` (
   `issue_date` date NOT NULL DEFAULT (CURRENT_DATE),
   `due_date` date NOT NULL,
   `return_date` date DEFAULT NULL,
+  `copy_id` int(11) DEFAULT NULL,
   PRIMARY KEY (`issue_id`),
   KEY `book_id` (`book_id`),
   KEY `member_id` (`member_id`),
+  KEY `copy_id` (`copy_id`),
   CONSTRAINT `issued_books_ibfk_1` FOREIGN KEY (`book_id`) REFERENCES `books` (`book_id`) ON DELETE CASCADE ON UPDATE CASCADE,
-  CONSTRAINT `issued_books_ibfk_2` FOREIGN KEY (`member_id`) REFERENCES `members` (`member_id`) ON DELETE CASCADE ON UPDATE CASCADE
+  CONSTRAINT `issued_books_ibfk_2` FOREIGN KEY (`member_id`) REFERENCES `members` (`member_id`) ON DELETE CASCADE ON UPDATE CASCADE,
+  CONSTRAINT `issued_books_ibfk_3` FOREIGN KEY (`copy_id`) REFERENCES `book_copies` (`copy_id`) ON DELETE SET NULL ON UPDATE CASCADE
 ) ENGINE=InnoDB AUTO_INCREMENT=2 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 SET character_set_client = @saved_cs_client;
 
 LOCK TABLES `issued_books` WRITE;
 ALTER TABLE `issued_books` DISABLE KEYS;
 INSERT INTO `issued_books` VALUES
-(1,6,1,'2025-06-10','2025-06-24','2025-06-12');
+(1,6,1,'2025-06-10','2025-06-24','2025-06-12',22);
 ALTER TABLE `issued_books` ENABLE KEYS;
 UNLOCK TABLES;
 
@@ -116,6 +188,140 @@ INSERT INTO `users` VALUES
 ALTER TABLE `users` ENABLE KEYS;
 UNLOCK TABLES;
 
+DROP TABLE IF EXISTS `book_issue_totals`;
+SET @saved_cs_client     = @@character_set_client;
+SET character_set_client = utf8mb4;
+CREATE TABLE `book_issue_totals` (
+  `book_id` int(11) NOT NULL,
+  `issue_count` int(11) NOT NULL DEFAULT 0,
+  `last_issued` date DEFAULT NULL,
+  PRIMARY KEY (`book_id`),
+  KEY `issue_count` (`issue_count`),
+  CONSTRAINT `book_issue_totals_ibfk_1` FOREIGN KEY (`book_id`) REFERENCES `books` (`book_id`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+SET character_set_client = @saved_cs_client;
+
+LOCK TABLES `book_issue_totals` WRITE;
+ALTER TABLE `book_issue_totals` DISABLE KEYS;
+INSERT INTO `book_issue_totals` VALUES
+(6,1,'2025-06-10');
+ALTER TABLE `book_issue_totals` ENABLE KEYS;
+UNLOCK TABLES;
+
+DROP TABLE IF EXISTS `book_issue_monthly`;
+SET @saved_cs_client     = @@character_set_client;
+SET character_set_client = utf8mb4;
+CREATE TABLE `book_issue_monthly` (
+  `month` date NOT NULL,
+  `book_id` int(11) NOT NULL,
+  `issue_count` int(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`month`,`book_id`),
+  KEY `month_issue_count` (`month`,`issue_count`),
+  KEY `book_id` (`book_id`),
+  CONSTRAINT `book_issue_monthly_ibfk_1` FOREIGN KEY (`book_id`) REFERENCES `books` (`book_id`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+SET character_set_client = @saved_cs_client;
+
+LOCK TABLES `book_issue_monthly` WRITE;
+ALTER TABLE `book_issue_monthly` DISABLE KEYS;
+INSERT INTO `book_issue_monthly` VALUES
+('2025-06-01',6,1);
+ALTER TABLE `book_issue_monthly` ENABLE KEYS;
+UNLOCK TABLES;
+
+DROP TABLE IF EXISTS `book_issue_daily`;
+SET @saved_cs_client     = @@character_set_client;
+SET character_set_client = utf8mb4;
+CREATE TABLE `book_issue_daily` (
+  `day` date NOT NULL,
+  `book_id` int(11) NOT NULL,
+  `issue_count` int(11) NOT NULL DEFAULT 0,
+  `return_count` int(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`day`,`book_id`),
+  KEY `book_id` (`book_id`),
+  CONSTRAINT `book_issue_daily_ibfk_1` FOREIGN KEY (`book_id`) REFERENCES `books` (`book_id`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+SET character_set_client = @saved_cs_client;
+
+LOCK TABLES `book_issue_daily` WRITE;
+ALTER TABLE `book_issue_daily` DISABLE KEYS;
+INSERT INTO `book_issue_daily` VALUES
+('2025-06-10',6,1,0),
+('2025-06-12',6,0,1);
+ALTER TABLE `book_issue_daily` ENABLE KEYS;
+UNLOCK TABLES;
+
+DROP TABLE IF EXISTS `member_issue_monthly`;
+SET @saved_cs_client     = @@character_set_client;
+SET character_set_client = utf8mb4;
+CREATE TABLE `member_issue_monthly` (
+  `month` date NOT NULL,
+  `member_id` int(11) NOT NULL,
+  `issue_count` int(11) NOT NULL DEFAULT 0,
+  `return_count` int(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`month`,`member_id`),
+  KEY `member_id` (`member_id`),
+  CONSTRAINT `member_issue_monthly_ibfk_1` FOREIGN KEY (`member_id`) REFERENCES `members` (`member_id`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+SET character_set_client = @saved_cs_client;
+
+LOCK TABLES `member_issue_monthly` WRITE;
+ALTER TABLE `member_issue_monthly` DISABLE KEYS;
+INSERT INTO `member_issue_monthly` VALUES
+('2025-06-01',1,1,1);
+ALTER TABLE `member_issue_monthly` ENABLE KEYS;
+UNLOCK TABLES;
+
+DROP TABLE IF EXISTS `change_log`;
+SET @saved_cs_client     = @@character_set_client;
+SET character_set_client = utf8mb4;
+CREATE TABLE `change_log` (
+  `version` bigint(20) NOT NULL AUTO_INCREMENT,
+  `entity` enum('book','loan','member') NOT NULL,
+  `entity_id` int(11) DEFAULT NULL,
+  `op` enum('insert','update','reset') NOT NULL,
+  `member_id` int(11) DEFAULT NULL,
+  `changed_at` datetime NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`version`),
+  KEY `changed_at` (`changed_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+SET character_set_client = @saved_cs_client;
+
+DROP TABLE IF EXISTS `issued_books_archive`;
+SET @saved_cs_client     = @@character_set_client;
+SET character_set_client = utf8mb4;
+CREATE TABLE `issued_books_archive` (
+  `issue_id` int(11) NOT NULL,
+  `book_id` int(11) NOT NULL,
+  `member_id` int(11) NOT NULL,
+  `issue_date` date NOT NULL,
+  `due_date` date NOT NULL,
+  `return_date` date NOT NULL,
+  `copy_id` int(11) DEFAULT NULL,
+  PRIMARY KEY (`issue_id`),
+  KEY `member_id` (`member_id`,`issue_id`),
+  KEY `book_id` (`book_id`),
+  KEY `return_date` (`return_date`),
+  CONSTRAINT `issued_books_archive_ibfk_1` FOREIGN KEY (`book_id`) REFERENCES `books` (`book_id`) ON DELETE CASCADE ON UPDATE CASCADE,
+  CONSTRAINT `issued_books_archive_ibfk_2` FOREIGN KEY (`member_id`) REFERENCES `members` (`member_id`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+SET character_set_client = @saved_cs_client;
+
+DROP TABLE IF EXISTS `fines`;
+SET @saved_cs_client     = @@character_set_client;
+SET character_set_client = utf8mb4;
+CREATE TABLE `fines` (
+  `issue_id` int(11) NOT NULL,
+  `member_id` int(11) NOT NULL,
+  `days_overdue` int(11) NOT NULL,
+  `amount` decimal(10,2) NOT NULL,
+  `returned` tinyint(1) NOT NULL DEFAULT 0,
+  `computed_on` date NOT NULL,
+  PRIMARY KEY (`issue_id`),
+  KEY `member_id` (`member_id`,`returned`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+SET character_set_client = @saved_cs_client;
+
 SET TIME_ZONE=@OLD_TIME_ZONE;
 SET SQL_MODE=@OLD_SQL_MODE;
 SET FOREIGN_KEY_CHECKS=@OLD_FOREIGN_KEY_CHECKS;
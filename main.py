@@ -1,25 +1,32 @@
+import startup
 import sys
 import os
+import json
 from PyQt5 import QtWidgets, uic
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QDialog,
     QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
-    QMessageBox, QWidget, QTableWidget, QTableWidgetItem,
-    QHeaderView, QComboBox, QCheckBox
+    QMessageBox, QWidget, QTableWidget, QTableWidgetItem, QTableView,
+    QHeaderView, QComboBox, QCheckBox, QProgressBar, QFileDialog, QPlainTextEdit,
+    QListWidget, QListWidgetItem, QAbstractItemView
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer, pyqtSignal
+from PyQt5.QtGui import QFontDatabase
 from db import DatabaseManager
-import matplotlib
-matplotlib.use("Agg")
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-import qdarkstyle
+from feed import ChangeFeed
+from picker import BookPicker
+from rows import Rows
+from metrics import format_report
+from tasks import TaskRunner
+# matplotlib, qdarkstyle, numpy (search, recommend) aur importer bhaari h: jis tab ko chahiye
+# wahi pehli baar khulne par import karta h, login window ka intezaar nahi karwate
 
 # first dialogue box 
 class LoginDialog(QDialog):
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, runner):
         super().__init__()
         self.db = db_manager
+        self.runner = runner
         self.setWindowTitle("LMS Login")
         self.resize(300, 150)
         layout = QVBoxLayout()
@@ -30,24 +37,40 @@ class LoginDialog(QDialog):
         self.password_edit.setPlaceholderText("Password")
         self.password_edit.setEchoMode(QLineEdit.Password)
 
-        btn_login = QPushButton("Login")
-        btn_register = QPushButton("Register")
+        self.btn_login = QPushButton("Login")
+        self.btn_register = QPushButton("Register")
 
         layout.addWidget(QLabel("Username:"))
         layout.addWidget(self.username_edit)
         layout.addWidget(QLabel("Password:"))
         layout.addWidget(self.password_edit)
         btn_layout = QHBoxLayout()
-        btn_layout.addWidget(btn_login)
-        btn_layout.addWidget(btn_register)
+        btn_layout.addWidget(self.btn_login)
+        btn_layout.addWidget(self.btn_register)
         layout.addLayout(btn_layout)
 
         self.setLayout(layout)
 
-        btn_login.clicked.connect(self.attempt_login)
-        btn_register.clicked.connect(self.open_register)
+        self.btn_login.clicked.connect(self.attempt_login)
+        self.btn_register.clicked.connect(self.open_register)
 
         self.user_info = None  
+        self.connect_error = None
+        # db_manager None ho to connection abhi background me ban raha h, tab tak
+        # user type kar sakta h par login/register band
+        self.set_db(db_manager)
+
+    def set_db(self, db_manager):
+        self.db = db_manager
+        ready = db_manager is not None
+        self.btn_login.setEnabled(ready)
+        self.btn_register.setEnabled(ready)
+        self.btn_login.setText("Login" if ready else "Connecting...")
+
+    def connection_failed(self, err):
+        self.connect_error = err
+        QMessageBox.critical(self, "Database Error", f"Cannot connect to database: {err}")
+        self.reject()
 
     def attempt_login(self):
         username = self.username_edit.text().strip()
@@ -55,22 +78,35 @@ class LoginDialog(QDialog):
         if not username or not password:
             QMessageBox.warning(self, "Input Error", "Please enter both username and password.")
             return
-        info = self.db.validate_login(username, password)
+        self.btn_login.setEnabled(False)
+        self.btn_login.setText("Logging in...")
+        self.runner.submit(self.db.validate_login, username, password, key="login",
+                           on_result=self._login_done, on_error=self._login_error)
+
+    def _login_done(self, info):
+        self.btn_login.setEnabled(True)
+        self.btn_login.setText("Login")
         if info:
             self.user_info = info
             self.accept()
         else:
             QMessageBox.warning(self, "Login Failed", "Invalid username or password.")
 
+    def _login_error(self, err):
+        self.btn_login.setEnabled(True)
+        self.btn_login.setText("Login")
+        QMessageBox.warning(self, "Database Error", f"Login failed: {err}")
+
     def open_register(self):
-        dlg = RegisterDialog(self.db)
+        dlg = RegisterDialog(self.db, self.runner)
         dlg.exec_()
 
 # register wala screen
 class RegisterDialog(QDialog):
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, runner):
         super().__init__()
         self.db = db_manager
+        self.runner = runner
         self.setWindowTitle("Register New Account")
         self.resize(400, 300)
         layout = QVBoxLayout()
@@ -93,7 +129,7 @@ class RegisterDialog(QDialog):
         self.confirm_edit.setPlaceholderText("Confirm Password")
         self.confirm_edit.setEchoMode(QLineEdit.Password)
 
-        btn_register = QPushButton("Create Account")
+        self.btn_register = QPushButton("Create Account")
 
         layout.addWidget(QLabel("Full Name:"))
         layout.addWidget(self.fullname_edit)
@@ -107,11 +143,11 @@ class RegisterDialog(QDialog):
         layout.addWidget(self.password_edit)
         layout.addWidget(QLabel("Confirm Password:"))
         layout.addWidget(self.confirm_edit)
-        layout.addWidget(btn_register)
+        layout.addWidget(self.btn_register)
 
         self.setLayout(layout)
 
-        btn_register.clicked.connect(self.attempt_register)
+        self.btn_register.clicked.connect(self.attempt_register)
 
     def attempt_register(self):
         full_name = self.fullname_edit.text().strip()
@@ -126,19 +162,229 @@ class RegisterDialog(QDialog):
         if pwd != confirm:
             QMessageBox.warning(self, "Password Error", "Passwords do not match.")
             return
-        success = self.db.create_member_and_user(full_name, email, phone, username, pwd)
+        self.btn_register.setEnabled(False)
+        self.runner.submit(self.db.create_member_and_user, full_name, email, phone, username, pwd,
+                           on_result=self._register_done, on_error=self._register_error)
+
+    def _register_error(self, err):
+        self.btn_register.setEnabled(True)
+        QMessageBox.warning(self, "Database Error", f"Registration failed: {err}")
+
+    def _register_done(self, success):
+        self.btn_register.setEnabled(True)
         if success:
             QMessageBox.information(self, "Success", "Account created! You can now login.")
             self.accept()
         else:
             QMessageBox.warning(self, "Registration Failed", "Username or email may already exist.")
 
+# books ka model, poora catalog ek saath nahi aata - scroll karne par page by page
+class BookTableModel(QAbstractTableModel):
+    COLUMNS = [
+        ("book_id", "ID"), ("title", "Title"), ("author", "Author"),
+        ("publisher", "Publisher"), ("isbn", "ISBN"), ("year_published", "Year"),
+        ("total_copies", "Total"), ("available_copies", "Available"),
+    ]
+    TEXT_COLUMNS = ("title", "author", "publisher", "isbn")
+    PAGE_SIZE = 200
+
+    def __init__(self, db_manager, runner, catalog_search, parent=None):
+        super().__init__(parent)
+        self.db = db_manager
+        self.runner = runner
+        self.catalog_search = catalog_search
+        # rows.Rows: har book ek tuple, column naam ek baar; poora catalog scroll ho to bhi halka
+        self._rows = Rows(())
+        self._ranked = False
+        self._keyword = None
+        self._sort_key = "book_id"
+        self._descending = False
+        self._exhausted = False
+        self._loading = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        # text sirf dikh rahe cells ka, jab Qt maange; rows me asli values hi rehti h
+        return self._rows.display(index.row(), self.COLUMNS[index.column()][0])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section][1]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted and not self._loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if self.canFetchMore(parent):
+            self._load_page(self._rows[-1]['book_id'] if self._rows else None)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        # sorting SQL me hoti h, yaha sirf key badal ke pehla page dobara lana h
+        self._sort_key = self.COLUMNS[column][0]
+        self._descending = order == Qt.DescendingOrder
+        if self._ranked:
+            # search results chhote hote h (ek page), unko yahi sort kar dete h
+            self.layoutAboutToBeChanged.emit()
+            key = self._sort_key
+            # har row me ek hi type (text columns "", baaki 0), warna "" aur int ki tulna TypeError
+            blank = "" if key in self.TEXT_COLUMNS else 0
+            self._rows.sort(key=lambda r: (r.get(key) is None, blank if r.get(key) is None else r.get(key)),
+                            reverse=self._descending)
+            self.layoutChanged.emit()
+        else:
+            self._reset()
+
+    def reload(self, keyword=None):
+        self._ranked = False
+        self._keyword = keyword or None
+        self._reset()
+
+    def search(self, query):
+        # relevance ke hisaab se top results, ek hi page
+        self._ranked = True
+        self.beginResetModel()
+        self._rows = Rows(())
+        self._exhausted = True
+        self.endResetModel()
+        self._loading = True
+        self.runner.submit(self.catalog_search.search, query, limit=self.PAGE_SIZE, key="books",
+                           on_result=self._show_ranked, on_error=self._page_failed)
+
+    def _show_ranked(self, rows):
+        self._loading = False
+        self.beginResetModel()
+        self._rows = Rows.of(rows)
+        self.endResetModel()
+
+    def _reset(self):
+        self.beginResetModel()
+        self._rows = Rows(())
+        self._exhausted = False
+        self.endResetModel()
+        self._load_page(None)
+
+    def _load_page(self, after_id):
+        self._loading = True
+        if self._keyword:
+            fn, args = self.db.search_books, (self._keyword,)
+        else:
+            fn, args = self.db.get_all_books, ()
+        self.runner.submit(fn, *args, after_id=after_id, limit=self.PAGE_SIZE,
+                           sort_key=self._sort_key, descending=self._descending, key="books",
+                           on_result=self._append_page, on_error=self._page_failed)
+
+    def _append_page(self, rows):
+        self._loading = False
+        self._exhausted = len(rows) < self.PAGE_SIZE
+        if rows:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+            self._rows.extend(rows)
+            self.endInsertRows()
+
+    def _page_failed(self, err):
+        self._loading = False
+        self._exhausted = True
+        self.runner.failed.emit(str(err))
+
+    def patch_rows(self, rows):
+        # change feed se aayi books: jo rows dikh rahi h unhe jagah par badlo. nayi book
+        # sirf tab jodte h jab poori default listing (book_id order) load ho chuki ho
+        positions = {b: i for i, b in enumerate(self._rows.column('book_id'))} if self._rows else {}
+        appended = []
+        for row in rows:
+            i = positions.get(row['book_id'])
+            if i is not None:
+                self._rows[i].update(row)
+                self.dataChanged.emit(self.index(i, 0), self.index(i, len(self.COLUMNS) - 1))
+            elif (self._exhausted and not self._ranked and not self._keyword
+                  and self._sort_key == "book_id" and not self._descending
+                  and (not self._rows or row['book_id'] > self._rows[-1]['book_id'])):
+                appended.append(row)
+        if appended:
+            appended.sort(key=lambda r: r['book_id'])
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(appended) - 1)
+            self._rows.extend(appended)
+            self.endInsertRows()
+
+class AlsoBorrowedList(QListWidget):
+    """Borrowers-also-borrowed books for one book (recommend.Recommender),
+    loaded off the GUI thread. Double click emits bookChosen(row)."""
+
+    bookChosen = pyqtSignal(object)
+
+    def __init__(self, runner, recommender, key, parent=None):
+        super().__init__(parent)
+        self.runner = runner
+        self.recommender = recommender
+        self.key = key
+        self.book_id = None
+        self.setMaximumHeight(120)
+        self.itemDoubleClicked.connect(self._double_clicked)
+
+    def show_for(self, book_id):
+        if book_id == self.book_id:
+            return
+        self.clear()
+        self.book_id = None
+        if book_id is None:
+            return
+        if not self.recommender.ready:
+            # index abhi ban raha h; book_id yaad nahi rakhte, agli baar chunne par dobara
+            self._note("Recommendations are still being built...")
+            return
+        self.book_id = book_id
+        self.runner.submit(self.recommender.also_borrowed, book_id, key=self.key, quiet=True,
+                           on_result=lambda rows: self._fill(book_id, rows))
+
+    def _fill(self, book_id, rows):
+        if book_id != self.book_id:
+            return
+        self.clear()
+        if not rows:
+            self._note("No other books borrowed by its borrowers yet.")
+        for row in rows:
+            text = f"{row['title']} ({row.get('author') or 'unknown'})"
+            if not row.get('available_copies'):
+                text += " - no free copy"
+            item = QListWidgetItem(text)
+            item.setData(Qt.UserRole, row)
+            self.addItem(item)
+
+    def _note(self, text):
+        item = QListWidgetItem(text)
+        item.setFlags(Qt.NoItemFlags)
+        self.addItem(item)
+
+    def _double_clicked(self, item):
+        row = item.data(Qt.UserRole)
+        if row is not None:
+            self.bookChosen.emit(row)
+
 # sara tabs ke liye class
 class BooksTab(QWidget):
-    def __init__(self, db_manager):
+    SEARCH_DELAY_MS = 200
+
+    def __init__(self, db_manager, runner, catalog_search, feed=None, recommender=None):
         super().__init__()
         self.db = db_manager
+        self.runner = runner
+        self.catalog_search = catalog_search
+        self.feed = feed
+        self.recommender = recommender
         self.init_ui()
+        if feed is not None:
+            feed.booksChanged.connect(self._books_changed)
+            feed.booksReset.connect(self.search_books)
 
     def init_ui(self):
         layout = QVBoxLayout()
@@ -146,19 +392,24 @@ class BooksTab(QWidget):
         # Search operation 
         search_layout = QHBoxLayout()
         self.search_edit = QLineEdit()
-        self.search_edit.setPlaceholderText("Search by title or author")
+        self.search_edit.setPlaceholderText("Search by title, author, publisher or ISBN")
         btn_search = QPushButton("Search")
         btn_refresh = QPushButton("Refresh")
+        self.btn_import = QPushButton("Import...")
         search_layout.addWidget(self.search_edit)
         search_layout.addWidget(btn_search)
         search_layout.addWidget(btn_refresh)
+        search_layout.addWidget(self.btn_import)
 
         
-        self.table = QTableWidget()
-        self.table.setColumnCount(8)
-        headers = ["ID","Title","Author","Publisher","ISBN","Year","Total","Available"]
-        self.table.setHorizontalHeaderLabels(headers)
+        self.model = BookTableModel(self.db, self.runner, self.catalog_search, self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QTableView.SelectRows)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.horizontalHeader().setSortIndicator(0, Qt.AscendingOrder)
+        # header click -> model.sort -> ORDER BY in SQL
+        self.table.setSortingEnabled(True)
 
         
         form_layout = QHBoxLayout()
@@ -168,60 +419,62 @@ class BooksTab(QWidget):
         self.inp_isbn = QLineEdit(); self.inp_isbn.setPlaceholderText("ISBN")
         self.inp_year = QLineEdit(); self.inp_year.setPlaceholderText("Year")
         self.inp_copies = QLineEdit(); self.inp_copies.setPlaceholderText("Copies")
-        btn_add = QPushButton("Add Book")
+        self.btn_add = QPushButton("Add Book")
         form_layout.addWidget(self.inp_title)
         form_layout.addWidget(self.inp_author)
         form_layout.addWidget(self.inp_publisher)
         form_layout.addWidget(self.inp_isbn)
         form_layout.addWidget(self.inp_year)
         form_layout.addWidget(self.inp_copies)
-        form_layout.addWidget(btn_add)
+        form_layout.addWidget(self.btn_add)
 
         layout.addLayout(search_layout)
         layout.addWidget(self.table)
+        self.also_borrowed = None
+        if self.recommender is not None:
+            self.also_borrowed = AlsoBorrowedList(self.runner, self.recommender, "also-borrowed-books", self)
+            self.table.selectionModel().currentRowChanged.connect(self._row_selected)
+            layout.addWidget(QLabel("Borrowers of the selected book also borrowed:"))
+            layout.addWidget(self.also_borrowed)
         layout.addLayout(form_layout)
         self.setLayout(layout)
 
         
         btn_search.clicked.connect(self.search_books)
+        # type karte hi search, par har key par nahi - thoda ruk ke
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.search_books)
+        self.search_edit.textEdited.connect(self.search_timer.start)
         btn_refresh.clicked.connect(self.load_all_books)
-        btn_add.clicked.connect(self.add_book)
+        self.btn_import.clicked.connect(self.import_books)
+        self.btn_add.clicked.connect(self.add_book)
 
        
         self.load_all_books()
 
     def load_all_books(self):
+        self.search_timer.stop()
         self.search_edit.clear()
-        books = self.db.get_all_books()
-        self._populate_table(books)
+        self.model.reload()
+
+    def _row_selected(self, current, _previous):
+        book_id = self.model._rows.value(current.row(), 'book_id') if current.isValid() else None
+        self.also_borrowed.show_for(book_id)
+
+    def _books_changed(self, rows):
+        self.model.patch_rows(rows)
+        # nayi books index me bhi (catch_up sirf book_id > max uthata h, sasta h)
+        self.runner.submit(self.catalog_search.catch_up, key="catch-up", quiet=True)
 
     def search_books(self):
         kw = self.search_edit.text().strip()
         if not kw:
             self.load_all_books()
         else:
-            books = self.db.search_books(kw)
-            self._populate_table(books)
-
-    def _populate_table(self, books_list):
-        self.table.setRowCount(0)
-        for row_data in books_list:
-            row = self.table.rowCount()
-            self.table.insertRow(row)
-            vals = [
-                row_data.get('book_id'),
-                row_data.get('title'),
-                row_data.get('author'),
-                row_data.get('publisher'),
-                row_data.get('isbn'),
-                row_data.get('year_published'),
-                row_data.get('total_copies'),
-                row_data.get('available_copies'),
-            ]
-            for col, val in enumerate(vals):
-                item = QTableWidgetItem(str(val) if val is not None else "")
-                item.setFlags(item.flags() ^ Qt.ItemIsEditable)
-                self.table.setItem(row, col, item)
+            self.search_timer.stop()
+            self.model.search(kw)
 
     def add_book(self):
         title = self.inp_title.text().strip()
@@ -239,66 +492,130 @@ class BooksTab(QWidget):
         except ValueError:
             QMessageBox.warning(self, "Input Error", "Year and Copies must be integers.")
             return
-        success = self.db.add_book(title, author, publisher, isbn, year_int, copies_int)
+        self.btn_add.setEnabled(False)
+        self.runner.submit(self.db.add_book, title, author, publisher, isbn, year_int, copies_int,
+                           on_result=self._add_done, on_error=self._add_error)
+
+    def _add_error(self, err):
+        self.btn_add.setEnabled(True)
+        QMessageBox.warning(self, "Database Error", f"Could not add book: {err}")
+
+    def _add_done(self, success):
+        self.btn_add.setEnabled(True)
         if success:
             QMessageBox.information(self, "Success", "Book added.")
             self.inp_title.clear(); self.inp_author.clear()
             self.inp_publisher.clear(); self.inp_isbn.clear()
             self.inp_year.clear(); self.inp_copies.clear()
-            self.load_all_books()
+            if self.feed is not None:
+                # nayi row (aur index catch_up) feed ke through aati h, listing reload nahi
+                self.feed.poll()
+            else:
+                self.runner.submit(self.catalog_search.catch_up)
+                self.load_all_books()
         else:
             QMessageBox.warning(self, "Failed", "Could not add book (maybe duplicate ISBN).")
 
+    def import_books(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Import Books", "", "Catalog files (*.csv *.json *.jsonl *.mrc *.marc);;All files (*)")
+        if not path:
+            return
+        from importer import BulkImporter
+        self.btn_import.setEnabled(False)
+        self.runner.submit(BulkImporter(self.db).import_file, path,
+                           on_result=self._import_done, on_error=self._import_error)
+
+    def _import_error(self, err):
+        self.btn_import.setEnabled(True)
+        QMessageBox.warning(self, "Import Failed", str(err))
+
+    def _import_done(self, report):
+        self.btn_import.setEnabled(True)
+        msg = (f"Read {report.read} records: {report.inserted} new books, "
+               f"{report.updated} existing books got more copies, {report.rejected} rejected.")
+        if report.reject_path:
+            msg += f"\n\nRejected rows: {report.reject_path}"
+        QMessageBox.information(self, "Import Finished", msg)
+        # bahut saare naye books, index dobara bana lo
+        self.runner.submit(self.catalog_search.build)
+        self.load_all_books()
+
 class IssueReturnTab(QWidget):
     
-    def __init__(self, db_manager, current_member_id):
+    def __init__(self, db_manager, runner, current_member_id, feed=None, recommender=None):
         super().__init__()
         self.db = db_manager
+        self.runner = runner
         self.member_id = current_member_id
+        self.feed = feed
+        self.recommender = recommender
         self.init_ui()
+        if feed is not None:
+            feed.booksChanged.connect(self.book_picker.patch)
+            feed.booksReset.connect(self.book_picker.reset)
+            feed.loansChanged.connect(self._loans_changed)
 
     def init_ui(self):
         layout = QVBoxLayout()
 
        
-        issue_label = QLabel("Issue a Book:")
-        self.combo_books = QComboBox()
-        btn_issue = QPushButton("Issue Selected Book")
+        issue_label = QLabel("Issue Books (pick each book, then issue the whole stack):")
+        # poori available list nahi: type karte hi server se kuch dozen matches
+        self.book_picker = BookPicker(self.db, self.runner, self)
+        self.btn_issue = QPushButton("Issue Books")
+        self.btn_unstack = QPushButton("Remove")
         issue_layout = QHBoxLayout()
-        issue_layout.addWidget(self.combo_books)
-        issue_layout.addWidget(btn_issue)
+        issue_layout.addWidget(self.book_picker)
+        issue_layout.addWidget(self.btn_unstack)
+        issue_layout.addWidget(self.btn_issue)
+        # patron ka dher: chuni hui books yaha jama hoti h, ek transaction me issue
+        self.list_stack = QListWidget()
+        self.list_stack.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.list_stack.setMaximumHeight(120)
 
         
         return_label = QLabel("My Borrowed Books (Return below):")
         self.table_issued = QTableWidget()
-        self.table_issued.setColumnCount(5)
-        headers = ["Issue ID","Book ID","Title","Issue Date","Due Date"]
+        self.table_issued.setColumnCount(6)
+        headers = ["Issue ID","Book ID","Title","Barcode","Issue Date","Due Date"]
         self.table_issued.setHorizontalHeaderLabels(headers)
         self.table_issued.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        btn_return = QPushButton("Return Selected Book")
+        self.table_issued.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table_issued.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.btn_return = QPushButton("Return Selected Books")
 
         layout.addWidget(issue_label)
         layout.addLayout(issue_layout)
+        layout.addWidget(self.list_stack)
+        self.also_borrowed = None
+        if self.recommender is not None:
+            # dher ki aakhri book ke saath aur kya padha gaya; double click se dher me
+            self.also_borrowed = AlsoBorrowedList(self.runner, self.recommender, "also-borrowed-stack", self)
+            self.also_borrowed.bookChosen.connect(self._stack_recommended)
+            layout.addWidget(QLabel("Borrowers of the last picked book also borrowed (double click to add):"))
+            layout.addWidget(self.also_borrowed)
         layout.addWidget(return_label)
         layout.addWidget(self.table_issued)
-        layout.addWidget(btn_return)
+        layout.addWidget(self.btn_return)
         self.setLayout(layout)
 
-        btn_issue.clicked.connect(self.issue_book)
-        btn_return.clicked.connect(self.return_book)
+        self.book_picker.bookChosen.connect(self.stack_book)
+        self.btn_unstack.clicked.connect(self.unstack_books)
+        self.btn_issue.clicked.connect(self.issue_book)
+        self.btn_return.clicked.connect(self.return_book)
 
-        self.load_available_books()
         self.load_issued_books()
 
-    def load_available_books(self):
-        self.combo_books.clear()
-        books = self.db.get_available_books()
-        for b in books:
-            text = f"{b['book_id']}: {b['title']} (Available: {b['available_copies']})"
-            self.combo_books.addItem(text, b['book_id'])
+    def _loans_changed(self, member_ids):
+        if member_ids is None or self.member_id in member_ids:
+            self.load_issued_books()
 
     def load_issued_books(self):
-        data = self.db.get_issued_books_by_member(self.member_id)
+        self.runner.submit(self.db.get_issued_books_by_member, self.member_id, key="issued",
+                           on_result=self._fill_issued)
+
+    def _fill_issued(self, data):
         self.table_issued.setRowCount(0)
         for row_data in data:
             row = self.table_issued.rowCount()
@@ -307,6 +624,7 @@ class IssueReturnTab(QWidget):
                 row_data.get('issue_id'),
                 row_data.get('book_id'),
                 row_data.get('title'),
+                row_data.get('barcode') or "",
                 row_data.get('issue_date'),
                 row_data.get('due_date'),
             ]
@@ -315,93 +633,279 @@ class IssueReturnTab(QWidget):
                 item.setFlags(item.flags() ^ Qt.ItemIsEditable)
                 self.table_issued.setItem(row, col, item)
 
-    def issue_book(self):
-        idx = self.combo_books.currentIndex()
-        if idx < 0:
+    def stack_book(self, book):
+        if book is None:
             return
-        book_id = self.combo_books.currentData()
-        if book_id is None:
+        item = QListWidgetItem(f"{book['book_id']}: {book['title']}")
+        item.setData(Qt.UserRole, book['book_id'])
+        self.list_stack.addItem(item)
+        self.book_picker.clear_choice()
+        if self.also_borrowed is not None:
+            self.also_borrowed.show_for(book['book_id'])
+
+    def _stack_recommended(self, book):
+        if not book.get('available_copies'):
+            QMessageBox.warning(self, "Not Available", f"No free copy of \"{book['title']}\" right now.")
             return
-        success = self.db.issue_book(book_id, self.member_id)
-        if success:
-            QMessageBox.information(self, "Issued", "Book issued successfully.")
+        self.stack_book(book)
+
+    def unstack_books(self):
+        for item in self.list_stack.selectedItems():
+            self.list_stack.takeItem(self.list_stack.row(item))
+
+    def issue_book(self):
+        book_ids = [self.list_stack.item(i).data(Qt.UserRole) for i in range(self.list_stack.count())]
+        if not book_ids:
+            return
+        self.btn_issue.setEnabled(False)
+        self.btn_unstack.setEnabled(False)
+        # poora dher ek call, ek transaction
+        self.runner.submit(self.db.issue_books, self.member_id, book_ids,
+                           on_result=self._issue_done, on_error=self._write_error)
+
+    def _issue_done(self, results):
+        self.btn_issue.setEnabled(True)
+        self.btn_unstack.setEnabled(True)
+        # results dher ke order me h: jo issue ho gayi woh hatao, jo nahi hui woh dikhti rahe
+        # (issue chalte waqt jodi gayi books aakhir me h, unhe nahi chhedte)
+        for i in reversed(range(len(results))):
+            if results[i]['ok']:
+                self.list_stack.takeItem(i)
+        issued = sum(r['ok'] for r in results)
+        if issued == len(results):
+            QMessageBox.information(self, "Issued", f"{issued} book(s) issued successfully." + _queued_note(results))
         else:
-            QMessageBox.warning(self, "Failed", "Failed to issue book.")
-        self.load_available_books()
-        self.load_issued_books()
+            QMessageBox.warning(self, "Failed", f"{issued} of {len(results)} book(s) issued. "
+                                "The books left in the list have no free copy." + _queued_note(results))
+        if issued:
+            self._refresh_after_write()
+
+    def _write_error(self, err):
+        self.btn_issue.setEnabled(True)
+        self.btn_unstack.setEnabled(True)
+        self.btn_return.setEnabled(True)
+        QMessageBox.warning(self, "Database Error", str(err))
 
     def return_book(self):
-        selected = self.table_issued.currentRow()
-        if selected < 0:
-            QMessageBox.warning(self, "Select Error", "Select a row to return.")
-            return
-        issue_id_item = self.table_issued.item(selected, 0)
-        if not issue_id_item:
+        rows = sorted({index.row() for index in self.table_issued.selectionModel().selectedRows()})
+        if not rows:
+            QMessageBox.warning(self, "Select Error", "Select the rows to return.")
             return
-        issue_id = int(issue_id_item.text())
-        success = self.db.return_book(issue_id)
-        if success:
-            QMessageBox.information(self, "Returned", "Book returned successfully.")
+        issue_ids = [int(self.table_issued.item(r, 0).text()) for r in rows if self.table_issued.item(r, 0)]
+        self.btn_return.setEnabled(False)
+        self.runner.submit(self.db.return_books, issue_ids,
+                           on_result=self._return_done, on_error=self._write_error)
+
+    def _return_done(self, results):
+        self.btn_return.setEnabled(True)
+        returned = sum(r['ok'] for r in results)
+        if returned == len(results):
+            QMessageBox.information(self, "Returned",
+                                    f"{returned} book(s) returned successfully." + _queued_note(results))
         else:
-            QMessageBox.warning(self, "Failed", "Failed to return book.")
-        self.load_available_books()
-        self.load_issued_books()
+            QMessageBox.warning(self, "Failed",
+                                f"{returned} of {len(results)} book(s) returned." + _queued_note(results))
+        self._refresh_after_write()
+
+    def _refresh_after_write(self):
+        if self.feed is not None:
+            # apna hi likha hua feed se wapas aata h: ek book ki row aur apne loans
+            self.feed.poll()
+        else:
+            self.book_picker.reset()
+            self.load_issued_books()
+
+def _queued_note(results):
+    # OfflineDesk ne server ki jagah local journal me likha
+    if any(r.get('queued') for r in results):
+        return "\n\nOffline: saved on this desk, it will be sent to the server when it is reachable."
+    return ""
 
 class ReportsTab(QWidget):
-    def __init__(self, db_manager):
+    PERIODS = [("all", "All time"), ("month", "This month"), ("week", "Last 7 days"), ("today", "Today")]
+
+    def __init__(self, db_manager, runner):
         super().__init__()
         self.db = db_manager
+        self.runner = runner
+        self.report = None
         self.init_ui()
 
     def init_ui(self):
         layout = QVBoxLayout()
-        self.canvas = FigureCanvas(Figure(figsize=(5,4)))
-        layout.addWidget(self.canvas)
+        self.combo_period = QComboBox()
+        for key, label in self.PERIODS:
+            self.combo_period.addItem(label, key)
+        self.combo_period.currentIndexChanged.connect(self.refresh)
+        period_layout = QHBoxLayout()
+        period_layout.addWidget(QLabel("Period:"))
+        period_layout.addWidget(self.combo_period)
+        period_layout.addStretch()
+        layout.addLayout(period_layout)
+        # offline desk par reports nahi bante: purane charts rehte h, upar ek line
+        self.lbl_error = QLabel()
+        self.lbl_error.setStyleSheet("color: #c0392b;")
+        self.lbl_error.setVisible(False)
+        layout.addWidget(self.lbl_error)
+        import matplotlib
+        matplotlib.use("Agg")
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+        from matplotlib.figure import Figure
+        import reports
+        # axes ek hi baar bante h; refresh par sirf bars ki unchai badalti h
+        self.canvas = FigureCanvas(Figure(figsize=(5, 4), layout="constrained"))
+        ax_top, ax_overdue = self.canvas.figure.subplots(1, 2, gridspec_kw={"width_ratios": (3, 1)})
+        self.top_chart = reports.BarChart(ax_top, "Book Title", "Issue Count", "No issues yet", rotation=45)
+        self.overdue_chart = reports.BarChart(ax_overdue, "Days past due", "Loans", "Nothing out", rotation=45)
+        layout.addWidget(self.canvas, 3)
+        # bhaari charts worker thread par image ban ke aate h
+        images = reports.ImageCache()
+        self.timeline_view = reports.ChartView("report-timeline", reports.draw_timeline, self.runner, images)
+        self.hours_view = reports.ChartView("report-hours", reports.draw_hours, self.runner, images)
+        charts_layout = QHBoxLayout()
+        charts_layout.addWidget(self.timeline_view)
+        charts_layout.addWidget(self.hours_view)
+        layout.addLayout(charts_layout, 2)
         self.setLayout(layout)
-        
-        self.plot_top_issued()
-
-    def plot_top_issued(self):
-        data = self.db.get_top_issued_books(limit=10)
-        titles = [row['title'] for row in data]
-        counts = [row['issue_count'] for row in data]
-        ax = self.canvas.figure.subplots()
-        ax.clear()
-        if titles:
-            ax.bar(titles, counts)
-            ax.set_xlabel("Book Title")
-            ax.set_ylabel("Issue Count")
-            ax.set_title("Top Issued Books")
-            ax.tick_params(axis='x', rotation=45)
+
+        self.refresh()
+
+    def refresh(self):
+        period = self.combo_period.currentData()
+        self.runner.submit(self.db.get_report, period=period, key="report", on_result=self._show_report,
+                           on_error=self._report_failed)
+
+    def _report_failed(self, err):
+        if isinstance(err, ConnectionError):
+            # offline.DatabaseOffline bhi: server wapas aate hi MainWindow refresh karta h
+            text = "Reports need the server, which can't be reached right now. They load when it is back."
         else:
-            ax.text(0.5, 0.5, "No issues yet", ha='center', va='center')
-        self.canvas.draw()
+            text = f"Could not load the report: {err}"
+        self.lbl_error.setText(text)
+        self.lbl_error.setVisible(True)
+
+    def _show_report(self, report):
+        self.lbl_error.setVisible(False)
+        if report == self.report:
+            return   # tab dobara khula, kuch nahi badla: redraw nahi
+        self.report = report
+        top = report["top"]
+        changed = self.top_chart.update([r["title"] for r in top], [r["issue_count"] for r in top],
+                                        f"Top Issued Books ({self.combo_period.currentText()})")
+        overdue = report["overdue"]
+        out = sum(overdue)
+        rate = f"{1 - overdue[0] / out:.0%} overdue" if out else "no loans out"
+        changed |= self.overdue_chart.update(self.db.OVERDUE_BUCKETS, overdue, f"Loans out ({rate})")
+        if changed:
+            self.canvas.draw_idle()
+        self.timeline_view.set_data(report["timeline"])
+        self.hours_view.set_data(report["hours"])
 
 class SettingsTab(QWidget):
 
-    def __init__(self, app_ref):
+    def __init__(self, app_ref, db_manager=None):
         super().__init__()
         self.app = app_ref
+        self.db = db_manager
         self.init_ui()
 
     def init_ui(self):
         layout = QVBoxLayout()
         self.checkbox_dark = QCheckBox("Enable Dark Mode")
         layout.addWidget(self.checkbox_dark)
-        self.setLayout(layout)
         self.checkbox_dark.stateChanged.connect(self.toggle_theme)
 
+        if self.db is not None:
+            # database performance: har DatabaseManager method ke p50/p95/p99, rows,
+            # errors, slow queries (EXPLAIN ke saath), cache aur pool ke counters
+            perf_label = QLabel("<b>Database performance</b>")
+            self.perf_text = QPlainTextEdit()
+            self.perf_text.setReadOnly(True)
+            self.perf_text.setLineWrapMode(QPlainTextEdit.NoWrap)
+            self.perf_text.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+            btn_layout = QHBoxLayout()
+            btn_refresh = QPushButton("Refresh")
+            btn_copy = QPushButton("Copy as JSON")
+            btn_reset = QPushButton("Reset")
+            btn_layout.addWidget(btn_refresh)
+            btn_layout.addWidget(btn_copy)
+            btn_layout.addWidget(btn_reset)
+            btn_layout.addStretch()
+            layout.addWidget(perf_label)
+            layout.addWidget(self.perf_text)
+            layout.addLayout(btn_layout)
+            btn_refresh.clicked.connect(self.refresh_stats)
+            btn_copy.clicked.connect(self.copy_stats)
+            btn_reset.clicked.connect(self.reset_stats)
+        else:
+            layout.addStretch()
+        self.setLayout(layout)
+
     def toggle_theme(self, state):
         if state == Qt.Checked:
+            import qdarkstyle
             self.app.setStyleSheet(qdarkstyle.load_stylesheet_pyqt5())
         else:
             self.app.setStyleSheet("")
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.db is not None:
+            self.refresh_stats()
+
+    def _stats(self):
+        # DatabaseManager: sirf memory ke counters. ApiClient: server se aate h, woh band ho to
+        # (ConnectionError, offline.DatabaseOffline bhi) ya koi aur error ho to slot se bahar na jaaye
+        try:
+            return self.db.stats()
+        except Exception as e:
+            self.perf_text.setPlainText(f"Statistics unavailable: {e}")
+            return None
+
+    def refresh_stats(self):
+        stats = self._stats()
+        if stats is not None:
+            self.perf_text.setPlainText(format_report(stats))
+
+    def copy_stats(self):
+        stats = self._stats()
+        if stats is not None:
+            QApplication.clipboard().setText(json.dumps(stats, indent=2, default=str))
+
+    def reset_stats(self):
+        if getattr(self.db, "metrics", None):
+            self.db.metrics.reset()
+        self.refresh_stats()
+
+class LazyTab(QWidget):
+    """Tab bar placeholder; factory() builds (and so loads) the real tab the
+    first time it becomes the current tab."""
+
+    def __init__(self, factory):
+        super().__init__()
+        self.factory = factory
+        self.widget = None
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(layout)
+
+    def ensure_built(self):
+        """Build the tab if needed; True if it was built just now."""
+        if self.widget is not None:
+            return False
+        self.widget = self.factory()
+        self.layout().addWidget(self.widget)
+        return True
+
 class MainWindow(QMainWindow):
-    def __init__(self, db_manager, user_info):
+    def __init__(self, db_manager, user_info, runner):
         super().__init__()
         self.db = db_manager
         self.user_info = user_info
+        self.runner = runner
+        # doosri desks ke issue/return bhi isi se dikhte h, poori listing reload kiye bina
+        self.feed = ChangeFeed(self.db, self.runner, parent=self)
+        self.recommender = None
         self.resize(800, 600)
 
         ui_path = os.path.join(os.path.dirname(__file__), "home.ui")
@@ -421,6 +925,76 @@ class MainWindow(QMainWindow):
 
        
         self.setWindowTitle(f"LMS - Welcome {self.user_info.get('username')}")
+        self._setup_busy_indicator()
+        if hasattr(self.db, "status"):
+            self._setup_offline_indicator()
+        self.feed.start()
+
+    def _setup_busy_indicator(self):
+        # jab tak background me query chal rhi h, status bar me spinner dikhega
+        self.busy_bar = QProgressBar()
+        self.busy_bar.setRange(0, 0)
+        self.busy_bar.setMaximumWidth(120)
+        self.busy_bar.setVisible(self.runner.is_busy())
+        self.statusBar().addPermanentWidget(self.busy_bar)
+        self.runner.busyChanged.connect(self.busy_bar.setVisible)
+        self.runner.failed.connect(lambda msg: self.statusBar().showMessage(f"Database error: {msg}", 8000))
+
+    def _setup_offline_indicator(self):
+        # OfflineDesk: server dikh rha h ya nahi, kitne issue/return sync hone baaki.
+        # status() sirf memory padhta h, GUI thread se hi
+        self.offline_label = QLabel()
+        self.statusBar().addPermanentWidget(self.offline_label)
+        self._was_online = True
+        self._conflicts_seen = self.db.status()["conflicts"]
+        self._last_conflict_seq = max([c["seq"] for c in self.db.conflicts()], default=0)
+        self.offline_timer = QTimer(self)
+        self.offline_timer.setInterval(2000)
+        self.offline_timer.timeout.connect(self._update_offline_status)
+        self.offline_timer.start()
+        self._update_offline_status()
+
+    def _update_offline_status(self):
+        status = self.db.status()
+        if status["online"]:
+            text = f"Syncing {status['pending']} change(s)..." if status["pending"] else ""
+        else:
+            text = f"OFFLINE: {status['pending']} change(s) saved on this desk"
+        self.offline_label.setText(text)
+        self.offline_label.setToolTip(status["error"] or "")
+        self.offline_label.setStyleSheet("" if status["online"] else "color: #c0392b; font-weight: bold;")
+        if status["online"] and not self._was_online:
+            self._back_online()
+        self._was_online = status["online"]
+        if status["conflicts"] > self._conflicts_seen:
+            self._conflicts_seen = status["conflicts"]
+            self.runner.submit(self.db.conflicts, self._last_conflict_seq, key="offline-conflicts", quiet=True,
+                               on_result=self._show_conflicts)
+
+    def _back_online(self):
+        # offline me jo index/recommendations nahi bane, ab bana lo; baaki feed le aayega
+        search = getattr(self, "catalog_search", None)
+        if search is not None and not getattr(search, "ready", True):
+            self.runner.submit(search.build, quiet=True)
+        if self.recommender is not None and not getattr(self.recommender, "ready", True):
+            self.runner.submit(self.recommender.build, quiet=True)
+        for i in range(self.tabs.count()):
+            tab = self.tabs.widget(i)
+            if isinstance(tab, LazyTab) and isinstance(tab.widget, ReportsTab):
+                tab.widget.refresh()
+        self.feed.poll()
+
+    def _show_conflicts(self, conflicts):
+        if not conflicts:
+            return
+        self._last_conflict_seq = conflicts[-1]["seq"]
+        lines = [f"{c['day']}: {c['op']} of \"{c['title'] or c['book_id']}\" for member {c['member_id']}"
+                 f" - {c['detail']}" for c in conflicts[:20]]
+        if len(conflicts) > 20:
+            lines.append(f"... and {len(conflicts) - 20} more")
+        QMessageBox.warning(self, "Offline Changes Refused",
+                            "The server refused these issues/returns made while this desk was offline:\n\n"
+                            + "\n".join(lines))
 
     def _create_central_tabs(self):
         tabs = QtWidgets.QTabWidget()
@@ -437,27 +1011,16 @@ class MainWindow(QMainWindow):
         home_tab.setLayout(hlayout)
         tabs_widget.addTab(home_tab, "Home")
 
-        
-        books_tab = BooksTab(self.db)
-        tabs_widget.addTab(books_tab, "Books")
-
-       
-        issue_tab = IssueReturnTab(self.db, self.user_info.get('member_id'))
-        tabs_widget.addTab(issue_tab, "Issue/Return")
-
-       
-        reports_tab = ReportsTab(self.db)
-        tabs_widget.addTab(reports_tab, "Reports")
-       
-        index_reports = tabs_widget.indexOf(reports_tab)
-        def on_tab_changed(idx):
-            if idx == index_reports:
-                reports_tab.plot_top_issued()
-        tabs_widget.currentChanged.connect(on_tab_changed)
-
-       
-        settings_tab = SettingsTab(QApplication.instance())
-        tabs_widget.addTab(settings_tab, "Settings")
+        # baaki tabs pehli baar khulne par bante h (aur tabhi apna data laate h)
+        self.tabs = tabs_widget
+        tabs_widget.addTab(LazyTab(self._build_books_tab), "Books")
+        tabs_widget.addTab(LazyTab(lambda: IssueReturnTab(self.db, self.runner, self.user_info.get('member_id'),
+                                                          self.feed, self._get_recommender())),
+                           "Issue/Return")
+        tabs_widget.addTab(LazyTab(lambda: ReportsTab(self.db, self.runner)), "Reports")
+        tabs_widget.addTab(LazyTab(lambda: SettingsTab(QApplication.instance(), self.db)), "Settings")
+        tabs_widget.currentChanged.connect(self._on_tab_changed)
+        self._on_tab_changed(tabs_widget.currentIndex())
 
         
         if hasattr(self, 'actionLogout'):
@@ -470,13 +1033,54 @@ class MainWindow(QMainWindow):
             account_menu.addAction(logout_action)
             logout_action.triggered.connect(self.logout)
 
+    def _build_books_tab(self):
+        # API server se jude ho to index server par h (client.RemoteCatalogSearch)
+        self.catalog_search = getattr(self.db, "catalog_search", None)
+        if self.catalog_search is None:
+            from search import CatalogSearch
+            # search index background me banta h, tab tak FULLTEXT query se kaam chalta h
+            self.catalog_search = CatalogSearch(self.db)
+            self.runner.submit(self.catalog_search.build)
+        return BooksTab(self.db, self.runner, self.catalog_search, self.feed, self._get_recommender())
+
+    def _get_recommender(self):
+        # Books aur Issue/Return ek hi index baant-te h; API server par ho to wahi rakhta h
+        if self.recommender is None:
+            self.recommender = getattr(self.db, "recommender", None)
+            if self.recommender is None:
+                from recommend import Recommender
+                # saved index load (ya pehli baar poori history se build) background me
+                self.recommender = Recommender(self.db)
+                self.runner.submit(self.recommender.build, quiet=True)
+                # naye loans feed se pata chalte h; catch_up sirf unhe padhta h
+                self.feed.loansChanged.connect(
+                    lambda _members: self.runner.submit(self.recommender.catch_up, key="coborrow", quiet=True))
+        return self.recommender
+
+    def _on_tab_changed(self, idx):
+        tab = self.tabs.widget(idx)
+        if not isinstance(tab, LazyTab):
+            return
+        if not tab.ensure_built() and isinstance(tab.widget, ReportsTab):
+            # pehli baar banne par init_ui khud refresh karta h
+            tab.widget.refresh()
+
+    def closeEvent(self, event):
+        self.feed.stop()
+        if self.recommender is not None and self.recommender.ready and self.recommender.dirty:
+            # agli baar sirf is ke baad ke loans padhne padein
+            self.recommender.save()
+        super().closeEvent(event)
+
     def logout(self):
         self.close()
         main()
 
 
 def main():
+    startup.mark("imports")
     app = QApplication(sys.argv)
+    startup.mark("qapp")
 
     
     DB_HOST = "127.0.0.1"
@@ -484,29 +1088,63 @@ def main():
     DB_USER = "root"  
     DB_PASS = "ayushroot"
     DB_NAME = "lms_db"
+    DB_POOL_SIZE = 5
+    SLOW_QUERY_MS = 200   # isse dheemi har query Settings tab ke slow query log me
+    # server ke bina (ek desk wali branch library): LMS_SQLITE=lms.sqlite3 python main.py
+    # file na ho to lms_db.sql se ban jaati h
+    DB_SQLITE = os.environ.get("LMS_SQLITE")
+    # kiosk/desk jo server.py se baat karta h: LMS_SERVER=http://lms-server:8080 python main.py
+    # (tab upar ke DB credentials is machine par chahiye hi nahi)
+    API_SERVER = os.environ.get("LMS_SERVER")
+    # LMS_STARTUP_EXIT=1: login window dikhte aur DB tayyar hote hi band (startup benchmark)
+    EXIT_AFTER_STARTUP = bool(os.environ.get("LMS_STARTUP_EXIT"))
+
+    runner = TaskRunner(max_threads=DB_POOL_SIZE)
+    app.aboutToQuit.connect(runner.wait)
+
+    # login window turant khulti h; connection pool (ya SQLite file + schema) background
+    # me banta h aur tayyar hote hi dialog ko mil jaata h
+    login = LoginDialog(None, runner)
+
+    def db_ready(db_manager):
+        startup.mark("db_ready")
+        login.set_db(db_manager)
+
+    if EXIT_AFTER_STARTUP:
+        def maybe_exit(name, ms):
+            if {"first_window", "db_ready"} <= startup.marks().keys():
+                startup.write_log(backend="api" if API_SERVER else "sqlite" if DB_SQLITE else "mysql")
+                QTimer.singleShot(0, login.reject)
+        startup.add_hook(maybe_exit)
+
+    if DB_SQLITE:
+        runner.submit(DatabaseManager, pool_max_size=DB_POOL_SIZE, metrics=True, slow_query_ms=SLOW_QUERY_MS,
+                      sqlite_path=DB_SQLITE, on_result=db_ready, on_error=login.connection_failed)
+    else:
+        # server/DB band ho tab bhi desk khulti h: catalog aur open loans ki local copy se
+        # issue/return chalta h, journal wapas aane par sync hota h (offline.py).
+        # pool_min_size=0 / check=False: yaha connect karne ki koshish nahi, pehli call karegi
+        def open_desk():
+            from offline import OfflineDesk, default_path
+            if API_SERVER:
+                from client import ApiClient
+                return OfflineDesk(ApiClient(API_SERVER, check=False), default_path(API_SERVER))
+            db_manager = DatabaseManager(user=DB_USER, password=DB_PASS, database=DB_NAME, host=DB_HOST,
+                                         port=DB_PORT, pool_min_size=0, pool_max_size=DB_POOL_SIZE,
+                                         metrics=True, slow_query_ms=SLOW_QUERY_MS)
+            return OfflineDesk(db_manager, default_path(f"{DB_HOST}-{DB_NAME}"))
+        runner.submit(open_desk, on_result=db_ready, on_error=login.connection_failed)
+    login.show()
+    QTimer.singleShot(0, lambda: startup.mark("first_window"))
 
-    try:
-        db_manager = DatabaseManager(
-            user=DB_USER,
-            password=DB_PASS,
-            database=DB_NAME,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-
-    except Exception as e:
-        QMessageBox.critical(None, "Database Error", f"Cannot connect to database: {e}")
-        sys.exit(1)
-
-    login = LoginDialog(db_manager)
     if login.exec_() == QDialog.Accepted:
         user_info = login.user_info
-        window = MainWindow(db_manager, user_info)
+        window = MainWindow(login.db, user_info, runner)
         window.show()
+        QTimer.singleShot(0, lambda: (startup.mark("main_window"), startup.write_log()))
         sys.exit(app.exec_())
     else:
-        sys.exit(0)
+        sys.exit(1 if login.connect_error else 0)
 
 if __name__ == "__main__":
     main()
-
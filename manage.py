@@ -0,0 +1,108 @@
+"""Maintenance commands for the LMS database.
+
+    python manage.py rebuild-stats --password root
+    python manage.py sync-copies --password root
+    python manage.py rebuild-stats --sqlite lms.sqlite3
+    python manage.py prune-changes --keep-days 7 --password root
+    python manage.py archive-loans --keep-days 90 --password root
+    python manage.py calibrate-kdf --target-ms 250 --password root
+    python manage.py build-recommendations --sqlite lms.sqlite3
+"""
+import argparse
+import sys
+import time
+
+from db import DatabaseManager
+
+
+def rebuild_stats(db, args):
+    t0 = time.perf_counter()
+    db.rebuild_circulation_stats()
+    print(f"circulation stats rebuilt in {time.perf_counter() - t0:.2f}s")
+
+
+def sync_copies(db, args):
+    added = db.sync_book_copies()
+    print(f"{added} copy rows added, available counts recomputed from book_copies")
+
+
+def prune_changes(db, args):
+    removed = db.prune_changes(keep_days=args.keep_days)
+    print(f"{removed} change_log events older than {args.keep_days} days removed")
+
+
+def archive_loans(db, args):
+    from archive import LoanArchiver
+    t0 = time.perf_counter()
+    moved = LoanArchiver(db, keep_days=args.keep_days).run_once()
+    hot, archived = db.loan_table_sizes()
+    print(f"{moved} returned loans archived in {time.perf_counter() - t0:.2f}s "
+          f"({hot} loans in issued_books, {archived} in the archive)")
+
+
+def calibrate_kdf(db, args):
+    from passwords import PasswordHasher
+    hasher = PasswordHasher.calibrate(args.target_ms)
+    ms = hasher.time_hash() * 1000
+    old = db.hasher.params
+    db.set_password_kdf(hasher)
+    print(f"password hashing: scrypt {hasher.params}, {ms:.0f} ms per hash on this machine "
+          f"(target {args.target_ms} ms, was {old}); existing hashes upgrade on next login")
+
+
+def build_recommendations(db, args):
+    from recommend import Recommender
+    rec = Recommender(db)
+    if rec.path is None:
+        print("in-memory database: nowhere to save the recommendations index")
+        return
+    t0 = time.perf_counter()
+    rec.rebuild()
+    index = rec.index
+    print(f"borrowers-also-borrowed index built in {time.perf_counter() - t0:.2f}s from loans up to "
+          f"#{index.last_issue_id}: {len(index.ids)} neighbours for {len(index.offsets) - 1} books, saved to {rec.path}")
+
+
+COMMANDS = {
+    "rebuild-stats": (rebuild_stats, "regenerate circulation summary tables from issued_books"),
+    "sync-copies": (sync_copies, "create missing book_copies rows and recount books.available_copies"),
+    "prune-changes": (prune_changes, "drop change feed events older than --keep-days"),
+    "archive-loans": (archive_loans, "move loans returned more than --keep-days ago to issued_books_archive"),
+    "calibrate-kdf": (calibrate_kdf, "time scrypt here and store the largest cost within --target-ms"),
+    "build-recommendations": (build_recommendations, "rebuild the borrowers-also-borrowed index from all loans "
+                                                     "(file: $LMS_RECOMMENDATIONS or next to the database)"),
+}
+
+
+def main(argv=None):
+    # options command ke baad aate h (`manage.py archive-loans --keep-days 90 ...`), isliye har subcommand par
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--host", default="127.0.0.1")
+    common.add_argument("--port", type=int, default=3306)
+    common.add_argument("--user", default="root")
+    common.add_argument("--password", default="")
+    common.add_argument("--database", default="lms_db")
+    common.add_argument("--sqlite", default=None, metavar="PATH", help="use an embedded SQLite database file")
+    common.add_argument("--keep-days", type=int, default=None,
+                        help="prune-changes (default 7) / archive-loans (default 90): days of history to keep")
+    common.add_argument("--target-ms", type=float, default=250,
+                        help="calibrate-kdf: milliseconds one password hash may take (default 250)")
+    parser = argparse.ArgumentParser(description="LMS maintenance commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        sub.add_parser(name, help=help_text, parents=[common])
+    args = parser.parse_args(argv)
+    if args.keep_days is None:
+        args.keep_days = 90 if args.command == "archive-loans" else 7
+
+    db = DatabaseManager(user=args.user, password=args.password, database=args.database,
+                         host=args.host, port=args.port, sqlite_path=args.sqlite)
+    try:
+        COMMANDS[args.command][0](db, args)
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
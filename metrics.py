@@ -0,0 +1,288 @@
+import functools
+import inspect
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+from pymysql.cursors import DictCursor
+
+from rows import Rows
+
+slow_log = logging.getLogger("lms.slow_query")
+
+# latency buckets: 10us se ~100s tak, har bucket pichle se 2^(1/4) guna.
+# percentile bucket ki upper bound hoti h, to error ~19% se zyada nahi
+_BOUNDS = [1e-5 * 2 ** (i / 4) for i in range(94)]
+
+
+class Histogram:
+    __slots__ = ("counts",)
+
+    def __init__(self):
+        self.counts = [0] * (len(_BOUNDS) + 1)
+
+    def add(self, seconds):
+        self.counts[bisect_left(_BOUNDS, seconds)] += 1
+
+    def percentile(self, q):
+        total = sum(self.counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return _BOUNDS[i] if i < len(_BOUNDS) else float("inf")
+        return _BOUNDS[-1]
+
+
+class MethodStats:
+    __slots__ = ("calls", "errors", "rows", "bytes", "total_s", "max_s", "hist")
+
+    def __init__(self):
+        self.calls = self.errors = self.rows = self.bytes = 0
+        self.total_s = self.max_s = 0.0
+        self.hist = Histogram()
+
+    def as_dict(self):
+        ms = lambda s: round(s * 1000, 3)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "mean_ms": ms(self.total_s / self.calls) if self.calls else 0.0,
+            "p50_ms": ms(self.hist.percentile(0.50)),
+            "p95_ms": ms(self.hist.percentile(0.95)),
+            "p99_ms": ms(self.hist.percentile(0.99)),
+            "max_ms": ms(self.max_s),
+        }
+
+
+def _row_bytes(row):
+    # wire size ka andaza: text/blob ki length, baaki values 8 byte
+    if isinstance(row, dict):
+        return sum(len(v) if isinstance(v, (str, bytes)) else 8 for v in row.values())
+    if isinstance(row, tuple):
+        return sum(len(v) if isinstance(v, (str, bytes)) else 8 for v in row)
+    return 8
+
+
+def _measure(result):
+    if isinstance(result, Rows):
+        return len(result), sum(len(v) if isinstance(v, (str, bytes)) else 8 for t in result.data for v in t)
+    if isinstance(result, list):
+        return len(result), sum(_row_bytes(r) for r in result)
+    if isinstance(result, dict):
+        return 1, _row_bytes(result)
+    return 0, 0
+
+
+_SELECT = re.compile(r"^\s*(\(\s*)*select\b", re.IGNORECASE)
+
+
+class QueryMetrics:
+    """Per-method call statistics for DatabaseManager plus a slow-query log.
+
+    record() is fed by the @instrumented decorator. When slow_query_ms is set,
+    connections use the cursor class from cursor_class(), which times every
+    statement and keeps the slow ones (with EXPLAIN for SELECTs) in a ring
+    buffer and the "lms.slow_query" logger. While `trace` is a list, those
+    cursors also append every (query, args) they run to it.
+    """
+
+    EXPLAIN_INTERVAL = 60.0   # ek hi query ka EXPLAIN itne second me ek baar
+
+    def __init__(self, slow_query_ms=None, slow_log_size=50, clock=time.perf_counter):
+        self.slow_query_s = slow_query_ms / 1000 if slow_query_ms is not None else None
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._methods = {}
+        self._slow = deque(maxlen=slow_log_size)
+        self._explained = {}
+        self.trace = None
+        self.started = time.time()
+
+    def record(self, name, elapsed, rows=0, nbytes=0, error=False):
+        with self._lock:
+            stats = self._methods.get(name)
+            if stats is None:
+                stats = self._methods[name] = MethodStats()
+            stats.calls += 1
+            stats.errors += error
+            stats.rows += rows
+            stats.bytes += nbytes
+            stats.total_s += elapsed
+            if elapsed > stats.max_s:
+                stats.max_s = elapsed
+            stats.hist.add(elapsed)
+
+    def cursor_class(self, base):
+        metrics = self
+
+        class TimedCursor(base):
+            def execute(self, query, args=None):
+                trace = metrics.trace
+                if trace is not None:
+                    trace.append((query, args))
+                t0 = metrics._clock()
+                try:
+                    return super().execute(query, args)
+                finally:
+                    elapsed = metrics._clock() - t0
+                    if elapsed >= metrics.slow_query_s:
+                        metrics._slow_statement(self, query, args, elapsed)
+
+        TimedCursor.__name__ = "Timed" + base.__name__
+        return TimedCursor
+
+    def _slow_statement(self, cursor, query, args, elapsed):
+        try:
+            sql = cursor.mogrify(query, args)
+        except Exception:
+            sql = query
+        sql = " ".join(sql.split())
+        explain = None
+        now = self._clock()
+        with self._lock:
+            due = now - self._explained.get(query, -self.EXPLAIN_INTERVAL) >= self.EXPLAIN_INTERVAL
+            if due and _SELECT.match(query):
+                self._explained[query] = now
+            else:
+                due = False
+        if due:
+            # buffered cursor ka result pehle hi padh liya gaya h, to usi connection par chal jaata h
+            try:
+                with cursor.connection.cursor(DictCursor) as c:
+                    c.execute("EXPLAIN " + sql)
+                    explain = c.fetchall()
+            except Exception as e:
+                explain = f"EXPLAIN failed: {e}"
+        entry = {
+            "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "ms": round(elapsed * 1000, 3),
+            "sql": sql[:4000],
+            "explain": explain,
+        }
+        with self._lock:
+            self._slow.append(entry)
+        slow_log.warning("slow query (%.1f ms): %s%s", entry["ms"], entry["sql"],
+                         f"\n  EXPLAIN: {explain}" if explain else "")
+
+    def slow_queries(self):
+        with self._lock:
+            return list(self._slow)
+
+    def snapshot(self):
+        with self._lock:
+            methods = {name: s.as_dict() for name, s in sorted(self._methods.items())}
+            slow = list(self._slow)
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "slow_query_ms": self.slow_query_s * 1000 if self.slow_query_s is not None else None,
+            "methods": methods,
+            "slow_queries": slow,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+            self._slow.clear()
+            self._explained.clear()
+            self.started = time.time()
+
+
+def instrumented(fn=None, *, batches=False):
+    """Record calls of a DatabaseManager method in self.metrics (if enabled).
+
+    Goes above @cached so cache hits show up with their real latency.
+    Generator methods are measured until the caller finishes iterating;
+    with @instrumented(batches=True) each yielded item is a list of rows
+    and counts as len(batch) rows.
+    """
+    if fn is None:
+        return functools.partial(instrumented, batches=batches)
+    name = fn.__name__
+    if inspect.isgeneratorfunction(fn) or name.startswith("iter_"):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            metrics = self.metrics
+            if metrics is None:
+                return fn(self, *args, **kwargs)
+            return _measured_iter(metrics, name, fn(self, *args, **kwargs), batches)
+        return wrapper
+
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        metrics = self.metrics
+        if metrics is None:
+            return fn(self, *args, **kwargs)
+        t0 = metrics._clock()
+        try:
+            result = fn(self, *args, **kwargs)
+        except Exception:
+            metrics.record(name, metrics._clock() - t0, error=True)
+            raise
+        rows, nbytes = _measure(result)
+        metrics.record(name, metrics._clock() - t0, rows, nbytes)
+        return result
+    return wrapper
+
+
+def _measured_iter(metrics, name, gen, batches=False):
+    t0 = metrics._clock()
+    rows = nbytes = 0
+    error = False
+    try:
+        for item in gen:
+            if batches:
+                n, size = _measure(item)
+                rows += n
+                nbytes += size
+            else:
+                rows += 1
+                nbytes += _row_bytes(item)
+            yield item
+    except Exception:
+        error = True
+        raise
+    finally:
+        close = getattr(gen, "close", None)
+        if close is not None:
+            close()
+        metrics.record(name, metrics._clock() - t0, rows, nbytes, error)
+
+
+def format_report(stats):
+    """Plain-text table of DatabaseManager.stats() for the Settings panel / logs."""
+    lines = []
+    methods = stats.get("methods") or {}
+    if methods:
+        lines.append(f"{'method':<28}{'calls':>8}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}"
+                     f"{'p99 ms':>9}{'max ms':>9}{'rows':>10}{'KB':>9}")
+        for name, m in methods.items():
+            lines.append(f"{name:<28}{m['calls']:>8}{m['errors']:>5}{m['p50_ms']:>9.2f}{m['p95_ms']:>9.2f}"
+                         f"{m['p99_ms']:>9.2f}{m['max_ms']:>9.2f}{m['rows']:>10}{m['bytes'] / 1024:>9.1f}")
+    else:
+        lines.append("no calls recorded" if "methods" in stats else "instrumentation disabled")
+    for label in ("cache", "pool", "server", "responses", "offline"):
+        if stats.get(label):
+            lines.append("")
+            lines.append(f"{label}: " + "  ".join(f"{k}={v}" for k, v in stats[label].items()))
+    slow = stats.get("slow_queries") or []
+    if slow:
+        lines.append("")
+        lines.append(f"slow queries (>= {stats.get('slow_query_ms')} ms), newest last:")
+        for q in slow:
+            lines.append(f"  [{q['at']}] {q['ms']:.1f} ms  {q['sql'][:300]}")
+            if isinstance(q["explain"], list):
+                for row in q["explain"]:
+                    lines.append("      " + "  ".join(f"{k}={v}" for k, v in row.items()
+                                                       if k in ("table", "type", "key", "rows", "Extra", "detail")))
+            elif q["explain"]:
+                lines.append(f"      {q['explain']}")
+    return "\n".join(lines)
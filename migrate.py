@@ -0,0 +1,298 @@
+"""Versioned schema migrations on top of lms_db.sql.
+
+    python migrate.py status --password root
+    python migrate.py up --password root            # apply everything pending
+    python migrate.py up --to 3 --password root
+    python migrate.py down --password root          # undo the last one
+    python migrate.py down --to 0 --password root   # back to plain lms_db.sql
+    python migrate.py down --to -1 --password root  # back to the original dump
+    python migrate.py new add_fines_index           # empty up/down pair
+
+lms_db.sql is version 0: 0000_baseline holds everything it gained after
+the original dump, so a database loaded from that dump is brought up to it
+by `up`. On one loaded from the current lms_db.sql (and on every SQLite
+file) the baseline's tables are already there, and it is only recorded.
+
+Every migration is a pair of files in migrations/: NNNN_name.up.sql and
+NNNN_name.down.sql, plain MySQL statements ending in ";" (the SQLite
+backend translates them like any other query). Applied versions are recorded in `schema_migrations` with a
+checksum of the up script, so an edited migration shows up in `status`.
+Index changes should use ALGORITHM=INPLACE LOCK=NONE so a big table is
+never locked for writes; MySQL refuses instead of locking when it can't.
+SQLite databases are migrated automatically when DatabaseManager opens them.
+"""
+import argparse
+import hashlib
+import logging
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+from backends import is_missing_table
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+_FILE = re.compile(r"^(\d{4})_(\w+)\.(up|down)\.sql$")
+_CREATE_TABLE = re.compile(r"^\s*CREATE\s+TABLE\s+`?(\w+)`?", re.IGNORECASE)
+BASELINE = 0
+NONE = -1   # kuch applied nahi: original lms_db.sql
+
+log = logging.getLogger("lms.migrate")
+
+
+class MigrationError(Exception):
+    pass
+
+
+class Migration:
+    def __init__(self, version, name, up_path, down_path):
+        self.version = version
+        self.name = name
+        self.up_path = up_path
+        self.down_path = down_path
+
+    @property
+    def checksum(self):
+        with open(self.up_path, "rb") as fp:
+            return hashlib.sha256(fp.read()).hexdigest()
+
+    @staticmethod
+    def statements(path):
+        # "--" comment lines hata ke, line ke aakhir wale ";" par todo
+        with open(path, encoding="utf-8") as fp:
+            lines = [l for l in fp.read().splitlines() if not l.strip().startswith("--")]
+        return [s.strip() + ";" for s in re.split(r";\s*$", "\n".join(lines), flags=re.MULTILINE) if s.strip()]
+
+
+class Migrator:
+    """Applies and rolls back the migrations in `directory` on a DatabaseManager."""
+
+    def __init__(self, db_manager, directory=MIGRATIONS_DIR):
+        self.db = db_manager
+        self.directory = directory
+
+    def available(self):
+        found = {}
+        for fname in sorted(os.listdir(self.directory)) if os.path.isdir(self.directory) else []:
+            m = _FILE.match(fname)
+            if m:
+                version, name, kind = int(m.group(1)), m.group(2), m.group(3)
+                entry = found.setdefault(version, {"name": name})
+                entry[kind] = os.path.join(self.directory, fname)
+        migrations = []
+        for version, entry in sorted(found.items()):
+            if "up" not in entry or "down" not in entry:
+                raise MigrationError(f"migration {version:04d}_{entry['name']} needs both .up.sql and .down.sql")
+            migrations.append(Migration(version, entry["name"], entry["up"], entry["down"]))
+        return migrations
+
+    def _ensure_history(self, cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+              version int NOT NULL PRIMARY KEY,
+              name varchar(255) NOT NULL,
+              checksum char(64) NOT NULL,
+              applied_at datetime NOT NULL,
+              duration_ms int NOT NULL
+            );
+        """)
+
+    def applied(self):
+        """version -> history row."""
+        with self.db.pool.connection() as conn, conn.cursor() as cursor:
+            self._ensure_history(cursor)
+            cursor.execute("SELECT version, name, checksum, applied_at, duration_ms FROM schema_migrations;")
+            return {r["version"]: r for r in cursor.fetchall()}
+
+    def status(self):
+        applied = self.applied()
+        rows = []
+        for m in self.available():
+            row = applied.pop(m.version, None)
+            state = "pending"
+            if row is not None:
+                state = "applied" if row["checksum"] == m.checksum else "modified"
+            rows.append({"version": m.version, "name": m.name, "state": state,
+                         "applied_at": row["applied_at"] if row else None})
+        for version, row in sorted(applied.items()):
+            # db me chadhi h par file gayab: kisi aur branch ki migration
+            rows.append({"version": version, "name": row["name"], "state": "missing",
+                         "applied_at": row["applied_at"]})
+        return rows
+
+    def current(self):
+        return max(self.applied(), default=NONE)
+
+    def pending(self):
+        applied = self.applied()
+        return [m for m in self.available() if m.version not in applied]
+
+    def up(self, to=None):
+        """Apply pending migrations up to version `to` (default: all); returns them."""
+        done = []
+        with self._lock():
+            for m in self.pending():
+                if to is not None and m.version > to:
+                    break
+                self._run(m, m.up_path, fake=m.version == BASELINE and self._has_baseline(m))
+                done.append(m)
+        return done
+
+    def _has_baseline(self, m):
+        # naye lms_db.sql (ya SQLite file) me baseline ki tables pehle se h: sirf history me likho.
+        # aadhi bani ho to na chalana theek, na chhodna
+        tables = [t.group(1) for t in map(_CREATE_TABLE.match, Migration.statements(m.up_path)) if t]
+        missing = []
+        with self.db.pool.connection() as conn, conn.cursor() as cursor:
+            for table in tables:
+                try:
+                    cursor.execute(f"SELECT 1 FROM {table} LIMIT 0;")
+                except Exception as e:
+                    if not is_missing_table(e):
+                        raise
+                    missing.append(table)
+        if not missing:
+            return True
+        if len(missing) < len(tables):
+            raise MigrationError(f"{m.version:04d}_{m.name} is partly applied, missing: {', '.join(missing)}")
+        return False
+
+    def down(self, to=None):
+        """Roll back applied migrations newer than `to` (default: only the newest)."""
+        applied = self.applied()
+        by_version = {m.version: m for m in self.available()}
+        if to is None:
+            versions = sorted(applied)
+            to = versions[-2] if len(versions) > 1 else NONE
+        if to < BASELINE and self.db.backend.name == "sqlite":
+            # SQLite file lms_db.sql se baseline par hi banti h, aur uska down MySQL ka ALTER h
+            raise MigrationError("a SQLite database can't go below the baseline (version 0)")
+        done = []
+        with self._lock():
+            for version in sorted(applied, reverse=True):
+                if version <= to:
+                    break
+                m = by_version.get(version)
+                if m is None:
+                    raise MigrationError(f"no down script for applied migration {version:04d}")
+                self._run(m, m.down_path, undo=True)
+                done.append(m)
+        return done
+
+    def _run(self, m, path, undo=False, fake=False):
+        # MySQL me DDL transaction me nahi rehta: har statement apne aap commit hota h.
+        # isliye history row migration poori hone ke baad hi likhte/hatate h
+        log.info("%s %04d_%s", "recording" if fake else "reverting" if undo else "applying", m.version, m.name)
+        t0 = time.perf_counter()
+        with self.db.pool.connection() as conn, conn.cursor() as cursor:
+            for statement in [] if fake else Migration.statements(path):
+                try:
+                    cursor.execute(statement)
+                except Exception as e:
+                    raise MigrationError(f"{os.path.basename(path)} failed at: {statement}\n{e}") from e
+            if undo:
+                cursor.execute("DELETE FROM schema_migrations WHERE version=%s;", (m.version,))
+            else:
+                cursor.execute("""
+                    INSERT INTO schema_migrations (version, name, checksum, applied_at, duration_ms)
+                    VALUES (%s, %s, %s, %s, %s);
+                """, (m.version, m.name, m.checksum, datetime.now().replace(microsecond=0),
+                      round((time.perf_counter() - t0) * 1000)))
+        if self.db.cache:
+            self.db.cache.clear()
+
+    def _lock(self):
+        return _MigrationLock(self.db)
+
+
+class _MigrationLock:
+    # do log ek saath migrate na chala de. SQLite me ek hi writer hota h, wahan zaroorat nahi
+    def __init__(self, db_manager):
+        self.db = db_manager
+        self.conn = None
+
+    def __enter__(self):
+        if self.db.backend.name != "mysql":
+            return self
+        self.conn = self.db.pool.acquire()
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT GET_LOCK('lms_migrate', 30) AS ok;")
+            if not cursor.fetchone()["ok"]:
+                self.db.pool.release(self.conn)
+                self.conn = None
+                raise MigrationError("another migration is running")
+        return self
+
+    def __exit__(self, *exc):
+        if self.conn is not None:
+            with self.conn.cursor() as cursor:
+                cursor.execute("SELECT RELEASE_LOCK('lms_migrate');")
+            self.db.pool.release(self.conn)
+            self.conn = None
+
+
+def new_migration(name, directory=MIGRATIONS_DIR):
+    if not re.fullmatch(r"\w+", name):
+        raise MigrationError("name: letters, digits and _ only")
+    os.makedirs(directory, exist_ok=True)
+    versions = [int(m.group(1)) for m in map(_FILE.match, os.listdir(directory)) if m]
+    version = max(versions, default=0) + 1
+    paths = []
+    for kind in ("up", "down"):
+        path = os.path.join(directory, f"{version:04d}_{name}.{kind}.sql")
+        with open(path, "w", encoding="utf-8") as fp:
+            fp.write(f"-- {name} ({kind})\n")
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    # connection options command ke baad aate h (`migrate.py up --password root`)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--host", default="127.0.0.1")
+    common.add_argument("--port", type=int, default=3306)
+    common.add_argument("--user", default="root")
+    common.add_argument("--password", default="")
+    common.add_argument("--database", default="lms_db")
+    common.add_argument("--sqlite", default=None, metavar="PATH", help="use an embedded SQLite database file")
+    parser = argparse.ArgumentParser(description="LMS schema migrations")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="list migrations and whether they are applied", parents=[common])
+    for name, help_text in (("up", "apply pending migrations"), ("down", "roll back migrations")):
+        p = sub.add_parser(name, help=help_text, parents=[common])
+        p.add_argument("--to", type=int, default=None, metavar="VERSION")
+    p = sub.add_parser("new", help="create an empty up/down pair")
+    p.add_argument("name")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.command == "new":
+        for path in new_migration(args.name):
+            print(path)
+        return 0
+
+    from db import DatabaseManager
+    db = DatabaseManager(user=args.user, password=args.password, database=args.database,
+                         host=args.host, port=args.port, sqlite_path=args.sqlite, migrate=False)
+    try:
+        migrator = Migrator(db)
+        if args.command == "status":
+            for row in migrator.status():
+                print(f"{row['version']:04d}  {row['state']:<9} {row['name']:<40} {row['applied_at'] or ''}")
+        elif args.command == "up":
+            done = migrator.up(args.to)
+            print(f"{len(done)} migration(s) applied, now at version {migrator.current()}")
+        else:
+            done = migrator.down(args.to)
+            print(f"{len(done)} migration(s) rolled back, now at version {migrator.current()}")
+    except MigrationError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,20 @@
+-- back to the original lms_db.sql schema (MySQL only). Archived loans, fines, the change
+-- feed and copy barcodes are dropped with their tables.
+DROP TABLE fines;
+DROP TABLE issued_books_archive;
+DROP TABLE change_log;
+DROP TABLE member_issue_monthly;
+DROP TABLE book_issue_daily;
+DROP TABLE book_issue_monthly;
+DROP TABLE book_issue_totals;
+
+ALTER TABLE issued_books
+  DROP FOREIGN KEY issued_books_ibfk_3,
+  DROP KEY copy_id,
+  DROP COLUMN copy_id;
+
+DROP TABLE book_copies;
+
+ALTER TABLE books
+  DROP KEY ft_books,
+  DROP KEY title;
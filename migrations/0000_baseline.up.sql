@@ -0,0 +1,110 @@
+-- everything lms_db.sql gained after the original dump: catalog indexes, per-copy inventory,
+-- circulation summary tables, change feed, loan archive and fines. A database loaded from
+-- the current lms_db.sql already has all of it; migrate.py then only records this version.
+-- One-time upgrade: the FULLTEXT index and the new foreign key can't be built with
+-- LOCK=NONE, so no online-DDL options here. Afterwards fill the new tables with
+-- `manage.py sync-copies` and `manage.py rebuild-stats`.
+
+-- catalog: title sort/search (BookTableModel), ranked search (search_books_ranked)
+ALTER TABLE books
+  ADD KEY title (title),
+  ADD FULLTEXT KEY ft_books (title, author, publisher);
+
+-- one row per physical copy; checkouts claim a copy row (issue_book)
+CREATE TABLE book_copies (
+  copy_id int(11) NOT NULL AUTO_INCREMENT,
+  book_id int(11) NOT NULL,
+  barcode varchar(32) DEFAULT NULL,
+  status enum('available','issued','lost','withdrawn') NOT NULL DEFAULT 'available',
+  added_at datetime DEFAULT current_timestamp(),
+  PRIMARY KEY (copy_id),
+  UNIQUE KEY barcode (barcode),
+  KEY book_status (book_id, status),
+  CONSTRAINT book_copies_ibfk_1 FOREIGN KEY (book_id) REFERENCES books (book_id) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+ALTER TABLE issued_books
+  ADD COLUMN copy_id int(11) DEFAULT NULL,
+  ADD KEY copy_id (copy_id),
+  ADD CONSTRAINT issued_books_ibfk_3 FOREIGN KEY (copy_id) REFERENCES book_copies (copy_id) ON DELETE SET NULL ON UPDATE CASCADE;
+
+-- circulation summaries, updated in the issue/return transaction (Reports tab)
+CREATE TABLE book_issue_totals (
+  book_id int(11) NOT NULL,
+  issue_count int(11) NOT NULL DEFAULT 0,
+  last_issued date DEFAULT NULL,
+  PRIMARY KEY (book_id),
+  KEY issue_count (issue_count),
+  CONSTRAINT book_issue_totals_ibfk_1 FOREIGN KEY (book_id) REFERENCES books (book_id) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE book_issue_monthly (
+  month date NOT NULL,
+  book_id int(11) NOT NULL,
+  issue_count int(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (month, book_id),
+  KEY month_issue_count (month, issue_count),
+  KEY book_id (book_id),
+  CONSTRAINT book_issue_monthly_ibfk_1 FOREIGN KEY (book_id) REFERENCES books (book_id) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE book_issue_daily (
+  day date NOT NULL,
+  book_id int(11) NOT NULL,
+  issue_count int(11) NOT NULL DEFAULT 0,
+  return_count int(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, book_id),
+  KEY book_id (book_id),
+  CONSTRAINT book_issue_daily_ibfk_1 FOREIGN KEY (book_id) REFERENCES books (book_id) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE member_issue_monthly (
+  month date NOT NULL,
+  member_id int(11) NOT NULL,
+  issue_count int(11) NOT NULL DEFAULT 0,
+  return_count int(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (month, member_id),
+  KEY member_id (member_id),
+  CONSTRAINT member_issue_monthly_ibfk_1 FOREIGN KEY (member_id) REFERENCES members (member_id) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- change feed (get_changes)
+CREATE TABLE change_log (
+  version bigint(20) NOT NULL AUTO_INCREMENT,
+  entity enum('book','loan','member') NOT NULL,
+  entity_id int(11) DEFAULT NULL,
+  op enum('insert','update','reset') NOT NULL,
+  member_id int(11) DEFAULT NULL,
+  changed_at datetime NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (version),
+  KEY changed_at (changed_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- returned loans moved out of issued_books (archive_loans)
+CREATE TABLE issued_books_archive (
+  issue_id int(11) NOT NULL,
+  book_id int(11) NOT NULL,
+  member_id int(11) NOT NULL,
+  issue_date date NOT NULL,
+  due_date date NOT NULL,
+  return_date date NOT NULL,
+  copy_id int(11) DEFAULT NULL,
+  PRIMARY KEY (issue_id),
+  KEY member_id (member_id, issue_id),
+  KEY book_id (book_id),
+  KEY return_date (return_date),
+  CONSTRAINT issued_books_archive_ibfk_1 FOREIGN KEY (book_id) REFERENCES books (book_id) ON DELETE CASCADE ON UPDATE CASCADE,
+  CONSTRAINT issued_books_archive_ibfk_2 FOREIGN KEY (member_id) REFERENCES members (member_id) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- nightly fines run (fines.py)
+CREATE TABLE fines (
+  issue_id int(11) NOT NULL,
+  member_id int(11) NOT NULL,
+  days_overdue int(11) NOT NULL,
+  amount decimal(10,2) NOT NULL,
+  returned tinyint(1) NOT NULL DEFAULT 0,
+  computed_on date NOT NULL,
+  PRIMARY KEY (issue_id),
+  KEY member_id (member_id, returned)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
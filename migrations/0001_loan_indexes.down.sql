@@ -0,0 +1,2 @@
+DROP INDEX issued_books_open ON issued_books;
+DROP INDEX issued_books_member_open ON issued_books;
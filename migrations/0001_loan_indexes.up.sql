@@ -0,0 +1,6 @@
+-- a member's open loans: get_issued_books_by_member, the Issue/Return tab, API loan checks
+CREATE INDEX issued_books_member_open ON issued_books (member_id, return_date) ALGORITHM=INPLACE LOCK=NONE;
+
+-- loans still out, in member order: overdue notices (iter_overdue_loans) seek straight to
+-- them instead of walking every loan and sorting
+CREATE INDEX issued_books_open ON issued_books (return_date, member_id, due_date) ALGORITHM=INPLACE LOCK=NONE;
@@ -0,0 +1,7 @@
+-- per-deployment knobs that belong with the data, not in a config file on one kiosk:
+-- e.g. password_kdf, the scrypt cost picked by `python manage.py calibrate-kdf`
+CREATE TABLE settings (
+  name varchar(64) NOT NULL PRIMARY KEY,
+  value varchar(255) NOT NULL,
+  updated_at datetime NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
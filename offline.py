@@ -0,0 +1,896 @@
+"""Offline circulation: a desk keeps issuing and returning while the database is down.
+
+OfflineDesk wraps the desk's DatabaseManager (or client.ApiClient) and has
+the methods the GUI uses. Next to it a local SQLite file (LocalStore) holds
+a snapshot of the catalog and of every open loan, plus a journal:
+
+- While the server answers and the journal is empty, calls go to it as
+  before; issues and returns are copied into the snapshot as well.
+- When a call finds the server unreachable (refused, timed out, link
+  dropped, pool exhausted), the desk goes offline. Reads come from the
+  snapshot. An issue or return is checked against the snapshot, applied to
+  it and appended to the journal in one local transaction (fsynced, well
+  under a millisecond) and reported done.
+- A sync thread keeps trying the server. Once it answers, the journal is
+  replayed oldest first, in batches (issue_books / return_books with the
+  day the desk did it, so due dates and fines don't move). A replayed issue
+  that gets no copy (available_copies ran out on the server: another desk
+  lent the last one meanwhile) is a conflict: its local loan is dropped,
+  the book's count is reread from the server and the entry is kept for the
+  librarian (OfflineDesk.conflicts). So is the return of a loan that was
+  already returned, or whose offline issue conflicted. After the replay the
+  snapshot catches up through the change feed (get_changes); it is only
+  reloaded in full when the feed says reset.
+
+Reads and writes keep using the snapshot until the journal is empty, so
+the desk never shows a book as free that it has already handed out. Local
+changes are reported through get_changes too, so ChangeFeed patches the
+tabs the same way online or offline.
+
+A call whose answer got lost (connection dropped mid-commit) may or may not
+have happened on the server. It is applied locally and journalled as
+"sending"; before replaying, the sync thread looks at that member's loans
+on the server and only sends it if it isn't there.
+"""
+import http.client
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import passwords
+from backends import is_disconnect, translate
+from db import DatabaseManager
+from pool import PoolTimeout
+
+log = logging.getLogger("lms.offline")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    book_id INTEGER PRIMARY KEY, title TEXT NOT NULL, author TEXT, publisher TEXT, isbn TEXT,
+    year_published INTEGER, total_copies INTEGER NOT NULL, available_copies INTEGER NOT NULL, created_at TEXT);
+CREATE INDEX IF NOT EXISTS books_title ON books (title);
+CREATE INDEX IF NOT EXISTS books_isbn ON books (isbn);
+CREATE TABLE IF NOT EXISTS loans (
+    issue_id INTEGER PRIMARY KEY, member_id INTEGER NOT NULL, book_id INTEGER NOT NULL,
+    title TEXT, barcode TEXT, issue_date TEXT, due_date TEXT);
+CREATE INDEX IF NOT EXISTS loans_member ON loans (member_id, issue_id);
+CREATE TABLE IF NOT EXISTS journal (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT, op TEXT NOT NULL, book_id INTEGER, member_id INTEGER,
+    issue_id INTEGER, days INTEGER, day TEXT NOT NULL, state TEXT NOT NULL, result INTEGER,
+    detail TEXT, created_at REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS journal_state ON journal (state, seq);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+"""
+BOOK_COLUMNS = ("book_id", "title", "author", "publisher", "isbn", "year_published",
+                "total_copies", "available_copies", "created_at")
+LOAN_COLUMNS = ("issue_id", "member_id", "book_id", "title", "barcode", "issue_date", "due_date")
+SUGGEST_COLUMNS = "book_id, title, author, isbn, available_copies"
+
+
+class DatabaseOffline(ConnectionError):
+    """The server can't be reached and the snapshot can't answer this."""
+
+
+def unreachable(exc):
+    """The call failed because the server (DB or API) couldn't be reached,
+    not because of what it asked."""
+    if isinstance(exc, (OSError, http.client.HTTPException, PoolTimeout)):
+        return True
+    # API server zinda h par database nahi (503) / proxy ke peeche server band
+    if getattr(exc, "status", None) in (502, 503, 504):
+        return True
+    return is_disconnect(exc)
+
+
+def default_path(name):
+    """$LMS_OFFLINE, or ~/.cache/lms/offline-<name>.sqlite3 (name: server or host-database)."""
+    path = os.environ.get("LMS_OFFLINE")
+    if path:
+        return path
+    name = re.sub(r"[^\w.-]+", "_", name).strip("_")
+    return os.path.join(os.path.expanduser("~/.cache/lms"), f"offline-{name}.sqlite3")
+
+
+def _loan(row):
+    loan = dict(row)
+    for name in ("issue_date", "due_date"):
+        if loan.get(name):
+            loan[name] = date.fromisoformat(loan[name])
+    return loan
+
+
+def _day(value):
+    # date/datetime -> wahi text jo JSON (ApiClient) me aata h
+    return value.isoformat() if isinstance(value, date) else value
+
+
+class LocalStore:
+    """A desk's snapshot (books, open loans) and journal in one SQLite file.
+
+    One connection behind a lock; every write is one transaction. The
+    journal is what must survive a crash, so commits are fsynced
+    (synchronous=FULL; in WAL mode that is one fsync of the log).
+    """
+
+    MAX_EVENTS = 5000
+
+    def __init__(self, path):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.executescript(SCHEMA)
+        self.unsynced = self._one("SELECT COUNT(*) FROM journal WHERE state IN ('pending', 'sending')")
+        self.conflict_count = self._one("SELECT COUNT(*) FROM journal WHERE state='conflict'")
+        # local badlav jo get_changes ne abhi GUI ko nahi bataye: (entity, entity_id, member_id)
+        self._events = []
+        self._events_lost = False
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def _all(self, sql, params=()):
+        with self._lock:
+            return [dict(r) for r in self.conn.execute(sql, params)]
+
+    def _one(self, sql, params=()):
+        with self._lock:
+            row = self.conn.execute(sql, params).fetchone()
+        return row[0] if row is not None else None
+
+    def get_meta(self, name, default=None):
+        value = self._one("SELECT value FROM meta WHERE name=?", (name,))
+        return default if value is None else value
+
+    def set_meta(self, name, value):
+        with self.transaction() as c:
+            c.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, str(value)))
+
+    def has_snapshot(self):
+        return self.get_meta("version") is not None
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    # ---- change events for get_changes
+
+    def _event(self, entity, entity_id, member_id=None):
+        # lock ke andar se hi bulaya jaata h
+        if len(self._events) >= self.MAX_EVENTS:
+            # GUI poll nahi kar raha: list aur mat badhao, agli baar poora reload bolo
+            self._events.clear()
+            self._events_lost = True
+        self._events.append((entity, entity_id, member_id))
+
+    def take_events(self):
+        """-> (events, lost): local changes since the last call; lost = too many, reload."""
+        with self._lock:
+            events, lost = self._events, self._events_lost
+            self._events, self._events_lost = [], False
+        return events, lost
+
+    def put_back_events(self, events, lost):
+        with self._lock:
+            self._events[:0] = events
+            self._events_lost = self._events_lost or lost
+
+    # ---- snapshot reads (DatabaseManager signatures)
+
+    def _books(self, sql, params):
+        with self._lock:
+            return [dict(r) for r in self.conn.execute(translate(sql), params)]
+
+    def get_all_books(self, after_id=None, limit=None, sort_key="book_id", descending=False):
+        return self._books(*DatabaseManager._books_query(after_id=after_id, limit=limit, sort_key=sort_key,
+                                                         descending=descending))
+
+    def search_books(self, keyword, after_id=None, limit=None, sort_key="book_id", descending=False):
+        return self._books(*DatabaseManager._books_query(keyword=keyword, after_id=after_id, limit=limit,
+                                                         sort_key=sort_key, descending=descending))
+
+    def get_available_books(self, after_id=None, limit=None, sort_key="book_id", descending=False):
+        return self._books(*DatabaseManager._books_query(available_only=True, after_id=after_id, limit=limit,
+                                                         sort_key=sort_key, descending=descending))
+
+    def suggest_available_books(self, prefix, limit=20):
+        prefix = prefix.strip()
+        pattern = re.sub(r"([!%_])", r"!\1", prefix) + "%"
+        rows = self._all(f"""
+            SELECT {SUGGEST_COLUMNS} FROM books
+            WHERE title LIKE ? ESCAPE '!' AND available_copies > 0
+            ORDER BY title, book_id LIMIT ?""", (pattern, limit))
+        digits = re.sub(r"[\s-]", "", prefix)
+        if digits and re.fullmatch(r"\d+[Xx]?", digits):
+            number = int(digits.rstrip("Xx") or 0)
+            by_number = self._all(f"""
+                SELECT {SUGGEST_COLUMNS} FROM books
+                WHERE (book_id = ? OR isbn LIKE ?) AND available_copies > 0
+                ORDER BY book_id = ? DESC, isbn LIMIT ?""", (number, digits + "%", number, limit))
+            seen = {r["book_id"] for r in by_number}
+            rows = by_number + [r for r in rows if r["book_id"] not in seen]
+        return rows[:limit]
+
+    def search_books_ranked(self, query, limit=50):
+        # FULLTEXT yaha nahi: DatabaseManager._search_books_like jaisa LIKE
+        words = re.findall(r"\w+", query)
+        if not words:
+            return []
+        isbn = re.sub(r"[\s-]", "", query)
+        where = " AND ".join(["(title LIKE ? OR author LIKE ? OR publisher LIKE ?)"] * len(words))
+        params = [f"%{words[0]}%", f"{words[0]}%"] + [p for w in words for p in [f"%{w}%"] * 3]
+        return self._all(f"""
+            SELECT *, (title LIKE ?) + 0.5 * (title LIKE ?) AS relevance FROM books
+            WHERE ({where}) OR isbn = ?
+            ORDER BY isbn = ? DESC, relevance DESC, book_id LIMIT ?""", params + [isbn, isbn, limit])
+
+    def get_books_by_ids(self, book_ids):
+        if not book_ids:
+            return []
+        return self._all(f"SELECT * FROM books WHERE book_id IN ({', '.join('?' * len(book_ids))})",
+                         list(book_ids))
+
+    def get_issued_books_by_member(self, member_id, after_id=None, limit=None, descending=False):
+        op, direction = ("<", "DESC") if descending else (">", "ASC")
+        sql = "SELECT issue_id, book_id, title, barcode, issue_date, due_date FROM loans WHERE member_id=?"
+        params = [member_id]
+        if after_id is not None:
+            sql += f" AND issue_id {op} ?"
+            params.append(after_id)
+        sql += f" ORDER BY issue_id {direction}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [_loan(r) for r in self._all(sql, params)]
+
+    # ---- optimistic writes (journalled)
+
+    def issue(self, member_id, book_ids, days=14, state="pending"):
+        """Lend from the snapshot and journal it -> issue_books style results;
+        an offline loan's issue_id is -seq until the server gives it one."""
+        today = date.today()
+        due = today + timedelta(days=days)
+        results = []
+        with self.transaction() as c:
+            for book_id in book_ids:
+                book = c.execute("SELECT title, available_copies FROM books WHERE book_id=?", (book_id,)).fetchone()
+                if book is None or book["available_copies"] <= 0:
+                    results.append({"book_id": book_id, "issue_id": None, "ok": False})
+                    continue
+                seq = c.execute("""
+                    INSERT INTO journal (op, book_id, member_id, days, day, state, created_at)
+                    VALUES ('issue', ?, ?, ?, ?, ?, ?)""",
+                                (book_id, member_id, days, today.isoformat(), state, time.time())).lastrowid
+                c.execute("UPDATE books SET available_copies = available_copies - 1 WHERE book_id=?", (book_id,))
+                c.execute("INSERT INTO loans VALUES (?, ?, ?, ?, NULL, ?, ?)",
+                          (-seq, member_id, book_id, book["title"], today.isoformat(), due.isoformat()))
+                self.unsynced += 1
+                self._event("book", book_id)
+                self._event("loan", -seq, member_id)
+                results.append({"book_id": book_id, "issue_id": -seq, "ok": True, "queued": True})
+        return results
+
+    def return_loans(self, issue_ids, state="pending"):
+        today = date.today().isoformat()
+        results = []
+        with self.transaction() as c:
+            for issue_id in issue_ids:
+                current = self._current_id(c, issue_id)
+                loan = c.execute("SELECT member_id, book_id FROM loans WHERE issue_id=?", (current,)).fetchone()
+                if loan is None:
+                    results.append({"issue_id": issue_id, "ok": False})
+                    continue
+                c.execute("DELETE FROM loans WHERE issue_id=?", (current,))
+                c.execute("""
+                    UPDATE books SET available_copies = MIN(total_copies, available_copies + 1)
+                    WHERE book_id=?""", (loan["book_id"],))
+                c.execute("""
+                    INSERT INTO journal (op, book_id, member_id, issue_id, day, state, created_at)
+                    VALUES ('return', ?, ?, ?, ?, ?, ?)""",
+                          (loan["book_id"], loan["member_id"], current, today, state, time.time()))
+                self.unsynced += 1
+                self._event("book", loan["book_id"])
+                self._event("loan", current, loan["member_id"])
+                results.append({"issue_id": issue_id, "ok": True, "queued": True})
+        return results
+
+    @staticmethod
+    def _current_id(c, issue_id):
+        # offline loan (-seq) jo sync ho chuka: ab server wala issue_id
+        if issue_id >= 0:
+            return issue_id
+        row = c.execute("SELECT state, result FROM journal WHERE seq=?", (-issue_id,)).fetchone()
+        return row["result"] if row is not None and row["state"] == "done" else issue_id
+
+    def mirror_issued(self, results, member_id, book_ids, days=14):
+        """Copy issue_books results the server gave into the snapshot."""
+        today = date.today()
+        due = (today + timedelta(days=days)).isoformat()
+        with self.transaction() as c:
+            for r in results:
+                if not r["ok"]:
+                    continue
+                c.execute("""
+                    INSERT OR REPLACE INTO loans
+                    SELECT ?, ?, book_id, title, NULL, ?, ? FROM books WHERE book_id=?""",
+                          (r["issue_id"], member_id, today.isoformat(), due, r["book_id"]))
+                c.execute("UPDATE books SET available_copies = MAX(0, available_copies - 1) WHERE book_id=?",
+                          (r["book_id"],))
+
+    def mirror_returned(self, results, issue_ids):
+        with self.transaction() as c:
+            for r in results:
+                if not r["ok"]:
+                    continue
+                loan = c.execute("SELECT book_id FROM loans WHERE issue_id=?", (r["issue_id"],)).fetchone()
+                if loan is None:
+                    continue
+                c.execute("DELETE FROM loans WHERE issue_id=?", (r["issue_id"],))
+                c.execute("""
+                    UPDATE books SET available_copies = MIN(total_copies, available_copies + 1)
+                    WHERE book_id=?""", (loan["book_id"],))
+
+    # ---- sync side
+
+    def pending(self, limit):
+        return self._all("SELECT * FROM journal WHERE state='pending' ORDER BY seq LIMIT ?", (limit,))
+
+    def in_doubt(self):
+        return self._all("SELECT * FROM journal WHERE state='sending' ORDER BY seq")
+
+    def mark(self, seqs, state):
+        with self.transaction() as c:
+            c.executemany("UPDATE journal SET state=? WHERE seq=?", [(state, s) for s in seqs])
+
+    def server_issue_id(self, issue_id):
+        """Server issue_id of a journalled return's loan: None if its offline issue was
+        refused, still negative if that issue isn't synced yet."""
+        with self._lock:
+            current = self._current_id(self.conn, issue_id)
+            if current < 0:
+                state = self._one("SELECT state FROM journal WHERE seq=?", (-current,))
+                return None if state == "conflict" else current
+        return current
+
+    def issued_ids(self, member_id):
+        # server ke woh loans jo is desk ke journal se bane
+        return {r["result"] for r in self._all(
+            "SELECT result FROM journal WHERE op='issue' AND member_id=? AND state='done'", (member_id,))}
+
+    def settle(self, done=(), refused=()):
+        """Close journal entries in one transaction: done = [(entry, server issue_id or None)],
+        refused = [(entry, why)] (conflicts)."""
+        with self.transaction() as c:
+            for entry, issue_id in done:
+                c.execute("UPDATE journal SET state='done', result=? WHERE seq=?", (issue_id, entry["seq"]))
+                if entry["op"] == "issue":
+                    # server ka loan catch-up se pehle aa chuka ho to local wala hi rakho
+                    c.execute("DELETE FROM loans WHERE issue_id=? AND ? IN (SELECT issue_id FROM loans)",
+                              (issue_id, -entry["seq"]))
+                    c.execute("UPDATE loans SET issue_id=? WHERE issue_id=?", (issue_id, -entry["seq"]))
+                    self._event("loan", issue_id, entry["member_id"])
+            for entry, detail in refused:
+                c.execute("UPDATE journal SET state='conflict', detail=? WHERE seq=?", (detail, entry["seq"]))
+                if entry["op"] == "issue":
+                    c.execute("DELETE FROM loans WHERE issue_id=?", (-entry["seq"],))
+                    self._event("loan", -entry["seq"], entry["member_id"])
+            self.unsynced -= len(done) + len(refused)
+            self.conflict_count += len(refused)
+
+    def conflicts(self, after_seq=0):
+        return self._all("""
+            SELECT j.seq, j.op, j.book_id, b.title, j.member_id, j.issue_id, j.day, j.detail
+            FROM journal j LEFT JOIN books b ON b.book_id = j.book_id
+            WHERE j.state='conflict' AND j.seq > ? ORDER BY j.seq""", (after_seq,))
+
+    def _pending_deltas(self, c):
+        # journal me baaki issues/returns: server ki rows par dobara lagte h, warna desk ki
+        # di hui book refresh ke baad phir free dikhti
+        return dict(c.execute("""
+            SELECT book_id, SUM(CASE op WHEN 'issue' THEN -1 ELSE 1 END) FROM journal
+            WHERE state IN ('pending', 'sending') GROUP BY book_id"""))
+
+    def _unsynced_returns(self, c):
+        return {r[0] for r in c.execute(
+            "SELECT issue_id FROM journal WHERE op='return' AND state IN ('pending', 'sending')")}
+
+    def _put_books(self, c, rows):
+        deltas = self._pending_deltas(c)
+        values = []
+        for r in rows:
+            row = [_day(r[name]) if name in r else None for name in BOOK_COLUMNS]
+            row[7] = max(0, min(row[6], row[7] + deltas.get(row[0], 0)))
+            values.append(row)
+        c.executemany("INSERT OR REPLACE INTO books VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", values)
+
+    def _put_loans(self, c, rows):
+        skip = self._unsynced_returns(c)
+        c.executemany("INSERT OR REPLACE INTO loans VALUES (?, ?, ?, ?, ?, ?, ?)",
+                      [[_day(r[name]) for name in LOAN_COLUMNS] for r in rows if r["issue_id"] not in skip])
+
+    def put_books(self, rows):
+        """Fresh book rows from the server (journalled changes applied on top)."""
+        with self.transaction() as c:
+            self._put_books(c, rows)
+            for r in rows:
+                self._event("book", r["book_id"])
+
+    def put_member_loans(self, member_id, rows):
+        """A member's open loans from the server; their offline loans stay."""
+        with self.transaction() as c:
+            c.execute("DELETE FROM loans WHERE member_id=? AND issue_id > 0", (member_id,))
+            self._put_loans(c, [dict(r, member_id=member_id) for r in rows])
+            self._event("loan", None, member_id)
+
+    def reload(self, books, loans, version):
+        """Replace the whole snapshot (offline loans stay)."""
+        with self.transaction() as c:
+            c.execute("DELETE FROM books")
+            self._put_books(c, books)
+            c.execute("DELETE FROM loans WHERE issue_id > 0")
+            self._put_loans(c, loans)
+            c.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('version', ?)", (str(version),))
+            c.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('reloaded_at', ?)", (str(time.time()),))
+            self._events.clear()
+            self._events_lost = True
+
+    def prune(self, keep_days=30):
+        # sync ho chuki entries kuch din (GUI ke purane -seq ids ke liye), conflicts bhi
+        with self.transaction() as c:
+            c.execute("DELETE FROM journal WHERE state IN ('done', 'conflict') AND created_at < ?",
+                      (time.time() - keep_days * 86400,))
+            self.conflict_count = c.execute("SELECT COUNT(*) FROM journal WHERE state='conflict'").fetchone()[0]
+
+
+class OfflineDesk:
+    """DatabaseManager / ApiClient stand-in that keeps working offline (see module doc)."""
+
+    BATCH = 100            # journal entries per replay round (server ka MAX_STACK)
+    PAGE = 5000            # full reload page size (server.py ka MAX_PAGE se zyada nahi)
+    SYNC_INTERVAL = 5.0    # online: itni der me journal/catch-up
+    RETRY_INTERVAL = 3.0   # offline: itni der me server ko phir try
+    GAP_GRACE = 10.0       # change_log ka gap itni der na bhare to rollback tha (feed.ChangeFeed jaisa)
+
+    def __init__(self, online, path, start=True):
+        self.online = online
+        self.store = LocalStore(path)
+        self.is_online = True      # pehli call/sync batayegi
+        self.last_error = None
+        self.last_sync = None
+        self._credentials = None   # relogin ke liye, sirf memory me
+        self._gap_since = None
+        self._sync_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        # API server ka search index / recommendations: stand-in is desk se hokar jaayein
+        if getattr(online, "catalog_search", None) is not None:
+            from client import RemoteCatalogSearch, RemoteRecommender
+            self.catalog_search = RemoteCatalogSearch(self)
+            self.recommender = RemoteRecommender(self)
+        if start:
+            self.start()
+
+    def __getattr__(self, name):
+        # baaki sab (reports, stats, metrics, ...) seedha server se; offline ho to turant error
+        value = getattr(self.online, name)
+        if name.startswith("_") or not callable(value):
+            return value
+
+        def call(*args, **kwargs):
+            if not self.is_online:
+                raise DatabaseOffline(f"{name} needs the server, which is unreachable")
+            return self._online(name, *args, **kwargs)
+        return call
+
+    # ---- routing
+
+    def _local_mode(self):
+        # journal khaali hone tak snapshot hi sach h, online hote hue bhi
+        return not self.is_online or self.store.unsynced > 0
+
+    def _set_online(self, online, error=None):
+        if online != self.is_online:
+            log.warning("server %s%s", "reachable again" if online else "unreachable: ", error or "")
+        self.is_online = online
+        self.last_error = None if online else str(error)
+
+    def _online(self, name, *args, **kwargs):
+        try:
+            try:
+                result = getattr(self.online, name)(*args, **kwargs)
+                if not self.is_online:
+                    # offline me server ko sirf sync thread bulata h: jawab aaya matlab wapas aa gaya
+                    self._set_online(True)
+                return result
+            except Exception as e:
+                # API server restart par sessions gaye: wahi user dobara login, ek baar
+                if getattr(e, "status", None) == 401 and self._credentials and name != "validate_login":
+                    self.online.validate_login(*self._credentials)
+                    return getattr(self.online, name)(*args, **kwargs)
+                raise
+        except Exception as e:
+            if unreachable(e):
+                self._set_online(False, e)
+                self._wake.set()
+            raise
+
+    def _read(self, name, *args, **kwargs):
+        if not self._local_mode():
+            try:
+                return self._online(name, *args, **kwargs)
+            except Exception as e:
+                if not unreachable(e):
+                    raise
+        return getattr(self.store, name)(*args, **kwargs)
+
+    def _write(self, name, local, mirror, *args, **kwargs):
+        if not self._local_mode():
+            try:
+                result = self._online(name, *args, **kwargs)
+            except Exception as e:
+                if not unreachable(e):
+                    raise
+                # jawab kho gaya: server par hua ya nahi, sync thread member ke loans dekh ke tay karega
+                return local(*args, state="sending", **kwargs)
+            mirror(result, *args, **kwargs)
+            return result
+        result = local(*args, **kwargs)
+        self._wake.set()
+        return result
+
+    # ---- DatabaseManager API
+
+    def validate_login(self, username, plain_password):
+        if self.is_online:
+            try:
+                user = self._online("validate_login", username, plain_password)
+            except Exception as e:
+                if not unreachable(e):
+                    raise
+            else:
+                if user:
+                    self._remember_login(username, plain_password, user)
+                return user
+        return self._offline_login(username, plain_password)
+
+    def _remember_login(self, username, plain_password, user):
+        # offline login ke liye is desk par: user info + password ka scrypt hash
+        self._credentials = (username, plain_password)
+        cached = self.store.get_meta("login:" + username)
+        cached = json.loads(cached) if cached else None
+        stored = self._stored_hash(username)
+        if stored is not None:
+            # seedha DB: validate_login ne abhi yahi hash verify kiya, dobara KDF nahi chalana
+            if cached != {"user": user, "hash": stored}:
+                self.store.set_meta("login:" + username, json.dumps({"user": user, "hash": stored}))
+            return
+        # API server hash nahi deta: apna banana padta h, par login ke raaste me nahi (woh ek
+        # KDF pehle hi server par chala chuka). pehle se sahi hash ho to sirf verify
+        threading.Thread(target=self._cache_verifier, args=(username, plain_password, user, cached),
+                         name="lms-offline-login", daemon=True).start()
+
+    def _stored_hash(self, username):
+        fetch = getattr(self.online, "_fetch_all", None)
+        if fetch is None:
+            return None
+        try:
+            rows = fetch("SELECT password_hash FROM users WHERE username=%s;", (username,))
+        except Exception:
+            return None
+        stored = rows[0]["password_hash"] if rows else None
+        # purana bina salt ka SHA-256 disk par nahi rakhte
+        return stored if stored and stored.startswith(passwords.SCHEME + "$") else None
+
+    def _cache_verifier(self, username, plain_password, user, cached):
+        hasher = passwords.PasswordHasher()
+        try:
+            if cached is not None and hasher.verify(plain_password, cached["hash"]) == (True, False):
+                if cached["user"] != user:
+                    self.store.set_meta("login:" + username, json.dumps(dict(cached, user=user)))
+                return
+            entry = {"user": user, "hash": hasher.hash(plain_password)}
+            self.store.set_meta("login:" + username, json.dumps(entry))
+        except Exception:
+            # desk band ho gayi (store closed): agli login par phir
+            log.warning("could not cache the login of %s for offline use", username, exc_info=True)
+
+    def _offline_login(self, username, plain_password):
+        entry = self.store.get_meta("login:" + username)
+        if entry is None:
+            raise DatabaseOffline("the server is unreachable and this user has not logged in at this desk before")
+        entry = json.loads(entry)
+        ok, _ = passwords.PasswordHasher().verify(plain_password, entry["hash"])
+        if not ok:
+            return None
+        self._credentials = (username, plain_password)
+        return entry["user"]
+
+    def get_all_books(self, after_id=None, limit=None, sort_key="book_id", descending=False):
+        return self._read("get_all_books", after_id=after_id, limit=limit, sort_key=sort_key, descending=descending)
+
+    def search_books(self, keyword, after_id=None, limit=None, sort_key="book_id", descending=False):
+        return self._read("search_books", keyword, after_id=after_id, limit=limit, sort_key=sort_key,
+                          descending=descending)
+
+    def get_available_books(self, after_id=None, limit=None, sort_key="book_id", descending=False):
+        return self._read("get_available_books", after_id=after_id, limit=limit, sort_key=sort_key,
+                          descending=descending)
+
+    def suggest_available_books(self, prefix, limit=20):
+        return self._read("suggest_available_books", prefix, limit=limit)
+
+    def search_books_ranked(self, query, limit=50):
+        return self._read("search_books_ranked", query, limit=limit)
+
+    def get_books_by_ids(self, book_ids):
+        return self._read("get_books_by_ids", book_ids)
+
+    def get_issued_books_by_member(self, member_id, after_id=None, limit=None, descending=False):
+        return self._read("get_issued_books_by_member", member_id, after_id=after_id, limit=limit,
+                          descending=descending)
+
+    def issue_books(self, member_id, book_ids, days=14):
+        return self._write("issue_books", self.store.issue, self.store.mirror_issued, member_id, list(book_ids),
+                           days=days)
+
+    def return_books(self, issue_ids):
+        return self._write("return_books", self.store.return_loans, self.store.mirror_returned, list(issue_ids))
+
+    def issue_book(self, book_id, member_id, days=14) -> bool:
+        return self.issue_books(member_id, [book_id], days=days)[0]["ok"]
+
+    def return_book(self, issue_id) -> bool:
+        return self.return_books([issue_id])[0]["ok"]
+
+    def get_changes(self, since=None, limit=1000):
+        events, lost = self.store.take_events()
+        if self._local_mode():
+            version = since if since is not None else int(self.store.get_meta("version", 0))
+            feed = {"changes": [], "version": version, "latest": version, "reset": since is None,
+                    "more": False}
+        else:
+            try:
+                feed = self._online("get_changes", since, limit=limit)
+            except Exception:
+                self.store.put_back_events(events, lost)
+                raise
+        # version 0: ChangeFeed inhe apne version hisaab me nahi ginta, bas rows patch karta h
+        feed["changes"] = feed["changes"] + [
+            {"version": 0, "entity": entity, "entity_id": entity_id, "op": "update", "member_id": member_id}
+            for entity, entity_id, member_id in events]
+        feed["reset"] = feed["reset"] or lost
+        return feed
+
+    def stats(self):
+        """The wrapped manager's stats() plus an "offline" section. A DatabaseManager's are
+        in-process counters (read even offline); an ApiClient's come from the server and are
+        left out while it is unreachable."""
+        if hasattr(self.online, "pool"):
+            stats = self.online.stats()
+        elif self.is_online:
+            try:
+                stats = self._online("stats")
+            except Exception as e:
+                if not unreachable(e):
+                    raise
+                stats = {}
+        else:
+            stats = {}
+        status = self.status()
+        stats["offline"] = {"online": status["online"], "pending": status["pending"],
+                            "conflicts": status["conflicts"]}
+        return stats
+
+    def status(self):
+        """{online, pending, conflicts, last_sync, error} for the status bar; no I/O."""
+        return {"online": self.is_online, "pending": self.store.unsynced,
+                "conflicts": self.store.conflict_count, "last_sync": self.last_sync, "error": self.last_error}
+
+    def conflicts(self, after_seq=0):
+        """Journal entries the server refused, oldest first (see module doc)."""
+        return self.store.conflicts(after_seq)
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.store.close()
+        self.online.close()
+
+    # ---- sync thread
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="lms-offline-sync", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        self.store.prune()
+        while not self._stop.is_set():
+            try:
+                self.sync()
+            except Exception as e:
+                # 401: API server par abhi koi login nahi hua, login ke baad sync hoga
+                if not unreachable(e) and getattr(e, "status", None) != 401:
+                    log.exception("offline sync failed")
+            self._wake.wait(self.SYNC_INTERVAL if self.is_online else self.RETRY_INTERVAL)
+            self._wake.clear()
+
+    def sync(self):
+        """Replay the journal and catch the snapshot up; raises if the server is unreachable."""
+        with self._sync_lock:
+            self._resolve_in_doubt()
+            while True:
+                batch = self.store.pending(self.BATCH)
+                if not batch:
+                    break
+                self._replay(batch)
+            self._catch_up()
+            self.last_sync = time.time()
+
+    def _resolve_in_doubt(self):
+        entries = self.store.in_doubt()
+        if not entries:
+            return
+        cache = getattr(self.online, "cache", None)
+        if cache is not None:
+            cache.invalidate("loans")
+        loans = {}
+        for e in entries:
+            if e["member_id"] not in loans:
+                loans[e["member_id"]] = self._online("get_issued_books_by_member", e["member_id"])
+            open_loans = loans[e["member_id"]]
+            if e["op"] == "issue":
+                known = self.store.issued_ids(e["member_id"])
+                day = date.fromisoformat(e["day"])
+                match = [l["issue_id"] for l in open_loans if l["book_id"] == e["book_id"]
+                         and _day(l["issue_date"]) >= day.isoformat() and l["issue_id"] not in known]
+                if match:
+                    self.store.settle(done=[(e, match[0])])
+                else:
+                    self.store.mark([e["seq"]], "pending")
+            else:
+                issue_id = self.store.server_issue_id(e["issue_id"])
+                if issue_id is None:
+                    self.store.settle(refused=[(e, "its offline issue was refused by the server")])
+                elif issue_id < 0 or any(l["issue_id"] == issue_id for l in open_loans):
+                    self.store.mark([e["seq"]], "pending")
+                else:
+                    self.store.settle(done=[(e, None)])
+        self._refresh_books({e["book_id"] for e in entries})
+
+    def _replay(self, batch):
+        # returns ke beech ke issues: har member (wahi din/muddat) ka ek call; lagataar returns ek
+        # call. issue aur return ka aapas me kram nahi badalta (return ki copy baad me di ja sakti h)
+        runs, issue_runs = [], {}
+        for e in batch:
+            if e["op"] == "issue":
+                key = (e["member_id"], e["days"], e["day"])
+                if key not in issue_runs:
+                    issue_runs[key] = []
+                    runs.append(issue_runs[key])
+                issue_runs[key].append(e)
+                continue
+            issue_runs = {}
+            if runs and runs[-1][0]["op"] == "return" and runs[-1][0]["day"] == e["day"]:
+                runs[-1].append(e)
+            else:
+                runs.append([e])
+        self.store.mark([e["seq"] for e in batch], "sending")
+        for run in runs:
+            day = date.fromisoformat(run[0]["day"])
+            done, refused = [], []
+            if run[0]["op"] == "issue":
+                results = self._online("issue_books", run[0]["member_id"], [e["book_id"] for e in run],
+                                       days=run[0]["days"], on=day)
+                for e, r in zip(run, results):
+                    if r["ok"]:
+                        done.append((e, r["issue_id"]))
+                    else:
+                        refused.append((e, "no free copy left on the server (available_copies ran out)"))
+            else:
+                sendable = []
+                for e in run:
+                    issue_id = self.store.server_issue_id(e["issue_id"])
+                    if issue_id is None:
+                        refused.append((e, "its offline issue was refused by the server"))
+                    elif issue_id > 0:
+                        sendable.append((e, issue_id))
+                    # issue abhi sync nahi hua: "sending" me rehta h, agli baar in-doubt pass dekhega
+                if sendable:
+                    results = self._online("return_books", [i for _, i in sendable], on=day)
+                    for (e, _), r in zip(sendable, results):
+                        if r["ok"]:
+                            done.append((e, None))
+                        else:
+                            refused.append((e, "the loan was already returned on the server"))
+            self.store.settle(done, refused)
+        self._refresh_books({e["book_id"] for e in batch})
+
+    def _refresh_books(self, book_ids):
+        book_ids = sorted(b for b in book_ids if b is not None)
+        for i in range(0, len(book_ids), 500):
+            self.store.put_books(self._online("get_books_by_ids", book_ids[i:i + 500]))
+
+    def _catch_up(self):
+        version = self.store.get_meta("version")
+        if version is None:
+            self._reload()
+            return
+        version = int(version)
+        while True:
+            feed = self._online("get_changes", version, limit=1000)
+            if feed["reset"]:
+                self._reload()
+                return
+            books = {c["entity_id"] for c in feed["changes"] if c["entity"] == "book"}
+            members = {c["member_id"] for c in feed["changes"] if c["entity"] == "loan" and c["member_id"]}
+            self._refresh_books(books)
+            for member_id in sorted(members):
+                self.store.put_member_loans(member_id, self._online("get_issued_books_by_member", member_id))
+            reached = feed["version"]
+            if feed["latest"] > reached:
+                # beech me gap: chalti transaction (baad me bharega) ya rollback/AUTO_INCREMENT
+                # ka chheda (kabhi nahi bharega). grace ke baad aage, warna snapshot yahi atka rahe
+                if self._gap_since is None:
+                    self._gap_since = time.monotonic()
+                elif time.monotonic() - self._gap_since > self.GAP_GRACE:
+                    reached = feed["latest"]
+                    self._gap_since = None
+            else:
+                self._gap_since = None
+            self.store.set_meta("version", reached)
+            if not feed["more"] or reached == version:
+                return
+            version = reached
+
+    def _reload(self):
+        # reset wala version pehle: reload ke beech ke badlav agla catch-up dobara le aata h
+        version = self._online("get_changes", None)["version"]
+        books = self._pages("get_all_books", "book_id")
+        try:
+            loans = self._pages("get_open_loans", "issue_id")
+        except Exception as e:
+            if getattr(e, "status", None) != 403:
+                raise
+            # member ka kiosk: sirf apne loans
+            member_id = self._member_id()
+            loans = [dict(l, member_id=member_id) for l in
+                     self._online("get_issued_books_by_member", member_id)] if member_id else []
+        self.store.reload(books, loans, version)
+        self._gap_since = None
+        log.info("offline snapshot reloaded: %d books, %d open loans", len(books), len(loans))
+
+    def _member_id(self):
+        if self._credentials is None:
+            return None
+        entry = self.store.get_meta("login:" + self._credentials[0])
+        return json.loads(entry)["user"].get("member_id") if entry else None
+
+    def _pages(self, name, key):
+        rows, after = [], None
+        while True:
+            page = self._online(name, after_id=after, limit=self.PAGE)
+            rows.extend(dict(r) for r in page)
+            if len(page) < self.PAGE:
+                return rows
+            after = page[-1][key]
@@ -0,0 +1,129 @@
+"""Password hashing: salted scrypt in a versioned format.
+
+Stored hashes look like
+
+    scrypt$ln=15,r=8,p=1$<salt>$<key>      (salt and key base64, no padding)
+
+so the cost travels with each hash: raising it later only affects new
+hashes, and older ones are re-hashed on the next successful login. The
+unsalted SHA-256 hex digests written by earlier versions are still
+accepted and upgraded the same way.
+
+The cost is picked per deployment with `python manage.py calibrate-kdf
+--target-ms 250`, which times scrypt on that machine and stores the
+parameters in the `settings` table. Hashing runs on a small thread pool
+(hashlib.scrypt releases the GIL), one worker per core, so many logins at
+once queue up instead of each taking 16+ MB of RAM and a core.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import re
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEME = "scrypt"
+SETTING = "password_kdf"
+_LEGACY = re.compile(r"^[0-9a-f]{64}$")
+_FORMAT = re.compile(r"^scrypt\$ln=(\d+),r=(\d+),p=(\d+)\$([A-Za-z0-9+/]+)\$([A-Za-z0-9+/]+)$")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="lms-kdf")
+        return _executor
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _unb64(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def legacy_hash(plain):
+    # purana format: bina salt ka SHA-256. sirf pehchan/upgrade ke liye (aur datagen ke liye, jo
+    # laakhon users banata h), naye passwords ke liye nahi
+    return hashlib.sha256(plain.encode("utf-8")).hexdigest()
+
+
+class PasswordHasher:
+    """scrypt with cost N = 2**ln, block size r, parallelism p."""
+
+    SALT_BYTES = 16
+    KEY_BYTES = 32
+
+    def __init__(self, ln=14, r=8, p=1):
+        self.ln = ln
+        self.r = r
+        self.p = p
+        self._dummy = None
+
+    @property
+    def params(self):
+        return f"ln={self.ln},r={self.r},p={self.p}"
+
+    @classmethod
+    def from_params(cls, params):
+        """'ln=15,r=8,p=1' (as stored in settings) -> PasswordHasher."""
+        values = dict(part.split("=", 1) for part in params.split(","))
+        return cls(int(values["ln"]), int(values["r"]), int(values["p"]))
+
+    def _derive(self, plain, salt, ln, r, p):
+        # maxmem: scrypt ko ~128*r*N bytes chahiye, default 32 MB se bade cost par zaroori
+        return hashlib.scrypt(plain.encode("utf-8"), salt=salt, n=1 << ln, r=r, p=p,
+                              maxmem=256 * r * (1 << ln) + (1 << 20), dklen=self.KEY_BYTES)
+
+    def hash(self, plain):
+        salt = secrets.token_bytes(self.SALT_BYTES)
+        key = _pool().submit(self._derive, plain, salt, self.ln, self.r, self.p).result()
+        return f"{SCHEME}${self.params}${_b64(salt)}${_b64(key)}"
+
+    def verify(self, plain, stored):
+        """-> (matches, needs_rehash). needs_rehash: legacy hash or other parameters than now."""
+        stored = stored or ""
+        if _LEGACY.match(stored):
+            return hmac.compare_digest(legacy_hash(plain), stored), True
+        m = _FORMAT.match(stored)
+        if not m:
+            return False, False
+        ln, r, p = (int(g) for g in m.group(1, 2, 3))
+        key = _pool().submit(self._derive, plain, _unb64(m.group(4)), ln, r, p).result()
+        ok = hmac.compare_digest(key, _unb64(m.group(5)))
+        return ok, ok and (ln, r, p) != (self.ln, self.r, self.p)
+
+    def dummy_verify(self, plain):
+        # anjaan username par bhi utna hi samay lage, warna timing se pata chalta h kaun user h
+        if self._dummy is None:
+            self._dummy = self.hash(secrets.token_hex(8))
+        self.verify(plain, self._dummy)
+
+    def time_hash(self, rounds=3):
+        """Median seconds per hash at these parameters (run on the calling thread)."""
+        salt = secrets.token_bytes(self.SALT_BYTES)
+        times = []
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            self._derive("calibration", salt, self.ln, self.r, self.p)
+            times.append(time.perf_counter() - t0)
+        return sorted(times)[len(times) // 2]
+
+    @classmethod
+    def calibrate(cls, target_ms=250, r=8, p=1, min_ln=12, max_ln=22):
+        """Largest cost whose hash takes at most target_ms on this machine (at least min_ln)."""
+        best = cls(min_ln, r, p)
+        for ln in range(min_ln, max_ln + 1):
+            hasher = cls(ln, r, p)
+            if hasher.time_hash() * 1000 > target_ms:
+                break
+            best = hasher
+        return best
@@ -0,0 +1,163 @@
+"""Typeahead book picker for the Issue tab.
+
+Instead of loading every available book into a combo box, the picker asks
+DatabaseManager.suggest_available_books (or the API server) for a few
+dozen matches while the user types: title prefix, ISBN prefix or book_id.
+Requests are debounced and recent prefixes are cached; when a shorter
+prefix already returned every match, a longer one is filtered from it
+locally without asking again.
+"""
+import re
+from collections import OrderedDict
+
+from PyQt5.QtCore import QModelIndex, Qt, QTimer, pyqtSignal
+from PyQt5.QtGui import QStandardItem, QStandardItemModel
+from PyQt5.QtWidgets import QCompleter, QLineEdit
+
+
+def _number(prefix):
+    digits = re.sub(r"[\s-]", "", prefix)
+    return digits if re.fullmatch(r"\d+[Xx]?", digits) else None
+
+
+def matches(book, prefix):
+    """Same rule as suggest_available_books, for filtering cached rows."""
+    if (book["title"] or "").lower().startswith(prefix):
+        return True
+    digits = _number(prefix)
+    if digits is None:
+        return False
+    return (str(book["book_id"]) == digits.rstrip("Xx")
+            or (book["isbn"] or "").lower().startswith(digits.lower()))
+
+
+class BookPicker(QLineEdit):
+    bookChosen = pyqtSignal(object)   # chuni hui book (dict), None jab text badal gaya
+
+    DELAY_MS = 200
+    LIMIT = 30
+    CACHE_SIZE = 64
+    KEY = "book-picker"
+
+    def __init__(self, db_manager, runner, parent=None):
+        super().__init__(parent)
+        self.db = db_manager
+        self.runner = runner
+        self.book = None
+        self._rows = []               # popup me abhi dikh rahi books
+        self._cache = OrderedDict()   # prefix (lowercase) -> rows, LRU
+        self.setPlaceholderText("Type a title, ISBN or book ID")
+        self.setClearButtonEnabled(True)
+
+        self._model = QStandardItemModel(self)
+        self.completer = QCompleter(self._model, self)
+        # filtering server karta h, completer sirf popup dikhata h
+        self.completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.completer.setMaxVisibleItems(12)
+        self.completer.setWidget(self)
+        self.completer.activated[QModelIndex].connect(self._chosen)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.DELAY_MS)
+        self.timer.timeout.connect(self.refresh)
+        self.textEdited.connect(self._edited)
+
+    @staticmethod
+    def book_text(b):
+        return f"{b['book_id']}: {b['title']} (Available: {b['available_copies']})"
+
+    def _prefix(self):
+        return self.text().strip().lower()
+
+    def _edited(self, _text):
+        if self.book is not None:
+            self.book = None
+            self.bookChosen.emit(None)
+        rows = self._local(self._prefix())
+        if rows is not None:
+            self.timer.stop()
+            self._show(rows)
+        else:
+            self.timer.start()
+
+    def _local(self, prefix):
+        # pehle se pata ho to query nahi: khaali text, same prefix, ya chhote prefix ka poora result
+        if not prefix:
+            return []
+        if prefix in self._cache:
+            self._cache.move_to_end(prefix)
+            return self._cache[prefix]
+        for shorter in range(len(prefix) - 1, 0, -1):
+            rows = self._cache.get(prefix[:shorter])
+            if rows is not None and len(rows) < self.LIMIT:
+                return [b for b in rows if matches(b, prefix)]
+        return None
+
+    def refresh(self):
+        """Query the current text now (also after the debounce delay)."""
+        prefix = self._prefix()
+        rows = self._local(prefix)
+        if rows is not None:
+            self._show(rows)
+            return
+        self.runner.submit(self.db.suggest_available_books, prefix, limit=self.LIMIT, key=self.KEY,
+                           quiet=True, on_result=lambda rows: self._loaded(prefix, rows))
+
+    def _loaded(self, prefix, rows):
+        self._cache[prefix] = rows
+        while len(self._cache) > self.CACHE_SIZE:
+            self._cache.popitem(last=False)
+        current = self._prefix()
+        if self.book is None and current.startswith(prefix):
+            local = self._local(current)
+            if local is not None:
+                self._show(local)
+
+    def _show(self, rows):
+        self._rows = rows
+        self._model.clear()
+        for b in rows:
+            item = QStandardItem(self.book_text(b))
+            item.setData(b["book_id"], Qt.UserRole)
+            self._model.appendRow(item)
+        if rows and self.hasFocus():
+            self.completer.complete()
+        else:
+            self.completer.popup().hide()
+
+    def _chosen(self, index):
+        book_id = index.data(Qt.UserRole)
+        book = next((b for b in self._rows if b["book_id"] == book_id), None)
+        if book is None:
+            return
+        self.book = book
+        self.setText(self.book_text(book))
+        self.bookChosen.emit(book)
+
+    def patch(self, rows):
+        """Books changed elsewhere (change feed): fix what is on screen, forget the cache."""
+        self._cache.clear()
+        changed = {r["book_id"]: r for r in rows}
+        self._rows = [dict(b, available_copies=changed[b["book_id"]]["available_copies"])
+                      if b["book_id"] in changed else b for b in self._rows]
+        self._rows = [b for b in self._rows if b["available_copies"] > 0]
+        if self.book is not None and self.book["book_id"] in changed:
+            self.book = dict(self.book, available_copies=changed[self.book["book_id"]]["available_copies"])
+            self.setText(self.book_text(self.book))
+        elif self.completer.popup().isVisible():
+            self._show(self._rows)
+
+    def reset(self):
+        # bahut kuch badla: cache bekaar, likha hua text dobara poocho
+        self._cache.clear()
+        if self.book is None and self._prefix():
+            self.refresh()
+
+    def clear_choice(self):
+        self.timer.stop()
+        self.runner.cancel(self.KEY)
+        self.book = None
+        self._rows = []
+        self.clear()
+        self.completer.popup().hide()
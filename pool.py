@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pymysql
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of pymysql connections.
+
+    Connections are checked out with acquire()/release() or the connection()
+    context manager. Idle connections are pinged on every checkout (and
+    reconnected if the link dropped) so callers never get a dead socket.
+    health_check_interval > 0 skips the ping for connections returned less
+    than that many seconds ago: one round trip saved per call, at the cost of
+    handing out a link that died inside the window.
+    """
+
+    def __init__(self, conn_args, min_size=1, max_size=5, timeout=10.0,
+                 health_check_interval=0.0, connect=pymysql.connect):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("need 0 <= min_size <= max_size and max_size >= 1")
+        self._conn_args = dict(conn_args)
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._lock = threading.Condition()
+        self._idle = deque()   # (conn, last_used) pairs
+        self._size = 0         # open connections, idle + checked out
+        self._closed = False
+
+        for _ in range(min_size):
+            self._idle.append((self._new_connection(), time.monotonic()))
+            self._size += 1
+
+    def _new_connection(self):
+        return self._connect(**self._conn_args)
+
+    def _healthy(self, conn, last_used):
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            conn.ping(reconnect=True)
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("pool is closed")
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # reserve the slot, connect outside the lock
+                    self._size += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"no connection available after {self.timeout}s")
+                self._lock.wait(remaining)
+
+        if conn is not None and self._healthy(conn, last_used):
+            return conn
+        if conn is not None:
+            self._close_quietly(conn)
+        try:
+            return self._new_connection()
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._lock.notify()
+            raise
+
+    def release(self, conn, discard=False):
+        with self._lock:
+            if discard or self._closed or not conn.open:
+                self._size -= 1
+                self._lock.notify()
+                close_it = True
+            else:
+                self._idle.append((conn, time.monotonic()))
+                self._lock.notify()
+                close_it = False
+        if close_it:
+            self._close_quietly(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            # socket is probably broken, don't hand it to the next caller
+            self.release(conn, discard=True)
+            raise
+        except BaseException:
+            try:
+                conn.rollback()
+            except Exception:
+                self.release(conn, discard=True)
+            else:
+                self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def stats(self):
+        with self._lock:
+            return {"size": self._size, "idle": len(self._idle),
+                    "in_use": self._size - len(self._idle),
+                    "min_size": self.min_size, "max_size": self.max_size}
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._lock.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,385 @@
+"""Borrowers also borrowed: precomputed book-to-book recommendations.
+
+Every member's window of recently borrowed books (the last HISTORY distinct
+ones) is a row of a sparse member x book matrix B; two books in the same
+window co-occur, and B^T B is the book x book co-occurrence matrix. It is
+built from all of loan history with numpy (pairs as int64 keys, counted
+with np.unique) and only each book's top K neighbours are kept, CSR-style
+like the search index: offsets + neighbour/score arrays, so a lookup is
+one slice.
+
+Score of a pair: cosine c / sqrt(n_a * n_b) (n = members with the book in
+their window, so bestsellers don't top every list), times c / (c + SHRINK)
+so a pair seen once doesn't beat one seen by dozens of borrowers.
+
+New loans (add_loans) move the member's window along and recompute the
+rows of the books whose counts changed, exactly, from the windows of that
+book's readers (a book -> members list built once from the windows); a
+big batch of them rebuilds the top-k from the windows instead. Rows that
+only list a book whose popularity moved keep the old score until then. The windows and
+top-k lists are saved to one .npz file, so a restart loads them and reads
+only the loans after the newest one it has seen.
+"""
+import os
+import threading
+
+import numpy as np
+
+FORMAT = 1
+
+
+def _score(counts, pop_a, pop_b, shrink):
+    c = counts.astype(np.float32)
+    return c / np.sqrt(pop_a.astype(np.float32) * pop_b) * (c / (c + shrink))
+
+
+def _columns(batches):
+    parts = [np.array(batch, dtype=np.int64).reshape(-1, 3) for batch in batches]
+    cols = np.concatenate(parts) if parts else np.zeros((0, 3), dtype=np.int64)
+    return cols[:, 0], cols[:, 1], cols[:, 2]
+
+
+def _windows(issue, member, book, history):
+    """member_id -> last `history` distinct book_ids, right-aligned (newest last, 0 = empty)."""
+    window = np.zeros((int(member.max()) + 1 if len(member) else 1, history), dtype=np.int32)
+    if not len(issue):
+        return window
+    # har (member, book) ka sabse naya loan
+    key = member * (int(book.max()) + 1) + book
+    order = np.lexsort((issue, key))
+    key = key[order]
+    last = np.ones(len(key), dtype=bool)
+    last[:-1] = key[1:] != key[:-1]
+    m, b, latest = member[order][last], book[order][last], issue[order][last]
+    # member ke andar naye se purane, pehli `history` rakho
+    order = np.lexsort((-latest, m))
+    m, b = m[order], b[order]
+    first = np.flatnonzero(np.diff(m, prepend=-1))
+    rank = np.arange(len(m)) - np.repeat(first, np.diff(first, append=len(m)))
+    keep = rank < history
+    window[m[keep], history - 1 - rank[keep]] = b[keep]
+    return window
+
+
+class CoBorrowIndex:
+    """Top-k co-borrowed books per book, kept up to date loan by loan."""
+
+    HISTORY = 20
+    K = 10
+    SHRINK = 5.0
+    REBUILD_ROWS = 2000        # ek baar me isse zyada rows badlein to windows se poora top-k
+    BLOCK_ENTRIES = 4_000_000  # top-k ka sort itni entries ke row blocks me (memory)
+
+    def __init__(self, history=HISTORY, k=K):
+        self.history = history
+        self.k = k
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.window = np.zeros((1, self.history), dtype=np.int32)
+        self.popularity = np.zeros(1, dtype=np.int32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.ids = np.zeros(0, dtype=np.int32)
+        self.scores = np.zeros(0, dtype=np.float32)
+        self.updated = {}   # book_id -> (ids, scores): add_loans ke baad dobara nikali rows
+        self.last_issue_id = 0
+        self._readers = None
+
+    def build(self, batches):
+        """Rebuild from batches of (issue_id, member_id, book_id) tuples covering every loan."""
+        issue, member, book = _columns(batches)
+        window = _windows(issue, member, book, self.history)
+        popularity, offsets, ids, scores = self._top_k_all(window)
+        with self._lock:
+            self.window = window
+            self.popularity = popularity
+            self.offsets, self.ids, self.scores = offsets, ids, scores
+            self.updated = {}
+            self._readers = None
+            self.last_issue_id = int(issue.max()) if len(issue) else 0
+
+    def _top_k_all(self, window):
+        n_books = int(window.max()) + 1
+        popularity = np.bincount(window.ravel(), minlength=n_books).astype(np.int32)
+        popularity[0] = 0
+        # window ki har do jagah i < j ek unordered pair. right-aligned h, to column i
+        # bhara h to aage ke sab bhi bhare h
+        keys = []
+        for i in range(self.history - 1):
+            rows = window[:, i] > 0
+            if not rows.any():
+                continue
+            a = window[rows, i].astype(np.int64)[:, None]
+            rest = window[rows, i + 1:]
+            keys.append((np.minimum(a, rest) * n_books + np.maximum(a, rest)).ravel())
+        if not keys:
+            return popularity, np.zeros(n_books + 1, dtype=np.int64), self.ids[:0], self.scores[:0]
+        pairs, counts = np.unique(np.concatenate(keys), return_counts=True)
+        del keys
+        a, b = (pairs // n_books).astype(np.int32), (pairs % n_books).astype(np.int32)
+        s = _score(counts, popularity[a], popularity[b], self.SHRINK)
+        del pairs, counts
+        # score ki jagah uska rank (bada score = chhota rank): (row, rank, id) ek int64 key
+        # me aa jaata h, aur ek argsort teen keys ke lexsort se kai guna tez h
+        distinct, score_rank = np.unique(s, return_inverse=True)
+        score_rank = (len(distinct) - 1 - score_rank).astype(np.int64)
+        id_bits, rank_bits = n_books.bit_length(), len(distinct).bit_length()
+
+        # har pair dono books ki row me jata h; poora (row, -score) sort ek saath bahut
+        # memory leta, isliye books ke blocks me, har block me ~BLOCK_ENTRIES entries
+        degree = np.bincount(a, minlength=n_books) + np.bincount(b, minlength=n_books)
+        cuts = np.searchsorted(np.cumsum(degree), np.arange(self.BLOCK_ENTRIES, degree.sum(), self.BLOCK_ENTRIES))
+        bounds = np.unique(np.concatenate(([0], cuts + 1, [n_books])))
+        out_rows, out_ids, out_scores = [], [], []
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            in_a = (a >= lo) & (a < hi)
+            in_b = (b >= lo) & (b < hi)
+            rows = np.concatenate((a[in_a], b[in_b]))
+            ids = np.concatenate((b[in_a], a[in_b]))
+            sc = np.concatenate((s[in_a], s[in_b]))
+            if (int(hi - lo) - 1).bit_length() + rank_bits + id_bits <= 63:
+                key = (rows - lo).astype(np.int64) << rank_bits | np.concatenate((score_rank[in_a], score_rank[in_b]))
+                order = np.argsort(key << id_bits | ids)
+                del key
+            else:
+                order = np.lexsort((ids, -sc, rows))
+            rows, ids, sc = rows[order], ids[order], sc[order]
+            first = np.flatnonzero(np.diff(rows, prepend=-1))
+            rank = np.arange(len(rows)) - np.repeat(first, np.diff(first, append=len(rows)))
+            keep = rank < self.k
+            out_rows.append(rows[keep])
+            out_ids.append(ids[keep])
+            out_scores.append(sc[keep])
+        rows = np.concatenate(out_rows)
+        offsets = np.zeros(n_books + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_books), out=offsets[1:])
+        return popularity, offsets, np.concatenate(out_ids), np.concatenate(out_scores)
+
+    def _reader_lists(self):
+        # book -> members jinki window me thi (CSR, windows se ek baar), plus baad me
+        # jude members. window se nikle members yahan rehte h, _row unhe chhaant deta h
+        flat = self.window.ravel()
+        filled = np.flatnonzero(flat)
+        books = flat[filled]
+        order = np.argsort(books, kind="stable")
+        offsets = np.zeros(len(self.popularity) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(books, minlength=len(self.popularity)), out=offsets[1:])
+        return offsets, (filled[order] // self.history).astype(np.int32), {}
+
+    def _readers_of(self, book_id):
+        if self._readers is None:
+            self._readers = self._reader_lists()
+        offsets, members, added = self._readers
+        base = members[offsets[book_id]:offsets[book_id + 1]] if book_id < len(offsets) - 1 else members[:0]
+        more = added.get(book_id)
+        return np.unique(np.concatenate((base, more))) if more else base
+
+    def _row(self, book_id):
+        # ek book ki row, abhi ki windows se: jin members ki window me h unki baaki books
+        windows = self.window[self._readers_of(book_id)]
+        others = windows[(windows == book_id).any(axis=1)].ravel()
+        others = others[(others != 0) & (others != book_id)]
+        ids, counts = np.unique(others, return_counts=True)
+        s = _score(counts, self.popularity[book_id], self.popularity[ids], self.SHRINK)
+        top = np.lexsort((ids, -s))[:self.k]
+        return ids[top].astype(np.int32), s[top]
+
+    def _grow(self, member_id, book_id):
+        if member_id >= len(self.window):
+            extra = max(member_id + 1, 2 * len(self.window)) - len(self.window)
+            self.window = np.vstack((self.window, np.zeros((extra, self.history), dtype=np.int32)))
+        if book_id >= len(self.popularity):
+            extra = max(book_id + 1, 2 * len(self.popularity)) - len(self.popularity)
+            self.popularity = np.concatenate((self.popularity, np.zeros(extra, dtype=np.int32)))
+
+    def add_loans(self, loans):
+        """Apply (issue_id, member_id, book_id) loans in issue_id order; loans
+        already seen are skipped. Returns how many were new."""
+        new_loans = 0
+        dirty = set()
+        with self._lock:
+            if self._readers is None:
+                self._readers = self._reader_lists()
+            added = self._readers[2]
+            for issue_id, member_id, book_id in loans:
+                if issue_id <= self.last_issue_id:
+                    continue
+                self.last_issue_id = issue_id
+                new_loans += 1
+                self._grow(member_id, book_id)
+                row = self.window[member_id]
+                old = [b for b in row.tolist() if b]
+                if book_id in old:
+                    # dobara li: window ka set wahi, bas sabse naya ban gaya
+                    new = [b for b in old if b != book_id] + [book_id]
+                else:
+                    new = (old + [book_id])[-self.history:]
+                    self.popularity[book_id] += 1
+                    if len(old) == self.history:
+                        self.popularity[old[0]] -= 1
+                    # nayi book ke saath sab ke counts badhe, window se nikli ke ghate
+                    dirty.update(old)
+                    dirty.add(book_id)
+                    added.setdefault(book_id, []).append(member_id)
+                row[:] = [0] * (self.history - len(new)) + new
+            if len(dirty) > self.REBUILD_ROWS:
+                self.popularity, self.offsets, self.ids, self.scores = self._top_k_all(self.window)
+                self.updated = {}
+                self._readers = None
+            else:
+                for book_id in dirty:
+                    self.updated[book_id] = self._row(book_id)
+        return new_loans
+
+    def neighbours(self, book_id, limit=None):
+        """[(book_id, score)] most co-borrowed first, at most K."""
+        with self._lock:
+            row = self.updated.get(book_id)
+            if row is None:
+                if not 0 < book_id < len(self.offsets) - 1:
+                    return []
+                lo, hi = self.offsets[book_id], self.offsets[book_id + 1]
+                row = self.ids[lo:hi], self.scores[lo:hi]
+        ids, scores = row
+        n = self.k if limit is None else min(limit, self.k)
+        return list(zip(ids[:n].tolist(), scores[:n].tolist()))
+
+    def _compact(self):
+        # updated rows ko base CSR me mila do (save se pehle)
+        if not self.updated:
+            return
+        n = max(len(self.offsets) - 1, max(self.updated) + 1)
+        lengths = np.zeros(n, dtype=np.int64)
+        lengths[:len(self.offsets) - 1] = np.diff(self.offsets)
+        rows = np.repeat(np.arange(n), lengths)
+        keep = ~np.isin(rows, np.fromiter(self.updated, dtype=np.int64))
+        changed = sorted(self.updated.items())
+        rows = np.concatenate([rows[keep]] + [np.full(len(ids), b) for b, (ids, _) in changed])
+        ids = np.concatenate([self.ids[keep]] + [ids for _, (ids, _) in changed])
+        scores = np.concatenate([self.scores[keep]] + [s for _, (_, s) in changed])
+        order = np.argsort(rows, kind="stable")
+        self.offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=self.offsets[1:])
+        self.ids, self.scores = ids[order].astype(np.int32), scores[order].astype(np.float32)
+        self.updated = {}
+
+    def save(self, path):
+        with self._lock:
+            self._compact()
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as fp:
+                np.savez(fp, window=self.window, popularity=self.popularity, offsets=self.offsets,
+                         ids=self.ids, scores=self.scores,
+                         meta=np.array([FORMAT, self.history, self.k, self.last_issue_id], dtype=np.int64))
+            # aadhi likhi file kabhi load na ho
+            os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """The index saved at `path`, or None if there is none (or it is from another version)."""
+        try:
+            data = np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+        with data:
+            fmt, history, k, last_issue_id = data["meta"].tolist()
+            if fmt != FORMAT or history != cls.HISTORY or k != cls.K:
+                return None
+            index = cls(history, k)
+            index.window = data["window"]
+            index.popularity = data["popularity"]
+            index.offsets = data["offsets"]
+            index.ids = data["ids"]
+            index.scores = data["scores"]
+            index.last_issue_id = last_issue_id
+        return index
+
+
+def default_path(db_manager):
+    """Where the index of this database is saved: $LMS_RECOMMENDATIONS, next to a
+    SQLite file, or ~/.cache/lms/ per MySQL database. None for :memory:."""
+    path = os.environ.get("LMS_RECOMMENDATIONS")
+    if path:
+        return path
+    backend = db_manager.backend
+    if backend.name == "sqlite":
+        return None if backend.path == ":memory:" else backend.path + ".coborrow.npz"
+    args = backend.conn_args
+    name = f"coborrow-{args.get('host') or args.get('unix_socket') or 'local'}-{args.get('database')}.npz"
+    return os.path.join(os.path.expanduser("~/.cache/lms"), name.replace(os.sep, "_"))
+
+
+class Recommender:
+    """Borrowers-also-borrowed lists for the GUI and the API server.
+
+    build() loads the saved index and catches up on newer loans, or builds
+    it from all of loan history and saves it. catch_up() applies loans
+    issued since (call it when the change feed reports loans).
+    """
+
+    def __init__(self, db_manager, path=None):
+        self.db = db_manager
+        self.path = path if path is not None else default_path(db_manager)
+        self.index = CoBorrowIndex()
+        self.ready = False
+        self.dirty = False
+        self._build_lock = threading.Lock()
+
+    def build(self):
+        with self._build_lock:
+            index = CoBorrowIndex.load(self.path) if self.path else None
+            # file kisi aur (ya reset hue) database ki: usme aage ke loans h
+            if index is None or index.last_issue_id > self.db.latest_issue_id():
+                self._rebuild()
+                return
+            self.index = index
+            self.ready = True
+            self._catch_up()
+
+    def rebuild(self):
+        with self._build_lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        index = CoBorrowIndex()
+        index.build(self.db.iter_loan_pairs(batch_size=100_000))
+        self.index = index
+        self.ready = True
+        self.dirty = True
+        self._save()
+
+    def catch_up(self):
+        if not self.ready:
+            return 0
+        with self._build_lock:
+            return self._catch_up()
+
+    def _catch_up(self):
+        added = 0
+        for batch in self.db.iter_loan_pairs(self.index.last_issue_id, batch_size=10_000):
+            added += self.index.add_loans(batch)
+        self.dirty = self.dirty or bool(added)
+        return added
+
+    def save(self):
+        with self._build_lock:
+            self._save()
+
+    def _save(self):
+        if self.path and self.dirty:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self.index.save(self.path)
+            self.dirty = False
+
+    def also_borrowed(self, book_id, limit=10):
+        """Book rows (with a `score`) most borrowed by the borrowers of book_id."""
+        ranked = self.index.neighbours(book_id, limit)
+        rows = {b["book_id"]: b for b in self.db.get_books_by_ids([b for b, _ in ranked])}
+        result = []
+        for other, score in ranked:
+            row = rows.get(other)
+            if row is not None:
+                row["score"] = round(score, 4)
+                result.append(row)
+        return result
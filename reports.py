@@ -0,0 +1,199 @@
+"""Charts for the Reports tab.
+
+The old tab called figure.subplots() on every visit, so each visit stacked
+one more Axes on the figure and every redraw got slower. Here charts are
+built once and then only updated:
+
+BarChart    - bars on an Axes that lives as long as the tab; new data
+              changes the bar heights and tick labels in place, and the
+              same data again changes nothing (update() returns False, so
+              the canvas isn't redrawn).
+ChartView   - a QLabel for the heavier charts (loans over time, busiest
+              hours heatmap). A worker thread draws them on its own Agg
+              figure into a QImage; images are kept by (data, size), so
+              switching periods back and forth or revisiting the tab just
+              shows the image again.
+
+All of it is fed by DatabaseManager.get_report (one query per refresh).
+"""
+import json
+import threading
+from collections import OrderedDict
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtWidgets import QLabel, QSizePolicy
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+# do worker ek saath matplotlib ka text layout na chalayein
+_render_lock = threading.Lock()
+
+
+class BarChart:
+    """Bar chart on a long-lived Axes, updated in place."""
+
+    def __init__(self, ax, xlabel="", ylabel="", empty="No data", rotation=0, label_width=24):
+        self.ax = ax
+        self.xlabel = xlabel
+        self.ylabel = ylabel
+        self.rotation = rotation
+        self.label_width = label_width
+        self.bars = None
+        self.shown = None
+        self.empty = ax.text(0.5, 0.5, empty, ha="center", va="center", transform=ax.transAxes, visible=False)
+
+    def update(self, labels, values, title=""):
+        """Show labels/values; False if that's what is already shown."""
+        labels, values = list(labels), list(values)
+        if (labels, values, title) == self.shown:
+            return False
+        ax = self.ax
+        if self.bars is not None and len(self.bars) == len(values):
+            # wahi bars: sirf unchai badlo, naye artists nahi
+            for bar, value in zip(self.bars, values):
+                bar.set_height(value)
+        else:
+            if self.bars is not None:
+                self.bars.remove()
+            self.bars = ax.bar(range(len(values)), values) if values else None
+        ax.set_xticks(range(len(labels)))
+        ax.set_xticklabels([shorten(label, self.label_width) for label in labels],
+                           rotation=self.rotation, ha="right" if self.rotation else "center")
+        ax.set_xlim(-0.6, max(len(values), 1) - 0.4)
+        ax.set_ylim(0, max(values, default=0) * 1.1 or 1)
+        ax.set_xlabel(self.xlabel if values else "")
+        ax.set_ylabel(self.ylabel if values else "")
+        ax.set_title(title)
+        self.empty.set_visible(not values)
+        self.shown = (labels, values, title)
+        return True
+
+
+def shorten(text, width=24):
+    # lambe titles tick labels me poora chart kha jaate h
+    text = str(text)
+    return text if len(text) <= width else text[:width - 1] + "\u2026"
+
+
+def render(draw, data, width, height, dpi=100):
+    """draw(figure, data) on a fresh Agg figure -> QImage. Safe on a worker thread."""
+    with _render_lock:
+        fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi, layout="constrained")
+        canvas = FigureCanvasAgg(fig)
+        draw(fig, data)
+        canvas.draw()
+        w, h = canvas.get_width_height()
+        # copy(): QImage ka buffer canvas ke saath chala jata
+        return QImage(bytes(canvas.buffer_rgba()), w, h, 4 * w, QImage.Format_RGBA8888).copy()
+
+
+def draw_timeline(fig, timeline):
+    ax = fig.subplots()
+    points = timeline["points"]
+    if not points:
+        ax.text(0.5, 0.5, "No loans yet", ha="center", va="center", transform=ax.transAxes)
+        ax.set_axis_off()
+        return
+    fmt = "%b %y" if timeline["unit"] == "month" else "%d %b"
+    x = range(len(points))
+    ax.bar(x, [p["issued"] for p in points], label="Issued")
+    ax.plot(x, [p["returned"] for p in points], color="tab:orange", marker=".", label="Returned")
+    step = max(1, len(points) // 12)
+    ax.set_xticks(x[::step])
+    ax.set_xticklabels([p["day"].strftime(fmt) for p in points[::step]], rotation=45, ha="right")
+    ax.set_title("Loans over time")
+    ax.legend(loc="upper left", fontsize="small")
+
+
+def draw_hours(fig, hours):
+    ax = fig.subplots()
+    image = ax.imshow(hours, aspect="auto", cmap="YlOrRd", interpolation="nearest")
+    ax.set_yticks(range(7))
+    ax.set_yticklabels(WEEKDAYS)
+    ax.set_xticks(range(0, 24, 3))
+    ax.set_xlabel("Hour")
+    ax.set_title("Busiest hours (issues + returns)")
+    fig.colorbar(image, ax=ax)
+
+
+class ImageCache:
+    """Small LRU of rendered chart images. GUI thread only."""
+
+    def __init__(self, max_size=32):
+        self.max_size = max_size
+        self._images = OrderedDict()
+
+    def get(self, key):
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+        return image
+
+    def put(self, key, image):
+        self._images[key] = image
+        self._images.move_to_end(key)
+        while len(self._images) > self.max_size:
+            self._images.popitem(last=False)
+
+
+class ChartView(QLabel):
+    """Shows a chart rendered off the GUI thread; re-renders on resize."""
+
+    RESIZE_DELAY_MS = 150
+
+    def __init__(self, name, draw, runner, cache, parent=None):
+        super().__init__(parent)
+        self.name = name
+        self.draw = draw
+        self.runner = runner
+        self.cache = cache
+        self.data = None
+        self.key = None
+        self.renders = 0
+        # pixmap label ka size tay na kare, label layout ke hisaab se chale
+        self.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored)
+        self.setMinimumHeight(160)
+        self._resize_timer = QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.setInterval(self.RESIZE_DELAY_MS)
+        self._resize_timer.timeout.connect(self._refresh)
+
+    def set_data(self, data):
+        self.data = data
+        self._refresh()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.data is not None:
+            self._resize_timer.start()
+
+    def _refresh(self):
+        ratio = self.devicePixelRatioF()
+        width, height = round(self.width() * ratio), round(self.height() * ratio)
+        if width < 50 or height < 50:
+            return
+        key = (self.name, json.dumps(self.data, default=str, sort_keys=True), width, height)
+        if key == self.key:
+            return
+        self.key = key
+        image = self.cache.get(key)
+        if image is not None:
+            self.runner.cancel(self.name)
+            self._show(image)
+            return
+        self.runner.submit(render, self.draw, self.data, width, height, 100 * ratio, key=self.name, quiet=True,
+                           on_result=lambda image: self._rendered(key, image))
+
+    def _rendered(self, key, image):
+        self.renders += 1
+        self.cache.put(key, image)
+        if key == self.key:
+            self._show(image)
+
+    def _show(self, image):
+        pixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(self.devicePixelRatioF())
+        self.setPixmap(pixmap)
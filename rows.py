@@ -0,0 +1,167 @@
+"""Compact query results for catalog-sized listings.
+
+A DictCursor row is a dict of its own: 272 bytes for a nine-column books
+row before counting the values, and building a million of them is a good
+part of the fetch time. Rows keeps what the driver returns -- one plain
+tuple per row -- and the column names once per result (column_index()
+shares the name -> position map between every result of the same shape).
+Plain tuples of ints/strings/dates also drop out of the garbage
+collector's lists after its first pass, which slots objects or tuple
+subclasses never do.
+
+Indexing or iterating gives Row views that read like the old dicts
+(row["title"], row.get("isbn"), dict(row), `in`) and write an existing
+column back into the batch. Views are for the moment: after sort(), index
+the Rows again. display() turns a value into table text only when a view
+actually paints it.
+"""
+from collections.abc import Mapping, Sequence
+from functools import lru_cache
+
+
+@lru_cache(maxsize=512)
+def column_index(columns):
+    # naam do baar aaye to dict jaisa: aakhri wala jeetta h
+    return {name: i for i, name in enumerate(columns)}
+
+
+class Row(Mapping):
+    """One row of a Rows batch, looked up by column name."""
+
+    __slots__ = ("_rows", "_i")
+
+    def __init__(self, rows, i):
+        self._rows = rows
+        self._i = i
+
+    def __getitem__(self, key):
+        rows = self._rows
+        return rows.data[self._i][rows.index[key]]
+
+    def get(self, key, default=None):
+        # har cell ke liye chalta h (table model), isliye Mapping.get se seedha
+        rows = self._rows
+        j = rows.index.get(key)
+        return default if j is None else rows.data[self._i][j]
+
+    def __setitem__(self, key, value):
+        rows = self._rows
+        j = rows.index.get(key)
+        if j is None:
+            raise KeyError(f"{key!r} is not a column of this result; use dict(row, ...) to add keys")
+        values = list(rows.data[self._i])
+        values[j] = value
+        rows.data[self._i] = tuple(values)
+
+    def update(self, other=(), **kwargs):
+        for key, value in dict(other, **kwargs).items():
+            self[key] = value
+
+    def __contains__(self, key):
+        return key in self._rows.index
+
+    def __iter__(self):
+        return iter(self._rows.columns)
+
+    def __len__(self):
+        return len(self._rows.columns)
+
+    def copy(self):
+        return self.as_dict()
+
+    def as_dict(self):
+        return dict(zip(self._rows.columns, self._rows.data[self._i]))
+
+    def __repr__(self):
+        return f"Row({self.as_dict()!r})"
+
+
+class Rows(Sequence):
+    """Query result: column names once, one plain tuple per row."""
+
+    __slots__ = ("columns", "index", "data")
+
+    def __init__(self, columns, data=()):
+        self.columns = tuple(columns)
+        self.index = column_index(self.columns)
+        self.data = list(data)
+
+    @classmethod
+    def of(cls, rows, columns=None):
+        """Rows from any list of row mappings (API client dicts, search results)."""
+        if isinstance(rows, Rows) and columns is None:
+            return rows.copy()
+        batch = cls(columns or ())
+        batch.extend(rows)
+        return batch
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return Rows(self.columns, self.data[i])
+        if i < 0:
+            i += len(self.data)
+        if not 0 <= i < len(self.data):
+            raise IndexError("Rows index out of range")
+        return Row(self, i)
+
+    def __iter__(self):
+        for i in range(len(self.data)):
+            yield Row(self, i)
+
+    def value(self, i, name, default=None):
+        j = self.index.get(name)
+        return default if j is None else self.data[i][j]
+
+    def display(self, i, name):
+        return display(self.value(i, name))
+
+    def column(self, name):
+        j = self.index[name]
+        return [t[j] for t in self.data]
+
+    def extend(self, rows):
+        if not isinstance(rows, Rows):
+            rows = list(rows)
+            if not rows:
+                return
+        if not self.columns and not self.data:
+            # Rows(()) abhi khaali: pehli rows se columns le lo
+            self.columns = rows.columns if isinstance(rows, Rows) else tuple(rows[0])
+            self.index = column_index(self.columns)
+        if isinstance(rows, Rows) and rows.columns == self.columns:
+            self.data.extend(rows.data)
+            return
+        # doosre shape ki rows: apne columns ke hisaab se, faltu keys chhod ke
+        columns = self.columns
+        self.data.extend(tuple(r.get(c) for c in columns) for r in rows)
+
+    def sort(self, key, reverse=False):
+        order = sorted(range(len(self.data)), key=lambda i: key(Row(self, i)), reverse=reverse)
+        self.data = [self.data[i] for i in order]
+
+    def copy(self):
+        return Rows(self.columns, self.data)
+
+    def as_dicts(self):
+        columns = self.columns
+        return [dict(zip(columns, t)) for t in self.data]
+
+    def __eq__(self, other):
+        if isinstance(other, Rows):
+            return self.columns == other.columns and self.data == other.data
+        return isinstance(other, list) and self.as_dicts() == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Rows({self.columns!r}, {len(self.data)} rows)"
+
+
+def display(value):
+    """Table text for one value ('' for NULL)."""
+    if value is None:
+        return ""
+    return value if isinstance(value, str) else str(value)
@@ -0,0 +1,276 @@
+import re
+import threading
+from bisect import bisect_left
+import unicodedata
+from array import array
+
+import numpy as np
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text):
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii")
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def trigrams(text, prefix=False):
+    # pg_trgm jaisa: har word ke aage do space, peeche ek. prefix=True me last word
+    # ke peeche space nahi lagta, taaki "harr" -> "harry" match ho (search-as-you-type)
+    words = text.split()
+    grams = set()
+    for i, w in enumerate(words):
+        tail = "" if prefix and i == len(words) - 1 else " "
+        padded = "  " + w + tail
+        for j in range(len(padded) - 2):
+            grams.add(padded[j:j + 3])
+    return grams
+
+
+def isbn_key(isbn):
+    # ISBN-10 ko ISBN-13 me badal ke int banate h, taaki sorted int64 array me rakh sake
+    digits = re.sub(r"[^0-9Xx]", "", isbn or "").upper()
+    if len(digits) == 10:
+        core = "978" + digits[:9]
+        check = (10 - sum(int(d) * (1 if k % 2 == 0 else 3) for k, d in enumerate(core)) % 10) % 10
+        digits = core + str(check)
+    if len(digits) != 13 or not digits.isdigit():
+        return None
+    return int(digits)
+
+
+class TrigramIndex:
+    """In-memory trigram index over book title/author/publisher plus ISBN.
+
+    Postings are stored CSR-style in numpy arrays (one sorted doc list per
+    trigram), so a query is a handful of array slices and one bincount.
+    Books added after build() go to a small delta that is scanned directly
+    until the next rebuild.
+    """
+
+    MIN_COVERAGE = 0.5     # query ke kam se kam itne trigram match hone chahiye
+    LENGTH_PENALTY = 0.1   # lambe titles thoda neeche
+    POSTING_BUDGET = 500_000
+    SHORT_QUERY = 4       # isse chhote single-word query sirf title prefix se
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.vocab = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.postings = np.zeros(0, dtype=np.int32)
+        self.doc_ids = np.zeros(0, dtype=np.int64)
+        self.doc_grams = np.zeros(0, dtype=np.int32)
+        self.titles = []
+        self.title_order = np.zeros(0, dtype=np.int32)
+        self.isbn_keys = np.zeros(0, dtype=np.int64)
+        self.isbn_docs = np.zeros(0, dtype=np.int32)
+        self.delta = []   # (book_id, grams, title, isbn_key)
+        self.max_book_id = 0
+
+    def __len__(self):
+        return len(self.doc_ids) + len(self.delta)
+
+    @staticmethod
+    def _text(book):
+        return normalize(" ".join(str(book.get(k) or "") for k in ("title", "author", "publisher")))
+
+    def build(self, books):
+        vocab = {}
+        gram_ids, doc_idx = array("i"), array("i")
+        doc_ids, doc_grams, titles = array("q"), array("i"), []
+        isbn_keys, isbn_docs = array("q"), array("i")
+        for n, book in enumerate(books):
+            grams = trigrams(self._text(book))
+            for g in grams:
+                gid = vocab.get(g)
+                if gid is None:
+                    gid = vocab[g] = len(vocab)
+                gram_ids.append(gid)
+                doc_idx.append(n)
+            doc_ids.append(book["book_id"])
+            doc_grams.append(len(grams))
+            titles.append(normalize(book.get("title")))
+            key = isbn_key(book.get("isbn"))
+            if key is not None:
+                isbn_keys.append(key)
+                isbn_docs.append(n)
+
+        gram_ids = np.frombuffer(gram_ids, dtype=np.int32)
+        order = np.argsort(gram_ids, kind="stable")
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(gram_ids, minlength=len(vocab)), out=offsets[1:])
+        keys = np.frombuffer(isbn_keys, dtype=np.int64)
+        isbn_order = np.argsort(keys)
+        title_order = np.array(sorted(range(len(titles)), key=titles.__getitem__), dtype=np.int32)
+
+        with self._lock:
+            self.vocab = vocab
+            self.offsets = offsets
+            self.postings = np.frombuffer(doc_idx, dtype=np.int32)[order]
+            self.doc_ids = np.frombuffer(doc_ids, dtype=np.int64)
+            self.doc_grams = np.frombuffer(doc_grams, dtype=np.int32)
+            self.titles = titles
+            self.title_order = title_order
+            self.isbn_keys = keys[isbn_order]
+            self.isbn_docs = np.frombuffer(isbn_docs, dtype=np.int32)[isbn_order]
+            self.delta = []
+            self.max_book_id = int(self.doc_ids.max()) if len(self.doc_ids) else 0
+
+    def add(self, book):
+        grams = trigrams(self._text(book))
+        entry = (book["book_id"], grams, normalize(book.get("title")), isbn_key(book.get("isbn")))
+        with self._lock:
+            self.delta.append(entry)
+            self.max_book_id = max(self.max_book_id, book["book_id"])
+
+    def search(self, query, limit=50):
+        """Returns [(book_id, score)] best first. Score is in (0, ~2]."""
+        q = normalize(query)
+        if not q:
+            return []
+        with self._lock:
+            scores = {}
+            self._search_isbn(query, scores)
+            prefix_hits = self._search_title_prefix(q, scores, limit)
+            qgrams = trigrams(q, prefix=True)
+            # title-prefix hits hamesha trigram hits se upar rank hote h, to `limit`
+            # mil gaye to trigram pass ki zarurat nahi
+            if prefix_hits < limit and (len(q) > self.SHORT_QUERY or " " in q):
+                self._search_main(q, qgrams, scores, limit)
+            self._search_delta(q, qgrams, query, scores)
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
+        return ranked[:limit]
+
+    def _search_isbn(self, query, scores):
+        digits = re.sub(r"[\s-]", "", query).upper()
+        if len(digits) < 6 or len(digits) > 13:
+            return
+        key = isbn_key(digits)
+        if key is not None:
+            lo, hi, score = key, key + 1, 2.0
+        elif digits.isdigit():
+            # 13 digit range me prefix search, chhote number (jaise "1984") title hi rehte h
+            pad = 13 - len(digits)
+            lo, hi, score = int(digits) * 10 ** pad, (int(digits) + 1) * 10 ** pad, 1.5
+        else:
+            return
+        a, b = np.searchsorted(self.isbn_keys, [lo, hi])
+        for n in self.isbn_docs[a:min(b, a + 50)].tolist():
+            scores[int(self.doc_ids[n])] = score
+
+    def _search_title_prefix(self, q, scores, limit):
+        # sorted titles par binary search, search-as-you-type ke pehle 1-2 akshar ke liye
+        titles = self.titles
+        start = bisect_left(self.title_order, q, key=titles.__getitem__)
+        hits = 0
+        for n in self.title_order[start:start + limit].tolist():
+            if not titles[n].startswith(q):
+                break
+            book_id = int(self.doc_ids[n])
+            scores[book_id] = max(scores.get(book_id, 0.0), 1.0 + self._title_bonus(q, titles[n]))
+            hits += 1
+        return hits
+
+    def _search_main(self, q, qgrams, scores, limit):
+        if not len(self.doc_ids):
+            return
+        slices = []
+        for g in qgrams:
+            gid = self.vocab.get(g)
+            if gid is not None:
+                slices.append((int(self.offsets[gid + 1] - self.offsets[gid]), gid))
+        if not slices:
+            return
+        # bahut common trigram ("  t", "the") bina kaam ke lakhon postings dete h,
+        # isliye rare se shuru karke budget tak hi lete h
+        slices.sort()
+        used, total = [], 0
+        for df, gid in slices:
+            if used and total + df > self.POSTING_BUDGET:
+                break
+            used.append(gid)
+            total += df
+        nq = len(qgrams) - (len(slices) - len(used))
+        hits = np.concatenate([self.postings[self.offsets[g]:self.offsets[g + 1]] for g in used])
+        counts = np.bincount(hits, minlength=len(self.doc_ids))
+        cand = np.flatnonzero(counts >= max(1, int(np.ceil(nq * self.MIN_COVERAGE))))
+        if not len(cand):
+            return
+        m = counts[cand].astype(np.float64)
+        score = m / (nq + self.LENGTH_PENALTY * (self.doc_grams[cand] - m))
+        if len(cand) > limit * 4:
+            pick = np.argpartition(-score, limit * 4 - 1)[:limit * 4]
+            cand, score = cand[pick], score[pick]
+        for n, s in zip(cand.tolist(), score.tolist()):
+            book_id = int(self.doc_ids[n])
+            scores[book_id] = max(scores.get(book_id, 0.0), s + self._title_bonus(q, self.titles[n]))
+
+    def _search_delta(self, q, qgrams, query, scores):
+        key = isbn_key(query)
+        for book_id, grams, title, ikey in self.delta:
+            if key is not None and ikey == key:
+                scores[book_id] = 2.0
+                continue
+            m = len(qgrams & grams)
+            if m and m >= len(qgrams) * self.MIN_COVERAGE:
+                s = m / (len(qgrams) + self.LENGTH_PENALTY * (len(grams) - m))
+                scores[book_id] = max(scores.get(book_id, 0.0), s + self._title_bonus(q, title))
+
+    @staticmethod
+    def _title_bonus(q, title):
+        if title == q:
+            return 0.5
+        if title.startswith(q):
+            return 0.3
+        if (" " + q) in (" " + title):
+            return 0.1
+        return 0.0
+
+
+class CatalogSearch:
+    """Ranked catalog search for the GUI.
+
+    Answers from the in-process TrigramIndex once it is built (typo tolerant,
+    prefix aware) and falls back to the FULLTEXT query in
+    DatabaseManager.search_books_ranked until then.
+    """
+
+    REBUILD_DELTA = 5000
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+        self.index = TrigramIndex()
+        self.ready = False
+        self._build_lock = threading.Lock()
+
+    def build(self):
+        with self._build_lock:
+            self.index.build(self.db.iter_all_books(batch_size=5000))
+            self.ready = True
+
+    def catch_up(self):
+        # naye add hue books (book_id > jo index me h) keyset se utha lo
+        if not self.ready:
+            return
+        for book in self.db.get_all_books(after_id=self.index.max_book_id):
+            self.index.add(book)
+        if len(self.index.delta) > self.REBUILD_DELTA:
+            self.build()
+
+    def search(self, query, limit=50):
+        if not self.ready:
+            return self.db.search_books_ranked(query, limit=limit)
+        ranked = self.index.search(query, limit=limit)
+        rows = {b["book_id"]: b for b in self.db.get_books_by_ids([bid for bid, _ in ranked])}
+        result = []
+        for book_id, score in ranked:
+            row = rows.get(book_id)
+            if row is not None:
+                row["relevance"] = score
+                result.append(row)
+        return result
@@ -0,0 +1,663 @@
+"""Headless circulation API: DatabaseManager over HTTP/JSON.
+
+    python server.py --password root --port 8080
+    python server.py --sqlite lms.sqlite3 --port 8080
+
+One process holds the database credentials and the connection pool; desks
+and kiosks talk JSON to it (main.py does when LMS_SERVER is set, see
+client.py). Plain asyncio, HTTP/1.1 with keep-alive. Blocking DB calls run
+on a thread pool the size of the connection pool.
+
+Endpoints (all under /api, tokens from /api/login go in "Authorization: Bearer ..."):
+
+    GET  health
+    POST login {username, password}                 -> {token, user}
+    POST register {full_name, email, phone, username, password}
+    GET  books?q=&after_id=&limit=&sort=&desc=      GET books/available?...
+    GET  search?q=&limit=                           (ranked, typo tolerant)
+    GET  books/suggest?q=&limit=                    (available books by title/ISBN prefix)
+    POST books {title, author, publisher, isbn, year_published, total_copies}
+    POST books/bulk {books: [...]}                  -> {inserted, updated}
+    GET  loans?member_id=&after_id=&limit=&desc=    (members: only their own)
+    GET  loans/open?after_id=&limit=                (every member's, librarians: a desk's offline snapshot)
+    POST issue {book_id, member_id?, days?}         POST return {issue_id}
+    POST issue-books {book_ids, member_id?, days?, on?}  POST return-books {issue_ids, on?}  -> {results}
+                                                    (on: YYYY-MM-DD, when an offline desk did it)
+    GET  top?limit=&period=                         GET stats (librarians)
+    GET  report?period=&limit=                      (every Reports chart, see DatabaseManager.get_report)
+    GET  changes?since=&limit=                      (change feed, see DatabaseManager.get_changes)
+    GET  books/by-id?ids=1,2,3
+    GET  books/also-borrowed?book_id=&limit=        (borrowers of this book also borrowed, see recommend.py)
+    POST batch {requests: [{method, path, body?}]}  -> [{status, body}]
+
+Identical GETs that arrive while one is already running share its result,
+and GET responses are cached (already encoded) for a few seconds; writes
+drop the cached responses they affect.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from urllib.parse import parse_qsl, urlsplit
+
+from cache import QueryCache
+from db import BOOK_SORT_COLUMNS
+from pool import PoolTimeout
+from rows import Row, Rows
+
+log = logging.getLogger("lms.server")
+
+REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_default(value):
+    if isinstance(value, Rows):
+        return value.as_dicts()
+    if isinstance(value, Row):
+        return value.as_dict()
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode(value):
+    return json.dumps(value, default=_json_default, separators=(",", ":")).encode("utf-8")
+
+
+def _int(params, name, default=None):
+    value = params.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"{name} must be an integer")
+
+
+def _flag(params, name):
+    return str(params.get(name, "")).lower() in ("1", "true", "yes")
+
+
+def _required(body, *names):
+    missing = [n for n in names if body.get(n) in (None, "")]
+    if missing:
+        raise HTTPError(400, "missing " + ", ".join(missing))
+    return [body[n] for n in names]
+
+
+class Sessions:
+    """Bearer tokens -> validate_login() user info, in memory."""
+
+    def __init__(self, ttl=8 * 3600):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._tokens = {}
+
+    def create(self, user):
+        token = secrets.token_urlsafe(24)
+        with self._lock:
+            self._tokens[token] = (user, time.monotonic() + self.ttl)
+        return token
+
+    def get(self, token):
+        with self._lock:
+            entry = self._tokens.get(token)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._tokens[token]
+                return None
+            return entry[0]
+
+
+class CirculationServer:
+    """asyncio HTTP/1.1 front end for one DatabaseManager."""
+
+    MAX_BODY = 8 << 20
+    MAX_PAGE = 5000
+    MAX_STACK = 100   # issue-books / return-books me ek baar me itne
+    KEEPALIVE_TIMEOUT = 75.0
+    # GET path -> (cache tags, kiske hisaab se response alag h). tags () = cache nahi, sirf
+    # in-flight coalescing. scope cache key aur coalescing key dono me jaata h:
+    #   "public": sab ko ek jaisa   "role": login/role par (401/403 ya filter)
+    #   "member": har member ka apna. yaha na likha GET path "member" maana jaata h
+    READ_TAGS = {
+        "/api/health": ((), "public"),
+        "/api/books": (("books",), "public"),
+        "/api/books/available": (("books", "available"), "public"),
+        "/api/books/suggest": (("books", "available"), "public"),
+        "/api/books/by-id": ((), "public"),
+        "/api/search": (("books",), "public"),
+        "/api/loans": (("loans",), "member"),
+        "/api/loans/open": (("loans",), "role"),
+        "/api/top": (("top",), "public"),
+        "/api/report": (("top",), "public"),
+        "/api/books/also-borrowed": (("top",), "public"),
+        "/api/stats": ((), "role"),
+        # librarian ko poora feed, member ko sirf books + apne loans
+        "/api/changes": ((), "member"),
+    }
+
+    def __init__(self, db, catalog_search=None, workers=None, cache_size=1024, cache_ttl=2.0, recommender=None):
+        self.db = db
+        self.catalog_search = catalog_search
+        self.recommender = recommender
+        self.executor = ThreadPoolExecutor(max_workers=workers or db.pool.max_size,
+                                           thread_name_prefix="lms-api")
+        # encoded GET responses; cache_ttl=0 se band
+        self.responses = QueryCache(cache_size, cache_ttl) if cache_ttl else None
+        self.sessions = Sessions()
+        self._inflight = {}
+        self._server = None
+        self.requests = self.coalesced = self.errors = self.connections = 0
+        self.routes = {
+            ("GET", "/api/health"): self.health,
+            ("POST", "/api/login"): self.login,
+            ("POST", "/api/register"): self.register,
+            ("GET", "/api/books"): self.books,
+            ("GET", "/api/books/available"): self.available_books,
+            ("GET", "/api/books/suggest"): self.suggest_books,
+            ("GET", "/api/search"): self.search,
+            ("POST", "/api/books"): self.add_book,
+            ("POST", "/api/books/bulk"): self.upsert_books,
+            ("GET", "/api/loans"): self.loans,
+            ("GET", "/api/loans/open"): self.open_loans,
+            ("POST", "/api/issue"): self.issue,
+            ("POST", "/api/return"): self.return_book,
+            ("POST", "/api/issue-books"): self.issue_books,
+            ("POST", "/api/return-books"): self.return_books,
+            ("GET", "/api/top"): self.top,
+            ("GET", "/api/report"): self.report,
+            ("GET", "/api/stats"): self.stats,
+            ("GET", "/api/changes"): self.changes,
+            ("GET", "/api/books/by-id"): self.books_by_id,
+            ("GET", "/api/books/also-borrowed"): self.also_borrowed,
+            ("POST", "/api/batch"): self.batch,
+        }
+
+    # ---- lifecycle
+
+    async def start(self, host="127.0.0.1", port=8080):
+        self._server = await asyncio.start_server(self._serve_connection, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+        self.executor.shutdown(wait=True)
+
+    # ---- HTTP
+
+    async def _serve_connection(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), self.KEEPALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # body kaha khatam hoti h pata nahi, to connection bhi aage kaam ka nahi
+                    self._write(writer, 400, encode({"error": "invalid Content-Length"}), False)
+                    break
+                if length > self.MAX_BODY:
+                    self._write(writer, 413, encode({"error": "request body too large"}), False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                conn_header = headers.get("connection", "").lower()
+                keep_alive = conn_header != "close" and (version == "HTTP/1.1" or conn_header == "keep-alive")
+
+                status, payload = await self.handle(method, target, body, headers.get("authorization"))
+                self._write(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _write(writer, status, payload, keep_alive):
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + payload)
+
+    async def handle(self, method, target, body=b"", authorization=None):
+        """Run one request; returns (status, encoded JSON body)."""
+        user = None
+        if authorization and authorization.startswith("Bearer "):
+            user = self.sessions.get(authorization[7:])
+        return await self._dispatch(method, target, body, user)
+
+    async def _dispatch(self, method, target, body, user):
+        self.requests += 1
+        url = urlsplit(target)
+        route = self.routes.get((method, url.path))
+        try:
+            if route is None:
+                if any(path == url.path for _, path in self.routes):
+                    raise HTTPError(405, f"{method} not allowed on {url.path}")
+                raise HTTPError(404, f"no endpoint {url.path}")
+            if method == "GET":
+                return 200, await self._get(url.path, route, dict(parse_qsl(url.query)), user)
+            try:
+                data = json.loads(body) if body else {}
+            except ValueError:
+                raise HTTPError(400, "body is not valid JSON")
+            if not isinstance(data, dict):
+                raise HTTPError(400, "body must be a JSON object")
+            return 200, encode(await route(data, user))
+        except HTTPError as e:
+            return e.status, encode({"error": str(e)})
+        except PoolTimeout as e:
+            self.errors += 1
+            return 503, encode({"error": str(e)})
+        except Exception as e:
+            self.errors += 1
+            log.exception("%s %s failed", method, target)
+            return 500, encode({"error": str(e)})
+
+    async def _get(self, path, route, params, user):
+        tags, scope = self.READ_TAGS.get(path, ((), "member"))
+        key = (path, tuple(sorted(params.items())), self._caller(scope, user))
+        cache = self.responses if tags else None
+        if cache is not None:
+            hit, payload = cache.get(key)
+            if hit:
+                return payload
+        # same GET already running (e.g. every desk refreshing the top books): wait for it
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = cache.generation if cache is not None else None
+        try:
+            payload = encode(await route(params, user))
+        except BaseException as e:
+            future.set_exception(e)
+            # koi aur wait nahi kar raha tha to "exception never retrieved" warning na aaye
+            future.exception()
+            raise
+        else:
+            future.set_result(payload)
+            if cache is not None:
+                cache.put(key, payload, tags, generation)
+            return payload
+        finally:
+            del self._inflight[key]
+
+    @staticmethod
+    def _caller(scope, user):
+        # kis caller ka response kisko mil sakta h (cache aur in-flight dono ke liye)
+        if scope == "public":
+            return None
+        if user is None:
+            return "anonymous"
+        if scope == "role":
+            return user["role"]
+        return user["role"], user["member_id"]
+
+    def _call(self, fn, *args, **kwargs):
+        return asyncio.get_running_loop().run_in_executor(self.executor, lambda: fn(*args, **kwargs))
+
+    def _invalidate(self, *tags):
+        if self.responses is not None:
+            for tag in tags:
+                self.responses.invalidate(tag)
+
+    @staticmethod
+    def _need_user(user):
+        if user is None:
+            raise HTTPError(401, "login required")
+        return user
+
+    @staticmethod
+    def _member_for(user, requested):
+        # member sirf apne loans dekh/badal sakta h, librarian/admin kisi ke bhi
+        if requested is None or requested == user["member_id"]:
+            return user["member_id"]
+        if user["role"] in ("librarian", "admin"):
+            return requested
+        raise HTTPError(403, "members can only act on their own loans")
+
+    # ---- endpoints
+
+    async def health(self, params, user):
+        return {"ok": True}
+
+    async def login(self, body, user):
+        username, password = _required(body, "username", "password")
+        info = await self._call(self.db.validate_login, username, password)
+        if not info:
+            raise HTTPError(401, "invalid username or password")
+        return {"token": self.sessions.create(info), "user": info}
+
+    async def register(self, body, user):
+        full_name, email, username, password = _required(body, "full_name", "email", "username", "password")
+        ok = await self._call(self.db.create_member_and_user, full_name, email, body.get("phone"),
+                              username, password)
+        return {"ok": ok}
+
+    @staticmethod
+    def _listing(params):
+        sort_key = params.get("sort", "book_id")
+        if sort_key not in BOOK_SORT_COLUMNS:
+            raise HTTPError(400, f"unknown sort {sort_key!r}")
+        limit = _int(params, "limit", CirculationServer.MAX_PAGE)
+        return dict(after_id=_int(params, "after_id"), limit=min(limit, CirculationServer.MAX_PAGE),
+                    sort_key=sort_key, descending=_flag(params, "desc"))
+
+    async def books(self, params, user):
+        kwargs = self._listing(params)
+        if params.get("q"):
+            return await self._call(self.db.search_books, params["q"], **kwargs)
+        return await self._call(self.db.get_all_books, **kwargs)
+
+    async def available_books(self, params, user):
+        return await self._call(self.db.get_available_books, **self._listing(params))
+
+    async def suggest_books(self, params, user):
+        limit = min(_int(params, "limit", 20), 100)
+        return await self._call(self.db.suggest_available_books, params.get("q", ""), limit=limit)
+
+    async def search(self, params, user):
+        q = params.get("q", "")
+        limit = min(_int(params, "limit", 50), 500)
+        searcher = self.catalog_search
+        if searcher is not None:
+            return await self._call(searcher.search, q, limit=limit)
+        return await self._call(self.db.search_books_ranked, q, limit=limit)
+
+    async def add_book(self, body, user):
+        self._need_user(user)
+        title, total = _required(body, "title", "total_copies")
+        ok = await self._call(self.db.add_book, title, body.get("author"), body.get("publisher"),
+                              body.get("isbn"), body.get("year_published"), int(total))
+        if ok:
+            self._invalidate("books")
+            if self.catalog_search is not None:
+                await self._call(self.catalog_search.catch_up)
+        return {"ok": ok}
+
+    async def upsert_books(self, body, user):
+        self._need_user(user)
+        books = body.get("books")
+        if not isinstance(books, list):
+            raise HTTPError(400, "books must be a list")
+        inserted, updated = await self._call(self.db.upsert_books, books)
+        self._invalidate("books")
+        return {"inserted": inserted, "updated": updated}
+
+    async def loans(self, params, user):
+        member_id = self._member_for(self._need_user(user), _int(params, "member_id"))
+        return await self._call(self.db.get_issued_books_by_member, member_id,
+                                after_id=_int(params, "after_id"), limit=_int(params, "limit"),
+                                descending=_flag(params, "desc"))
+
+    async def open_loans(self, params, user):
+        if self._need_user(user)["role"] not in ("librarian", "admin"):
+            raise HTTPError(403, "only librarians can list every member's loans")
+        return await self._call(self.db.get_open_loans, after_id=_int(params, "after_id"),
+                                limit=min(_int(params, "limit", self.MAX_PAGE), self.MAX_PAGE))
+
+    async def issue(self, body, user):
+        user = self._need_user(user)
+        book_id, = _required(body, "book_id")
+        member_id = self._member_for(user, body.get("member_id"))
+        ok = await self._call(self.db.issue_book, int(book_id), member_id, days=int(body.get("days", 14)))
+        if ok:
+            self._invalidate("books", "loans", "top")
+            self._catch_up_recommendations()
+        return {"ok": ok}
+
+    async def return_book(self, body, user):
+        user = self._need_user(user)
+        issue_id, = _required(body, "issue_id")
+        if user["role"] not in ("librarian", "admin"):
+            loans = await self._call(self.db.get_issued_books_by_member, user["member_id"])
+            if not any(loan["issue_id"] == int(issue_id) for loan in loans):
+                raise HTTPError(403, "members can only return their own loans")
+        ok = await self._call(self.db.return_book, int(issue_id))
+        if ok:
+            self._invalidate("books", "loans", "top")
+        return {"ok": ok}
+
+    def _catch_up_recommendations(self):
+        # jawab iska intezaar nahi karta; naye loan wali lists agle request se dikhti h
+        if self.recommender is not None and self.recommender.ready:
+            self.executor.submit(self.recommender.catch_up)
+
+    @staticmethod
+    def _day(body):
+        # offline desk ke replay me asli din; naa ho to aaj
+        if not body.get("on"):
+            return None
+        try:
+            return date.fromisoformat(str(body["on"]))
+        except ValueError:
+            raise HTTPError(400, "on must be YYYY-MM-DD")
+
+    @staticmethod
+    def _id_list(body, name):
+        ids = body.get(name)
+        if not isinstance(ids, list) or not ids:
+            raise HTTPError(400, f"{name} must be a non-empty list")
+        if len(ids) > CirculationServer.MAX_STACK:
+            raise HTTPError(400, f"at most {CirculationServer.MAX_STACK} {name} per call")
+        try:
+            return [int(i) for i in ids]
+        except (TypeError, ValueError):
+            raise HTTPError(400, f"{name} must be integers")
+
+    async def issue_books(self, body, user):
+        user = self._need_user(user)
+        book_ids = self._id_list(body, "book_ids")
+        member_id = self._member_for(user, body.get("member_id"))
+        results = await self._call(self.db.issue_books, member_id, book_ids, days=int(body.get("days", 14)),
+                                   on=self._day(body))
+        if any(r["ok"] for r in results):
+            self._invalidate("books", "loans", "top")
+            self._catch_up_recommendations()
+        return {"results": results}
+
+    async def return_books(self, body, user):
+        user = self._need_user(user)
+        issue_ids = self._id_list(body, "issue_ids")
+        if user["role"] not in ("librarian", "admin"):
+            own = {loan["issue_id"] for loan in await self._call(self.db.get_issued_books_by_member,
+                                                                  user["member_id"])}
+            if not own.issuperset(issue_ids):
+                raise HTTPError(403, "members can only return their own loans")
+        results = await self._call(self.db.return_books, issue_ids, on=self._day(body))
+        if any(r["ok"] for r in results):
+            self._invalidate("books", "loans", "top")
+        return {"results": results}
+
+    async def top(self, params, user):
+        period = params.get("period", "all")
+        if period not in self.db.TOP_PERIODS:
+            raise HTTPError(400, f"period must be one of {', '.join(self.db.TOP_PERIODS)}")
+        return await self._call(self.db.get_top_issued_books, limit=_int(params, "limit", 10), period=period)
+
+    async def report(self, params, user):
+        period = params.get("period", "all")
+        if period not in self.db.TOP_PERIODS:
+            raise HTTPError(400, f"period must be one of {', '.join(self.db.TOP_PERIODS)}")
+        return await self._call(self.db.get_report, period=period, limit=_int(params, "limit", 10))
+
+    async def changes(self, params, user):
+        since = _int(params, "since")
+        feed = await self._call(self.db.get_changes, since, limit=min(_int(params, "limit", 1000), self.MAX_PAGE))
+        if user is None or user["role"] not in ("librarian", "admin"):
+            # dusre members ke loans/registration kisi member ko nahi dikhne chahiye
+            member_id = user["member_id"] if user else None
+            feed["changes"] = [c for c in feed["changes"]
+                               if c["entity"] == "book" or c["member_id"] == member_id]
+        return feed
+
+    async def also_borrowed(self, params, user):
+        book_id = _int(params, "book_id")
+        if book_id is None:
+            raise HTTPError(400, "missing book_id")
+        if self.recommender is None or not self.recommender.ready:
+            return []
+        return await self._call(self.recommender.also_borrowed, book_id, limit=min(_int(params, "limit", 10), 50))
+
+    async def books_by_id(self, params, user):
+        try:
+            ids = [int(x) for x in params.get("ids", "").split(",") if x]
+        except ValueError:
+            raise HTTPError(400, "ids must be comma separated integers")
+        if len(ids) > self.MAX_PAGE:
+            raise HTTPError(400, f"at most {self.MAX_PAGE} ids")
+        return await self._call(self.db.get_books_by_ids, ids)
+
+    async def stats(self, params, user):
+        # slow query log me SQL apne literal parameters ke saath h (password hash bhi): sirf staff
+        if self._need_user(user)["role"] not in ("librarian", "admin"):
+            raise HTTPError(403, "only librarians can see server statistics")
+        stats = self.db.stats()
+        stats["server"] = {"requests": self.requests, "coalesced": self.coalesced,
+                           "errors": self.errors, "connections": self.connections}
+        if self.responses is not None:
+            stats["responses"] = self.responses.stats()
+        return stats
+
+    async def batch(self, body, user):
+        # kai calls ek round trip me (jaise desk refresh: available + loans + top). lagataar GETs
+        # saath saath chalte h, har write apni jagah par akela (pichle sab khatam hone ke baad)
+        requests = body.get("requests")
+        if not isinstance(requests, list):
+            raise HTTPError(400, "requests must be a list")
+
+        async def one(req):
+            if req.get("path", "").rstrip("/") == "/api/batch":
+                return 400, encode({"error": "nested batch"})
+            sub_body = json.dumps(req["body"]).encode() if "body" in req else b""
+            return await self._dispatch(req.get("method", "GET"), req.get("path", ""), sub_body, user)
+
+        results, reads = [], []
+        for req in requests:
+            if not isinstance(req, dict):
+                raise HTTPError(400, "each request must be an object")
+            if req.get("method", "GET") == "GET":
+                reads.append(one(req))
+                continue
+            results += await asyncio.gather(*reads)
+            reads = []
+            results.append(await one(req))
+        results += await asyncio.gather(*reads)
+        return [{"status": status, "body": json.loads(payload)} for status, payload in results]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LMS circulation API server")
+    parser.add_argument("--listen", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--host", default="127.0.0.1", help="database host")
+    parser.add_argument("--db-port", type=int, default=3306)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default=os.environ.get("LMS_DB_PASSWORD", ""),
+                        help="default: $LMS_DB_PASSWORD")
+    parser.add_argument("--database", default="lms_db")
+    parser.add_argument("--sqlite", default=None, metavar="PATH", help="use an embedded SQLite database file")
+    parser.add_argument("--pool-size", type=int, default=16)
+    parser.add_argument("--cache-ttl", type=float, default=2.0, help="seconds GET responses are cached (0: off)")
+    parser.add_argument("--no-index", action="store_true", help="don't build the in-memory search index")
+    parser.add_argument("--no-recommendations", action="store_true",
+                        help="don't load/build the borrowers-also-borrowed index")
+    parser.add_argument("--archive-every", type=float, default=0, metavar="HOURS",
+                        help="move loans returned more than --keep-days ago to the archive table (0: off)")
+    parser.add_argument("--keep-days", type=int, default=90)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    from db import DatabaseManager
+    db = DatabaseManager(user=args.user, password=args.password, database=args.database,
+                         host=args.host, port=args.db_port, sqlite_path=args.sqlite,
+                         pool_min_size=min(4, args.pool_size), pool_max_size=args.pool_size,
+                         metrics=True)
+    catalog_search = None
+    if not args.no_index:
+        from search import CatalogSearch
+        catalog_search = CatalogSearch(db)
+        threading.Thread(target=catalog_search.build, daemon=True).start()
+    recommender = None
+    if not args.no_recommendations:
+        from recommend import Recommender
+        recommender = Recommender(db)
+        threading.Thread(target=recommender.build, daemon=True).start()
+    server = CirculationServer(db, catalog_search, cache_ttl=args.cache_ttl, recommender=recommender)
+    archiver = None
+    if args.archive_every > 0:
+        from archive import LoanArchiver
+        archiver = LoanArchiver(db, keep_days=args.keep_days)
+        archiver.start(every=args.archive_every * 3600)
+
+    async def run():
+        host, port = await server.start(args.listen, args.port)
+        log.info("listening on http://%s:%s", host, port)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if archiver is not None:
+            archiver.stop()
+        server.close()
+        if recommender is not None and recommender.ready:
+            recommender.save()
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""Startup timing for the GUI.
+
+main.py imports this module first, so perf_counter() here is as close to
+process start as Python gets. mark() records named milestones ("qapp",
+"first_window", "db_ready", ...) relative to that point. They are logged to
+the "lms.startup" logger, kept for the Settings tab, and when
+LMS_STARTUP_LOG is set appended as one JSON line per run to that file, so
+time-to-first-window can be tracked across commits (see
+benchmarks/bench_startup.py).
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+T0 = time.perf_counter()
+log = logging.getLogger("lms.startup")
+
+_lock = threading.Lock()
+_marks = {}
+_hooks = []
+
+
+def mark(name):
+    """Record milestone `name` (first call wins) and return its time in ms."""
+    ms = round((time.perf_counter() - T0) * 1000, 2)
+    with _lock:
+        if name in _marks:
+            return _marks[name]
+        _marks[name] = ms
+        hooks = list(_hooks)
+    log.info("startup %s at %.1f ms", name, ms)
+    for hook in hooks:
+        hook(name, ms)
+    return ms
+
+
+def add_hook(fn):
+    """fn(name, ms) is called for every new milestone."""
+    with _lock:
+        _hooks.append(fn)
+
+
+def marks():
+    with _lock:
+        return dict(_marks)
+
+
+def write_log(path=None, **extra):
+    """Append this run's milestones as a JSON line to `path` (default LMS_STARTUP_LOG)."""
+    path = path or os.environ.get("LMS_STARTUP_LOG")
+    if not path:
+        return
+    record = {"at": time.strftime("%Y-%m-%d %H:%M:%S"), "pid": os.getpid(), "marks": marks()}
+    record.update(extra)
+    with open(path, "a", encoding="utf-8") as fp:
+        fp.write(json.dumps(record) + "\n")
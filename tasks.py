@@ -0,0 +1,99 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class _Task(QRunnable):
+    def __init__(self, runner, fn, args, kwargs, key, on_result, on_error, quiet=False):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.runner = runner
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.on_result = on_result
+        self.on_error = on_error
+        self.quiet = quiet
+        self.cancelled = False
+
+    def run(self):
+        if self.cancelled:
+            self.runner._finished.emit(self, None, None)
+            return
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            self.runner._finished.emit(self, None, e)
+        else:
+            self.runner._finished.emit(self, result, None)
+
+
+class TaskRunner(QObject):
+    """Runs DB calls on a QThreadPool and hands results back on the GUI thread.
+
+    submit(fn, *args, key=..., on_result=..., on_error=...) queues fn in the
+    background. Callbacks always run on the GUI thread. Tasks sharing a key
+    replace each other: when a newer one is submitted the older one is taken
+    off the queue if it hasn't started, and its result is dropped if it has.
+    quiet=True tasks (background polling) don't count towards busyChanged.
+    """
+
+    busyChanged = pyqtSignal(bool)
+    failed = pyqtSignal(str)  # error of a task that had no on_error callback
+    _finished = pyqtSignal(object, object, object)
+
+    def __init__(self, max_threads=4, parent=None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_threads)
+        self._latest = {}
+        self._running = set()
+        self._finished.connect(self._on_finished)
+
+    def submit(self, fn, *args, key=None, on_result=None, on_error=None, quiet=False, **kwargs):
+        if key is not None:
+            self.cancel(key)
+        task = _Task(self, fn, args, kwargs, key, on_result, on_error, quiet)
+        if key is not None:
+            self._latest[key] = task
+        was_busy = self.is_busy()
+        self._running.add(task)
+        if not was_busy and not quiet:
+            self.busyChanged.emit(True)
+        self._pool.start(task)
+        return task
+
+    def cancel(self, key):
+        task = self._latest.pop(key, None)
+        if task is None:
+            return
+        task.cancelled = True
+        if self._pool.tryTake(task):
+            self._done(task)
+
+    def is_busy(self, key=None):
+        if key is None:
+            return any(not task.quiet for task in self._running)
+        return key in self._latest
+
+    def wait(self, msecs=-1):
+        return self._pool.waitForDone(msecs)
+
+    def _done(self, task):
+        if task.key is not None and self._latest.get(task.key) is task:
+            del self._latest[task.key]
+        if task in self._running:
+            self._running.discard(task)
+            if not task.quiet and not self.is_busy():
+                self.busyChanged.emit(False)
+
+    def _on_finished(self, task, result, error):
+        self._done(task)
+        if task.cancelled:
+            return
+        if error is not None:
+            if task.on_error:
+                task.on_error(error)
+            else:
+                self.failed.emit(str(error))
+        elif task.on_result:
+            task.on_result(result)
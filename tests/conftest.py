@@ -0,0 +1,72 @@
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import passwords  # noqa: E402
+from db import DatabaseManager  # noqa: E402
+
+
+def make_db(path, **kwargs):
+    db = DatabaseManager(sqlite_path=str(path), **kwargs)
+    # tests me scrypt ka asli cost nahi chahiye
+    db.set_password_kdf(passwords.PasswordHasher(ln=4))
+    return db
+
+
+def add_user(db, username, password="secret", role="member"):
+    assert db.create_member_and_user(username.title(), f"{username}@test", None, username, password)
+    with db.pool.connection() as conn, conn.cursor() as cursor:
+        cursor.execute("UPDATE users SET role=%s WHERE username=%s;", (role, username))
+    return db.validate_login(username, password)
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = make_db(tmp_path / "lms.sqlite3", pool_max_size=8)
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def serve():
+    """serve(server) -> base url; CirculationServer ek background event loop par."""
+    started = []
+
+    def start(server):
+        loop = asyncio.new_event_loop()
+        addr = []
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            addr.extend(loop.run_until_complete(server.start("127.0.0.1", 0)))
+            ready.set()
+            loop.run_forever()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        ready.wait(10)
+        started.append((server, loop, thread))
+        return f"http://{addr[0]}:{addr[1]}"
+
+    yield start
+    for server, loop, thread in started:
+        asyncio.run_coroutine_threadsafe(_stop(server), loop).result(10)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+        loop.close()
+
+
+async def _stop(server):
+    # keep-alive connections ke handler bhi band, loop band hone se pehle
+    server.close()
+    tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+pytest.importorskip("PyQt5")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import Qt  # noqa: E402
+
+from main import BookTableModel  # noqa: E402
+from rows import Rows  # noqa: E402
+
+
+def ranked(rows):
+    model = BookTableModel(None, None, None)
+    model._ranked = True
+    model._rows = Rows.of(rows)
+    return model
+
+
+def column(name):
+    return [key for key, _ in BookTableModel.COLUMNS].index(name)
+
+
+BOOKS = [
+    {"book_id": 1, "title": "Godan", "author": "Premchand", "publisher": None, "isbn": "",
+     "year_published": 1936, "total_copies": 2, "available_copies": 1},
+    {"book_id": 2, "title": "Gaban", "author": "", "publisher": "Saraswati", "isbn": "978",
+     "year_published": None, "total_copies": 1, "available_copies": 0},
+    {"book_id": 3, "title": "Nirmala", "author": None, "publisher": "", "isbn": None,
+     "year_published": 1927, "total_copies": 3, "available_copies": 3},
+]
+
+
+@pytest.mark.parametrize("name", [key for key, _ in BookTableModel.COLUMNS])
+def test_ranked_results_sort_by_every_column(name):
+    model = ranked(BOOKS)
+    model.sort(column(name), Qt.AscendingOrder)
+    model.sort(column(name), Qt.DescendingOrder)
+    assert sorted(r["book_id"] for r in model._rows) == [1, 2, 3]
+
+
+def test_ranked_sort_puts_blank_first_and_missing_last():
+    model = ranked(BOOKS)
+    model.sort(column("author"), Qt.AscendingOrder)
+    assert [r["book_id"] for r in model._rows] == [2, 1, 3]
+    model.sort(column("year_published"), Qt.AscendingOrder)
+    assert [r["book_id"] for r in model._rows] == [3, 1, 2]
@@ -0,0 +1,51 @@
+from conftest import add_user
+
+
+def copies(rows, book_id):
+    return next(b["available_copies"] for b in rows if b["book_id"] == book_id)
+
+
+def test_reads_are_cached(db):
+    books = db.get_all_books()
+    # cache ke peeche se badlav: cached listing wahi rehni chahiye
+    with db.pool.connection() as conn, conn.cursor() as cursor:
+        cursor.execute("UPDATE books SET title='changed behind the cache' WHERE book_id=1;")
+    assert db.get_all_books() == books
+
+
+def test_issue_and_return_refresh_cached_listings(db):
+    member = add_user(db, "asha")["member_id"]
+    before = copies(db.get_all_books(), 1)
+    available = copies(db.get_available_books(), 1)
+    assert db.get_issued_books_by_member(member) == []
+
+    assert db.issue_book(1, member)
+    assert copies(db.get_all_books(), 1) == before - 1
+    assert copies(db.get_available_books(), 1) == available - 1
+    loans = db.get_issued_books_by_member(member)
+    assert [l["book_id"] for l in loans] == [1]
+
+    assert db.return_book(loans[0]["issue_id"])
+    assert copies(db.get_all_books(), 1) == before
+    assert db.get_issued_books_by_member(member) == []
+
+
+def test_last_copy_leaves_and_rejoins_available(db):
+    member = add_user(db, "ravi")["member_id"]
+    total = copies(db.get_all_books(), 10)
+    assert any(b["book_id"] == 10 for b in db.get_available_books())
+    results = db.issue_books(member, [10] * total)
+    assert all(r["ok"] for r in results)
+    assert all(b["book_id"] != 10 for b in db.get_available_books())
+
+    db.return_books([results[0]["issue_id"]])
+    assert copies(db.get_available_books(), 10) == 1
+
+
+def test_add_book_invalidates_listings(db):
+    count = len(db.get_all_books())
+    available = len(db.get_available_books())
+    assert db.add_book("Godan", "Premchand", "Saraswati", "9788171676026", 1936, 2)
+    assert len(db.get_all_books()) == count + 1
+    assert len(db.get_available_books()) == available + 1
+    assert db.search_books("Godan")[0]["total_copies"] == 2
@@ -0,0 +1,93 @@
+import threading
+
+from conftest import add_user
+
+
+def counts(db, book_id):
+    row = db._fetch_all("""
+        SELECT b.available_copies,
+               (SELECT COUNT(*) FROM book_copies c WHERE c.book_id=b.book_id AND c.status='available') AS free,
+               (SELECT COUNT(*) FROM issued_books i WHERE i.book_id=b.book_id AND i.return_date IS NULL) AS out
+        FROM books b WHERE b.book_id=%s;
+    """, (book_id,))[0]
+    return row["available_copies"], row["free"], row["out"]
+
+
+def race(n, fn):
+    barrier = threading.Barrier(n)
+    results = [None] * n
+    errors = []
+
+    def run(i):
+        barrier.wait()
+        try:
+            results[i] = fn(i)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+    assert errors == []
+    return results
+
+
+def test_contended_issue_never_oversells(db):
+    members = [add_user(db, f"m{i}")["member_id"] for i in range(8)]
+    total = counts(db, 4)[0]   # The Catcher in the Rye, 3 copies
+    results = race(8, lambda i: db.issue_book(4, members[i]))
+    assert results.count(True) == total
+    assert counts(db, 4) == (0, 0, total)
+    assert db.issue_book(4, members[0]) is False
+
+
+def test_contended_returns_restore_every_copy(db):
+    members = [add_user(db, f"r{i}")["member_id"] for i in range(5)]
+    for member in members:
+        assert db.issue_book(1, member)
+    assert counts(db, 1) == (0, 0, 5)
+    loans = [db.get_issued_books_by_member(m)[0]["issue_id"] for m in members]
+    assert race(5, lambda i: db.return_book(loans[i])) == [True] * 5
+    assert counts(db, 1) == (5, 5, 0)
+
+
+def test_contended_stacks_and_returns_keep_counters_in_step(db):
+    members = [add_user(db, f"s{i}")["member_id"] for i in range(6)]
+    books = [1, 2, 3]
+    stacks = race(6, lambda i: db.issue_books(members[i], books * 2))
+    issued = [r["issue_id"] for stack in stacks for r in stack if r["ok"]]
+    for book_id in books:
+        available, free, out = counts(db, book_id)
+        assert available == free == 0
+        assert out == sum(r["ok"] for stack in stacks for r in stack if r["book_id"] == book_id)
+
+    # aadhe ek-ek karke, baaki stack me, dono saath saath
+    singles, stack = issued[::2], issued[1::2]
+    returned = race(2, lambda i: [db.return_book(x) for x in singles] if i == 0 else db.return_books(stack))
+    assert all(returned[0]) and all(r["ok"] for r in returned[1])
+    for book_id in books:
+        available, free, out = counts(db, book_id)
+        assert out == 0 and available == free
+
+
+def test_stack_with_one_short_title_issues_the_rest(db):
+    member = add_user(db, "uma")["member_id"]
+    total = counts(db, 10)[0]
+    results = db.issue_books(member, [10] * (total + 1) + [1])
+    assert [r["ok"] for r in results] == [True] * total + [False, True]
+    assert counts(db, 10) == (0, 0, total)
+    returned = db.return_books([r["issue_id"] for r in results if r["ok"]] + [999999])
+    assert [r["ok"] for r in returned] == [True] * (total + 1) + [False]
+    assert counts(db, 10)[0] == total and counts(db, 1) == (5, 5, 0)
+
+
+def test_return_twice_fails(db):
+    member = add_user(db, "lata")["member_id"]
+    assert db.issue_book(5, member)
+    issue_id = db.get_issued_books_by_member(member)[0]["issue_id"]
+    results = race(4, lambda i: db.return_book(issue_id))
+    assert results.count(True) == 1
+    assert db.return_book(issue_id) is False
+    assert counts(db, 5) == (5, 5, 0)
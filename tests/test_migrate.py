@@ -0,0 +1,81 @@
+import os
+import re
+
+import pytest
+
+from conftest import ROOT, make_db
+from migrate import BASELINE, MIGRATIONS_DIR, Migration, MigrationError, Migrator
+
+# original lms_db.sql ki tables; baaki sab 0000_baseline se aani chahiye
+ORIGINAL = {"books", "members", "users", "issued_books"}
+
+
+def dump_tables():
+    tables, current = {}, None
+    with open(os.path.join(ROOT, "lms_db.sql"), encoding="utf-8") as fp:
+        for line in fp:
+            m = re.match(r"CREATE TABLE `(\w+)`", line)
+            if m:
+                current = tables[m.group(1)] = []
+            elif current is not None and line.strip().startswith("`"):
+                current.append(line.split("`")[1])
+            elif line.startswith(")"):
+                current = None
+    return tables
+
+
+def read(name):
+    with open(os.path.join(MIGRATIONS_DIR, name), encoding="utf-8") as fp:
+        return fp.read()
+
+
+def baseline_tables():
+    tables = {}
+    for statement in Migration.statements(os.path.join(MIGRATIONS_DIR, "0000_baseline.up.sql")):
+        m = re.match(r"CREATE TABLE (\w+) \((.*)\)", statement, re.DOTALL)
+        if m:
+            tables[m.group(1)] = [line.split()[0] for line in m.group(2).splitlines()
+                                  if line.strip() and not re.match(r"\s*(PRIMARY|UNIQUE|KEY|CONSTRAINT)", line)]
+    return tables
+
+
+def test_baseline_covers_everything_added_to_the_dump():
+    dump, baseline = dump_tables(), baseline_tables()
+    assert set(dump) - ORIGINAL == set(baseline)
+    for table, columns in baseline.items():
+        assert columns == dump[table], table
+    up = read("0000_baseline.up.sql")
+    assert "ADD COLUMN copy_id" in up and "ft_books" in up
+    down = read("0000_baseline.down.sql")
+    for table in baseline:
+        assert f"DROP TABLE {table};" in down
+
+
+def test_baseline_is_first_and_recorded_on_a_current_schema(db):
+    migrator = Migrator(db)
+    assert migrator.available()[0].version == BASELINE
+    assert all(row["state"] == "applied" for row in migrator.status())
+    # pehle ke SQLite files: 0001/0002 applied, baseline nahi
+    with db.pool.connection() as conn, conn.cursor() as cursor:
+        cursor.execute("DELETE FROM schema_migrations WHERE version=0;")
+    assert [m.version for m in migrator.up()] == [BASELINE]
+    assert db.get_all_books()
+
+
+def test_partly_applied_baseline_is_refused(db):
+    with db.pool.connection() as conn, conn.cursor() as cursor:
+        cursor.execute("DELETE FROM schema_migrations WHERE version=0;")
+        cursor.execute("DROP TABLE fines;")
+    with pytest.raises(MigrationError, match="missing: fines"):
+        Migrator(db).up()
+
+
+def test_sqlite_stops_at_the_baseline(tmp_path):
+    db = make_db(tmp_path / "m.sqlite3")
+    migrator = Migrator(db)
+    migrator.down(to=BASELINE)
+    assert migrator.current() == BASELINE
+    with pytest.raises(MigrationError):
+        migrator.down()
+    assert [m.version for m in migrator.up()] == [1, 2]
+    db.close()
@@ -0,0 +1,49 @@
+import passwords
+from conftest import add_user
+
+
+def stored_hash(db, username):
+    return db._fetch_all("SELECT password_hash FROM users WHERE username=%s;", (username,))[0]["password_hash"]
+
+
+def set_hash(db, username, value):
+    with db.pool.connection() as conn, conn.cursor() as cursor:
+        cursor.execute("UPDATE users SET password_hash=%s WHERE username=%s;", (value, username))
+
+
+def test_new_users_get_scrypt(db):
+    add_user(db, "asha")
+    assert stored_hash(db, "asha").startswith("scrypt$ln=4,")
+
+
+def test_legacy_hash_is_upgraded_on_login(db):
+    add_user(db, "ravi")
+    set_hash(db, "ravi", passwords.legacy_hash("purana"))
+
+    assert db.validate_login("ravi", "galat") is None
+    assert stored_hash(db, "ravi") == passwords.legacy_hash("purana")
+
+    user = db.validate_login("ravi", "purana")
+    assert user["username"] == "ravi"
+    upgraded = stored_hash(db, "ravi")
+    assert upgraded.startswith(passwords.SCHEME + "$")
+    assert passwords.PasswordHasher(ln=4).verify("purana", upgraded) == (True, False)
+
+    # agli login naye hash se, aur wahi hash rehta h
+    assert db.validate_login("ravi", "purana") == user
+    assert stored_hash(db, "ravi") == upgraded
+    assert db.validate_login("ravi", "galat") is None
+
+
+def test_cheaper_hash_is_upgraded_to_current_cost(db):
+    add_user(db, "lata")
+    set_hash(db, "lata", passwords.PasswordHasher(ln=2).hash("secret"))
+    ok, needs_rehash = db.hasher.verify("secret", stored_hash(db, "lata"))
+    assert ok and needs_rehash
+
+    assert db.validate_login("lata", "secret")
+    assert stored_hash(db, "lata").startswith("scrypt$ln=4,")
+
+
+def test_unknown_user(db):
+    assert db.validate_login("nobody", "secret") is None
@@ -0,0 +1,132 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pool import ConnectionPool, PoolTimeout  # noqa: E402
+
+
+class FakeConnection:
+    """pymysql connection jitna pool ko chahiye; dead=True matlab server ne link tod diya."""
+
+    def __init__(self):
+        self.open = True
+        self.dead = False
+        self.pings = 0
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if self.dead:
+            raise ConnectionResetError(104, "Connection reset by peer")
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.open = False
+
+
+@pytest.fixture
+def made():
+    return []
+
+
+def connector(made):
+    def connect():
+        made.append(FakeConnection())
+        return made[-1]
+    return connect
+
+
+@pytest.fixture
+def pool(made):
+    pool = ConnectionPool({}, min_size=1, max_size=2, timeout=0.2, connect=connector(made))
+    yield pool
+    pool.close()
+
+
+def test_checkout_and_return(pool):
+    with pool.connection():
+        assert pool.stats()["in_use"] == 1
+    assert pool.stats() == {"size": 1, "idle": 1, "in_use": 0, "min_size": 1, "max_size": 2}
+
+
+def test_returned_connection_is_reused(pool, made):
+    first = pool.acquire()
+    pool.release(first)
+    second = pool.acquire()
+    assert second is first and len(made) == 1
+    pool.release(second)
+
+
+def test_every_checkout_is_health_checked(pool, made):
+    for _ in range(3):
+        with pool.connection():
+            pass
+    assert made[0].pings == 3
+
+
+def test_connection_that_just_died_is_replaced(pool, made):
+    with pool.connection():
+        pass
+    # link abhi abhi tuta (idle window ke andar): dead socket nahi milna chahiye
+    made[0].dead = True
+    with pool.connection() as conn:
+        assert conn is made[1]
+    assert not made[0].open
+    assert pool.stats()["size"] == 1
+
+
+def test_interval_skips_recent_pings(made):
+    pool = ConnectionPool({}, min_size=1, max_size=1, health_check_interval=60.0, connect=connector(made))
+    with pool.connection():
+        pass
+    assert made[0].pings == 0
+    pool.close()
+
+
+def test_timeout_when_exhausted(pool):
+    held = [pool.acquire(), pool.acquire()]
+    assert pool.stats()["size"] == 2
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    for conn in held:
+        pool.release(conn)
+    assert pool.stats()["idle"] == 2
+
+
+def test_waiter_gets_released_connection(pool):
+    pool.timeout = 5
+    held = [pool.acquire(), pool.acquire()]
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+    waiter.start()
+    pool.release(held[0])
+    waiter.join(5)
+    assert got == [held[0]]
+    pool.release(held[1])
+    pool.release(got[0])
+
+
+def test_discarded_connection_frees_its_slot(pool):
+    conn = pool.acquire()
+    pool.release(conn, discard=True)
+    assert pool.stats()["size"] == 0
+    with pool.connection() as fresh:
+        assert fresh is not conn
+
+
+def test_error_inside_block_still_returns(pool):
+    with pytest.raises(RuntimeError):
+        with pool.connection():
+            raise RuntimeError("boom")
+    assert pool.stats()["in_use"] == 0
+
+
+def test_closed_pool_refuses_checkout(pool):
+    pool.close()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
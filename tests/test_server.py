@@ -0,0 +1,119 @@
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+import pytest
+
+from client import ApiClient, ApiError
+from conftest import add_user
+from server import CirculationServer
+
+
+@pytest.fixture
+def api(db, serve):
+    server = CirculationServer(db, cache_size=256, cache_ttl=30.0)
+    url = serve(server)
+    add_user(db, "librarian", role="librarian")
+    add_user(db, "asha")
+    add_user(db, "ravi")
+
+    def login(username=None):
+        client = ApiClient(url)
+        if username is not None:
+            assert client.validate_login(username, "secret")
+        return client
+    login.url = url
+    return login
+
+
+def status(call):
+    with pytest.raises(ApiError) as e:
+        call()
+    return e.value.status
+
+
+def test_open_loans_stay_librarian_only_with_warm_cache(api):
+    asha = api("asha")
+    assert asha.issue_book(1, None)
+    librarian = api("librarian")
+    assert len(librarian.get_open_loans()) == 1
+    assert len(librarian.get_open_loans()) == 1   # ab response cache se
+
+    assert status(api().get_open_loans) == 401
+    assert status(asha.get_open_loans) == 403
+
+
+def test_member_loans_are_per_member_with_warm_cache(api):
+    asha, ravi = api("asha"), api("ravi")
+    asha_id = asha.validate_login("asha", "secret")["member_id"]
+    assert asha.issue_book(2, asha_id)
+    assert [l["book_id"] for l in asha.get_issued_books_by_member(asha_id)] == [2]
+
+    assert status(lambda: ravi.get_issued_books_by_member(asha_id)) == 403
+    assert status(lambda: api().get_issued_books_by_member(asha_id)) == 401
+    assert ravi.get_issued_books_by_member(None) == []
+    assert len(api("librarian").get_issued_books_by_member(asha_id)) == 1
+
+
+def test_login_failure_is_not_an_error(api):
+    assert api().validate_login("asha", "wrong") is None
+    assert api().validate_login("nobody", "secret") is None
+
+
+def test_stats_are_librarian_only(api):
+    assert status(api().stats) == 401
+    assert status(api("asha").stats) == 403
+    stats = api("librarian").stats()
+    assert stats["server"]["requests"] > 0
+    assert status(api("ravi").stats) == 403
+
+
+def raw_request(url, head):
+    url = urlsplit(url)
+    with socket.create_connection((url.hostname, url.port), timeout=5) as sock:
+        sock.sendall(head.encode("latin-1"))
+        reply = b""
+        while chunk := sock.recv(4096):
+            reply += chunk
+    return reply
+
+
+@pytest.mark.parametrize("length", ["abc", "-5", "1e3"])
+def test_bad_content_length_is_a_400(api, length):
+    reply = raw_request(api.url, f"POST /api/login HTTP/1.1\r\nHost: x\r\nContent-Length: {length}\r\n\r\n")
+    assert reply.startswith(b"HTTP/1.1 400 ")
+    assert b"invalid Content-Length" in reply
+    # server zinda h
+    assert api().validate_login("asha", "secret")
+
+
+def test_concurrent_changes_are_filtered_per_caller(db, api):
+    asha, ravi, librarian = api("asha"), api("ravi"), api("librarian")
+    since = librarian.get_changes()["version"]
+    assert asha.issue_book(3, None)
+    assert ravi.issue_book(4, None)
+
+    # feed dheema karo taaki teeno request ek saath in-flight ho
+    real = db.get_changes
+
+    def slow(*args, **kwargs):
+        time.sleep(0.2)
+        return real(*args, **kwargs)
+    db.get_changes = slow
+
+    feeds = {}
+    threads = [threading.Thread(target=lambda n=n, c=c: feeds.__setitem__(n, c.get_changes(since)))
+               for n, c in (("librarian", librarian), ("asha", asha), ("ravi", ravi))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+
+    def loan_members(feed):
+        return {c["member_id"] for c in feed["changes"] if c["entity"] == "loan"}
+    asha_id = asha.validate_login("asha", "secret")["member_id"]
+    ravi_id = ravi.validate_login("ravi", "secret")["member_id"]
+    assert loan_members(feeds["librarian"]) == {asha_id, ravi_id}
+    assert loan_members(feeds["asha"]) == {asha_id}
+    assert loan_members(feeds["ravi"]) == {ravi_id}